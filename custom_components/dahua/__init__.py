@@ -8,41 +8,82 @@ import asyncio
 import hashlib
 import logging
 import time
+from collections.abc import Awaitable, Callable
 from datetime import timedelta
+from functools import partial
 from typing import Any
 
 import aiohttp
-from aiohttp import ClientConnectorError, ClientError, ClientResponseError
+from aiohttp import ClientConnectorError, ClientResponseError
 from homeassistant.components.tag import async_scan_tag
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import EVENT_HOMEASSISTANT_STOP
-from homeassistant.core import CALLBACK_TYPE, HomeAssistant
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
 from homeassistant.exceptions import ConfigEntryNotReady
-from homeassistant.helpers.aiohttp_client import async_create_clientsession
+from homeassistant.helpers.debounce import Debouncer
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 
 from . import dahua_utils
+from .capability_store import get_capability_store
 from .client import DahuaClient
 from .const import (
     CONF_ADDRESS,
     CONF_CHANNEL,
+    CONF_EVENT_RATE_LIMIT,
     CONF_EVENTS,
+    CONF_MAX_CONCURRENT_REQUESTS,
     CONF_NAME,
     CONF_PASSWORD,
     CONF_PORT,
     CONF_RTSP_PORT,
+    CONF_SNAPSHOT_CACHE_TTL,
     CONF_USERNAME,
+    DEFAULT_EVENT_RATE_LIMIT,
+    DEFAULT_SNAPSHOT_CACHE_TTL,
     DOMAIN,
     PLATFORMS,
 )
-from .dahua_utils import parse_event
+from .event_hub import DahuaEventHub, get_event_hub, release_event_hub
+from .event_router import EventRouter
+from .event_throttle import EventThrottle
+from .request_scheduler import MAX_CONCURRENT_REQUESTS
+from .log_utils import HotPathLogger
+from .model_capabilities import classify_model
+from .models import DahuaState, ModelInfo
+from .poll_backend import CgiPollBackend, Rpc2PollBackend, select_config
+from .probes import CAPABILITY_PROBES, async_run_probes
+from .refresh_scheduler import (
+    KEY_COAXIAL_CONTROL,
+    KEY_DISARMING_LINKAGE,
+    KEY_EVENT_NOTIFICATIONS,
+    KEY_LIGHT_GLOBAL,
+    KEY_LIGHTING,
+    KEY_LIGHTING_V2,
+    KEY_MOTION_DETECT,
+    KEY_PTZ,
+    KEY_SMART_MOTION_DETECTION,
+    KEY_VIDEO_ANALYSE_RULE,
+    KEY_VIDEO_IN_MODE,
+    KEY_ZOOM_FOCUS,
+    TICK_SECONDS,
+    VOLATILE_KEYS,
+    WRITE_REFRESH_DELAY_SECONDS,
+    RefreshScheduler,
+)
+from .rpc2 import get_rpc2_client, release_rpc2_client
+from .session_pool import async_get_device_session, async_release_device_session
+from .snapshot_cache import SnapshotCache
 from .vto import DahuaVTOClient
+from .vto_supervisor import VTOSupervisor
 
 type DahuaConfigEntry = ConfigEntry["DahuaDataUpdateCoordinator"]
 
-SCAN_INTERVAL_SECONDS = timedelta(seconds=30)
+# The coordinator wakes up this often, but each part of the state has its own refresh interval, see refresh_scheduler.py
+SCAN_INTERVAL_SECONDS = timedelta(seconds=TICK_SECONDS)
 
 _LOGGER: logging.Logger = logging.getLogger(__package__)
+# Logs every event received, see log_utils.HotPathLogger
+_EVENT_LOGGER = HotPathLogger(_LOGGER)
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: DahuaConfigEntry) -> bool:
@@ -56,7 +97,11 @@ async def async_setup_entry(hass: HomeAssistant, entry: DahuaConfigEntry) -> boo
     name = str(entry.data.get(CONF_NAME, ""))
     channel = int(entry.data.get(CONF_CHANNEL, 0))
 
-    session = async_create_clientsession(hass, verify_ssl=False)
+    # All channels of a device share one connection pool, see session_pool.py
+    session = async_get_device_session(hass, entry.entry_id, address, port)
+    entry.async_on_unload(
+        partial(async_release_device_session, hass, entry.entry_id, address, port)
+    )
 
     coordinator = DahuaDataUpdateCoordinator(
         hass,
@@ -71,6 +116,11 @@ async def async_setup_entry(hass: HomeAssistant, entry: DahuaConfigEntry) -> boo
         channel=channel,
         session=session,
     )
+    # These also run when the first refresh fails and the entry is retried, async_unload_entry isn't called then.
+    # Registered last runs first: stop the event stream and keep alive, then drop the state shared with the device's
+    # other entries once none of them uses it
+    entry.async_on_unload(coordinator.close)
+    entry.async_on_unload(coordinator.async_stop)
     await coordinator.async_config_entry_first_refresh()
 
     if not coordinator.last_update_success:
@@ -113,9 +163,29 @@ class DahuaDataUpdateCoordinator(DataUpdateCoordinator[dict[str, Any]]):
     ) -> None:
         """Initialize the coordinator."""
         # The client used to communicate with Dahua devices
+        # The config entries of a device share its request slots, the largest max_concurrent_requests of them applies
         self.client: DahuaClient = DahuaClient(
+            username,
+            password,
+            address,
+            port,
+            rtsp_port,
+            session,
+            int(
+                entry.options.get(CONF_MAX_CONCURRENT_REQUESTS, MAX_CONCURRENT_REQUESTS)
+            ),
+        )
+
+        # The configs read on every poll come over CGI, or over a single RPC2 session if the device supports
+        # system.multicall (see the rpc2 probe and poll_backend.py). The channels of an NVR share the RPC2 session
+        self._rpc2_client = get_rpc2_client(
             username, password, address, port, rtsp_port, session
         )
+        self._poll_backend: CgiPollBackend | Rpc2PollBackend = CgiPollBackend(
+            self.client
+        )
+        self._rpc2_keep_alive = False
+        self._closed = False
 
         self.config_entry = entry
         self.platforms: list[str] = []
@@ -138,11 +208,17 @@ class DahuaDataUpdateCoordinator(DataUpdateCoordinator[dict[str, Any]]):
         self._supports_profile_mode = False
         self._channel = channel
         self._address = address
+        self._port = port
         self._max_streams = 3  # 1 main stream + 2 sub-streams by default
 
         self._supports_lighting_v2 = False
         self._supports_audio_cgi = False
         self._audio_encoding_enabled: bool | None = None
+        self._supports_rpc2 = False
+
+        # Outcome and duration of each capability probe, for diagnostics
+        self._probe_results: dict[str, dict[str, Any]] = {}
+        self._capabilities_from_store = False
 
         # channel_number is not the channel_index. channel_number is the index + 1.
         # So channel index 0 is channel number 1. Except for some older firmwares where channel
@@ -160,14 +236,20 @@ class DahuaDataUpdateCoordinator(DataUpdateCoordinator[dict[str, Any]]):
         self._username = username
         self._password = password
 
-        # Async tasks for event streaming (replaces threads)
-        self._event_task: asyncio.Task[None] | None = None
+        # Async tasks for event streaming (replaces threads). IP camera events come from the event hub shared by all
+        # channels of the device, _event_unsubscribe removes this channel from it
+        self._event_unsubscribe: Callable[[], None] | None = None
+        self._event_hub: DahuaEventHub | None = None
         self._vto_task: asyncio.Task[None] | None = None
-        self._vto_client: DahuaVTOClient | None = None
+        self._vto_supervisor: VTOSupervisor | None = None
+
+        # Routes events by (event name, channel) to their listeners (CrossLineDetection, VideoMotion, etc)
+        self._event_router = EventRouter()
 
-        # A dictionary of event name (CrossLineDetection, VideoMotion, etc) to a listener for that event
-        # The key will be formed from self.get_event_key(event_name) and includes the channel
-        self._dahua_event_listeners: dict[str, CALLBACK_TYPE] = dict()
+        # Decides which events are fired on the HA event bus, so event floods don't swamp the event loop and recorder
+        self._event_throttle = EventThrottle(
+            float(entry.options.get(CONF_EVENT_RATE_LIMIT, DEFAULT_EVENT_RATE_LIMIT))
+        )
 
         # A dictionary of event name (CrossLineDetection, VideoMotion, etc) to the time the event fire or was cleared.
         # If cleared the time will be 0. The time unit is seconds epoch
@@ -175,84 +257,89 @@ class DahuaDataUpdateCoordinator(DataUpdateCoordinator[dict[str, Any]]):
 
         self._floodlight_mode = 2
 
+        # data projected into a nested, typed tree (see dahua_utils.project_config) and the entity state derived from
+        # it. Both are rebuilt the first time they're read after data was replaced, so once per update
+        self._config: dict[Any, Any] = {}
+        self._config_data: dict[str, Any] | None = None
+        self._state = DahuaState()
+        self._state_data: dict[str, Any] | None = None
+
+        # Decides which state to refresh on each poll. Writes through the client make the state they changed due
+        self._refresh_scheduler = RefreshScheduler()
+        self.client.add_write_listener(self._on_write)
+
+        # Snapshots are shared by every camera entity (stream) of this channel
+        self._snapshot_cache = SnapshotCache(
+            self._async_fetch_snapshot,
+            float(
+                entry.options.get(CONF_SNAPSHOT_CACHE_TTL, DEFAULT_SNAPSHOT_CACHE_TTL)
+            ),
+        )
+
+        # Entities call async_request_refresh after a write. The refresh is delayed so the device has applied the
+        # write and a burst of writes is read back once
         super().__init__(
-            hass, _LOGGER, name=DOMAIN, update_interval=SCAN_INTERVAL_SECONDS
+            hass,
+            _LOGGER,
+            name=DOMAIN,
+            update_interval=SCAN_INTERVAL_SECONDS,
+            request_refresh_debouncer=Debouncer(
+                hass,
+                _LOGGER,
+                cooldown=WRITE_REFRESH_DELAY_SECONDS,
+                immediate=False,
+            ),
+            # The coordinator ticks every TICK_SECONDS but only refreshes what's due (see refresh_scheduler.py), so
+            # only tell the entities when the data changed
+            always_update=False,
         )
 
     async def async_start_event_listener(self) -> None:
-        """Starts the event listeners for IP cameras (this does not work for doorbells (VTO))"""
-        if self.events is not None:
-            self._event_task = asyncio.create_task(self._async_stream_events())
+        """
+        Starts the event listeners for IP cameras (this does not work for doorbells (VTO)). All channels of a device
+        share a single event stream, see DahuaEventHub.
+        """
+        # Already subscribed when an earlier initialization failed after this
+        if self.events is not None and self._event_unsubscribe is None:
+            hub = get_event_hub(
+                self.hass, self.client, self._address, self._port, self._username
+            )
+            self._event_hub = hub
+            self._event_unsubscribe = hub.subscribe(
+                self.client, self._channel, self.events, self.on_event
+            )
 
     async def async_start_vto_event_listener(self) -> None:
         """Starts the event listeners for doorbells (VTO). This will not work for IP cameras"""
         self._vto_task = asyncio.create_task(self._async_stream_vto_events())
 
-    async def _async_stream_events(self) -> None:
-        """Continuously stream events from the camera, reconnecting on failure."""
-        while True:
-            start_time = time.monotonic()
-            try:
-                await self.client.stream_events(
-                    self.on_receive, self.events, self._channel
-                )
-            except asyncio.CancelledError:
-                raise
-            except Exception as ex:
-                _LOGGER.warning(
-                    "Event stream for %s ended unexpectedly: %s", self._address, ex
-                )
-
-            elapsed = time.monotonic() - start_time
-            if elapsed < 10:
-                _LOGGER.debug(
-                    "Event stream for %s failed quickly, retrying in 60s", self._address
-                )
-                await asyncio.sleep(60)
-            else:
-                _LOGGER.debug("Reconnecting to event stream for %s", self._address)
-
     async def _async_stream_vto_events(self) -> None:
         """Continuously stream VTO events from a doorbell, reconnecting on failure."""
-        while True:
-            try:
-                _LOGGER.debug("Connecting to VTO event stream at %s", self._address)
-                loop = asyncio.get_event_loop()
-                _, protocol = await loop.create_connection(
-                    lambda: DahuaVTOClient(
-                        self._address,
-                        self._username,
-                        self._password,
-                        False,
-                        self.on_receive_vto_event,
-                    ),
-                    host=self._address,
-                    port=5000,
-                )
-                self._vto_client = protocol
-                await protocol.disconnected
-                _LOGGER.warning(
-                    "Disconnected from VTO at %s, reconnecting in 5s", self._address
-                )
-                await asyncio.sleep(5)
-            except asyncio.CancelledError:
-                raise
-            except Exception as ex:
-                _LOGGER.error(
-                    "VTO connection to %s failed, retrying in 30s: %s",
-                    self._address,
-                    ex,
-                )
-                await asyncio.sleep(30)
+        self._vto_supervisor = VTOSupervisor(
+            self._address, self._username, self._password, self.on_receive_vto_event
+        )
+        await self._vto_supervisor.async_run()
 
     async def async_stop(self, event: Any = None) -> None:
         """Stop anything we need to stop"""
-        if self._event_task is not None:
-            self._event_task.cancel()
-            self._event_task = None
+        if self._event_unsubscribe is not None:
+            self._event_unsubscribe()
+            self._event_unsubscribe = None
+            release_event_hub(self._address, self._port, self._username)
         if self._vto_task is not None:
             self._vto_task.cancel()
             self._vto_task = None
+        if self._rpc2_keep_alive:
+            self._rpc2_client.stop_keep_alive()
+            self._rpc2_keep_alive = False
+
+    def close(self) -> None:
+        """Releases what the coordinator shares with the other config entries of the device, see registry.py"""
+        if self._closed:
+            return
+        self._closed = True
+        self.client.close()
+        release_rpc2_client(self._username, self._password, self._address, self._port)
 
     async def _async_update_data(self) -> dict[str, Any]:
         """Reload the camera information"""
@@ -261,98 +348,42 @@ class DahuaDataUpdateCoordinator(DataUpdateCoordinator[dict[str, Any]]):
         # Do the one time initialization (do this when Home Assistant starts)
         if not self.initialized:
             try:
-                # Find the max number of streams. 1 main stream + n number of sub-streams
-                self._max_streams = await self.client.get_max_extra_streams() + 1
-                _LOGGER.debug("Using max streams %s", self._max_streams)
-
-                machine_name = await self.client.async_get_machine_name()
-                sys_info = await self.client.async_get_system_info()
-                version = await self.client.get_software_version()
+                # These don't depend on each other, fetch them at the same time
+                machine_name, sys_info, version = await asyncio.gather(
+                    self.client.async_get_machine_name(),
+                    self.client.async_get_system_info(),
+                    self.client.get_software_version(),
+                )
                 data.update(machine_name)
                 data.update(sys_info)
                 data.update(version)
 
-                device_type = data.get("deviceType", None)
-                # Lorex NVRs return deviceType=31, but the model is in the updateSerial
-                # /cgi-bin/magicBox.cgi?action=getSystemInfo"
-                # deviceType=31
-                # processor=ST7108
-                # serialNumber=ND0219110NNNNN
-                # updateSerial=DHI-NVR4108HS-8P-4KS2
-                if device_type in ["IP Camera", "31"] or device_type is None:
-                    # Some firmwares put the device type in the "updateSerial" field. Weird.
-                    device_type = data.get("updateSerial", None)
-                    if device_type is None:
-                        # If it's still none, then call the device type API
-                        dt = await self.client.get_device_type()
-                        device_type = dt.get("type")
-                data["model"] = device_type
-                self.model = str(device_type) if device_type else ""
                 self.machine_name = str(data.get("table.General.MachineName", ""))
                 self._serial_number = str(data.get("serialNumber", ""))
                 self._update_serial = str(data.get("updateSerial", ""))
 
-                try:
-                    await self.client.async_get_snapshot(0)
-                    # If able to take a snapshot with index 0 then most likely this cams channel needs to be reset
-                    # but check if unit is not a doorbell first as channel 0 doesnt exist for VTOs
-                    if not self.is_doorbell():
-                        self._channel_number = self._channel
-                except ClientError:
-                    pass
-                _LOGGER.debug("Using channel number %s", self._channel_number)
-
-                try:
-                    await self.client.async_get_coaxial_control_io_status()
-                    self._supports_coaxial_control = True
-                except ClientResponseError:
-                    self._supports_coaxial_control = False
-                _LOGGER.debug(
-                    "Device supports Coaxial Control=%s", self._supports_coaxial_control
-                )
-
-                try:
-                    await self.client.async_get_disarming_linkage()
-                    self._supports_disarming_linkage = True
-                except ClientError:
-                    self._supports_disarming_linkage = False
-                _LOGGER.debug(
-                    "Device supports disarming linkage=%s",
-                    self._supports_disarming_linkage,
-                )
-
-                try:
-                    await self.client.async_get_event_notifications()
-                    self._supports_event_notifications = True
-                except ClientError:
-                    self._supports_event_notifications = False
-                _LOGGER.debug(
-                    "Device supports event notifications=%s",
-                    self._supports_event_notifications,
-                )
+                # Capabilities found on an earlier start are reused until the firmware changes
+                capability_key = "{0}_{1}".format(self._serial_number, self._channel)
+                firmware_version = str(data.get("version", ""))
+                capability_store = get_capability_store(self.hass)
+                capabilities = None
+                if self._serial_number:
+                    capabilities = await capability_store.async_get(
+                        capability_key, firmware_version
+                    )
 
-                # PTZ
-                # The following lines are for Dahua devices
-                try:
-                    await self.client.async_get_ptz_position()
-                    self._supports_ptz_position = True
-                except ClientError:
-                    self._supports_ptz_position = False
-                _LOGGER.debug(
-                    "Device supports PTZ position=%s", self._supports_ptz_position
-                )
+                self._capabilities_from_store = capabilities is not None
+                if capabilities is not None:
+                    self._set_capabilities(capabilities)
+                    _LOGGER.debug(
+                        "Using stored capabilities for %s: %s",
+                        self._address,
+                        capabilities,
+                    )
+                else:
+                    await self._async_discover_model(data)
 
-                # Smart motion detection is enabled/disabled/fetched differently on Dahua devices compared to Amcrest
-                # The following lines are for Dahua devices
-                try:
-                    await self.client.async_get_smart_motion_detection()
-                    self._supports_smart_motion_detection = True
-                except ClientError:
-                    self._supports_smart_motion_detection = False
-                _LOGGER.debug(
-                    "Device supports smart motion detection=%s",
-                    self._supports_smart_motion_detection,
-                )
+                data["model"] = self.model
 
                 is_doorbell = self.is_doorbell()
                 _LOGGER.debug("Device is a doorbell=%s", is_doorbell)
@@ -362,94 +393,42 @@ class DahuaDataUpdateCoordinator(DataUpdateCoordinator[dict[str, Any]]):
 
                 self._supports_floodlightmode = self.supports_floodlightmode()
 
-                try:
-                    await self.client.async_get_config_lighting(
-                        self._channel, self._profile_mode
-                    )
-                    self._supports_lighting = True
-                except ClientError:
-                    self._supports_lighting = False
-                    pass
-                _LOGGER.debug(
-                    "Device supports infrared lighting=%s",
-                    self.supports_infrared_light(),
-                )
-
-                # Checking lighting_v2 support
-                try:
-                    await self.client.async_get_lighting_v2()
-                    self._supports_lighting_v2 = True
-                except ClientError:
-                    self._supports_lighting_v2 = False
-                    pass
-                _LOGGER.debug(
-                    "Device supports Lighting_V2=%s", self._supports_lighting_v2
-                )
+                # Find out what the device supports, see probes.py. Stored capabilities only need the probes that
+                # aren't persisted
+                probes = CAPABILITY_PROBES
+                if capabilities is not None:
+                    probes = tuple(probe for probe in probes if not probe.persist)
+                self._probe_results = await async_run_probes(self, probes)
+                _LOGGER.debug("Using channel number %s", self._channel_number)
 
-                # Check audio.cgi support (only for cameras with speakers)
-                if self.supports_speaker():
-                    try:
-                        await self.client.async_get_audio_input(self._channel_number)
-                        self._supports_audio_cgi = True
-                    except ClientError:
-                        self._supports_audio_cgi = False
-                    _LOGGER.debug(
-                        "Device supports audio.cgi=%s", self._supports_audio_cgi
+                # A timed out probe might work next time, so only store a complete set of results
+                if (
+                    capabilities is None
+                    and self._serial_number
+                    and all(
+                        result["result"] != "timeout"
+                        for result in self._probe_results.values()
+                    )
+                ):
+                    await capability_store.async_set(
+                        capability_key, firmware_version, self._get_capabilities()
                     )
 
-                    # Check if audio encoding is enabled (required for
-                    # RTSP backchannel speaker playback)
-                    try:
-                        self._audio_encoding_enabled = (
-                            await self.client.async_get_audio_encode_enabled(
-                                self._channel
-                            )
-                        )
-                    except (ClientError, Exception):  # noqa: BLE001
-                        self._audio_encoding_enabled = None
-                    if self._audio_encoding_enabled is False:
-                        _LOGGER.warning(
-                            "Audio encoding is disabled on %s. Speaker playback "
-                            "will not work until audio is enabled. Call the "
-                            "enable_audio service on the media player entity "
-                            "to enable it",
-                            self._name,
-                        )
-                    else:
-                        _LOGGER.debug(
-                            "Audio encoding enabled=%s",
-                            self._audio_encoding_enabled,
-                        )
+                if self._supports_rpc2:
+                    self._use_rpc2_poll_backend()
 
-                try:
-                    await self.client.async_get_zoomfocus_v1()
-                    self._supports_zoom_focus = True
-                except ClientError:
-                    self._supports_zoom_focus = False
-                    pass
-                _LOGGER.debug(
-                    "Device supports Zoom/Focus=%s", self._supports_zoom_focus
-                )
+                if self._audio_encoding_enabled is False:
+                    _LOGGER.warning(
+                        "Audio encoding is disabled on %s. Speaker playback "
+                        "will not work until audio is enabled. Call the "
+                        "enable_audio service on the media player entity "
+                        "to enable it",
+                        self._name,
+                    )
 
                 if not is_doorbell:
                     # Start the event listeners for IP cameras
                     await self.async_start_event_listener()
-
-                    try:
-                        # Some cams don't support profile modes, check and see... use 2 to check
-                        conf = await self.client.async_get_config("Lighting[0][2]")
-                        # We'll get back an error like this if it doesn't work:
-                        # Error: Error -1 getting param in name=Lighting[0][1]
-                        # Otherwise we'll get multiple lines of config back
-                        self._supports_profile_mode = len(conf) > 1
-                    except ClientError:
-                        _LOGGER.debug(
-                            "Cam does not support profile mode. Will use mode 0"
-                        )
-                        self._supports_profile_mode = False
-                    _LOGGER.debug(
-                        "Device supports profile mode=%s", self._supports_profile_mode
-                    )
                 else:
                     # Start the event listeners for doorbells (VTO)
                     await self.async_start_vto_event_listener()
@@ -490,25 +469,42 @@ class DahuaDataUpdateCoordinator(DataUpdateCoordinator[dict[str, Any]]):
                     "Dahua device at " + self._address + " isn't fully initialized yet"
                 ) from exception
 
-        # This is the event loop code that's called every n seconds
+        # This is the event loop code that's called every n seconds. Only the state that's due is fetched (see
+        # refresh_scheduler.py), everything else keeps the value from the last poll
+        if self.data:
+            data = {**self.data, **data}
+        scheduler = self._refresh_scheduler
         try:
             # We need the profile mode (0=day, 1=night, 2=scene)
-            if self._supports_profile_mode and not self.is_doorbell():
+            if (
+                self._supports_profile_mode
+                and not self.is_doorbell()
+                and scheduler.is_due(KEY_VIDEO_IN_MODE)
+            ):
+                mode_data = None
                 try:
-                    mode_data = await self.client.async_get_video_in_mode()
-                    data.update(mode_data)
-                    self._profile_mode = mode_data.get(
-                        "table.VideoInMode[0].Config[0]", "0"
+                    mode_data = await self._poll_backend.async_get_configs(
+                        ["VideoInMode"]
                     )
-                    if not self._profile_mode:
-                        self._profile_mode = "0"
+                    if mode_data is None:
+                        mode_data = await self.client.async_get_video_in_mode()
+                    data.update(mode_data)
+                    profile_mode = mode_data.get("table.VideoInMode[0].Config[0]", "0")
+                    if not profile_mode:
+                        profile_mode = "0"
+                    if profile_mode != self._profile_mode:
+                        # The Lighting config we read depends on the profile mode
+                        scheduler.invalidate([KEY_LIGHTING])
+                    self._profile_mode = profile_mode
                 except Exception as exception:
                     # I believe this API is missing on some cameras so we'll just ignore it and move on
                     _LOGGER.debug("Could not get profile mode", exc_info=exception)
                     pass
+                scheduler.record(KEY_VIDEO_IN_MODE, mode_data)
 
             # We need the ptz status
-            if self._supports_ptz_position:
+            if self._supports_ptz_position and scheduler.is_due(KEY_PTZ):
+                ptz_data = None
                 try:
                     ptz_data = await self.client.async_get_ptz_position()
                     data.update(ptz_data)
@@ -519,67 +515,119 @@ class DahuaDataUpdateCoordinator(DataUpdateCoordinator[dict[str, Any]]):
                     # I believe this API is missing on some cameras so we'll just ignore it and move on
                     _LOGGER.debug("Could not get preset position", exc_info=exception)
                     pass
-
-            # Figure out which APIs we need to call and then fan out and gather the results
-            coros = [
-                asyncio.ensure_future(self.client.async_get_config_motion_detection()),
+                scheduler.record(KEY_PTZ, ptz_data)
+
+            # Figure out which APIs are due and then fan out and gather the results. The configManager getConfig
+            # calls are keyed by config name so they can be fetched in a single batched request
+            fetches: list[tuple[str, str | None, Callable[[], Awaitable[Any]]]] = [
+                (
+                    KEY_MOTION_DETECT,
+                    "MotionDetect",
+                    self.client.async_get_config_motion_detection,
+                )
             ]
             if self.supports_infrared_light():
-                coros.append(
-                    asyncio.ensure_future(
-                        self.client.async_get_config_lighting(
-                            self._channel, self._profile_mode
-                        )
+                fetches.append(
+                    (
+                        KEY_LIGHTING,
+                        "Lighting[{0}][{1}]".format(self._channel, self._profile_mode),
+                        partial(
+                            self.client.async_get_config_lighting,
+                            self._channel,
+                            self._profile_mode,
+                        ),
                     )
                 )
             if self._supports_disarming_linkage:
-                coros.append(
-                    asyncio.ensure_future(self.client.async_get_disarming_linkage())
+                fetches.append(
+                    (
+                        KEY_DISARMING_LINKAGE,
+                        "DisableLinkage",
+                        self.client.async_get_disarming_linkage,
+                    )
                 )
             if self._supports_event_notifications:
-                coros.append(
-                    asyncio.ensure_future(self.client.async_get_event_notifications())
+                fetches.append(
+                    (
+                        KEY_EVENT_NOTIFICATIONS,
+                        "DisableEventNotify",
+                        self.client.async_get_event_notifications,
+                    )
                 )
             if self._supports_coaxial_control:
-                coros.append(
-                    asyncio.ensure_future(
-                        self.client.async_get_coaxial_control_io_status()
+                fetches.append(
+                    (
+                        KEY_COAXIAL_CONTROL,
+                        None,
+                        self.client.async_get_coaxial_control_io_status,
                     )
                 )
             if self._supports_smart_motion_detection:
-                coros.append(
-                    asyncio.ensure_future(
-                        self.client.async_get_smart_motion_detection()
+                fetches.append(
+                    (
+                        KEY_SMART_MOTION_DETECTION,
+                        "SmartMotionDetect",
+                        self.client.async_get_smart_motion_detection,
                     )
                 )
             if self.supports_smart_motion_detection_amcrest():
-                coros.append(
-                    asyncio.ensure_future(
-                        self.client.async_get_video_analyse_rules_for_amcrest()
+                fetches.append(
+                    (
+                        KEY_VIDEO_ANALYSE_RULE,
+                        "VideoAnalyseRule[0][0].Enable",
+                        self.client.async_get_video_analyse_rules_for_amcrest,
                     )
                 )
             if self.is_amcrest_doorbell():
-                coros.append(
-                    asyncio.ensure_future(self.client.async_get_light_global_enabled())
+                fetches.append(
+                    (
+                        KEY_LIGHT_GLOBAL,
+                        "LightGlobal[0].Enable",
+                        self.client.async_get_light_global_enabled,
+                    )
+                )
+            if (
+                self._supports_lighting_v2
+                or self.supports_security_light()
+                or self.is_flood_light()
+            ):
+                fetches.append(
+                    (KEY_LIGHTING_V2, "Lighting_V2", self.client.async_get_lighting_v2)
                 )
-            if self._supports_lighting_v2:  # add lighing_v2 API if it is supported
-                coros.append(asyncio.ensure_future(self.client.async_get_lighting_v2()))
             if self._supports_zoom_focus:
-                coros.append(
-                    asyncio.ensure_future(self.client.async_get_zoomfocus_v1())
+                fetches.append(
+                    (KEY_ZOOM_FOCUS, None, self.client.async_get_zoomfocus_v1)
                 )
 
+            fetches = [fetch for fetch in fetches if scheduler.is_due(fetch[0])]
+
+            configs = {name: key for key, name, _ in fetches if name is not None}
+            batch = None
+            if configs:
+                batch = await self._poll_backend.async_get_configs(list(configs))
+            if batch is not None:
+                data.update(batch)
+                batched: set[str] = set()
+                for name, key in configs.items():
+                    config = select_config(batch, name)
+                    if config:
+                        scheduler.record(key, config)
+                        batched.add(name)
+                # Only the other APIs and the configs the batch came without are left. Without a batch (a single
+                # config, or not supported by the device) each config is fetched on its own below
+                fetches = [fetch for fetch in fetches if fetch[1] not in batched]
+
             # Gather results and update the data map
-            results = await asyncio.gather(*coros)
-            for result in results:
+            results = await asyncio.gather(*(get() for _, _, get in fetches))
+            for (key, _, _), result in zip(fetches, results):
+                scheduler.record(key, result)
                 if result is not None:
                     data.update(result)
 
-            if self.supports_security_light() or self.is_flood_light():
-                light_v2 = await self.client.async_get_lighting_v2()
-                if light_v2 is not None:
-                    data.update(light_v2)
-
+            # Most ticks refresh nothing or read back what we already had. Keeping the same dict keeps the derived state
+            # and, with always_update=False, spares the entities a state write
+            if self.data and data == self.data:
+                return self.data
             return data
         except Exception as exception:
             _LOGGER.warning(
@@ -591,10 +639,92 @@ class DahuaDataUpdateCoordinator(DataUpdateCoordinator[dict[str, Any]]):
             )
             raise UpdateFailed() from exception
 
+    async def async_get_snapshot(self) -> bytes:
+        """
+        Returns a JPEG snapshot for this channel. Snapshots are cached for a short time and concurrent requests share
+        a single download so several callers in the same second don't each hit the camera.
+        """
+        return await self._snapshot_cache.async_get()
+
+    async def _async_fetch_snapshot(self) -> bytes:
+        return await self.client.async_get_snapshot(self._channel_number)
+
+    def _use_rpc2_poll_backend(self) -> None:
+        """Polls the configs over RPC2 from now on, keeping the session alive between polls"""
+        self._poll_backend = Rpc2PollBackend(
+            self._rpc2_client, CgiPollBackend(self.client)
+        )
+        if not self._rpc2_keep_alive:
+            self._rpc2_client.start_keep_alive()
+            self._rpc2_keep_alive = True
+        _LOGGER.debug("Polling %s over RPC2", self._address)
+
+    def get_poll_backend_stats(self) -> dict[str, Any]:
+        """Returns the backend the configs are polled with and its counters, for diagnostics"""
+        return self._poll_backend.as_dict()
+
+    def get_snapshot_cache_stats(self) -> dict[str, Any]:
+        """Returns the snapshot cache counters for diagnostics"""
+        return self._snapshot_cache.as_dict()
+
+    def get_probe_results(self) -> dict[str, dict[str, Any]]:
+        """Returns the outcome and duration of each capability probe for diagnostics"""
+        return self._probe_results
+
+    def get_refresh_intervals(self) -> dict[str, Any]:
+        """Returns the current refresh interval in seconds of each part of the state, for diagnostics"""
+        return self._refresh_scheduler.as_dict()
+
+    def is_capabilities_from_store(self) -> bool:
+        """True if the capabilities were loaded from storage instead of probing the device"""
+        return self._capabilities_from_store
+
+    async def _async_discover_model(self, data: dict[str, Any]) -> None:
+        """Works out the model and the number of streams from the device, data holds the system info"""
+        # Find the max number of streams. 1 main stream + n number of sub-streams
+        self._max_streams = await self.client.get_max_extra_streams() + 1
+        _LOGGER.debug("Using max streams %s", self._max_streams)
+
+        device_type = data.get("deviceType", None)
+        # Lorex NVRs return deviceType=31, but the model is in the updateSerial
+        # /cgi-bin/magicBox.cgi?action=getSystemInfo"
+        # deviceType=31
+        # processor=ST7108
+        # serialNumber=ND0219110NNNNN
+        # updateSerial=DHI-NVR4108HS-8P-4KS2
+        if device_type in ["IP Camera", "31"] or device_type is None:
+            # Some firmwares put the device type in the "updateSerial" field. Weird.
+            device_type = data.get("updateSerial", None)
+            if device_type is None:
+                # If it's still none, then call the device type API
+                dt = await self.client.get_device_type()
+                device_type = dt.get("type")
+        self.model = str(device_type) if device_type else ""
+
+    def _get_capabilities(self) -> dict[str, Any]:
+        """Returns what was discovered about the device, in the form saved by the capability store"""
+        capabilities: dict[str, Any] = {
+            "model": self.model,
+            "_max_streams": self._max_streams,
+        }
+        for probe in CAPABILITY_PROBES:
+            if probe.persist:
+                capabilities[probe.attribute] = getattr(self, probe.attribute)
+        return capabilities
+
+    def _set_capabilities(self, capabilities: dict[str, Any]) -> None:
+        """Restores what _get_capabilities returned"""
+        self.model = str(capabilities.get("model", ""))
+        self._max_streams = int(capabilities.get("_max_streams", self._max_streams))
+        for probe in CAPABILITY_PROBES:
+            if probe.persist and probe.attribute in capabilities:
+                setattr(self, probe.attribute, capabilities[probe.attribute])
+
     def on_receive_vto_event(self, event: dict[str, Any]) -> None:
         event["DeviceName"] = self.get_device_name()
-        _LOGGER.debug(f"VTO Data received: {event}")
-        self.hass.bus.fire("dahua_event_received", event)
+        if self._event_throttle.allow(str(event.get("Code", "")), event):
+            _EVENT_LOGGER.debug("VTO Data received: %s", event)
+            self.hass.bus.fire("dahua_event_received", event)
 
         # Example events:
         # {
@@ -629,7 +759,7 @@ class DahuaDataUpdateCoordinator(DataUpdateCoordinator[dict[str, Any]]):
 
         # This is the event code, example: VideoMotion, CrossLineDetection, BackKeyLight, PhoneCallDetect, DoorStatus, etc
         code = self.translate_event_code(event)
-        event_key = self.get_event_key(code)
+        route = self._event_router.route(code, self._channel)
 
         if code == "AccessControl":
             card_id = event.get("Data", {}).get("CardNo", "")
@@ -640,94 +770,80 @@ class DahuaDataUpdateCoordinator(DataUpdateCoordinator[dict[str, Any]]):
                     self.hass.loop,
                 ).result()
 
-        listener = self._dahua_event_listeners.get(event_key)
-        if listener is not None:
+        if route is not None:
             action = event.get("Action", "")
             if action == "Start":
-                self._dahua_event_timestamp[event_key] = int(time.time())
-                listener()
+                self._dahua_event_timestamp[route.key] = int(time.time())
             elif action == "Stop":
-                self._dahua_event_timestamp[event_key] = 0
-                listener()
+                self._dahua_event_timestamp[route.key] = 0
             elif action == "Pulse":
                 if code == "DoorStatus":
                     if event.get("Data", {}).get("Status", "") == "Open":
-                        self._dahua_event_timestamp[event_key] = int(time.time())
+                        self._dahua_event_timestamp[route.key] = int(time.time())
                     else:
-                        self._dahua_event_timestamp[event_key] = 0
+                        self._dahua_event_timestamp[route.key] = 0
                 else:
                     state = event.get("Data", {}).get("State", 0)
                     if state == 1:
                         # button pressed
-                        self._dahua_event_timestamp[event_key] = int(time.time())
+                        self._dahua_event_timestamp[route.key] = int(time.time())
                     else:
-                        self._dahua_event_timestamp[event_key] = 0
+                        self._dahua_event_timestamp[route.key] = 0
+            else:
+                return
+            for listener in route.listeners:
                 listener()
 
-    def on_receive(self, data_bytes: bytes, channel: int) -> None:
+    @callback
+    def _on_write(self, keys: set[str], values: dict[str, str]) -> None:
         """
-        Takes in bytes from the Dahua event stream, converts to a string, parses to a dict and fires an event with the data on the HA event bus
-        Example input:
-
-        b'Code=VideoMotion;action=Start;index=0;data={\n'
-        b'   "Id" : [ 0 ],\n'
-        b'   "RegionName" : [ "Region1" ]\n'
-        b'}\n'
-        b'\r\n'
-
-
-        Example events that are fired on the HA event bus:
-        {'name': 'Cam13', 'Code': 'VideoMotion', 'action': 'Start', 'index': '0', 'data': {'Id': [0], 'RegionName': ['Region1'], 'SmartMotionEnable': False}}
-        {'name': 'Cam13', 'Code': 'VideoMotion', 'action': 'Stop', 'index': '0', 'data': {'Id': [0], 'RegionName': ['Region1'], 'SmartMotionEnable': False}}
-        {
-            'name': 'Cam8', 'Code': 'CrossLineDetection', 'action': 'Start', 'index': '0', 'data': {'Class': 'Normal', 'DetectLine': [[18, 4098], [8155, 5549]], 'Direction':      'RightToLeft', 'EventSeq': 40, 'FrameSequence': 549073, 'GroupID': 40, 'Mark': 0, 'Name': 'Rule1', 'Object': {'Action': 'Appear', 'BoundingBox': [4816, 4552, 5248, 5272], 'Center': [5032, 4912], 'Confidence': 0, 'FrameSequence': 0, 'ObjectID': 542, 'ObjectType': 'Unknown', 'RelativeID': 0, 'Source': 0.0, 'Speed': 0, 'SpeedTypeInternal': 0}, 'PTS': 42986015370.0, 'RuleId': 1, 'Source': 51190936.0, 'Track': None, 'UTC': 1620477656, 'UTCMS': 180}
-        }
+        Called by the client after a write to the device. The state the write changed is refreshed on the next poll,
+        which the entity requests with async_request_refresh. Until then the values the device accepted are shown
+        right away, only values that are already in data are patched.
         """
-        data = data_bytes.decode("utf-8", errors="ignore")
-        events = parse_event(data)
-
-        if len(events) == 0:
+        self._refresh_scheduler.invalidate(keys)
+        if not self.data:
             return
+        patch = {
+            key: value
+            for key, value in values.items()
+            if key in self.data and self.data[key] != value
+        }
+        if patch:
+            self.async_set_updated_data({**self.data, **patch})
 
-        _LOGGER.debug(
-            f"Events received from {self.get_address()} on channel {channel}: {events}"
-        )
-
-        for event in events:
-            index = 0
-            if "index" in event:
-                try:
-                    index = int(event["index"])
-                except ValueError:
-                    index = 0
-
-            # This is a short term fix. Right now for NVRs this integration creates a thread per channel to listen to events. Every thread gets the same response. We need to
-            # discard events not for this channel. Longer term work should create only a single thread per channel.
-            if index != self._channel:
-                continue
+    def on_event(self, event: dict[str, Any]) -> None:
+        """
+        Handles a single parsed event for this channel: fires it on the HA event bus and updates the event
+        timestamps/listeners used by the binary sensors. Called by the DahuaEventHub.
+        """
+        # Events mean things are happening on the device, keep a close eye on the state that changes with them
+        self._refresh_scheduler.activity(VOLATILE_KEYS)
 
-            # Put the vent on the HA event bus
+        # Put the event on the HA event bus, unless the throttle drops it. Listeners below still get every event
+        if self._event_throttle.allow(str(event.get("Code", "")), event):
             event["name"] = self.get_device_name()
             event["DeviceName"] = self.get_device_name()
             self.hass.bus.fire("dahua_event_received", event)
 
-            # When there's an event start we'll update the a map x to the current timestamp in seconds for the event.
-            # We'll reset it to 0 when the event stops.
-            # We'll use these timestamps in binary_sensor to know how long to trigger the sensor
+        # When there's an event start we'll update the a map x to the current timestamp in seconds for the event.
+        # We'll reset it to 0 when the event stops.
+        # We'll use these timestamps in binary_sensor to know how long to trigger the sensor
 
-            # This is the event code, example: VideoMotion, CrossLineDetection, etc
-            event_name = self.translate_event_code(event)
+        # This is the event code, example: VideoMotion, CrossLineDetection, etc
+        event_name = self.translate_event_code(event)
 
-            event_key = self.get_event_key(event_name)
-            listener = self._dahua_event_listeners.get(event_key)
-            if listener is not None:
-                action = event["action"]
-                if action == "Start":
-                    self._dahua_event_timestamp[event_key] = int(time.time())
-                    listener()
-                elif action == "Stop":
-                    self._dahua_event_timestamp[event_key] = 0
-                    listener()
+        route = self._event_router.route(event_name, self._channel)
+        if route is not None:
+            action = event["action"]
+            if action == "Start":
+                self._dahua_event_timestamp[route.key] = int(time.time())
+            elif action == "Stop":
+                self._dahua_event_timestamp[route.key] = 0
+            else:
+                return
+            for listener in route.listeners:
+                listener()
 
     def translate_event_code(self, event: dict[str, Any]) -> str:
         """
@@ -748,10 +864,7 @@ class DahuaDataUpdateCoordinator(DataUpdateCoordinator[dict[str, Any]]):
         if code == "CrossLineDetection" or code == "CrossRegionDetection":
             data = event.get("data", event.get("Data", {}))
             is_human = data.get("Object", {}).get("ObjectType", "").lower() == "human"
-            if (
-                is_human
-                and self._dahua_event_listeners.get(self.get_event_key(code)) is None
-            ):
+            if is_human and not self._event_router.has_listener(code, self._channel):
                 return "SmartMotionHuman"
 
         # Convert doorbell pressed related events to common event name, DoorbellPressed.
@@ -771,19 +884,29 @@ class DahuaDataUpdateCoordinator(DataUpdateCoordinator[dict[str, Any]]):
 
     def add_dahua_event_listener(
         self, event_name: str, listener: CALLBACK_TYPE
-    ) -> None:
+    ) -> CALLBACK_TYPE:
         """Adds an event listener for the given event (CrossLineDetection, etc).
-        This callback will be called when the event fire"""
-        event_key = self.get_event_key(event_name)
-        self._dahua_event_listeners[event_key] = listener
+        This callback will be called when the event fire. Returns a function that removes the listener"""
+        return self._event_router.add_listener(event_name, self._channel, listener)
+
+    def get_event_stats(self) -> dict[str, Any]:
+        """Returns the event listeners and the event counts and rates per event code, used by diagnostics"""
+        return {
+            **self._event_router.as_dict(),
+            "throttle": self._event_throttle.as_dict(),
+        }
+
+    @property
+    def model_info(self) -> ModelInfo:
+        """What the model name tells about the device, see model_capabilities.classify_model"""
+        return classify_model(self.model, self._update_serial)
 
     def supports_siren(self) -> bool:
         """
         Returns true if this camera has a siren. For example, the IPC-HDW3849HP-AS-PV does
         https://dahuawiki.com/Template:NameConvention
         """
-        m = self.model.upper()
-        return "-AS-PV" in m or "L46N" in m or m.startswith("W452ASD")
+        return self.model_info.siren
 
     def supports_security_light(self) -> bool:
         """
@@ -791,123 +914,160 @@ class DahuaDataUpdateCoordinator(DataUpdateCoordinator[dict[str, Any]]):
         IPC-HDW3849HP-AS-PV does https://dahuawiki.com/Template:NameConvention
         Addressed issue https://github.com/brianegge/dahua/pull/405
         """
-        return (
-            "-AS-PV" in self.model
-            or self.model == "AD410"
-            or self.model == "DB61i"
-            or self.model.startswith("IP8M-2796E")
-        )
+        return self.model_info.security_light
 
     def is_doorbell(self) -> bool:
         """Returns true if this is a doorbell (VTO)"""
-        m = self.model.upper()
-        return (
-            m.startswith("VTO")
-            or m.startswith("DH-VTO")
-            or ("NVR" not in m and m.startswith("DHI"))
-            or self.is_amcrest_doorbell()
-            or self.is_empiretech_doorbell()
-            or self.is_avaloidgoliath_doorbell()
-        )
+        return self.model_info.doorbell
 
     def is_amcrest_doorbell(self) -> bool:
         """Returns true if this is an Amcrest doorbell - IMOU DB61i is identical"""
-        return self.model.upper().startswith("AD") or self.model.upper().startswith(
-            "DB6"
-        )
+        return self.model_info.amcrest_doorbell
 
     def is_empiretech_doorbell(self) -> bool:
         """Returns true if this is an EmpireTech doorbell"""
-        return self.model.upper().startswith("DB2X")
+        return self.model_info.empiretech_doorbell
 
     def is_avaloidgoliath_doorbell(self) -> bool:
         """Returns true if this is an Avaloid Goliath doorbell"""
-        return self.model.upper().startswith("AV-V")
+        return self.model_info.avaloidgoliath_doorbell
 
     def is_flood_light(self) -> bool:
         """Returns true if this camera is an floodlight camera (eg.ASH26-W)"""
-        m = self.model.upper()
-        return (
-            m.startswith("ASH26")
-            or "L26N" in m
-            or "L46N" in m
-            or m.startswith("V261LC")
-            or m.startswith("W452ASD")
-        )
+        return self.model_info.flood_light
 
     def supports_infrared_light(self) -> bool:
         """
         Returns true if this camera has an infrared light.  For example, the IPC-HDW3849HP-AS-PV does not, but most
         others do. I don't know of a better way to detect this
         """
-        if not self._supports_lighting:
-            return False
-        return (
-            "-AS-PV" not in self.model
-            and "-AS-NI" not in self.model
-            and "LED-S2" not in self.model
-        )  # IPC-HFW2439SP-SA-LED-S2 also has no infrared light
+        return self._supports_lighting and self.model_info.infrared_light
 
     def supports_floodlightmode(self) -> bool:
         """Returns true if this camera supports floodlight mode"""
-        return "W452ASD" in self.model.upper() or "L46N" in self.model.upper()
+        return self.model_info.floodlightmode
 
     def supports_illuminator(self) -> bool:
         """
         Returns true if this camera has an illuminator (white light for color cameras).  For example, the
         IPC-HDW3849HP-AS-PV does
         """
-        return (
-            not (self.is_amcrest_doorbell() or self.is_flood_light())
-            and "table.Lighting_V2[{0}][0][0].Mode".format(self._channel) in self.data
-        )
+        return self.get_state().supports_illuminator
 
     def supports_ptz_position(self) -> bool:
         """
         Returns true if this camera supports PTZ preset position
         """
-        return (
-            not (self.is_amcrest_doorbell() or self.is_flood_light())
-            and "table.Lighting_V2[{0}][0][0].Mode".format(self._channel) in self.data
+        return self.get_state().supports_ptz_position
+
+    def get_config(self) -> dict[Any, Any]:
+        """Returns data as a nested, typed tree, see dahua_utils.project_config"""
+        if self._config_data is not self.data:
+            self._config = dahua_utils.project_config(self.data or {})
+            self._config_data = self.data
+        return self._config
+
+    def _get_table_value(self, *path: str | int) -> Any:
+        """Returns a getConfig value, e.g. _get_table_value("MotionDetect", 0, "Enable") for table.MotionDetect[0].Enable"""
+        return dahua_utils.config_value(self.get_config(), "table", *path)
+
+    def get_state(self) -> DahuaState:
+        """Returns the entity state derived from data. It's rebuilt the first time it's read after data was replaced"""
+        if self._state_data is not self.data:
+            self._state = self._build_state()
+            self._state_data = self.data
+        return self._state
+
+    def _build_state(self) -> DahuaState:
+        data = self.data or {}
+        channel = self._channel
+        # profile_mode 0=day, 1=night, 2=scene
+        profile_mode = dahua_utils.typed_config_value(self.get_profile_mode())
+        model_info = self.model_info
+
+        if self.supports_smart_motion_detection_amcrest():
+            smart_motion_detection_enabled = (
+                self._get_table_value("VideoAnalyseRule", 0, 0, "Enable") is True
+            )
+        else:
+            smart_motion_detection_enabled = (
+                self._get_table_value("SmartMotionDetect", 0, "Enable") is True
+            )
+
+        if self._supports_floodlightmode:
+            # 'coaxialControlIO.cgi?action=getStatus&channel=1'
+            flood_light_on = str(data.get("status.status.WhiteLight", "")) == "On"
+        else:
+            # The amcrest flood light
+            flood_light_on = (
+                self._get_table_value("Lighting_V2", channel, profile_mode, 1, "Mode")
+                == "Manual"
+            )
+
+        has_lighting_v2 = (
+            self._get_table_value("Lighting_V2", channel, 0, 0, "Mode") is not None
+        )
+        has_illuminator = has_lighting_v2 and not (
+            model_info.amcrest_doorbell or model_info.flood_light
         )
 
-    def is_motion_detection_enabled(self) -> bool:
-        """Returns true if motion detection is enabled for the camera"""
-        return (
-            str(
-                self.data.get(
-                    "table.MotionDetect[{0}].Enable".format(self._channel), ""
+        return DahuaState(
+            motion_detection_enabled=(
+                self._get_table_value("MotionDetect", channel, "Enable") is True
+            ),
+            disarming_linkage_enabled=(
+                self._get_table_value("DisableLinkage", "Enable") is True
+            ),
+            event_notifications_enabled=(
+                self._get_table_value("DisableEventNotify", "Enable") is False
+            ),
+            smart_motion_detection_enabled=smart_motion_detection_enabled,
+            siren_on=str(data.get("status.status.Speaker", "")).lower() == "on",
+            infrared_light_on=(
+                self._get_table_value("Lighting", channel, 0, "Mode") == "Manual"
+            ),
+            infrared_brightness=dahua_utils.dahua_brightness_to_hass_brightness(
+                data.get("table.Lighting[{0}][0].MiddleLight[0].Light".format(channel))
+            ),
+            illuminator_on=(
+                self._get_table_value("Lighting_V2", channel, profile_mode, 0, "Mode")
+                == "Manual"
+            ),
+            illuminator_brightness=dahua_utils.dahua_brightness_to_hass_brightness(
+                data.get(
+                    "table.Lighting_V2[{0}][0][0].MiddleLight[0].Light".format(channel)
                 )
-            ).lower()
-            == "true"
+            ),
+            flood_light_on=flood_light_on,
+            ring_light_on=self._get_table_value("LightGlobal", 0, "Enable") is True,
+            security_light_on=str(data.get("status.status.WhiteLight", "")) == "On",
+            supports_illuminator=has_illuminator,
+            supports_ptz_position=has_illuminator,
+            zoom=float(data.get("status.Zoom", 0)) if self._supports_zoom_focus else 0,
+            focus=float(data.get("status.Focus", 0))
+            if self._supports_zoom_focus
+            else 0,
         )
 
+    def is_motion_detection_enabled(self) -> bool:
+        """Returns true if motion detection is enabled for the camera"""
+        return self.get_state().motion_detection_enabled
+
     def is_disarming_linkage_enabled(self) -> bool:
         """Returns true if disarming linkage is enable"""
-        return str(self.data.get("table.DisableLinkage.Enable", "")).lower() == "true"
+        return self.get_state().disarming_linkage_enabled
 
     def is_event_notifications_enabled(self) -> bool:
         """Returns true if event notifications is enable"""
-        return (
-            str(self.data.get("table.DisableEventNotify.Enable", "")).lower() == "false"
-        )
+        return self.get_state().event_notifications_enabled
 
     def is_smart_motion_detection_enabled(self) -> bool:
         """Returns true if smart motion detection is enabled"""
-        if self.supports_smart_motion_detection_amcrest():
-            return (
-                str(self.data.get("table.VideoAnalyseRule[0][0].Enable", "")).lower()
-                == "true"
-            )
-        else:
-            return (
-                str(self.data.get("table.SmartMotionDetect[0].Enable", "")).lower()
-                == "true"
-            )
+        return self.get_state().smart_motion_detection_enabled
 
     def is_siren_on(self) -> bool:
         """Returns true if the camera siren is on"""
-        return str(self.data.get("status.status.Speaker", "")).lower() == "on"
+        return self.get_state().siren_on
 
     def get_device_name(self) -> str:
         """returns the device name, e.g. Cam 2"""
@@ -941,68 +1101,31 @@ class DahuaDataUpdateCoordinator(DataUpdateCoordinator[dict[str, Any]]):
 
     def is_infrared_light_on(self) -> bool:
         """returns true if the infrared light is on"""
-        return (
-            str(self.data.get("table.Lighting[{0}][0].Mode".format(self._channel), ""))
-            == "Manual"
-        )
+        return self.get_state().infrared_light_on
 
     def get_infrared_brightness(self) -> int:
         """Return the brightness of this light, as reported by the camera itself, between 0..255 inclusive"""
-
-        bri = self.data.get(
-            "table.Lighting[{0}][0].MiddleLight[0].Light".format(self._channel)
-        )
-        return dahua_utils.dahua_brightness_to_hass_brightness(bri)
+        return self.get_state().infrared_brightness
 
     def is_illuminator_on(self) -> bool:
         """Return true if the illuminator light is on"""
-        # profile_mode 0=day, 1=night, 2=scene
-        profile_mode = self.get_profile_mode()
-        return (
-            str(
-                self.data.get(
-                    "table.Lighting_V2[{0}][{1}][0].Mode".format(
-                        self._channel, profile_mode
-                    ),
-                    "",
-                )
-            )
-            == "Manual"
-        )
+        return self.get_state().illuminator_on
 
     def is_flood_light_on(self) -> bool:
-        if self._supports_floodlightmode:
-            # 'coaxialControlIO.cgi?action=getStatus&channel=1'
-            return str(self.data.get("status.status.WhiteLight", "")) == "On"
-        else:
-            """Return true if the amcrest flood light light is on"""
-            # profile_mode 0=day, 1=night, 2=scene
-            profile_mode = self.get_profile_mode()
-            return (
-                str(
-                    self.data.get(
-                        f"table.Lighting_V2[{self._channel}][{profile_mode}][1].Mode",
-                        "",
-                    )
-                )
-                == "Manual"
-            )
+        """Return true if the flood light is on"""
+        return self.get_state().flood_light_on
 
     def is_ring_light_on(self) -> bool:
         """Return true if ring light is on for an Amcrest Doorbell"""
-        return str(self.data.get("table.LightGlobal[0].Enable", "")) == "true"
+        return self.get_state().ring_light_on
 
     def get_illuminator_brightness(self) -> int:
         """Return the brightness of the illuminator light, as reported by the camera itself, between 0..255 inclusive"""
-
-        bri = self.data.get(
-            "table.Lighting_V2[{0}][0][0].MiddleLight[0].Light".format(self._channel)
-        )
-        return dahua_utils.dahua_brightness_to_hass_brightness(bri)
+        return self.get_state().illuminator_brightness
 
     def is_security_light_on(self) -> bool:
         """Return true if the security light is on. This is the red/blue flashing light"""
-        return str(self.data.get("status.status.WhiteLight", "")) == "On"
+        return self.get_state().security_light_on
 
     def get_profile_mode(self) -> str:
         # profile_mode 0=day, 1=night, 2=scene
@@ -1039,21 +1162,9 @@ class DahuaDataUpdateCoordinator(DataUpdateCoordinator[dict[str, Any]]):
         because some firmwares report a generic deviceType (e.g. "E891AB") while
         the real Dahua model with feature suffixes is in updateSerial.
 
-        Detection is based on Dahua model suffix conventions:
-        - ``-AS`` = Audio Speaker (also catches -ASE = Audio Speaker + Event I/O)
-        - ``-PV`` = Active Visual deterrence (siren + warning lights)
-        - Siren models (L46N, W452ASD) and doorbells also have speakers.
+        Detection is based on Dahua model suffix conventions, see model_capabilities.MODEL_RULES.
         """
-        m = self.model.upper()
-        u = self._update_serial.upper()
-        return (
-            "-AS" in m
-            or "-PV" in m
-            or "-AS" in u
-            or "-PV" in u
-            or self.supports_siren()
-            or self.is_doorbell()
-        )
+        return self.model_info.speaker
 
     def supports_audio_cgi(self) -> bool:
         """True if the camera supports the HTTP audio.cgi endpoint."""
@@ -1068,7 +1179,7 @@ class DahuaDataUpdateCoordinator(DataUpdateCoordinator[dict[str, Any]]):
 
     def supports_smart_motion_detection_amcrest(self) -> bool:
         """True if smart motion detection is supported for an amcrest device"""
-        return self.model == "AD410" or self.model == "DB61i"
+        return self.model_info.smart_motion_detection_amcrest
 
     def supports_focus_zoom(self) -> bool:
         """True if camera is varifocal"""
@@ -1079,15 +1190,39 @@ class DahuaDataUpdateCoordinator(DataUpdateCoordinator[dict[str, Any]]):
         Returns an instance of the connected VTO client if this is a VTO device. We need this because there's different
         ways to call a VTO device and the VTO client will handle that. For example, to hang up a call
         """
-        return self._vto_client
+        if self._vto_supervisor is None:
+            return None
+        return self._vto_supervisor.client
+
+    def get_event_stream_stats(self) -> dict[str, Any] | None:
+        """
+        Returns whether the event stream is connected, the seconds since it last sent anything and its reconnects,
+        see DahuaEventHub. None if this device doesn't use the event stream (doorbells)
+        """
+        if self._event_hub is None:
+            return None
+        return self._event_hub.as_dict()
+
+    def get_event_stream_signal(self) -> str | None:
+        """
+        Returns the dispatcher signal sent when the event stream connects or disconnects, None if this device doesn't
+        use the event stream (doorbells)
+        """
+        if self._event_hub is None:
+            return None
+        return self._event_hub.signal
 
-        return self.dahua_vto_event_thread.vto_client
+    def get_vto_stats(self) -> dict[str, Any] | None:
+        """Returns the VTO connection counts and reconnect latency, used by diagnostics. None if this isn't a VTO"""
+        if self._vto_supervisor is None:
+            return None
+        return self._vto_supervisor.as_dict()
 
     def get_zoom(self) -> float:
-        return float(self.data.get("status.Zoom")) if self._supports_zoom_focus else 0
+        return self.get_state().zoom
 
     def get_focus(self) -> float:
-        return float(self.data.get("status.Focus")) if self._supports_zoom_focus else 0
+        return self.get_state().focus
 
 
 async def async_remove_config_entry_device(
@@ -1116,5 +1251,5 @@ async def async_unload_entry(hass: HomeAssistant, entry: DahuaConfigEntry) -> bo
 
 async def async_reload_entry(hass: HomeAssistant, entry: DahuaConfigEntry) -> None:
     """Reload config entry."""
-    await async_unload_entry(hass, entry)
-    await async_setup_entry(hass, entry)
+    # Through the config entries, so the entry's unload callbacks (coordinator.close, the session) run
+    await hass.config_entries.async_reload(entry.entry_id)
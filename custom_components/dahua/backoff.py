@@ -0,0 +1,16 @@
+"""Reconnect delays for the long lived connections to a device (event stream, VTO)"""
+
+from __future__ import annotations
+
+import random
+
+
+def backoff_delay(
+    attempt: int, base: float, maximum: float, rng: random.Random | None = None
+) -> float:
+    """
+    Returns the delay before reconnect attempt (0 based). The delay doubles per attempt from base up to maximum, and
+    half of it is random so devices that lost the network together don't reconnect in lockstep.
+    """
+    delay = min(maximum, base * 2**attempt)
+    return delay / 2 + (rng or random).uniform(0, delay / 2)
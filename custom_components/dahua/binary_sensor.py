@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 import re
+from typing import Any
 
 from homeassistant.components.binary_sensor import (
     BinarySensorDeviceClass,
@@ -10,6 +11,8 @@ from homeassistant.components.binary_sensor import (
 )
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.helpers.entity import EntityCategory  # type: ignore[attr-defined]
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from custom_components.dahua import DahuaConfigEntry, DahuaDataUpdateCoordinator
 
@@ -57,7 +60,7 @@ async def async_setup_entry(
     """Setup binary_sensor platform."""
     coordinator: DahuaDataUpdateCoordinator = entry.runtime_data
 
-    sensors: list[DahuaEventSensor] = []
+    sensors: list[BinarySensorEntity] = []
     for event_name in coordinator.get_event_list():
         sensors.append(DahuaEventSensor(coordinator, entry, event_name))
 
@@ -67,6 +70,8 @@ async def async_setup_entry(
         sensors.append(DahuaEventSensor(coordinator, entry, "Invite"))
         sensors.append(DahuaEventSensor(coordinator, entry, "DoorStatus"))
         sensors.append(DahuaEventSensor(coordinator, entry, "CallNoAnswered"))
+    elif coordinator.events is not None:
+        sensors.append(DahuaEventStreamSensor(coordinator, entry))
 
     if sensors:
         async_add_devices(sensors)
@@ -151,11 +156,59 @@ class DahuaEventSensor(DahuaBaseEntity, BinarySensorEntity):
 
     async def async_added_to_hass(self) -> None:
         """Connect to dispatcher listening for entity data notifications."""
-        self._coordinator.add_dahua_event_listener(
-            self._event_name, self.schedule_update_ha_state
+        self.async_on_remove(
+            self._coordinator.add_dahua_event_listener(
+                self._event_name, self.schedule_update_ha_state
+            )
         )
 
     @property
     def should_poll(self) -> bool:
         """Return True if entity has to be polled for state.  False if entity pushes its state to HA"""
         return False
+
+
+class DahuaEventStreamSensor(DahuaBaseEntity, BinarySensorEntity):
+    """
+    Shows whether the event stream is connected, i.e. the device sent an event or a heartbeat within the last few
+    heartbeats. When it's off the event sensors of the device don't update. The seconds since the stream last sent
+    anything are in the event_lag attribute.
+    """
+
+    _attr_translation_key = "event_stream"
+    _attr_device_class = BinarySensorDeviceClass.CONNECTIVITY
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    # The lag changes on every update, keep it out of the recorder
+    _unrecorded_attributes = frozenset({"event_lag"})
+
+    @property
+    def unique_id(self) -> str:
+        """Return the entity unique ID."""
+        return self._coordinator.get_serial_number() + "_event_stream"
+
+    async def async_added_to_hass(self) -> None:
+        """Update right away when the event stream connects or disconnects, not only on the next poll."""
+        await super().async_added_to_hass()
+        signal = self._coordinator.get_event_stream_signal()
+        if signal is not None:
+            self.async_on_remove(
+                async_dispatcher_connect(self.hass, signal, self.async_write_ha_state)
+            )
+
+    @property
+    def is_on(self) -> bool:
+        """Return true if the event stream is connected."""
+        stats = self._coordinator.get_event_stream_stats()
+        return stats is not None and bool(stats["connected"])
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return the event lag and the reconnect counts."""
+        stats = self._coordinator.get_event_stream_stats()
+        if stats is None:
+            return {}
+        return {
+            "event_lag": stats["event_lag_seconds"],
+            "reconnects": stats["reconnects"],
+            "stale_reconnects": stats["stale_reconnects"],
+        }
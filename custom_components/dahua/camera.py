@@ -7,11 +7,13 @@ import voluptuous as vol
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers import entity_platform
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.components.camera import Camera, CameraEntityFeature, StreamType  # type: ignore[attr-defined]
 
 from custom_components.dahua import DahuaConfigEntry, DahuaDataUpdateCoordinator
+from custom_components.dahua.const import DOMAIN
 from custom_components.dahua.entity import DahuaBaseEntity, dahua_command
 
 _LOGGER: logging.Logger = logging.getLogger(__package__)
@@ -318,8 +320,9 @@ class DahuaCamera(DahuaBaseEntity, Camera):
         self, width: int | None = None, height: int | None = None
     ) -> bytes | None:
         """Return a still image response from the camera."""
-        # Send the request to snap a picture and return raw jpg data
-        return await self._coordinator.client.async_get_snapshot(self._channel_number)
+        # Send the request to snap a picture and return raw jpg data. The coordinator caches and coalesces snapshots
+        # so all streams of this channel share the same image
+        return await self._coordinator.async_get_snapshot()
 
     @property
     def supported_features(self) -> CameraEntityFeature:
@@ -341,7 +344,7 @@ class DahuaCamera(DahuaBaseEntity, Camera):
         try:
             channel = self._coordinator.get_channel()
             await self._coordinator.client.enable_motion_detection(channel, True)
-            await self._coordinator.async_refresh()
+            await self._coordinator.async_request_refresh()
         except TypeError:
             _LOGGER.debug(
                 "Failed enabling motion detection on '%s'. Is it supported by the device?",
@@ -354,7 +357,7 @@ class DahuaCamera(DahuaBaseEntity, Camera):
         try:
             channel = self._coordinator.get_channel()
             await self._coordinator.client.enable_motion_detection(channel, False)
-            await self._coordinator.async_refresh()
+            await self._coordinator.async_request_refresh()
         except TypeError:
             _LOGGER.debug(
                 "Failed disabling motion detection on '%s'. Is it supported by the device?",
@@ -373,14 +376,14 @@ class DahuaCamera(DahuaBaseEntity, Camera):
         await self._coordinator.client.async_set_lighting_v1_mode(
             channel, mode, brightness
         )
-        await self._coordinator.async_refresh()
+        await self._coordinator.async_request_refresh()
 
     @dahua_command
     async def async_goto_preset_position(self, position: int) -> None:
         """Handles the service call from SERVICE_GOTO_PRESET_POSITION to go to a specific preset position"""
         channel = self._coordinator.get_channel()
         await self._coordinator.client.async_goto_preset_position(channel, position)
-        await self._coordinator.async_refresh()
+        await self._coordinator.async_request_refresh()
 
     @dahua_command
     async def async_set_video_in_day_night_mode(
@@ -391,7 +394,7 @@ class DahuaCamera(DahuaBaseEntity, Camera):
         await self._coordinator.client.async_set_video_in_day_night_mode(
             channel, config_type, mode
         )
-        await self._coordinator.async_refresh()
+        await self._coordinator.async_request_refresh()
 
     @dahua_command
     async def async_reboot(self) -> None:
@@ -403,7 +406,7 @@ class DahuaCamera(DahuaBaseEntity, Camera):
         """Handles the service call from SERVICE_SET_RECORD_MODE to set the record mode"""
         channel = self._coordinator.get_channel()
         await self._coordinator.client.async_set_record_mode(channel, mode)
-        await self._coordinator.async_refresh()
+        await self._coordinator.async_request_refresh()
 
     @dahua_command
     async def async_set_video_profile_mode(self, mode: str) -> None:
@@ -420,7 +423,7 @@ class DahuaCamera(DahuaBaseEntity, Camera):
     async def async_adjustfocus(self, focus: str, zoom: str) -> None:
         """Handles the service call from SERVICE_SET_INFRARED_MODE to set zoom and focus"""
         await self._coordinator.client.async_adjustfocus_v1(focus, zoom)
-        await self._coordinator.async_refresh()
+        await self._coordinator.async_request_refresh()
 
     @dahua_command
     async def async_set_privacy_masking(self, index: int, enabled: bool) -> None:
@@ -476,8 +479,12 @@ class DahuaCamera(DahuaBaseEntity, Camera):
     async def async_vto_cancel_call(self) -> None:
         """Handles the service call from SERVICE_VTO_CANCEL_CALL to cancel VTO calls"""
         vto_client = self._coordinator.get_vto_client()
-        if vto_client is not None:
-            await vto_client.cancel_call()
+        if vto_client is not None and not await vto_client.cancel_call():
+            raise HomeAssistantError(
+                translation_domain=DOMAIN,
+                translation_key="command_failed",
+                translation_placeholders={"error": "the VTO didn't cancel the call"},
+            )
 
     @dahua_command
     async def async_set_service_set_channel_title(self, text1: str, text2: str) -> None:
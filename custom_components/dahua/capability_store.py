@@ -0,0 +1,64 @@
+"""
+Persists the capabilities discovered by the probes (see probes.py) in Home Assistant storage so they don't have to be
+rediscovered on every restart. Entries are keyed by serial number and channel and are only used while the device
+reports the same firmware version they were discovered with.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+
+STORAGE_KEY = f"{DOMAIN}.capabilities"
+STORAGE_VERSION = 1
+
+# Several devices finish probing around the same time at startup, write them out together
+SAVE_DELAY_SECONDS = 10
+
+_DATA_CAPABILITY_STORE = f"{DOMAIN}_capability_store"
+
+
+class DahuaCapabilityStore:
+    """Loads and saves the capabilities of every device in a single storage file"""
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        self._store: Store[dict[str, dict[str, Any]]] = Store(
+            hass, STORAGE_VERSION, STORAGE_KEY
+        )
+        self._data: dict[str, dict[str, Any]] | None = None
+        self._load_lock = asyncio.Lock()
+
+    async def _async_load(self) -> dict[str, dict[str, Any]]:
+        async with self._load_lock:
+            if self._data is None:
+                self._data = await self._store.async_load() or {}
+        return self._data
+
+    async def async_get(self, key: str, version: str) -> dict[str, Any] | None:
+        """Returns the capabilities saved for key, or None if there aren't any for this firmware version"""
+        entry = (await self._async_load()).get(key)
+        if entry is None or entry.get("version") != version:
+            return None
+        return entry.get("capabilities")
+
+    async def async_set(
+        self, key: str, version: str, capabilities: dict[str, Any]
+    ) -> None:
+        """Saves the capabilities for key, discovered with the given firmware version"""
+        data = await self._async_load()
+        data[key] = {"version": version, "capabilities": capabilities}
+        self._store.async_delay_save(lambda: data, SAVE_DELAY_SECONDS)
+
+
+def get_capability_store(hass: HomeAssistant) -> DahuaCapabilityStore:
+    """Returns the capability store shared by all config entries"""
+    store: DahuaCapabilityStore | None = hass.data.get(_DATA_CAPABILITY_STORE)
+    if store is None:
+        store = DahuaCapabilityStore(hass)
+        hass.data[_DATA_CAPABILITY_STORE] = store
+    return store
@@ -14,13 +14,26 @@ from typing import Any
 
 import aiohttp
 
-from .digest import DigestAuth
+from .digest import DigestAuth, get_digest_auth_cache, release_digest_auth_cache
+from .metrics import LatencyStats
+from .request_scheduler import (
+    PRIORITY_COMMAND,
+    PRIORITY_POLL,
+    PRIORITY_SNAPSHOT,
+    MAX_CONCURRENT_REQUESTS,
+    get_request_scheduler,
+    release_request_scheduler,
+)
+from .write_queue import get_set_config_queue, release_set_config_queue
 from hashlib import md5
-from urllib.parse import quote
+from urllib.parse import quote, unquote, urlsplit
 
 _LOGGER: logging.Logger = logging.getLogger(__package__)
 
+# How long the device has to answer a request, from when the request got its slot (see request_scheduler.py)
 TIMEOUT_SECONDS = 20
+# The event stream asks the device for a heartbeat this often, see DahuaEventHub for what happens when they stop
+EVENT_HEARTBEAT_SECONDS = 5
 SECURITY_LIGHT_TYPE = 1
 SIREN_TYPE = 2
 
@@ -48,6 +61,85 @@ def _parse_adts_frames(data: bytes) -> list[bytes]:
     return frames
 
 
+def _has_config(response: dict[str, Any], name: str) -> bool:
+    """Returns True if a getConfig response has values for the config name, e.g. table.Lighting[0][0].Mode for Lighting[0][0]"""
+    prefix = "table." + name
+    for key in response:
+        if key.startswith(prefix) and key[len(prefix) : len(prefix) + 1] in (
+            "",
+            ".",
+            "[",
+        ):
+            return True
+    return False
+
+
+# Write APIs that aren't configManager setConfig, and the state (see refresh_scheduler.py) they change
+_WRITE_ACTIONS: dict[tuple[str, str], str] = {
+    ("ptz.cgi", "start"): "ptz",
+    ("ptz.cgi", "stop"): "ptz",
+    ("coaxialControlIO.cgi", "control"): "coaxial",
+    ("devVideoInput.cgi", "adjustFocus"): "zoomfocus",
+    ("devVideoInput.cgi", "autoFocus"): "zoomfocus",
+}
+
+
+def _written_keys(url: str) -> set[str]:
+    """
+    Returns the state a request changes on the device, empty for read only requests. For setConfig that's the names
+    of the configs it sets, e.g. {"Lighting"} for configManager.cgi?action=setConfig&Lighting[0][0].Mode=Auto
+    """
+    parts = urlsplit(url)
+    cgi = parts.path.rsplit("/", 1)[-1]
+    params = parts.query.split("&")
+    action = ""
+    for param in params:
+        if param.startswith("action="):
+            action = param[7:]
+            break
+
+    if cgi == "configManager.cgi" and action == "setConfig":
+        keys = set()
+        for param in params:
+            if not param.startswith("action="):
+                keys.add(re.split(r"[\[.=]", param, 1)[0])
+        return keys
+
+    key = _WRITE_ACTIONS.get((cgi, action))
+    return {key} if key is not None else set()
+
+
+def _set_config_params(url: str) -> list[str]:
+    """Returns the key=value params of a configManager.cgi setConfig request, empty for any other request"""
+    parts = urlsplit(url)
+    if not parts.path.endswith("/configManager.cgi"):
+        return []
+    params = parts.query.split("&")
+    if "action=setConfig" not in params:
+        return []
+    return [param for param in params if param and not param.startswith("action=")]
+
+
+def _written_values(url: str) -> dict[str, str]:
+    """
+    Returns the config values a setConfig request writes, keyed like the getConfig response (and coordinator.data),
+    e.g. {"table.Lighting[0][0].Mode": "Manual"} for configManager.cgi?action=setConfig&Lighting[0][0].Mode=Manual.
+    Empty for any other request.
+    """
+    parts = urlsplit(url)
+    if not parts.path.endswith("/configManager.cgi"):
+        return {}
+    values = {}
+    is_set_config = False
+    for param in parts.query.split("&"):
+        name, _, value = param.partition("=")
+        if name == "action":
+            is_set_config = value == "setConfig"
+        else:
+            values["table." + unquote(name)] = unquote(value)
+    return values if is_set_config else {}
+
+
 class DahuaClient:
     """
     DahuaClient is the client for accessing Dahua IP Cameras. The APIs were discovered from the "API of HTTP Protocol Specification" V2.76 2019-07-25 document
@@ -64,6 +156,7 @@ class DahuaClient:
         port: int,
         rtsp_port: int,
         session: aiohttp.ClientSession,
+        request_limit: int = MAX_CONCURRENT_REQUESTS,
     ) -> None:
         self._username = username
         self._password = password
@@ -76,6 +169,98 @@ class DahuaClient:
         protocol = "https" if int(port) == 443 else "http"
         self._base = "{0}://{1}:{2}".format(protocol, self._address, port)
 
+        # The digest challenge is shared by every client talking to the same device (e.g. all channels of an NVR)
+        self._auth_cache = get_digest_auth_cache(self._base, username)
+        # So are setConfig writes, writes made at the same time are merged into one request
+        self._set_config_queue = get_set_config_queue(self._base, username)
+        # and so is the limit on how many requests can be sent to the device at once
+        self._request_scheduler = get_request_scheduler(self._base)
+        self._request_limit = request_limit
+        self._request_scheduler.add_limit(request_limit)
+        self._snapshot_latency = LatencyStats()
+
+        # Whether the firmware answers a getConfig with several names in one request. None until we've tried
+        self._supports_config_batch: bool | None = None
+        # Config names a batch came back without, they're fetched on their own from then on
+        self._config_batch_excluded: set[str] = set()
+        self._config_batch_requests = 0
+        self._config_batch_fallbacks = 0
+
+        # Called with the keys and values a successful write changed, see add_write_listener
+        self._write_listeners: list[Callable[[set[str], dict[str, str]], None]] = []
+        self._closed = False
+
+    def close(self) -> None:
+        """
+        Releases what this client shares with the other clients of the device (see registry.py), so it's dropped
+        once the last config entry of the device is unloaded. The client shouldn't be used afterwards
+        """
+        if self._closed:
+            return
+        self._closed = True
+        release_digest_auth_cache(self._base, self._username)
+        release_set_config_queue(self._base, self._username)
+        self._request_scheduler.remove_limit(self._request_limit)
+        release_request_scheduler(self._base)
+
+    def _digest_auth(self) -> DigestAuth:
+        """Returns a DigestAuth that uses the challenge cached for this device"""
+        return DigestAuth(
+            self._username, self._password, self._session, cache=self._auth_cache
+        )
+
+    def get_auth_stats(self) -> dict[str, Any]:
+        """Returns the digest auth cache counters (hits, misses, stale nonces) for diagnostics"""
+        return self._auth_cache.as_dict()
+
+    def get_snapshot_stats(self) -> dict[str, Any]:
+        """Returns the snapshot latency (count, p50 and p95 in ms) for diagnostics"""
+        return self._snapshot_latency.as_dict()
+
+    def add_write_listener(
+        self, listener: Callable[[set[str], dict[str, str]], None]
+    ) -> Callable[[], None]:
+        """
+        Registers a listener that's called with the state a write changed on the device (for example {"Lighting"}
+        after setting the IR light) so it can be refreshed, and the config values it wrote when the device answered
+        OK, keyed like coordinator.data, so they can be shown before the refresh. Returns a function that removes the
+        listener.
+        """
+        self._write_listeners.append(listener)
+
+        def remove() -> None:
+            if listener in self._write_listeners:
+                self._write_listeners.remove(listener)
+
+        return remove
+
+    def _notify_write(self, url: str, response: str) -> None:
+        if not self._write_listeners:
+            return
+        keys = _written_keys(url)
+        if keys:
+            # Only trust the written values if the device accepted them
+            values = _written_values(url) if response.strip().lower() == "ok" else {}
+            for listener in list(self._write_listeners):
+                listener(keys, values)
+
+    def get_write_queue_stats(self) -> dict[str, Any]:
+        """Returns how many setConfig writes were made and how many requests they took, for diagnostics"""
+        return self._set_config_queue.as_dict()
+
+    def get_request_scheduler_stats(self) -> dict[str, Any]:
+        """Returns the in flight and queued requests and how long requests waited for the device, for diagnostics"""
+        return self._request_scheduler.as_dict()
+
+    def get_config_batch_stats(self) -> dict[str, Any]:
+        """Returns whether batched getConfig works on this device and how often it was used, for diagnostics"""
+        return {
+            "supported": self._supports_config_batch,
+            "requests": self._config_batch_requests,
+            "fallbacks": self._config_batch_fallbacks,
+            "excluded": sorted(self._config_batch_excluded),
+        }
+
     def get_rtsp_stream_url(self, channel: int, subtype: int) -> str:
         """
         Returns the RTSP url for the supplied subtype (subtype is 0=Main stream, 1=Sub stream)
@@ -103,9 +288,15 @@ class DahuaClient:
         NOTE: channel_number is not the channel_index. channel_number is the index + 1
         so channel index 0 is channel number 1. Except for some older firmwares where channel
         and channel number are the same!
+
+        The snapshot is sent with the Authorization header computed from the cached digest challenge, so it's a single
+        round-trip. If the camera rejects the cached nonce DigestAuth re-challenges and retries transparently.
         """
         url = "/cgi-bin/snapshot.cgi?channel={0}".format(channel_number)
-        return await self.get_bytes(url)
+        start = time.monotonic()
+        image = await self.get_bytes(url, PRIORITY_SNAPSHOT)
+        self._snapshot_latency.add(time.monotonic() - start)
+        return image
 
     async def async_get_system_info(self) -> dict[str, Any]:
         """
@@ -243,6 +434,55 @@ class DahuaClient:
         except aiohttp.ClientResponseError:
             return {}
 
+    async def async_get_config_batch(self, names: list[str]) -> dict[str, Any] | None:
+        """
+        async_get_config_batch gets several configs with a single request, for example
+        /cgi-bin/configManager.cgi?action=getConfig&name=MotionDetect&name=DisableLinkage
+        and returns the combined response. The caller gets the configs missing from the response one at a time, and
+        all of them when this returns None. Not every firmware supports this: some reject the request, which turns
+        batching off if it happens on the first try. Others only answer some of the names, e.g. the first one or the
+        configs the model has, so a name the response came without is left out of later batches.
+        """
+        if self._supports_config_batch is False:
+            self._config_batch_fallbacks += 1
+            return None
+
+        names = [name for name in names if name not in self._config_batch_excluded]
+        if len(names) < 2:
+            self._config_batch_fallbacks += 1
+            return None
+
+        url = "/cgi-bin/configManager.cgi?action=getConfig&" + "&".join(
+            "name={0}".format(name) for name in names
+        )
+        try:
+            result = await self.get(url)
+        except aiohttp.ClientResponseError as exception:
+            # One of the configs may not exist on this device, which fails the whole request
+            _LOGGER.debug("Batched getConfig failed for %s: %s", names, exception)
+            if self._supports_config_batch is None:
+                self._supports_config_batch = False
+            self._config_batch_fallbacks += 1
+            return None
+
+        missing = [name for name in names if not _has_config(result, name)]
+        if len(missing) == len(names):
+            if self._supports_config_batch is None:
+                self._supports_config_batch = False
+            self._config_batch_fallbacks += 1
+            return None
+        if missing:
+            _LOGGER.debug(
+                "Batched getConfig on %s came back without %s, getting them on their own from now on",
+                self._address,
+                missing,
+            )
+            self._config_batch_excluded.update(missing)
+
+        self._supports_config_batch = True
+        self._config_batch_requests += 1
+        return result
+
     async def async_get_config_lighting(
         self, channel: int, profile_mode: str
     ) -> dict[str, Any]:
@@ -912,16 +1152,14 @@ class DahuaClient:
         """
         # Use codes=[All] for all codes
         codes = ",".join(events)
-        url = (
-            "{0}/cgi-bin/eventManager.cgi?action=attach&codes=[{1}]&heartbeat=5".format(
-                self._base, codes
-            )
+        url = "{0}/cgi-bin/eventManager.cgi?action=attach&codes=[{1}]&heartbeat={2}".format(
+            self._base, codes, EVENT_HEARTBEAT_SECONDS
         )
         if self._username is not None and self._password is not None:
             response = None
 
             try:
-                auth = DigestAuth(self._username, self._password, self._session)
+                auth = self._digest_auth()
                 response = await auth.request("GET", url)
                 response.raise_for_status()
 
@@ -937,24 +1175,21 @@ class DahuaClient:
                     response.close()
 
     @staticmethod
-    async def parse_dahua_api_response(data: str) -> dict[str, Any]:
+    def parse_dahua_api_response(data: str) -> dict[str, Any]:
         """
         Dahua APIs return back text that looks like this:
 
         key1=value1
         key2=value2
 
-        We'll convert that to a dictionary like {"key1":"value1", "key2":"value2"}
+        We'll convert that to a dictionary like {"key1":"value1", "key2":"value2"}. See dahua_utils.project_config to
+        turn it into a nested, typed structure.
         """
-        lines = data.splitlines()
-        data_dict = {}
-        for line in lines:
-            parts = line.split("=", 1)
-            if len(parts) == 2:
-                data_dict[parts[0]] = parts[1]
-            else:
-                # We didn't get a key=value. We just got a key. Just stick it in the dictionary and move on
-                data_dict[parts[0]] = line
+        data_dict: dict[str, Any] = {}
+        for line in data.splitlines():
+            key, separator, value = line.partition("=")
+            # A line without a key=value is just a key. Just stick it in the dictionary and move on
+            data_dict[key] = value if separator else line
         return data_dict
 
     async def async_get_audio_encode_enabled(self, channel: int) -> bool:
@@ -989,8 +1224,8 @@ class DahuaClient:
         url = (
             "{0}/cgi-bin/audio.cgi?action=getAudio&httptype=singlepart&channel={1}"
         ).format(self._base, channel)
-        async with asyncio.timeout(TIMEOUT_SECONDS):
-            auth = DigestAuth(self._username, self._password, self._session)
+        async with self._request_scheduler.slot(PRIORITY_POLL, TIMEOUT_SECONDS):
+            auth = self._digest_auth()
             response = await auth.request("GET", url)
             response.raise_for_status()
             response.close()
@@ -1025,23 +1260,15 @@ class DahuaClient:
 
         # Prime digest auth with a lightweight GET so the POST is
         # authenticated on first attempt (camera drops un-authed POSTs).
-        prime_auth = DigestAuth(self._username, self._password, self._session)
+        # The challenge is stored in the shared cache and reused by the POST.
+        prime_auth = self._digest_auth()
         async with asyncio.timeout(TIMEOUT_SECONDS):
             prime_resp = await prime_auth.request(
                 "GET", self._base + "/cgi-bin/magicBox.cgi?action=getMachineName"
             )
             prime_resp.close()
 
-        auth = DigestAuth(
-            self._username,
-            self._password,
-            self._session,
-            {
-                "last_nonce": prime_auth.last_nonce,
-                "nonce_count": prime_auth.nonce_count,
-                "challenge": prime_auth.challenge,
-            },
-        )
+        auth = self._digest_auth()
 
         # Parse ADTS frames for frame-aligned delivery; fall back to
         # a single part for non-AAC encodings.
@@ -1315,12 +1542,12 @@ class DahuaClient:
             except Exception:
                 pass
 
-    async def get_bytes(self, url: str) -> bytes:
+    async def get_bytes(self, url: str, priority: int = PRIORITY_POLL) -> bytes:
         """Get information from the API. This will return the raw response and not process it"""
-        async with asyncio.timeout(TIMEOUT_SECONDS):
+        async with self._request_scheduler.slot(priority, TIMEOUT_SECONDS):
             response = None
             try:
-                auth = DigestAuth(self._username, self._password, self._session)
+                auth = self._digest_auth()
                 response = await auth.request("GET", self._base + url)
                 response.raise_for_status()
 
@@ -1330,24 +1557,46 @@ class DahuaClient:
                 if response is not None:
                     response.close()
 
+    async def _async_get_text(self, url: str, priority: int) -> str:
+        """Sends a GET to the full url once a request slot is free and returns the response body"""
+        async with self._request_scheduler.slot(priority, TIMEOUT_SECONDS):
+            response = None
+            try:
+                auth = self._digest_auth()
+                response = await auth.request("GET", url)
+                response.raise_for_status()
+                return await response.text()
+            finally:
+                if response is not None:
+                    response.close()
+
+    async def _async_send_set_config(self, params: list[str]) -> str:
+        return await self._async_get_text(
+            self._base
+            + "/cgi-bin/configManager.cgi?action=setConfig&"
+            + "&".join(params),
+            PRIORITY_COMMAND,
+        )
+
     async def get(self, url: str, verify_ok: bool = False) -> dict[str, Any]:
         """Get information from the API."""
         url = self._base + url
         try:
-            async with asyncio.timeout(TIMEOUT_SECONDS):
-                response = None
-                try:
-                    auth = DigestAuth(self._username, self._password, self._session)
-                    response = await auth.request("GET", url)
-                    response.raise_for_status()
-                    data = await response.text()
-                    if verify_ok:
-                        if data.lower().strip() != "ok":
-                            raise Exception(data)
-                    return await self.parse_dahua_api_response(data)
-                finally:
-                    if response is not None:
-                        response.close()
+            # The request times out on its own once it has a slot, see _async_get_text and the set config queue
+            params = _set_config_params(url)
+            if params:
+                data = await self._set_config_queue.async_set(
+                    params, self._async_send_set_config
+                )
+            else:
+                # Anything that changes the device (moving the PTZ, the siren) is a command the user waits on
+                priority = PRIORITY_COMMAND if _written_keys(url) else PRIORITY_POLL
+                data = await self._async_get_text(url, priority)
+            if verify_ok:
+                if data.lower().strip() != "ok":
+                    raise Exception(data)
+            self._notify_write(url, data)
+            return self.parse_dahua_api_response(data)
         except asyncio.TimeoutError as exception:
             _LOGGER.warning("TimeoutError fetching information from %s", url)
             raise exception
@@ -25,7 +25,13 @@ from .const import (
     DOMAIN,
     PLATFORMS,
     CONF_CHANNEL,
+    CONF_SNAPSHOT_CACHE_TTL,
+    DEFAULT_SNAPSHOT_CACHE_TTL,
+    CONF_EVENT_RATE_LIMIT,
+    DEFAULT_EVENT_RATE_LIMIT,
+    CONF_MAX_CONCURRENT_REQUESTS,
 )
+from .request_scheduler import MAX_CONCURRENT_REQUESTS, MAX_REQUEST_LIMIT
 
 """
 https://developers.home-assistant.io/docs/config_entries_config_flow_handler
@@ -316,10 +322,10 @@ class DahuaFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
     ) -> dict[str, Any] | None:
         """Return name and serialNumber if credentials is valid."""
         session = async_create_clientsession(self.hass, verify_ssl=False)
+        client = DahuaClient(
+            username, password, address, int(port), int(rtsp_port), session
+        )
         try:
-            client = DahuaClient(
-                username, password, address, int(port), int(rtsp_port), session
-            )
             data = await client.get_machine_name()
             serial = await client.async_get_system_info()
             data.update(serial)
@@ -331,6 +337,8 @@ class DahuaFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
                 + "https://github.com/brianegge/dahua/issues/6",
                 exc_info=exception,
             )
+        finally:
+            client.close()
         return None
 
 
@@ -356,8 +364,30 @@ class DahuaOptionsFlowHandler(config_entries.OptionsFlow):
             step_id="user",
             data_schema=vol.Schema(
                 {
-                    vol.Required(x, default=self.options.get(x, True)): bool
-                    for x in sorted(PLATFORMS)
+                    **{
+                        vol.Required(x, default=self.options.get(x, True)): bool
+                        for x in sorted(PLATFORMS)
+                    },
+                    vol.Optional(
+                        CONF_SNAPSHOT_CACHE_TTL,
+                        default=self.options.get(
+                            CONF_SNAPSHOT_CACHE_TTL, DEFAULT_SNAPSHOT_CACHE_TTL
+                        ),
+                    ): vol.All(vol.Coerce(float), vol.Range(min=0, max=10)),
+                    vol.Optional(
+                        CONF_EVENT_RATE_LIMIT,
+                        default=self.options.get(
+                            CONF_EVENT_RATE_LIMIT, DEFAULT_EVENT_RATE_LIMIT
+                        ),
+                    ): vol.All(vol.Coerce(float), vol.Range(min=0, max=100)),
+                    vol.Optional(
+                        CONF_MAX_CONCURRENT_REQUESTS,
+                        default=self.options.get(
+                            CONF_MAX_CONCURRENT_REQUESTS, MAX_CONCURRENT_REQUESTS
+                        ),
+                    ): vol.All(
+                        vol.Coerce(int), vol.Range(min=1, max=MAX_REQUEST_LIMIT)
+                    ),
                 }
             ),
         )
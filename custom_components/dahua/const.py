@@ -50,9 +50,17 @@ CONF_STREAMS = "streams"
 CONF_EVENTS = "events"
 CONF_NAME = "name"
 CONF_CHANNEL = "channel"
+CONF_SNAPSHOT_CACHE_TTL = "snapshot_cache_ttl"
+CONF_EVENT_RATE_LIMIT = "event_rate_limit"
+CONF_MAX_CONCURRENT_REQUESTS = "max_concurrent_requests"
 
 # Defaults
 DEFAULT_NAME = "Dahua"
+# Seconds a camera snapshot is reused for. 0 disables the cache
+DEFAULT_SNAPSHOT_CACHE_TTL = 1.0
+# Events per second, per event code, fired on the HA event bus. 0 disables the limit, which is the default so
+# automations keep seeing every event unless the user opts in
+DEFAULT_EVENT_RATE_LIMIT = 0.0
 
 STARTUP_MESSAGE = f"""
 -------------------------------------------------------------------
@@ -4,6 +4,8 @@ Various utilities for Dahua cameras
 
 import json
 import re
+from collections.abc import Mapping
+from functools import lru_cache
 from typing import Any
 
 
@@ -29,6 +31,77 @@ def hass_brightness_to_dahua_brightness(hass_brightness: int | None) -> int:
     return int((hass_brightness / 255) * 100)
 
 
+# A name (Lighting_V2, Mode) or an index ([0]) in a config key
+_CONFIG_PATH_TOKEN = re.compile(r"\[(\d+)\]|([^.\[\]]+)")
+
+_CONFIG_BOOLEANS = {
+    "true": True,
+    "false": False,
+    "True": True,
+    "False": False,
+    "TRUE": True,
+    "FALSE": False,
+}
+
+
+@lru_cache(maxsize=8192)
+def parse_config_path(key: str) -> tuple[str | int, ...]:
+    """
+    Splits a config key into its names and indexes, e.g. table.Lighting_V2[0][1][0].Mode becomes
+    ("table", "Lighting_V2", 0, 1, 0, "Mode"). The same keys come back on every poll so the result is cached.
+    """
+    return tuple(
+        int(index) if index else name for index, name in _CONFIG_PATH_TOKEN.findall(key)
+    )
+
+
+def typed_config_value(value: str) -> Any:
+    """Converts a config value to a bool or int when it is one, other values are returned as is"""
+    boolean = _CONFIG_BOOLEANS.get(value)
+    if boolean is not None:
+        return boolean
+    digits = value[1:] if value[:1] == "-" else value
+    # Keep values with leading zeros (like serial numbers) as strings, they'd lose the zeros as an int
+    if digits.isdigit() and (digits[0] != "0" or len(digits) == 1):
+        return int(value)
+    return value
+
+
+def project_config(data: Mapping[str, Any]) -> dict[Any, Any]:
+    """
+    Projects the flat key=value pairs from parse_dahua_api_response into a tree of dicts keyed by name and index,
+    with typed values. For example {"table.Lighting_V2[0][1][0].Mode": "Manual", "table.MotionDetect[0].Enable": "true"}
+    becomes {"table": {"Lighting_V2": {0: {1: {0: {"Mode": "Manual"}}}}, "MotionDetect": {0: {"Enable": True}}}}.
+    Use config_value to look up a value.
+    """
+    tree: dict[Any, Any] = {}
+    for key, value in data.items():
+        path = parse_config_path(key)
+        if not path:
+            continue
+        node = tree
+        for part in path[:-1]:
+            child = node.get(part)
+            if type(child) is not dict:
+                child = node[part] = {}
+            node = child
+        leaf = path[-1]
+        if type(node.get(leaf)) is not dict:
+            node[leaf] = typed_config_value(value) if type(value) is str else value
+    return tree
+
+
+def config_value(tree: Mapping[Any, Any], *path: str | int, default: Any = None) -> Any:
+    """Returns the value at path in a tree from project_config, e.g. config_value(tree, "table", "MotionDetect", 0, "Enable")"""
+    node: Any = tree
+    try:
+        for part in path:
+            node = node[part]
+    except (KeyError, TypeError):
+        return default
+    return node
+
+
 # https://github.com/brianegge/dahua/issues/166
 def parse_event(data: str) -> list[dict[str, Any]]:
     # This will turn the event stream data into a list of events, where each item in the list is a dictionary and where
@@ -55,31 +128,185 @@ def parse_event(data: str) -> list[dict[str, Any]]:
     for event_block in event_blocks:
         # Skip the first 3 lines... the first line looks like: Content-Type: text/plain
         s = event_block.split("\n", 3)
-        if len(s) < 3:
-            continue
-        event_block = s[3].strip()
-        if not event_block.startswith("Code="):
+        if len(s) < 4:
             continue
+        event = _parse_event_body(s[3])
+        if event is not None:
+            events.append(event)
+
+    return events
+
+
+def _parse_event_body(event_block: str) -> dict[str, Any] | None:
+    """
+    Parses the body of a single event, which looks like this:
+    Code=VideoMotion;action=Start;index=0;data={
+       "Id" : [ 0 ],
+       "RegionName" : [ "Region1" ],
+       "SmartMotionEnable" : true
+    }
+    Returns None if it isn't an event (for example a Heartbeat)
+    """
+    event_block = event_block.strip()
+    if not event_block.startswith("Code="):
+        return None
+
+    # data is always last and is JSON, which can contain ; and =, so split it off before splitting the rest
+    data = None
+    if ";data=" in event_block:
+        event_block, data = event_block.split(";data=", 1)
+
+    # And we want to put each key/value pair into a dictionary...
+    event: dict[str, Any] = dict()
+    for key_value in event_block.split(";"):
+        key, _, value = key_value.partition("=")
+        event[key] = value
+
+    # data is a json string, convert it to real json and add it back to the output dic
+    if data is not None:
+        try:
+            event["data"] = json.loads(data)
+        except Exception:  # pylint: disable=broad-except
+            event["data"] = data
 
-        # At this point we'll have something that looks like this...
-        # Code=VideoMotion;action=Start;index=0;data={
-        #    "Id" : [ 0 ],
-        #    "RegionName" : [ "Region1" ],
-        #    "SmartMotionEnable" : true
-        # }
-        # And we want to put each key/value pair into a dictionary...
-        event = dict()
-        for key_value in event_block.split(";"):
-            key, value = key_value.split("=")
-            event[key] = value
-
-        # data is a json string, convert it to real json and add it back to the output dic
-        if "data" in event:
+    return event
+
+
+class EventStreamParser:
+    """
+    EventStreamParser incrementally parses the multipart stream from eventManager.cgi?action=attach. Chunks from the
+    HTTP response are fed in as they arrive and every complete event is returned exactly once, even when an event is
+    split across chunks or a chunk holds several events. Each part looks like this:
+
+    --myboundary
+    Content-Type: text/plain
+    Content-Length: 39
+
+    Code=VideoMotion;action=Start;index=0
+
+    The body is complete once Content-Length bytes have arrived or the next boundary shows up, whichever comes first,
+    so a wrong Content-Length can't swallow the next event. Without a Content-Length the body ends at the next boundary
+    (devices send a heartbeat every few seconds). Bytes are only scanned once, so parsing is linear in the stream size.
+    """
+
+    # Drop whatever we have buffered if a single part grows past this, the device isn't sending what we expect
+    MAX_PART_SIZE = 1024 * 1024
+    MAX_HEADER_SIZE = 1024
+
+    def __init__(self, boundary: str = "myboundary") -> None:
+        self._boundary = b"--" + boundary.encode()
+        self._buffer = bytearray()
+        # Start of the data we haven't consumed yet
+        self._pos = 0
+        # Where the body of the current part starts, -1 when we haven't seen its headers yet
+        self._body_start = -1
+        self._content_length: int | None = None
+        # Where to continue looking for the next boundary in the body of the current part
+        self._scan_from = 0
+
+    def feed(self, data: bytes) -> list[dict[str, Any]]:
+        """Adds a chunk from the stream and returns the events it completed"""
+        self._buffer += data
+
+        events = []
+        while True:
+            body = self._next_body()
+            if body is None:
+                break
+            event = _parse_event_body(body.decode("utf-8", errors="ignore"))
+            if event is not None:
+                events.append(event)
+
+        # Throw away what we consumed, once per chunk
+        if self._pos > 0:
+            del self._buffer[: self._pos]
+            if self._body_start >= 0:
+                self._body_start -= self._pos
+                self._scan_from -= self._pos
+            self._pos = 0
+
+        if len(self._buffer) > self.MAX_PART_SIZE:
+            self._buffer.clear()
+            self._reset_part()
+
+        return events
+
+    def _reset_part(self) -> None:
+        self._body_start = -1
+        self._content_length = None
+        self._scan_from = 0
+
+    def _next_body(self) -> bytes | None:
+        """Returns the body of the next complete part, or None if more data is needed"""
+        buffer = self._buffer
+        boundary_length = len(self._boundary)
+
+        if self._body_start < 0 and not self._parse_headers():
+            return None
+
+        body_start = self._body_start
+        body_end = len(buffer)
+        if self._content_length is not None:
+            body_end = min(body_end, body_start + self._content_length)
+
+        next_boundary = buffer.find(self._boundary, self._scan_from, body_end)
+        if next_boundary >= 0:
+            end = next_boundary
+        elif (
+            self._content_length is not None
+            and len(buffer) >= body_start + self._content_length
+        ):
+            end = body_start + self._content_length
+        else:
+            # Keep the tail in case the next boundary is split across chunks
+            self._scan_from = max(body_start, len(buffer) - boundary_length + 1)
+            return None
+
+        body = bytes(buffer[body_start:end])
+        self._pos = end
+        self._reset_part()
+        return body
+
+    def _parse_headers(self) -> bool:
+        """Finds the next boundary and reads the part headers, returns False if more data is needed"""
+        buffer = self._buffer
+        while True:
+            start = buffer.find(self._boundary, self._pos)
+            if start < 0:
+                # Nothing but noise (for example the CRLF after a body), keep just enough for a split boundary
+                self._pos = max(self._pos, len(buffer) - len(self._boundary) + 1)
+                return False
+            self._pos = start
+
+            # The headers end at the first empty line after the boundary line. Headers are short, so only look that
+            # far, that way we never scan a large body looking for them.
+            limit = start + self.MAX_HEADER_SIZE
+            header_end = -1
+            separator_length = 0
+            for separator in (b"\n\r\n", b"\n\n"):
+                end = buffer.find(separator, start, limit)
+                if end >= 0 and (header_end < 0 or end < header_end):
+                    header_end = end
+                    separator_length = len(separator)
+
+            if header_end >= 0:
+                break
+            if len(buffer) - start < self.MAX_HEADER_SIZE:
+                return False
+            # Not a real part, look for the next boundary
+            self._pos = start + len(self._boundary)
+
+        content_length = None
+        headers = bytes(buffer[start:header_end]).lower()
+        index = headers.find(b"content-length:")
+        if index >= 0:
+            value = headers[index + 15 :].split(b"\n", 1)[0]
             try:
-                data = json.loads(event["data"])
-                event["data"] = data
-            except Exception:  # pylint: disable=broad-except
-                pass
-        events.append(event)
+                content_length = int(value)
+            except ValueError:
+                content_length = None
 
-    return events
+        self._body_start = header_end + separator_length
+        self._scan_from = self._body_start
+        self._content_length = content_length
+        return True
@@ -33,4 +33,17 @@ async def async_get_config_entry_diagnostics(
             "doorbell": coordinator.is_doorbell(),
             "audio_cgi": coordinator.supports_audio_cgi(),
         },
+        "digest_auth": coordinator.client.get_auth_stats(),
+        "snapshot_latency": coordinator.client.get_snapshot_stats(),
+        "config_batch": coordinator.client.get_config_batch_stats(),
+        "poll_backend": coordinator.get_poll_backend_stats(),
+        "write_queue": coordinator.client.get_write_queue_stats(),
+        "request_scheduler": coordinator.client.get_request_scheduler_stats(),
+        "snapshot_cache": coordinator.get_snapshot_cache_stats(),
+        "events": coordinator.get_event_stats(),
+        "event_stream": coordinator.get_event_stream_stats(),
+        "vto": coordinator.get_vto_stats(),
+        "capability_probes": coordinator.get_probe_results(),
+        "capabilities_from_store": coordinator.is_capabilities_from_store(),
+        "refresh_intervals": coordinator.get_refresh_intervals(),
     }
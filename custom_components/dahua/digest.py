@@ -12,15 +12,67 @@ from aiohttp.client_reqrep import ClientResponse
 from aiohttp.client_exceptions import ClientError
 from yarl import URL
 
+from .registry import SharedRegistry
+
 # Seems that aiohttp doesn't support Diegest Auth, which Dahua cams require. So I had to bake it in here.
 # Copied and then modified from https://github.com/aio-libs/aiohttp/pull/2213
 # I really wish this was baked into aiohttp :-(
 
 
+class DigestAuthCache:
+    """
+    DigestAuthCache holds the last digest challenge a device handed out, along with the nonce count, so that every
+    request to that device can authenticate preemptively instead of paying for a 401 round-trip first. A new challenge
+    is only requested when the device rejects the cached nonce (for example when it has gone stale).
+    """
+
+    def __init__(self) -> None:
+        self.challenge: dict[str, str] | None = None
+        self.last_nonce = ""
+        self.nonce_count = 0
+        # Requests that were sent with a cached challenge
+        self.hits = 0
+        # Requests that had no cached challenge and needed a 401 round-trip
+        self.misses = 0
+        # Requests where the cached challenge was rejected and we had to re-challenge
+        self.stale = 0
+
+    def as_dict(self) -> dict[str, Any]:
+        """Returns the cache counters, used by diagnostics"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "nonce_count": self.nonce_count,
+            "has_challenge": self.challenge is not None,
+        }
+
+
+# One cache per device (host + username). NVR channels are set up as separate config entries, each with its own
+# client, so keeping the caches here lets all of them share the same challenge.
+_DIGEST_AUTH_CACHES: SharedRegistry[tuple[str, str], DigestAuthCache] = SharedRegistry()
+
+
+def get_digest_auth_cache(host: str, username: str) -> DigestAuthCache:
+    """
+    Returns the shared DigestAuthCache for the given host and username, creating it if needed. Each call holds the
+    cache until release_digest_auth_cache is called
+    """
+    return _DIGEST_AUTH_CACHES.acquire((host, username), DigestAuthCache)
+
+
+def release_digest_auth_cache(host: str, username: str) -> None:
+    """Releases a hold from get_digest_auth_cache, the cache is dropped when the last holder released it"""
+    _DIGEST_AUTH_CACHES.release((host, username))
+
+
 class DigestAuth:
     """HTTP digest authentication helper.
     The work here is based off of
     https://github.com/requests/requests/blob/v2.18.4/requests/auth.py.
+
+    If a DigestAuthCache is supplied the challenge and nonce count are read from and written to it, so requests made
+    with different DigestAuth instances reuse the same challenge.
     """
 
     def __init__(
@@ -29,18 +81,45 @@ class DigestAuth:
         password: str,
         session: aiohttp.ClientSession,
         previous: dict[str, Any] | None = None,
+        cache: DigestAuthCache | None = None,
     ) -> None:
-        if previous is None:
-            previous = {}
+        if cache is None:
+            cache = DigestAuthCache()
+            if previous is not None:
+                cache.last_nonce = previous.get("last_nonce", "")
+                cache.nonce_count = previous.get("nonce_count", 0)
+                cache.challenge = previous.get("challenge")
 
         self.username = username
         self.password = password
-        self.last_nonce: str = previous.get("last_nonce", "")
-        self.nonce_count: int = previous.get("nonce_count", 0)
-        self.challenge: dict[str, str] | None = previous.get("challenge")
+        self.cache = cache
         self.args: dict[str, Any] = {}
         self.session = session
 
+    @property
+    def challenge(self) -> dict[str, str] | None:
+        return self.cache.challenge
+
+    @challenge.setter
+    def challenge(self, value: dict[str, str] | None) -> None:
+        self.cache.challenge = value
+
+    @property
+    def last_nonce(self) -> str:
+        return self.cache.last_nonce
+
+    @last_nonce.setter
+    def last_nonce(self, value: str) -> None:
+        self.cache.last_nonce = value
+
+    @property
+    def nonce_count(self) -> int:
+        return self.cache.nonce_count
+
+    @nonce_count.setter
+    def nonce_count(self, value: int) -> None:
+        self.cache.nonce_count = value
+
     async def request(
         self,
         method: str,
@@ -56,18 +135,33 @@ class DigestAuth:
         # Save the args so we can re-run the request
         self.args = {"method": method, "url": url, "headers": headers, "kwargs": kwargs}
 
-        if self.challenge:
-            authorization = self._build_digest_header(method.upper(), url)
-            headers["AUTHORIZATION"] = authorization
+        preemptive = self.challenge is not None
+        if preemptive:
+            self.cache.hits += 1
+        else:
+            self.cache.misses += 1
 
-        response = await self.session.request(method, url, headers=headers, **kwargs)
+        response = await self._send(method, url, headers, kwargs)
 
         # Only try performing digest authentication if the response status is from 401
         if response.status == 401:
+            if preemptive:
+                # The device didn't accept the cached nonce, get a new challenge
+                self.cache.stale += 1
             return await self._handle_401(response)
 
         return response
 
+    async def _send(
+        self, method: str, url: str, headers: dict[str, str], kwargs: dict[str, Any]
+    ) -> ClientResponse:
+        """Sends the request, adding the authorization header if we have a challenge"""
+        if self.challenge:
+            authorization = self._build_digest_header(method.upper(), url)
+            headers["AUTHORIZATION"] = authorization
+
+        return await self.session.request(method, url, headers=headers, **kwargs)
+
     def _build_digest_header(self, method: str, url: str) -> str:
         """
         :rtype: str
@@ -153,7 +247,8 @@ class DigestAuth:
 
     async def _handle_401(self, response: ClientResponse) -> ClientResponse:
         """
-        Takes the given response and tries digest-auth, if needed.
+        Takes the given response and tries digest-auth, if needed. The request is only retried once, if the
+        device rejects the new challenge too (bad credentials) the 401 response is returned to the caller.
         :rtype: ClientResponse
         """
         auth_header = response.headers.get("www-authenticate", "")
@@ -165,11 +260,11 @@ class DigestAuth:
 
             self.challenge = parse_key_value_list(parts[1])
 
-            return await self.request(
+            return await self._send(
                 self.args["method"],
                 self.args["url"],
-                headers=self.args["headers"],
-                **self.args["kwargs"],
+                self.args["headers"],
+                self.args["kwargs"],
             )
 
         return response
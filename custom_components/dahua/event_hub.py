@@ -0,0 +1,291 @@
+"""Shared event stream for all channels of a Dahua device"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections.abc import Callable
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+
+from .backoff import backoff_delay
+from .client import EVENT_HEARTBEAT_SECONDS, DahuaClient
+from .const import DOMAIN
+from .dahua_utils import EventStreamParser
+from .log_utils import HotPathLogger
+from .registry import SharedRegistry
+
+_LOGGER: logging.Logger = logging.getLogger(__package__)
+# Logs every event received, see log_utils.HotPathLogger
+_EVENT_LOGGER = HotPathLogger(_LOGGER)
+
+EventCallback = Callable[[dict[str, Any]], None]
+
+# A stream that missed this many heartbeats in a row is reconnected
+MISSED_HEARTBEATS = 3
+STALE_STREAM_SECONDS = EVENT_HEARTBEAT_SECONDS * MISSED_HEARTBEATS
+
+# Reconnect delays grow from the base to the max, doubling after every stream that didn't last STABLE_STREAM_SECONDS
+BACKOFF_BASE_SECONDS = 2.0
+BACKOFF_MAX_SECONDS = 120.0
+STABLE_STREAM_SECONDS = 60.0
+
+# Subscriptions made within this time are applied with a single (re)connect. The channels of an NVR set up one after
+# the other, without the delay the stream reconnected once per channel at startup
+STREAM_RESTART_DELAY_SECONDS = 1.0
+
+# Sent with the dispatcher when the stream connects or disconnects, formatted with the device's address, port and
+# username (see DahuaEventHub.signal)
+SIGNAL_EVENT_STREAM_UPDATED = DOMAIN + "_event_stream_updated_{0}_{1}_{2}"
+
+
+class DahuaEventHub:
+    """
+    DahuaEventHub keeps a single eventManager.cgi attach stream open per device and dispatches each event to the
+    coordinator of the channel in the event's index. NVRs are set up with one config entry per channel, and without
+    the hub every channel opened its own identical stream and parsed (then discarded) every other channel's events.
+
+    The stream subscribes to the union of the event codes of all the channels. It's only reconnected when a
+    subscription adds codes, a code that is no longer subscribed to stays on the stream until the next reconnect.
+    Connects and disconnects are sent to the signal with the dispatcher, for the Event stream sensors.
+    """
+
+    def __init__(
+        self, hass: HomeAssistant, key: tuple[str, int, str], client: DahuaClient
+    ) -> None:
+        self._hass = hass
+        self._key = key
+        self.signal = SIGNAL_EVENT_STREAM_UPDATED.format(*key)
+        self._client = client
+        self._subscribers: dict[
+            int, list[tuple[DahuaClient, list[str], EventCallback]]
+        ] = {}
+        self._codes: list[str] = []
+        self._task: asyncio.Task[None] | None = None
+        self._restart_handle: asyncio.TimerHandle | None = None
+        self._parser = EventStreamParser()
+        self._watchdog: asyncio.Timeout | None = None
+        self._attempt = 0
+        self.connected = False
+        self.last_data: float | None = None
+        self.reconnects = 0
+        self.stale_reconnects = 0
+        self.last_backoff = 0.0
+
+    def subscribe(
+        self,
+        client: DahuaClient,
+        channel: int,
+        events: list[str],
+        on_event: EventCallback,
+    ) -> Callable[[], None]:
+        """
+        Registers on_event for events of the given channel (index) and starts or restarts the stream if it isn't
+        subscribed to all of the events yet. Returns a function that removes the subscription.
+        """
+        # Use the most recent client so a reloaded entry (e.g. new credentials) is picked up on the next reconnect
+        self._client = client
+        subscriber = (client, events, on_event)
+        self._subscribers.setdefault(channel, []).append(subscriber)
+        self._update_stream()
+
+        def unsubscribe() -> None:
+            subscribers = self._subscribers.get(channel, [])
+            if subscriber in subscribers:
+                subscribers.remove(subscriber)
+            if not subscribers:
+                self._subscribers.pop(channel, None)
+            if not self._subscribers:
+                self.stop()
+                return
+            if self._client is client:
+                # The entry is unloading and closes its client, reconnect with one that is still in use. The open
+                # connection isn't affected
+                self._client = next(iter(self._subscribers.values()))[-1][0]
+            self._update_stream()
+
+        return unsubscribe
+
+    def event_lag(self) -> float | None:
+        """Returns the seconds since anything (an event or a heartbeat) was received, None if nothing was yet"""
+        if self.last_data is None:
+            return None
+        return round(time.monotonic() - self.last_data, 1)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Returns the stream state and the reconnect counts, used by diagnostics"""
+        return {
+            "connected": self.connected,
+            "event_lag_seconds": self.event_lag(),
+            "reconnects": self.reconnects,
+            "stale_reconnects": self.stale_reconnects,
+            "last_backoff_seconds": round(self.last_backoff, 1),
+        }
+
+    def get_codes(self) -> list[str]:
+        """Returns the event codes the stream is subscribed to"""
+        return self._codes
+
+    def _update_stream(self) -> None:
+        """
+        Schedules a (re)start of the stream when the subscriptions have codes the stream doesn't. Later changes within
+        STREAM_RESTART_DELAY_SECONDS push the restart back, so they're all applied by one reconnect.
+        """
+        if self._task is not None and self._streams(self._union_codes()):
+            return
+        if self._restart_handle is not None:
+            self._restart_handle.cancel()
+        self._restart_handle = asyncio.get_running_loop().call_later(
+            STREAM_RESTART_DELAY_SECONDS, self._restart_stream
+        )
+
+    def _restart_stream(self) -> None:
+        self._restart_handle = None
+        codes = self._union_codes()
+        if self._task is not None and self._streams(codes):
+            return
+        self._stop_stream()
+        self._codes = codes
+        if codes:
+            self._task = asyncio.create_task(self._async_stream_events())
+
+    def _streams(self, codes: list[str]) -> bool:
+        """Returns whether the stream already gets the events for codes"""
+        return "All" in self._codes or all(code in self._codes for code in codes)
+
+    def _union_codes(self) -> list[str]:
+        codes: list[str] = []
+        for subscribers in self._subscribers.values():
+            for _, events, _ in subscribers:
+                for code in events:
+                    if code not in codes:
+                        codes.append(code)
+        if "All" in codes:
+            return ["All"]
+        return codes
+
+    def stop(self) -> None:
+        """Stops the event stream, and any (re)start that is scheduled"""
+        if self._restart_handle is not None:
+            self._restart_handle.cancel()
+            self._restart_handle = None
+        self._stop_stream()
+
+    def _stop_stream(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _async_stream_events(self) -> None:
+        """
+        Continuously stream events from the device, reconnecting on failure. The device sends a heartbeat every
+        EVENT_HEARTBEAT_SECONDS, a stream that goes quiet for MISSED_HEARTBEATS of them is dead (e.g. a half open
+        connection after a router reboot) and is torn down and reconnected.
+        """
+        address = self._key[0]
+        while True:
+            start_time = time.monotonic()
+            # Every connection starts a new multipart stream, don't carry over a partial event from the last one
+            self._parser = EventStreamParser()
+            try:
+                async with asyncio.timeout(STALE_STREAM_SECONDS) as self._watchdog:
+                    await self._client.stream_events(self.on_receive, self._codes, 0)
+            except asyncio.CancelledError:
+                raise
+            except TimeoutError:
+                self.stale_reconnects += 1
+                _LOGGER.warning(
+                    "No heartbeat from %s for %ss, reconnecting the event stream",
+                    address,
+                    STALE_STREAM_SECONDS,
+                )
+            except Exception as ex:
+                _LOGGER.warning(
+                    "Event stream for %s ended unexpectedly: %s", address, ex
+                )
+            finally:
+                self._watchdog = None
+                self._set_connected(False)
+
+            if time.monotonic() - start_time >= STABLE_STREAM_SECONDS:
+                self._attempt = 0
+            self.last_backoff = backoff_delay(
+                self._attempt, BACKOFF_BASE_SECONDS, BACKOFF_MAX_SECONDS
+            )
+            self._attempt += 1
+            self.reconnects += 1
+            _LOGGER.debug(
+                "Reconnecting to event stream for %s in %.1fs",
+                address,
+                self.last_backoff,
+            )
+            await asyncio.sleep(self.last_backoff)
+
+    def on_receive(self, data_bytes: bytes, channel: int) -> None:
+        """
+        Feeds a chunk from the stream to the parser and dispatches each completed event to the subscribers of its
+        channel. Events can be split across chunks, so a chunk may complete zero, one or several events.
+        """
+        # Anything from the device, heartbeats included, shows the stream is alive
+        self.last_data = time.monotonic()
+        self._set_connected(True)
+        if self._watchdog is not None:
+            self._watchdog.reschedule(
+                asyncio.get_running_loop().time() + STALE_STREAM_SECONDS
+            )
+
+        events = self._parser.feed(data_bytes)
+
+        if len(events) == 0:
+            return
+
+        _EVENT_LOGGER.debug("Events received from %s: %s", self._key[0], events)
+
+        for event in events:
+            self.dispatch(event)
+
+    def _set_connected(self, connected: bool) -> None:
+        if connected == self.connected:
+            return
+        self.connected = connected
+        async_dispatcher_send(self._hass, self.signal)
+
+    def dispatch(self, event: dict[str, Any]) -> None:
+        """Sends the event to the subscribers of the channel in the event's index"""
+        index = 0
+        if "index" in event:
+            try:
+                index = int(event["index"])
+            except ValueError:
+                index = 0
+
+        subscribers = self._subscribers.get(index, [])
+        for _, _, on_event in subscribers:
+            # Coordinators add their device name to the event, so each gets its own copy if the channel is shared
+            on_event(event if len(subscribers) == 1 else dict(event))
+
+
+_EVENT_HUBS: SharedRegistry[tuple[str, int, str], DahuaEventHub] = SharedRegistry()
+
+
+def get_event_hub(
+    hass: HomeAssistant, client: DahuaClient, address: str, port: int, username: str
+) -> DahuaEventHub:
+    """
+    Returns the shared DahuaEventHub for the device, creating it if needed. Each call holds the hub until
+    release_event_hub is called
+    """
+    key = (address, port, username)
+    return _EVENT_HUBS.acquire(key, lambda: DahuaEventHub(hass, key, client))
+
+
+def release_event_hub(address: str, port: int, username: str) -> None:
+    """Releases a hold from get_event_hub, the hub is stopped and dropped when the last holder released it"""
+    key = (address, port, username)
+    hub = _EVENT_HUBS.get(key)
+    _EVENT_HUBS.release(key)
+    if hub is not None and _EVENT_HUBS.get(key) is None:
+        hub.stop()
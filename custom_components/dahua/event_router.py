@@ -0,0 +1,100 @@
+"""Routes device events to the listeners of their event code and channel"""
+
+from __future__ import annotations
+
+import time
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+# Event rates are reported over this window
+RATE_WINDOW_SECONDS = 300
+
+# The most events per code kept for the rate, a noisy code reports at least this many per window
+MAX_RATE_SAMPLES = 1000
+
+
+@dataclass
+class EventRoute:
+    """
+    The listeners of one (code, channel) pair. key is the event key used for the event timestamps, it's formatted once
+    when the first listener is added instead of for every event.
+    """
+
+    key: str
+    listeners: list[Callable[[], None]] = field(default_factory=list)
+
+
+class EventRateCounter:
+    """Counts events and reports the rate over the last RATE_WINDOW_SECONDS"""
+
+    def __init__(self) -> None:
+        self._times: deque[float] = deque(maxlen=MAX_RATE_SAMPLES)
+        self.count = 0
+
+    def add(self, now: float) -> None:
+        """Records an event received at now (time.monotonic)"""
+        self._times.append(now)
+        self.count += 1
+
+    def per_minute(self, now: float) -> float:
+        """Returns the events per minute over the last RATE_WINDOW_SECONDS"""
+        times = self._times
+        while times and now - times[0] > RATE_WINDOW_SECONDS:
+            times.popleft()
+        return round(len(times) * 60 / RATE_WINDOW_SECONDS, 2)
+
+
+class EventRouter:
+    """
+    EventRouter maps (code, channel) to the listeners of that event, so an event is routed with a single dict lookup
+    and any number of entities can listen to the same event. It also counts the events received per code.
+    """
+
+    def __init__(self) -> None:
+        self._routes: dict[tuple[str, int], EventRoute] = {}
+        self._rates: dict[str, EventRateCounter] = {}
+
+    def add_listener(
+        self, code: str, channel: int, listener: Callable[[], None]
+    ) -> Callable[[], None]:
+        """Adds a listener for the event code on the channel, returns a function that removes it"""
+        route = self._routes.get((code, channel))
+        if route is None:
+            route = EventRoute("{0}-{1}".format(code, channel))
+            self._routes[(code, channel)] = route
+        route.listeners.append(listener)
+
+        def remove() -> None:
+            if listener in route.listeners:
+                route.listeners.remove(listener)
+            if not route.listeners and self._routes.get((code, channel)) is route:
+                del self._routes[(code, channel)]
+
+        return remove
+
+    def has_listener(self, code: str, channel: int) -> bool:
+        """Returns true if something listens to the event code on the channel"""
+        return (code, channel) in self._routes
+
+    def route(self, code: str, channel: int) -> EventRoute | None:
+        """Counts the event and returns its route, or None when nothing listens to it"""
+        rate = self._rates.get(code)
+        if rate is None:
+            rate = self._rates[code] = EventRateCounter()
+        rate.add(time.monotonic())
+        return self._routes.get((code, channel))
+
+    def as_dict(self) -> dict[str, Any]:
+        """Returns the listeners and the event counts and rates per code, used by diagnostics"""
+        now = time.monotonic()
+        return {
+            "listeners": {
+                route.key: len(route.listeners) for route in self._routes.values()
+            },
+            "events": {
+                code: {"count": rate.count, "per_minute": rate.per_minute(now)}
+                for code, rate in self._rates.items()
+            },
+        }
@@ -0,0 +1,115 @@
+"""Limits the rate device events are fired on the Home Assistant event bus"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import Any
+
+# Tokens per event code, so a short burst (e.g. a motion start and stop with a few IVS events) always gets through
+DEFAULT_EVENT_BURST = 10
+
+# An event identical to the previous one of its code within this many seconds is collapsed into it
+DEFAULT_DEDUP_WINDOW_SECONDS = 1.0
+
+# Data fields that change with every event (time stamps, sequence numbers), they're ignored when comparing events
+_VOLATILE_FIELDS = frozenset(
+    {"UTC", "UTCMS", "PTS", "LocaleTime", "FrameSequence", "EventSeq", "Sequence"}
+)
+
+
+@dataclass
+class _CodeState:
+    tokens: float
+    updated: float
+    last_signature: str | None = None
+    last_time: float = 0.0
+    passed: int = 0
+    dropped: int = 0
+    collapsed: int = 0
+
+
+def _signature(event: dict[str, Any]) -> str:
+    data = event.get("data", event.get("Data"))
+    if isinstance(data, dict):
+        data = {
+            key: value for key, value in data.items() if key not in _VOLATILE_FIELDS
+        }
+    return repr(
+        (
+            event.get("action", event.get("Action")),
+            event.get("index", event.get("Index")),
+            data,
+        )
+    )
+
+
+class EventThrottle:
+    """
+    EventThrottle decides which events are fired on the HA event bus. With codes=[All] or busy IVS rules cameras send
+    VideoMotionInfo, IntelliFrame, MDResult and the like many times a second, and each event on the bus is handled by
+    the event loop and written by the recorder.
+
+    Each event code has a token bucket of burst tokens refilled at rate per second, an event without a token is
+    dropped. An event identical to the previous one of its code (ignoring time stamps) within dedup_window seconds is
+    collapsed. A rate of 0 disables the throttle.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int = DEFAULT_EVENT_BURST,
+        dedup_window: float = DEFAULT_DEDUP_WINDOW_SECONDS,
+    ) -> None:
+        self._rate = rate
+        self._burst = burst
+        self._dedup_window = dedup_window
+        self._codes: dict[str, _CodeState] = {}
+
+    def allow(self, code: str, event: dict[str, Any]) -> bool:
+        """Returns true if the event should be fired, counts it as passed, dropped or collapsed otherwise"""
+        now = time.monotonic()
+        state = self._codes.get(code)
+        if state is None:
+            state = self._codes[code] = _CodeState(float(self._burst), now)
+        if self._rate <= 0:
+            state.passed += 1
+            return True
+
+        signature = _signature(event)
+        if (
+            signature == state.last_signature
+            and now - state.last_time < self._dedup_window
+        ):
+            state.collapsed += 1
+            return False
+
+        state.tokens = min(
+            float(self._burst), state.tokens + (now - state.updated) * self._rate
+        )
+        state.updated = now
+        if state.tokens < 1:
+            state.dropped += 1
+            return False
+
+        state.tokens -= 1
+        state.last_signature = signature
+        state.last_time = now
+        state.passed += 1
+        return True
+
+    def as_dict(self) -> dict[str, Any]:
+        """Returns the settings and the passed, dropped and collapsed events per code, used by diagnostics"""
+        return {
+            "rate": self._rate,
+            "burst": self._burst,
+            "dedup_window_seconds": self._dedup_window,
+            "events": {
+                code: {
+                    "passed": state.passed,
+                    "dropped": state.dropped,
+                    "collapsed": state.collapsed,
+                }
+                for code, state in self._codes.items()
+            },
+        }
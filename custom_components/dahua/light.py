@@ -113,7 +113,7 @@ class DahuaInfraredLight(DahuaBaseEntity, LightEntity):
         await self._coordinator.client.async_set_lighting_v1(
             channel, True, dahua_brightness
         )
-        await self.coordinator.async_refresh()
+        await self.coordinator.async_request_refresh()
 
     @dahua_command
     async def async_turn_off(self, **kwargs: Any) -> None:
@@ -126,7 +126,7 @@ class DahuaInfraredLight(DahuaBaseEntity, LightEntity):
         await self._coordinator.client.async_set_lighting_v1(
             channel, False, dahua_brightness
         )
-        await self.coordinator.async_refresh()
+        await self.coordinator.async_request_refresh()
 
 
 class DahuaIlluminator(DahuaBaseEntity, LightEntity):
@@ -186,7 +186,7 @@ class DahuaIlluminator(DahuaBaseEntity, LightEntity):
         await self._coordinator.client.async_set_lighting_v2(
             channel, True, dahua_brightness, profile_mode
         )
-        await self._coordinator.async_refresh()
+        await self._coordinator.async_request_refresh()
 
     @dahua_command
     async def async_turn_off(self, **kwargs: Any) -> None:
@@ -200,7 +200,7 @@ class DahuaIlluminator(DahuaBaseEntity, LightEntity):
         await self._coordinator.client.async_set_lighting_v2(
             channel, False, dahua_brightness, profile_mode
         )
-        await self._coordinator.async_refresh()
+        await self._coordinator.async_request_refresh()
 
 
 class AmcrestRingLight(DahuaBaseEntity, LightEntity):
@@ -232,13 +232,13 @@ class AmcrestRingLight(DahuaBaseEntity, LightEntity):
     async def async_turn_on(self, **kwargs: Any) -> None:
         """Turn the light on"""
         await self._coordinator.client.async_set_light_global_enabled(True)
-        await self._coordinator.async_refresh()
+        await self._coordinator.async_request_refresh()
 
     @dahua_command
     async def async_turn_off(self, **kwargs: Any) -> None:
         """Turn the light off"""
         await self._coordinator.client.async_set_light_global_enabled(False)
-        await self._coordinator.async_refresh()
+        await self._coordinator.async_request_refresh()
 
     @property
     def color_mode(self) -> ColorMode | None:
@@ -311,14 +311,14 @@ class FloodLight(DahuaBaseEntity, LightEntity):
             await self._coordinator.client.async_set_coaxial_control_state(
                 channel, SECURITY_LIGHT_TYPE, True
             )
-            await self._coordinator.async_refresh()
+            await self._coordinator.async_request_refresh()
         else:
             channel = self._coordinator.get_channel()
             profile_mode = self._coordinator.get_profile_mode()
             await self._coordinator.client.async_set_lighting_v2_for_flood_lights(
                 channel, True, profile_mode
             )
-            await self._coordinator.async_refresh()
+            await self._coordinator.async_request_refresh()
 
     @dahua_command
     async def async_turn_off(self, **kwargs: Any) -> None:
@@ -331,14 +331,14 @@ class FloodLight(DahuaBaseEntity, LightEntity):
             await self._coordinator.client.async_set_floodlightmode(
                 self._coordinator._floodlight_mode
             )
-            await self._coordinator.async_refresh()
+            await self._coordinator.async_request_refresh()
         else:
             channel = self._coordinator.get_channel()
             profile_mode = self._coordinator.get_profile_mode()
             await self._coordinator.client.async_set_lighting_v2_for_flood_lights(
                 channel, False, profile_mode
             )
-            await self._coordinator.async_refresh()
+            await self._coordinator.async_request_refresh()
 
 
 class DahuaSecurityLight(DahuaBaseEntity, LightEntity):
@@ -380,7 +380,7 @@ class DahuaSecurityLight(DahuaBaseEntity, LightEntity):
         await self._coordinator.client.async_set_coaxial_control_state(
             channel, SECURITY_LIGHT_TYPE, True
         )
-        await self._coordinator.async_refresh()
+        await self._coordinator.async_request_refresh()
 
     @dahua_command
     async def async_turn_off(self, **kwargs: Any) -> None:
@@ -389,7 +389,7 @@ class DahuaSecurityLight(DahuaBaseEntity, LightEntity):
         await self._coordinator.client.async_set_coaxial_control_state(
             channel, SECURITY_LIGHT_TYPE, False
         )
-        await self._coordinator.async_refresh()
+        await self._coordinator.async_request_refresh()
 
     @property
     def color_mode(self) -> ColorMode | None:
@@ -0,0 +1,72 @@
+"""Logging for the event hot paths, where every message from the device would otherwise be formatted and logged"""
+
+from __future__ import annotations
+
+import logging
+from typing import Any
+
+# Payloads (raw bytes, parsed events) are cut to this many characters in the log
+MAX_LOG_PAYLOAD_CHARS = 500
+
+
+class Truncated:
+    """Formats a payload for the log no longer than max_chars. The payload is only formatted if the record is emitted"""
+
+    __slots__ = ("_payload", "_max_chars")
+
+    def __init__(self, payload: Any, max_chars: int = MAX_LOG_PAYLOAD_CHARS) -> None:
+        self._payload = payload
+        self._max_chars = max_chars
+
+    def __str__(self) -> str:
+        payload = self._payload
+        if isinstance(payload, (bytes, bytearray)):
+            if len(payload) <= self._max_chars:
+                return repr(bytes(payload))
+            return "{0}... ({1} bytes)".format(
+                repr(bytes(payload[: self._max_chars])), len(payload)
+            )
+        if isinstance(payload, str):
+            if len(payload) <= self._max_chars:
+                return payload
+            return "{0}... ({1} chars)".format(payload[: self._max_chars], len(payload))
+        text = repr(payload)
+        if len(text) <= self._max_chars:
+            return text
+        return "{0}... ({1} chars)".format(text[: self._max_chars], len(text))
+
+    __repr__ = __str__
+
+
+class HotPathLogger:
+    """
+    HotPathLogger logs messages that come with every event or packet from a device. Nothing is done unless the logger
+    is enabled for the level, the payload arguments are truncated (see Truncated) and with sample_every > 1 only every
+    nth message is logged, so debug logging a busy camera doesn't flood the log.
+    """
+
+    def __init__(self, logger: logging.Logger, sample_every: int = 1) -> None:
+        self._logger = logger
+        self._sample_every = max(sample_every, 1)
+        self._count = 0
+
+    def debug(self, msg: str, *args: Any) -> None:
+        """Logs msg with the args truncated at debug level"""
+        if self._logger.isEnabledFor(logging.DEBUG):
+            self._log(logging.DEBUG, msg, args)
+
+    def info(self, msg: str, *args: Any) -> None:
+        """Logs msg with the args truncated at info level"""
+        if self._logger.isEnabledFor(logging.INFO):
+            self._log(logging.INFO, msg, args)
+
+    def _log(self, level: int, msg: str, args: tuple[Any, ...]) -> None:
+        self._count += 1
+        if self._sample_every > 1:
+            if self._count % self._sample_every != 1:
+                return
+            msg += " (1 in {0} logged, {1} so far)".format(
+                self._sample_every, self._count
+            )
+        # stacklevel points the record at the caller of debug/info instead of this module
+        self._logger.log(level, msg, *(Truncated(arg) for arg in args), stacklevel=3)
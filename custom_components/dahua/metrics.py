@@ -0,0 +1,39 @@
+"""Small in-memory metrics used for diagnostics"""
+
+from __future__ import annotations
+
+import math
+from collections import deque
+from typing import Any
+
+
+class LatencyStats:
+    """
+    LatencyStats keeps the most recent latency samples (in seconds) and reports count and percentiles in
+    milliseconds. Only the last max_samples are kept so memory stays bounded for long running installs.
+    """
+
+    def __init__(self, max_samples: int = 200) -> None:
+        self._samples: deque[float] = deque(maxlen=max_samples)
+        self.count = 0
+
+    def add(self, seconds: float) -> None:
+        """Records a sample"""
+        self._samples.append(seconds)
+        self.count += 1
+
+    def percentile(self, percent: float) -> float | None:
+        """Returns the given percentile (0..100) in milliseconds using nearest-rank, or None when empty"""
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+        return round(ordered[rank - 1] * 1000, 1)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Returns the stats, used by diagnostics"""
+        return {
+            "count": self.count,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+        }
@@ -0,0 +1,196 @@
+"""
+What a device model supports, looked up from its model name (deviceType) and updateSerial. The rules are declared in
+MODEL_RULES and indexed in tries, so classifying a model is a single pass over its name no matter how many rules there
+are. The model name conventions are described at https://dahuawiki.com/Template:NameConvention
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any
+
+from .models import ModelInfo
+
+# Features a rule can set, named after the ModelInfo fields. NO_INFRARED_LIGHT clears ModelInfo.infrared_light
+DOORBELL = "doorbell"
+AMCREST_DOORBELL = "amcrest_doorbell"
+EMPIRETECH_DOORBELL = "empiretech_doorbell"
+AVALOIDGOLIATH_DOORBELL = "avaloidgoliath_doorbell"
+FLOOD_LIGHT = "flood_light"
+FLOODLIGHTMODE = "floodlightmode"
+SIREN = "siren"
+SECURITY_LIGHT = "security_light"
+SPEAKER = "speaker"
+NO_INFRARED_LIGHT = "no_infrared_light"
+SMART_MOTION_DETECTION_AMCREST = "smart_motion_detection_amcrest"
+
+# How a rule's pattern is matched against the upper cased model name
+PREFIX = "prefix"
+CONTAINS = "contains"
+EXACT = "exact"
+
+# Some firmwares report a generic deviceType (e.g. "E891AB") while the real model with the feature suffixes is in
+# updateSerial. Only the rules that set nothing but these features are applied to updateSerial
+UPDATE_SERIAL_FEATURES = frozenset({SPEAKER})
+
+
+@dataclass(frozen=True)
+class ModelRule:
+    """
+    A model name pattern and the features models matching it have. Models matching unless are excluded. known_probes
+    are capability probes (see probes.py) whose answer is already known for these models, they aren't run.
+    """
+
+    pattern: str
+    match: str
+    features: frozenset[str]
+    unless: str | None = None
+    known_probes: frozenset[str] = frozenset()
+
+
+def _rule(
+    pattern: str,
+    match: str,
+    *features: str,
+    unless: str | None = None,
+    known_probes: tuple[str, ...] = (),
+) -> ModelRule:
+    # Doorbells have speakers and no channel 0, so the snapshot_channel_0 probe can't change the channel number
+    if DOORBELL in features:
+        features += (SPEAKER,)
+        known_probes += ("snapshot_channel_0",)
+    # Sirens play through the speaker
+    if SIREN in features:
+        features += (SPEAKER,)
+    return ModelRule(
+        pattern, match, frozenset(features), unless, frozenset(known_probes)
+    )
+
+
+MODEL_RULES: tuple[ModelRule, ...] = (
+    # Doorbells (VTO)
+    _rule("VTO", PREFIX, DOORBELL),
+    _rule("DH-VTO", PREFIX, DOORBELL),
+    _rule("DHI", PREFIX, DOORBELL, unless="NVR"),
+    # Amcrest doorbells, the IMOU DB61i is identical
+    _rule("AD", PREFIX, DOORBELL, AMCREST_DOORBELL),
+    _rule("DB6", PREFIX, DOORBELL, AMCREST_DOORBELL),
+    _rule("DB2X", PREFIX, DOORBELL, EMPIRETECH_DOORBELL),
+    _rule("AV-V", PREFIX, DOORBELL, AVALOIDGOLIATH_DOORBELL),
+    # Smart motion detection on these is set through VideoAnalyseRule, they don't need the Dahua SmartMotionDetect
+    _rule(
+        "AD410",
+        EXACT,
+        SECURITY_LIGHT,
+        SMART_MOTION_DETECTION_AMCREST,
+        known_probes=("smart_motion_detection",),
+    ),
+    _rule(
+        "DB61I",
+        EXACT,
+        SECURITY_LIGHT,
+        SMART_MOTION_DETECTION_AMCREST,
+        known_probes=("smart_motion_detection",),
+    ),
+    # Flood lights
+    _rule("ASH26", PREFIX, FLOOD_LIGHT),
+    _rule("V261LC", PREFIX, FLOOD_LIGHT),
+    _rule("L26N", CONTAINS, FLOOD_LIGHT),
+    _rule("L46N", CONTAINS, FLOOD_LIGHT, FLOODLIGHTMODE, SIREN),
+    _rule("W452ASD", PREFIX, FLOOD_LIGHT, SIREN),
+    _rule("W452ASD", CONTAINS, FLOODLIGHTMODE),
+    # Active deterrence, the IPC-HDW3849HP-AS-PV has a siren and the red/blue light but no infrared light
+    _rule("-AS-PV", CONTAINS, SIREN, SECURITY_LIGHT, NO_INFRARED_LIGHT),
+    # Addressed issue https://github.com/brianegge/dahua/pull/405
+    _rule("IP8M-2796E", PREFIX, SECURITY_LIGHT),
+    _rule("-AS-NI", CONTAINS, NO_INFRARED_LIGHT),
+    # IPC-HFW2439SP-SA-LED-S2 also has no infrared light
+    _rule("LED-S2", CONTAINS, NO_INFRARED_LIGHT),
+    # -AS = Audio Speaker (also catches -ASE = Audio Speaker + Event I/O), -PV = Active Visual deterrence
+    _rule("-AS", CONTAINS, SPEAKER),
+    _rule("-PV", CONTAINS, SPEAKER),
+)
+
+# The rules that end at a trie node are stored under this key
+_RULES = ""
+
+
+class ModelCapabilityDatabase:
+    """Indexes model rules so all rules matching a model are found in one pass over the model name"""
+
+    def __init__(self, rules: tuple[ModelRule, ...]) -> None:
+        self._prefix_trie: dict[str, Any] = {}
+        self._contains_trie: dict[str, Any] = {}
+        self._exact: dict[str, list[ModelRule]] = {}
+        for rule in rules:
+            if rule.match == EXACT:
+                self._exact.setdefault(rule.pattern, []).append(rule)
+            elif rule.match == PREFIX:
+                self._insert(self._prefix_trie, rule)
+            else:
+                self._insert(self._contains_trie, rule)
+
+    @staticmethod
+    def _insert(trie: dict[str, Any], rule: ModelRule) -> None:
+        node = trie
+        for char in rule.pattern:
+            node = node.setdefault(char, {})
+        node.setdefault(_RULES, []).append(rule)
+
+    @staticmethod
+    def _walk(trie: dict[str, Any], name: str, start: int) -> list[ModelRule]:
+        rules: list[ModelRule] = []
+        node = trie
+        for index in range(start, len(name)):
+            node = node.get(name[index])
+            if node is None:
+                break
+            rules.extend(node.get(_RULES, ()))
+        return rules
+
+    def match(self, name: str) -> list[ModelRule]:
+        """Returns the rules that match the (upper cased) name"""
+        rules = list(self._exact.get(name, ()))
+        rules.extend(self._walk(self._prefix_trie, name, 0))
+        for start in range(len(name)):
+            if name[start] in self._contains_trie:
+                rules.extend(self._walk(self._contains_trie, name, start))
+        return [
+            rule for rule in rules if rule.unless is None or rule.unless not in name
+        ]
+
+
+MODEL_CAPABILITIES = ModelCapabilityDatabase(MODEL_RULES)
+
+
+@lru_cache(maxsize=64)
+def classify_model(model: str, update_serial: str = "") -> ModelInfo:
+    """
+    Classifies a device by its model name and updateSerial, see MODEL_RULES. The result only depends on the arguments,
+    so it's cached and each model is only classified once.
+    """
+    features: set[str] = set()
+    known_probes: set[str] = set()
+    for rule in MODEL_CAPABILITIES.match(model.upper()):
+        features |= rule.features
+        known_probes |= rule.known_probes
+    if update_serial:
+        for rule in MODEL_CAPABILITIES.match(update_serial.upper()):
+            if rule.features <= UPDATE_SERIAL_FEATURES:
+                features |= rule.features
+
+    return ModelInfo(
+        doorbell=DOORBELL in features,
+        amcrest_doorbell=AMCREST_DOORBELL in features,
+        empiretech_doorbell=EMPIRETECH_DOORBELL in features,
+        avaloidgoliath_doorbell=AVALOIDGOLIATH_DOORBELL in features,
+        flood_light=FLOOD_LIGHT in features,
+        floodlightmode=FLOODLIGHTMODE in features,
+        siren=SIREN in features,
+        security_light=SECURITY_LIGHT in features,
+        speaker=SPEAKER in features,
+        infrared_light=NO_INFRARED_LIGHT not in features,
+        smart_motion_detection_amcrest=SMART_MOTION_DETECTION_AMCREST in features,
+        known_probes=frozenset(known_probes),
+    )
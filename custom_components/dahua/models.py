@@ -12,3 +12,48 @@ class CoaxialControlIOStatus:
         if api_response is not None:
             self.speaker = api_response["params"]["status"]["Speaker"] == "On"
             self.white_light = api_response["params"]["status"]["WhiteLight"] == "On"
+
+
+@dataclass(frozen=True)
+class ModelInfo:
+    """What the model name (deviceType) and updateSerial tell about a device, see model_capabilities.classify_model"""
+
+    doorbell: bool = False
+    amcrest_doorbell: bool = False
+    empiretech_doorbell: bool = False
+    avaloidgoliath_doorbell: bool = False
+    flood_light: bool = False
+    floodlightmode: bool = False
+    siren: bool = False
+    security_light: bool = False
+    speaker: bool = False
+    # False for models known to have no infrared light, the device also has to support the Lighting config
+    infrared_light: bool = True
+    smart_motion_detection_amcrest: bool = False
+    # Capability probes (see probes.py) whose answer is known from the model, they aren't run
+    known_probes: frozenset[str] = frozenset()
+
+
+@dataclass(frozen=True)
+class DahuaState:
+    """
+    The entity state derived from the coordinator data. It's built once per coordinator update so entities read
+    precomputed fields instead of looking up and converting config values on every state write.
+    """
+
+    motion_detection_enabled: bool = False
+    disarming_linkage_enabled: bool = False
+    event_notifications_enabled: bool = False
+    smart_motion_detection_enabled: bool = False
+    siren_on: bool = False
+    infrared_light_on: bool = False
+    infrared_brightness: int = 0
+    illuminator_on: bool = False
+    illuminator_brightness: int = 0
+    flood_light_on: bool = False
+    ring_light_on: bool = False
+    security_light_on: bool = False
+    supports_illuminator: bool = False
+    supports_ptz_position: bool = False
+    zoom: float = 0
+    focus: float = 0
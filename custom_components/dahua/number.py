@@ -35,7 +35,7 @@ class DahuaCameraZoomNumber(DahuaBaseEntity, NumberEntity):
     async def async_set_native_value(self, value: float) -> None:
         """Turn off/disable motion detection."""
         await self._coordinator.client.async_set_zoom_v1(value)
-        await self._coordinator.async_refresh()
+        await self._coordinator.async_request_refresh()
 
     @property
     def name(self):
@@ -80,7 +80,7 @@ class DahuaCameraFocusNumber(DahuaBaseEntity, NumberEntity):
     async def async_set_native_value(self, value: float) -> None:
         """Turn off/disable motion detection."""
         await self._coordinator.client.async_set_focus_v1(value)
-        await self._coordinator.async_refresh()
+        await self._coordinator.async_request_refresh()
 
     @property
     def name(self):
@@ -121,4 +121,4 @@ class DahuaCameraFocusNumber(DahuaBaseEntity, NumberEntity):
     async def async_auto_focus(self):
         """Handles the service call from SERVICE_SET_INFRARED_MODE to set zoom and focus"""
         await self._coordinator.client.async_auto_focus_v1()
-        await self._coordinator.async_refresh()
+        await self._coordinator.async_request_refresh()
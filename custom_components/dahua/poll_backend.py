@@ -0,0 +1,186 @@
+"""
+Poll backends fetch the configs the coordinator reads on every poll. CgiPollBackend uses configManager.cgi, the way
+the integration always has, Rpc2PollBackend uses one RPC2 session with the calls batched in system.multicall. Both
+return the configs in the flat form parse_dahua_api_response gives, e.g. {"table.Lighting[0][0].Mode": "Auto"}, so
+nothing downstream knows which one was used. A config missing from what they return is fetched on its own by the
+coordinator.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+from typing import TYPE_CHECKING, Any
+
+from aiohttp import ClientError
+
+from .metrics import LatencyStats
+
+if TYPE_CHECKING:
+    from .client import DahuaClient
+    from .rpc2 import DahuaRpc2Client
+
+_LOGGER: logging.Logger = logging.getLogger(__package__)
+
+# After this many polls in a row failed over RPC2 the device is polled over CGI until the integration reloads
+MAX_RPC2_FAILURES = 3
+
+# A poll over RPC2 that raises one of these failed. KeyError, TypeError and ValueError come from a response without
+# the fields expected, e.g. "params": null
+_RPC2_POLL_ERRORS = (
+    ClientError,
+    ConnectionError,
+    KeyError,
+    TimeoutError,
+    TypeError,
+    ValueError,
+)
+
+# The config name without the index and field selectors, Lighting[0][1] and VideoAnalyseRule[0][0].Enable are read
+# as Lighting and VideoAnalyseRule over RPC2
+_SELECTOR = re.compile(r"[\[.]")
+
+
+def flatten_config(name: str, table: Any) -> dict[str, str]:
+    """
+    Flattens the table of an RPC2 configManager.getConfig response into the keys and values the CGI API returns for
+    the same config, e.g. {"table.MotionDetect[0].Enable": "true"}
+    """
+    flat: dict[str, str] = {}
+
+    def walk(key: str, value: Any) -> None:
+        if isinstance(value, dict):
+            for field, item in value.items():
+                walk("{0}.{1}".format(key, field), item)
+        elif isinstance(value, list):
+            for index, item in enumerate(value):
+                walk("{0}[{1}]".format(key, index), item)
+        elif isinstance(value, bool):
+            flat[key] = "true" if value else "false"
+        elif value is None:
+            flat[key] = ""
+        else:
+            flat[key] = str(value)
+
+    walk("table." + name, table)
+    return flat
+
+
+def select_config(flat: dict[str, str], name: str) -> dict[str, str]:
+    """Returns the keys of flat that belong to the config name, e.g. table.Lighting[0][0].Mode for Lighting[0][0]"""
+    prefix = "table." + name
+    return {
+        key: value
+        for key, value in flat.items()
+        if key.startswith(prefix)
+        and key[len(prefix) : len(prefix) + 1] in ("", ".", "[")
+    }
+
+
+class CgiPollBackend:
+    """Gets the configs with one configManager.cgi request when the firmware supports it, see async_get_config_batch"""
+
+    name = "cgi"
+
+    def __init__(self, client: DahuaClient) -> None:
+        self._client = client
+
+    async def async_get_configs(self, names: list[str]) -> dict[str, Any] | None:
+        """
+        Returns the configs with the given names, or None when they have to be fetched one at a time with the
+        client's getters. Configs missing from the result have to be fetched one at a time too
+        """
+        if len(names) < 2:
+            return None
+        return await self._client.async_get_config_batch(names)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Returns the backend in use, used by diagnostics"""
+        return {"backend": self.name}
+
+
+class Rpc2PollBackend:
+    """
+    Rpc2PollBackend gets all the configs of a poll with a single system.multicall request over the RPC2 session. When
+    a poll fails over RPC2 it is done over CGI with fallback, and after MAX_RPC2_FAILURES failed polls in a row RPC2 is
+    no longer used. A config the device doesn't have is left out.
+    """
+
+    name = "rpc2"
+
+    def __init__(self, rpc2_client: DahuaRpc2Client, fallback: CgiPollBackend) -> None:
+        self._rpc2_client = rpc2_client
+        self._fallback = fallback
+        self._failures = 0
+        self.enabled = True
+        self.polls = 0
+        self.fallbacks = 0
+        self._latency = LatencyStats()
+
+    async def async_get_configs(self, names: list[str]) -> dict[str, Any] | None:
+        """Returns the configs with the given names, from the CGI fallback if RPC2 fails"""
+        if not self.enabled:
+            return await self._fallback.async_get_configs(names)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        try:
+            # Each RPC2 request times out on its own, from when it got its request slot
+            data = await self._async_get_configs(names)
+        except _RPC2_POLL_ERRORS as exception:
+            self._failed(exception)
+            return await self._fallback.async_get_configs(names)
+        self._failures = 0
+        self.polls += 1
+        self._latency.add(loop.time() - start)
+        return data
+
+    async def _async_get_configs(self, names: list[str]) -> dict[str, Any]:
+        base_names = list(
+            dict.fromkeys(_SELECTOR.split(name, maxsplit=1)[0] for name in names)
+        )
+        # All the names are known up front, so they're sent right away instead of waiting in the client's call queue
+        responses = await self._rpc2_client.multicall(
+            [("configManager.getConfig", {"name": base}) for base in base_names]
+        )
+        flat: dict[str, str] = {}
+        for base, response in zip(base_names, responses):
+            if response.get("result") is False:
+                # The device rejected this call only, it doesn't have the config
+                continue
+            flat.update(flatten_config(base, response["params"]["table"]))
+        if not flat:
+            raise ConnectionError("No configs returned for {0}".format(names))
+
+        data: dict[str, Any] = {}
+        for name in names:
+            data.update(select_config(flat, name))
+        return data
+
+    def _failed(self, exception: BaseException) -> None:
+        self._failures += 1
+        self.fallbacks += 1
+        if self._failures < MAX_RPC2_FAILURES:
+            _LOGGER.debug("RPC2 poll failed, polling over CGI: %s", exception)
+            return
+        _LOGGER.warning(
+            "RPC2 poll failed %s times in a row (%s), polling over CGI from now on",
+            self._failures,
+            exception,
+        )
+        self.enabled = False
+
+    def as_dict(self) -> dict[str, Any]:
+        """Returns the backend in use, the poll counts and latency and the RPC2 request counts, used by diagnostics"""
+        client = self._rpc2_client
+        return {
+            "backend": self.name if self.enabled else self._fallback.name,
+            "polls": self.polls,
+            "fallbacks": self.fallbacks,
+            "latency": self._latency.as_dict(),
+            "calls": client.calls,
+            "requests": client.requests,
+            "multicalls": client.multicalls,
+            "keep_alives": client.keep_alives,
+            "logins": client.logins,
+        }
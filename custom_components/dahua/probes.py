@@ -0,0 +1,244 @@
+"""
+Capability probes run once when the coordinator initializes. Each probe calls a device API and records whether the
+device supports it on the coordinator. Probes are declared in CAPABILITY_PROBES and run concurrently, see
+async_run_probes.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+
+from aiohttp import ClientError, ClientResponseError
+
+from .request_scheduler import slot_acquired
+
+if TYPE_CHECKING:
+    from . import DahuaDataUpdateCoordinator
+
+_LOGGER: logging.Logger = logging.getLogger(__package__)
+
+# How many probes can be in flight at once. The web servers on these devices are slow, so don't flood them
+PROBE_CONCURRENCY = 4
+
+# A probe whose device doesn't answer within this time, counted from when its request got a request scheduler slot,
+# times out so a half-dead device can't hold up startup. A timed out probe is unknown rather than unsupported: the
+# attribute keeps its default and the results aren't stored, so the probe runs again on the next start
+PROBE_TIMEOUT_SECONDS = 10
+
+# How long a probe can wait for its first request scheduler slot. The slots are shared with the other entries of the
+# device, so this is long enough for their requests to finish or time out
+PROBE_QUEUE_TIMEOUT_SECONDS = 60
+
+
+def _supported(coordinator: DahuaDataUpdateCoordinator, result: Any) -> Any:
+    return True
+
+
+def _unsupported(coordinator: DahuaDataUpdateCoordinator) -> Any:
+    return False
+
+
+def _always(coordinator: DahuaDataUpdateCoordinator) -> bool:
+    return True
+
+
+@dataclass(frozen=True)
+class CapabilityProbe:
+    """
+    A single capability probe. probe calls the device, on success the coordinator attribute is set to
+    supported(coordinator, result), if probe raises one of errors it is set to unsupported(coordinator). If it times out
+    the attribute is left alone. Any other error fails the initialization. Probes only run when condition(coordinator) is True. Probes in a later
+    stage run after every probe in the earlier stages finished, for probes that depend on an earlier result.
+    Results of persist probes are saved across restarts (see capability_store.py), the others run on every start.
+    """
+
+    name: str
+    attribute: str
+    probe: Callable[[DahuaDataUpdateCoordinator], Awaitable[Any]]
+    supported: Callable[[DahuaDataUpdateCoordinator, Any], Any] = _supported
+    unsupported: Callable[[DahuaDataUpdateCoordinator], Any] = _unsupported
+    errors: tuple[type[BaseException], ...] = (ClientError,)
+    condition: Callable[[DahuaDataUpdateCoordinator], bool] = _always
+    stage: int = 0
+    persist: bool = True
+
+
+CAPABILITY_PROBES: tuple[CapabilityProbe, ...] = (
+    # If able to take a snapshot with index 0 then most likely this cams channel needs to be reset
+    # but check if unit is not a doorbell first as channel 0 doesnt exist for VTOs
+    CapabilityProbe(
+        "snapshot_channel_0",
+        "_channel_number",
+        lambda c: c.client.async_get_snapshot(0),
+        supported=lambda c, _: c._channel_number if c.is_doorbell() else c._channel,
+        unsupported=lambda c: c._channel_number,
+    ),
+    CapabilityProbe(
+        "coaxial_control",
+        "_supports_coaxial_control",
+        lambda c: c.client.async_get_coaxial_control_io_status(),
+        errors=(ClientResponseError,),
+    ),
+    CapabilityProbe(
+        "disarming_linkage",
+        "_supports_disarming_linkage",
+        lambda c: c.client.async_get_disarming_linkage(),
+    ),
+    CapabilityProbe(
+        "event_notifications",
+        "_supports_event_notifications",
+        lambda c: c.client.async_get_event_notifications(),
+    ),
+    CapabilityProbe(
+        "ptz_position",
+        "_supports_ptz_position",
+        lambda c: c.client.async_get_ptz_position(),
+    ),
+    # Smart motion detection is enabled/disabled/fetched differently on Dahua devices compared to Amcrest
+    # This is the Dahua one
+    CapabilityProbe(
+        "smart_motion_detection",
+        "_supports_smart_motion_detection",
+        lambda c: c.client.async_get_smart_motion_detection(),
+    ),
+    CapabilityProbe(
+        "lighting",
+        "_supports_lighting",
+        lambda c: c.client.async_get_config_lighting(c._channel, c._profile_mode),
+    ),
+    CapabilityProbe(
+        "lighting_v2",
+        "_supports_lighting_v2",
+        lambda c: c.client.async_get_lighting_v2(),
+    ),
+    CapabilityProbe(
+        "zoom_focus",
+        "_supports_zoom_focus",
+        lambda c: c.client.async_get_zoomfocus_v1(),
+    ),
+    # Some cams don't support profile modes, check and see... use 2 to check
+    # We'll get back an error like this if it doesn't work:
+    # Error: Error -1 getting param in name=Lighting[0][1]
+    # Otherwise we'll get multiple lines of config back
+    CapabilityProbe(
+        "profile_mode",
+        "_supports_profile_mode",
+        lambda c: c.client.async_get_config("Lighting[0][2]"),
+        supported=lambda c, conf: len(conf) > 1,
+        condition=lambda c: not c.is_doorbell(),
+    ),
+    # audio.cgi is only checked on cameras with speakers. It needs the channel number from the snapshot probe
+    CapabilityProbe(
+        "audio_cgi",
+        "_supports_audio_cgi",
+        lambda c: c.client.async_get_audio_input(c._channel_number),
+        condition=lambda c: c.supports_speaker(),
+        stage=1,
+    ),
+    # Polling over RPC2 needs the JSON-RPC login and system.multicall, which older firmware doesn't have
+    CapabilityProbe(
+        "rpc2",
+        "_supports_rpc2",
+        lambda c: c._rpc2_client.multicall(
+            [
+                ("configManager.getConfig", {"name": "General"}),
+                ("global.getCurrentTime", None),
+            ]
+        ),
+        supported=lambda c, responses: all(
+            response.get("result") is not False for response in responses
+        ),
+        errors=(ClientError, ConnectionError, KeyError, TypeError, ValueError),
+    ),
+    # Audio encoding must be enabled for RTSP backchannel speaker playback. This is a setting the user can change, not
+    # a capability, so it isn't persisted
+    CapabilityProbe(
+        "audio_encoding",
+        "_audio_encoding_enabled",
+        lambda c: c.client.async_get_audio_encode_enabled(c._channel),
+        supported=lambda c, enabled: enabled,
+        unsupported=lambda c: None,
+        errors=(Exception,),
+        condition=lambda c: c.supports_speaker(),
+        stage=1,
+        persist=False,
+    ),
+)
+
+
+async def async_run_probes(
+    coordinator: DahuaDataUpdateCoordinator,
+    probes: tuple[CapabilityProbe, ...] = CAPABILITY_PROBES,
+) -> dict[str, dict[str, Any]]:
+    """
+    Runs the probes against the coordinator's device, at most PROBE_CONCURRENCY at a time, and sets the results on
+    the coordinator. Probes that are known for the device's model are skipped. Returns the outcome and duration of
+    each probe, which is shown in the diagnostics.
+    """
+    semaphore = asyncio.Semaphore(PROBE_CONCURRENCY)
+    results: dict[str, dict[str, Any]] = {}
+
+    async def run(probe: CapabilityProbe) -> tuple[CapabilityProbe, Any]:
+        async with semaphore:
+            loop = asyncio.get_running_loop()
+            start = time.monotonic()
+            outcome = "supported"
+            try:
+                async with asyncio.timeout(PROBE_QUEUE_TIMEOUT_SECONDS) as timeout:
+                    started = False
+
+                    def start_timeout() -> None:
+                        # Only the wait for the first slot is excluded, the probe's requests share the timeout
+                        nonlocal started
+                        if not started:
+                            started = True
+                            timeout.reschedule(loop.time() + PROBE_TIMEOUT_SECONDS)
+
+                    # run is its own task (see gather below), so this only applies to this probe's requests
+                    slot_acquired.set(start_timeout)
+                    value = probe.supported(coordinator, await probe.probe(coordinator))
+            except TimeoutError:
+                outcome = "timeout"
+                value = getattr(coordinator, probe.attribute)
+            except probe.errors:
+                outcome = "unsupported"
+                value = probe.unsupported(coordinator)
+            results[probe.name] = {
+                "result": outcome,
+                "duration_ms": round((time.monotonic() - start) * 1000, 1),
+            }
+            _LOGGER.debug(
+                "Probe %s for %s: %s=%s (%s) in %s ms",
+                probe.name,
+                coordinator.get_address(),
+                probe.attribute,
+                value,
+                outcome,
+                results[probe.name]["duration_ms"],
+            )
+            return probe, value
+
+    # Probes whose answer is known for this model (see model_capabilities.py) keep the attribute's default
+    known_probes = coordinator.model_info.known_probes
+    for probe in probes:
+        if probe.name in known_probes:
+            results[probe.name] = {"result": "known", "duration_ms": 0.0}
+
+    for stage in sorted({probe.stage for probe in probes}):
+        stage_probes = [
+            probe
+            for probe in probes
+            if probe.stage == stage
+            and probe.name not in known_probes
+            and probe.condition(coordinator)
+        ]
+        # Apply the results once the whole stage is done so probes in a stage all see the same coordinator state
+        for probe, value in await asyncio.gather(*(run(p) for p in stage_probes)):
+            setattr(coordinator, probe.attribute, value)
+
+    return results
@@ -0,0 +1,106 @@
+"""
+Decides which parts of the device state to refresh on each poll. Every part (key) has its own interval: state that
+keeps changing, like the PTZ position, is read often while config that is rarely touched, like DisableLinkage, backs
+off to minutes as long as it doesn't change.
+"""
+
+from __future__ import annotations
+
+import time
+from collections.abc import Iterable
+from typing import Any
+
+# The keys, named after the config (configManager.cgi getConfig name) or status they read
+KEY_MOTION_DETECT = "MotionDetect"
+KEY_LIGHTING = "Lighting"
+KEY_LIGHTING_V2 = "Lighting_V2"
+KEY_DISARMING_LINKAGE = "DisableLinkage"
+KEY_EVENT_NOTIFICATIONS = "DisableEventNotify"
+KEY_SMART_MOTION_DETECTION = "SmartMotionDetect"
+KEY_VIDEO_ANALYSE_RULE = "VideoAnalyseRule"
+KEY_LIGHT_GLOBAL = "LightGlobal"
+KEY_VIDEO_IN_MODE = "VideoInMode"
+KEY_PTZ = "ptz"
+KEY_COAXIAL_CONTROL = "coaxial"
+KEY_ZOOM_FOCUS = "zoomfocus"
+
+# How often the coordinator wakes up to look for keys that are due. This is the shortest interval of any key
+TICK_SECONDS = 10
+
+# How long after a write the state it changed is read back from the device. Writes that come in quick succession
+# (a brightness slider, several switches toggled together) share a single read back
+WRITE_REFRESH_DELAY_SECONDS = 2
+
+# (min, max) refresh interval in seconds. A key is refreshed at its min interval, every refresh that comes back
+# unchanged doubles the interval until it reaches max. A change, a write or event activity resets it to min.
+VOLATILE = (10, 30)
+NORMAL = (30, 120)
+SLOW = (60, 600)
+
+REFRESH_POLICIES: dict[str, tuple[int, int]] = {
+    KEY_PTZ: VOLATILE,
+    KEY_COAXIAL_CONTROL: VOLATILE,
+    KEY_ZOOM_FOCUS: NORMAL,
+    KEY_VIDEO_IN_MODE: NORMAL,
+    KEY_MOTION_DETECT: NORMAL,
+    KEY_LIGHTING: NORMAL,
+    KEY_LIGHTING_V2: NORMAL,
+    KEY_LIGHT_GLOBAL: NORMAL,
+    KEY_DISARMING_LINKAGE: SLOW,
+    KEY_EVENT_NOTIFICATIONS: SLOW,
+    KEY_SMART_MOTION_DETECTION: SLOW,
+    KEY_VIDEO_ANALYSE_RULE: SLOW,
+}
+
+# Keys that event stream activity can change (alarms trigger the siren/white light, PTZ tours move the camera)
+VOLATILE_KEYS = (KEY_PTZ, KEY_COAXIAL_CONTROL)
+
+
+class RefreshScheduler:
+    """Tracks when each key is due and adapts its interval to how often its value changes"""
+
+    def __init__(self, policies: dict[str, tuple[int, int]] = REFRESH_POLICIES) -> None:
+        self._policies = policies
+        self._interval: dict[str, float] = {}
+        self._next_refresh: dict[str, float] = {}
+        self._last_value: dict[str, Any] = {}
+
+    def _policy(self, key: str) -> tuple[int, int]:
+        return self._policies.get(key, NORMAL)
+
+    def is_due(self, key: str) -> bool:
+        """Returns True if the key should be refreshed now. Keys that were never refreshed are always due"""
+        return time.monotonic() >= self._next_refresh.get(key, 0)
+
+    def record(self, key: str, value: Any) -> None:
+        """Records a refreshed value and schedules the next refresh of the key"""
+        min_interval, max_interval = self._policy(key)
+        interval = self._interval.get(key, min_interval)
+        if key in self._last_value and self._last_value[key] == value:
+            interval = min(interval * 2, max_interval)
+        else:
+            interval = min_interval
+        self._last_value[key] = value
+        self._interval[key] = interval
+        self._next_refresh[key] = time.monotonic() + interval
+
+    def invalidate(self, keys: Iterable[str]) -> None:
+        """Makes the keys due right away, used after a write to the device changed them"""
+        for key in keys:
+            self._next_refresh[key] = 0
+            self._interval.pop(key, None)
+
+    def activity(self, keys: Iterable[str]) -> None:
+        """Goes back to the min interval for the keys, without refreshing them right away"""
+        now = time.monotonic()
+        for key in keys:
+            min_interval = self._policy(key)[0]
+            if self._interval.get(key, min_interval) > min_interval:
+                self._interval[key] = min_interval
+                self._next_refresh[key] = min(
+                    self._next_refresh.get(key, 0), now + min_interval
+                )
+
+    def as_dict(self) -> dict[str, Any]:
+        """Returns the current interval of each key, used by diagnostics"""
+        return {key: interval for key, interval in sorted(self._interval.items())}
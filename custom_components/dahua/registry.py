@@ -0,0 +1,46 @@
+"""Objects shared by the clients of the same device, kept only as long as a client uses them"""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Hashable
+from typing import Generic, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class SharedRegistry(Generic[K, V]):
+    """
+    SharedRegistry holds one value per key (usually the device's host), shared by every client of that device. NVRs
+    are set up with one config entry per channel, each with its own client, and they should share e.g. the digest
+    challenge. acquire counts the holders of a value and release drops it once the last holder let go, so nothing
+    outlives the config entries of a device (like a stale challenge after the entry was reloaded with new credentials).
+    """
+
+    def __init__(self) -> None:
+        self._values: dict[K, V] = {}
+        self._holders: dict[K, int] = {}
+
+    def acquire(self, key: K, factory: Callable[[], V]) -> V:
+        """Returns the value for the key, creating it with factory if needed. Call release when done with it"""
+        value = self._values.get(key)
+        if value is None:
+            value = self._values[key] = factory()
+        self._holders[key] = self._holders.get(key, 0) + 1
+        return value
+
+    def release(self, key: K) -> None:
+        """Releases a hold on the value for the key, the value is dropped once nothing holds it"""
+        holders = self._holders.get(key, 0) - 1
+        if holders > 0:
+            self._holders[key] = holders
+            return
+        self._holders.pop(key, None)
+        self._values.pop(key, None)
+
+    def get(self, key: K) -> V | None:
+        """Returns the value for the key without holding it, None if nothing holds it"""
+        return self._values.get(key)
+
+    def __len__(self) -> int:
+        return len(self._values)
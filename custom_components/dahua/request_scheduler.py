@@ -0,0 +1,196 @@
+"""Limits and orders the HTTP requests made to a device"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import Counter
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from itertools import count
+from typing import Any
+
+from .metrics import LatencyStats
+from .registry import SharedRegistry
+
+# Request priorities, lower goes first. Commands are what the user is waiting on, snapshots are shown on dashboards
+# and polling can always wait a bit
+PRIORITY_COMMAND = 0
+PRIORITY_SNAPSHOT = 1
+PRIORITY_POLL = 2
+
+_PRIORITY_NAMES = {
+    PRIORITY_COMMAND: "command",
+    PRIORITY_SNAPSHOT: "snapshot",
+    PRIORITY_POLL: "poll",
+}
+
+# The web servers on these devices start dropping connections with more than a few requests in flight. The event
+# stream keeps its own connection open and isn't counted
+MAX_CONCURRENT_REQUESTS = 2
+
+# The most requests in flight the max_concurrent_requests option can allow, NVRs serving many channels handle more
+# than a camera
+MAX_REQUEST_LIMIT = 8
+
+# How long a request with a timeout may wait for its slot. Its own timeout only starts once it has the slot, the
+# requests of all the channels of an NVR share the device's slots and can queue for a while
+QUEUE_TIMEOUT_SECONDS = 60
+
+# A request that has been waiting this long is moved up one priority, so a busy dashboard can't starve the polling
+AGING_SECONDS = 5.0
+
+# Called whenever a request made in the current context gets its slot, so a caller can time the request from then on
+# instead of from when it started waiting (see probes.py)
+slot_acquired: ContextVar[Callable[[], None] | None] = ContextVar(
+    "slot_acquired", default=None
+)
+
+
+@dataclass
+class _Waiter:
+    priority: int
+    order: int
+    queued_at: float
+    future: asyncio.Future[None] = field(repr=False)
+
+    def rank(self, now: float) -> tuple[float, int]:
+        return self.priority - (now - self.queued_at) // AGING_SECONDS, self.order
+
+
+class RequestScheduler:
+    """
+    RequestScheduler lets at most limit requests to a device run at once. When all slots are taken the waiting
+    requests get the next free slot by priority (see PRIORITY_*), first come first served within a priority. Requests
+    that waited AGING_SECONDS move up a priority so nothing waits forever. The clients sharing the scheduler can ask
+    for a different limit with add_limit, the largest one asked for applies.
+    """
+
+    def __init__(self, limit: int = MAX_CONCURRENT_REQUESTS) -> None:
+        self._default_limit = limit
+        self._limit = limit
+        self._limits: Counter[int] = Counter()
+        self._active = 0
+        self._waiters: list[_Waiter] = []
+        self._order = count()
+        self._wait_times = {priority: LatencyStats() for priority in _PRIORITY_NAMES}
+        self.peak_queue_depth = 0
+
+    @asynccontextmanager
+    async def slot(
+        self, priority: int, timeout: float | None = None
+    ) -> AsyncIterator[None]:
+        """
+        Waits for a free slot for a request of the given priority and holds it until the block exits. With a timeout
+        the wait for the slot is bounded by QUEUE_TIMEOUT_SECONDS and the block by timeout from when it got the slot,
+        both raise TimeoutError
+        """
+        loop = asyncio.get_running_loop()
+        async with asyncio.timeout(
+            None if timeout is None else QUEUE_TIMEOUT_SECONDS
+        ) as deadline:
+            await self._acquire(priority)
+            try:
+                if timeout is not None:
+                    deadline.reschedule(loop.time() + timeout)
+                callback = slot_acquired.get()
+                if callback is not None:
+                    callback()
+                yield
+            finally:
+                self._release()
+
+    def add_limit(self, limit: int) -> None:
+        """Asks for at most limit requests at once, until remove_limit is called with the same limit"""
+        self._limits[limit] += 1
+        self._update_limit()
+
+    def remove_limit(self, limit: int) -> None:
+        """Takes back a limit asked for with add_limit"""
+        self._limits[limit] -= 1
+        if self._limits[limit] <= 0:
+            del self._limits[limit]
+        self._update_limit()
+
+    def _update_limit(self) -> None:
+        self._limit = max(self._limits, default=self._default_limit)
+        # A raised limit starts waiting requests right away, a lowered one takes effect as requests finish
+        while self._active < self._limit and self._hand_over():
+            self._active += 1
+
+    async def _acquire(self, priority: int) -> None:
+        start = time.monotonic()
+        if self._active < self._limit and not self.queue_depth:
+            self._active += 1
+        else:
+            waiter = _Waiter(
+                priority,
+                next(self._order),
+                start,
+                asyncio.get_running_loop().create_future(),
+            )
+            self._waiters.append(waiter)
+            self.peak_queue_depth = max(self.peak_queue_depth, self.queue_depth)
+            try:
+                await waiter.future
+            except asyncio.CancelledError:
+                if waiter.future.done() and not waiter.future.cancelled():
+                    # The slot was handed over as we were cancelled, give it to the next one
+                    self._release()
+                elif waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                raise
+        self._wait_times[priority].add(time.monotonic() - start)
+
+    def _release(self) -> None:
+        # The slot goes straight to a waiter, so the number of active requests doesn't change
+        if self._active <= self._limit and self._hand_over():
+            return
+        self._active -= 1
+
+    def _hand_over(self) -> bool:
+        """Gives a slot to the waiter that goes next, returns false if nothing is waiting"""
+        now = time.monotonic()
+        while self._waiters:
+            waiter = min(self._waiters, key=lambda w: w.rank(now))
+            self._waiters.remove(waiter)
+            if not waiter.future.done():
+                waiter.future.set_result(None)
+                return True
+        return False
+
+    @property
+    def queue_depth(self) -> int:
+        """The number of requests waiting for a slot"""
+        return sum(1 for waiter in self._waiters if not waiter.future.done())
+
+    def as_dict(self) -> dict[str, Any]:
+        """Returns the in flight and queued requests and the wait time per priority, used by diagnostics"""
+        return {
+            "limit": self._limit,
+            "in_flight": self._active,
+            "queue_depth": self.queue_depth,
+            "peak_queue_depth": self.peak_queue_depth,
+            "wait": {
+                name: self._wait_times[priority].as_dict()
+                for priority, name in _PRIORITY_NAMES.items()
+            },
+        }
+
+
+_REQUEST_SCHEDULERS: SharedRegistry[str, RequestScheduler] = SharedRegistry()
+
+
+def get_request_scheduler(host: str) -> RequestScheduler:
+    """
+    Returns the shared RequestScheduler for the given host, creating it if needed. Each call holds the scheduler until
+    release_request_scheduler is called
+    """
+    return _REQUEST_SCHEDULERS.acquire(host, RequestScheduler)
+
+
+def release_request_scheduler(host: str) -> None:
+    """Releases a hold from get_request_scheduler, the scheduler is dropped when the last holder released it"""
+    _REQUEST_SCHEDULERS.release(host)
@@ -6,23 +6,90 @@ Auth taken and modified and added to, from https://gist.github.com/gxfxyz/48072a
 
 from __future__ import annotations
 
+import asyncio
 import hashlib
 import json
 import logging
 import sys
+import time
+from dataclasses import dataclass, field
 from typing import Any
 
 import aiohttp
 
-from custom_components.dahua.models import CoaxialControlIOStatus
+from .models import CoaxialControlIOStatus
+from .registry import SharedRegistry
+from .request_scheduler import (
+    PRIORITY_COMMAND,
+    PRIORITY_POLL,
+    get_request_scheduler,
+    release_request_scheduler,
+)
 
 _LOGGER: logging.Logger = logging.getLogger(__package__)
 
 if sys.version_info > (3, 0):
     unicode = str
 
+# Error code the device returns for a call made with an expired or unknown session
+INVALID_SESSION_CODE = 287637505
+
+# Calls queued within this many seconds of each other are sent in one system.multicall request
+MULTICALL_WINDOW_SECONDS = 0.01
+
+# The most calls sent in one system.multicall request, keeps the request and response bodies small
+MAX_MULTICALL_CALLS = 16
+
+# How often global.keepAlive is sent when the login response doesn't say (keepAliveInterval)
+DEFAULT_KEEP_ALIVE_SECONDS = 60
+
+# The session timeout asked for with global.keepAlive. A session not kept alive this long is logged in again
+# before the next call instead of finding out from an error response
+SESSION_TIMEOUT_SECONDS = 300
+
+# How long the device has to answer a request to /RPC2, from when the request got its slot (see request_scheduler.py)
+REQUEST_TIMEOUT_SECONDS = 20
+
+# Requests with these calls are sent ahead of the polling, the user is waiting on them
+_COMMAND_METHODS = frozenset({"configManager.setConfig"})
+
+
+def _priority(data: dict[str, Any]) -> int:
+    """Returns the request scheduler priority of the request body, a multicall by the calls it carries"""
+    calls = data.get("params") if data.get("method") == "system.multicall" else [data]
+    if any(
+        isinstance(call, dict) and call.get("method") in _COMMAND_METHODS
+        for call in calls or []
+    ):
+        return PRIORITY_COMMAND
+    return PRIORITY_POLL
+
+
+def _is_session_error(response: dict[str, Any]) -> bool:
+    """Returns true if the response is an error about the session, the call succeeds after logging in again"""
+    if response.get("result") is not False:
+        return False
+    error = response.get("error", {})
+    code = error.get("code", 0) if isinstance(error, dict) else 0
+    return code == INVALID_SESSION_CODE or "session" in str(error).lower()
+
+
+@dataclass
+class _QueuedCall:
+    method: str
+    params: Any
+    future: asyncio.Future[dict[str, Any]] = field(repr=False)
+
 
 class DahuaRpc2Client:
+    """
+    DahuaRpc2Client talks JSON-RPC to the device on /RPC2. Calls made with call (get_config, set_config) within
+    MULTICALL_WINDOW_SECONDS are queued and sent as one system.multicall request, so reading several configs costs a
+    single round trip. The session is kept alive with global.keepAlive, sent along with queued calls when it's due or
+    by async_run_keep_alive when the client is idle. The config entries of a device share one client and session, see
+    get_rpc2_client. Requests take a slot from the device's request scheduler, like the CGI requests of DahuaClient.
+    """
+
     def __init__(
         self,
         username: str,
@@ -31,6 +98,7 @@ class DahuaRpc2Client:
         port: int,
         rtsp_port: int,
         session: aiohttp.ClientSession,
+        window: float = MULTICALL_WINDOW_SECONDS,
     ) -> None:
         self._username = username
         self._password = password
@@ -39,18 +107,83 @@ class DahuaRpc2Client:
         self._session_id: str | None = None
         self._id: int = 0
         protocol = "https" if int(port) == 443 else "http"
-        self._base = "{0}://{1}:{2}".format(protocol, address, port)
+        # Built like DahuaClient's, so both get the same request scheduler for the device
+        self._base = "{0}://{1}:{2}".format(protocol, address.rstrip("/"), port)
+        self._request_scheduler = get_request_scheduler(self._base)
+        self._closed = False
+        self._window = window
+        self._queue: list[_QueuedCall] = []
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._flush_tasks: set[asyncio.Task[None]] = set()
+        self._login_lock = asyncio.Lock()
+        self._keep_alive_interval: float = DEFAULT_KEEP_ALIVE_SECONDS
+        self._keep_alive_at = 0.0
+        self._session_expires = 0.0
+        self._keep_alive_task: asyncio.Task[None] | None = None
+        self._keep_alive_holders = 0
+        self.calls = 0
+        self.requests = 0
+        self.multicalls = 0
+        self.fallbacks = 0
+        self.keep_alives = 0
+        self.logins = 0
+
+    def close(self) -> None:
+        """Stops the keep alive loop and releases the request scheduler. The client shouldn't be used afterwards"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._keep_alive_task is not None:
+            self._keep_alive_task.cancel()
+            self._keep_alive_task = None
+        self._keep_alive_holders = 0
+        release_request_scheduler(self._base)
 
     async def request(
         self,
         method: str,
-        params: dict[str, Any] | None = None,
+        params: dict[str, Any] | list[Any] | None = None,
         object_id: int | None = None,
         extra: dict[str, Any] | None = None,
         url: str | None = None,
         verify_result: bool = True,
     ) -> dict[str, Any]:
         """Make an RPC request."""
+        if not url:
+            url = "{0}/RPC2".format(self._base)
+        data = self._build(method, params, object_id, extra)
+        resp_json = await self._post(url, data)
+
+        if verify_result and resp_json.get("result") is False:
+            error_msg = resp_json.get("error", {})
+
+            if not _is_session_error(resp_json):
+                _LOGGER.error("RPC2 request failed: %s", error_msg)
+                raise ConnectionError(f"RPC2 error: {error_msg}")
+
+            _LOGGER.info("Session expired, attempting to re-login")
+            await self._relogin()
+            if not self._session_id:
+                _LOGGER.error("Failed to re-login after session expiry")
+                raise ConnectionError(f"RPC2 error: {error_msg}")
+
+            # Retry the request with the new session
+            data = self._build(method, params, object_id, extra)
+            resp_json = await self._post(url, data)
+            if resp_json.get("result") is False:
+                error_msg = resp_json.get("error", {})
+                _LOGGER.error("RPC2 request failed after re-login: %s", error_msg)
+                raise ConnectionError(f"RPC2 error: {error_msg}")
+
+        return resp_json
+
+    def _build(
+        self,
+        method: str,
+        params: Any = None,
+        object_id: int | None = None,
+        extra: dict[str, Any] | None = None,
+    ) -> dict[str, Any]:
         self._id += 1
         data: dict[str, Any] = {"method": method, "id": self._id}
         if params is not None:
@@ -61,52 +194,204 @@ class DahuaRpc2Client:
             data.update(extra)
         if self._session_id:
             data["session"] = self._session_id
-        if not url:
-            url = "{0}/RPC2".format(self._base)
+        return data
+
+    async def _post(self, url: str, data: dict[str, Any]) -> dict[str, Any]:
+        async with self._request_scheduler.slot(
+            _priority(data), REQUEST_TIMEOUT_SECONDS
+        ):
+            self.requests += 1
+            resp = await self._session.post(url, data=json.dumps(data))
+            try:
+                # content_type=None, the devices answer with text/plain or no content type at all
+                resp_json: dict[str, Any] = await resp.json(content_type=None)
+            except ValueError:
+                resp_text = await resp.text()
+                _LOGGER.error("Failed to parse RPC2 JSON response: %s", resp_text)
+                raise ConnectionError(f"Invalid JSON response: {resp_text}")
+        if not isinstance(resp_json, dict):
+            # e.g. null, which some firmware answers instead of an error
+            raise ConnectionError(f"Invalid RPC2 response: {resp_json}")
+        return resp_json
 
-        resp = await self._session.post(url, data=json.dumps(data))
-        resp_json: dict[str, Any] = json.loads(await resp.text())
+    async def call(self, method: str, params: Any = None) -> dict[str, Any]:
+        """
+        Queues the call and returns its response, like request does. Calls queued within the window are sent in one
+        system.multicall request. Raises ConnectionError if the device returns an error for the call.
+        """
+        loop = asyncio.get_running_loop()
+        queued = _QueuedCall(method, params, loop.create_future())
+        self._queue.append(queued)
+        self.calls += 1
+        if self._flush_handle is None:
+            self._flush_handle = loop.call_later(self._window, self._flush)
+        return await queued.future
+
+    def _flush(self) -> None:
+        self._flush_handle = None
+        # Calls whose caller gave up (cancelled or timed out) before they were sent are dropped
+        calls = [queued for queued in self._queue if not queued.future.done()]
+        self._queue = []
+        if not calls:
+            return
+        task = asyncio.create_task(self._async_send_calls(calls))
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    async def _async_send_calls(self, calls: list[_QueuedCall]) -> None:
+        for start in range(0, len(calls), MAX_MULTICALL_CALLS):
+            batch = calls[start : start + MAX_MULTICALL_CALLS]
+            try:
+                await self._async_send_batch(batch)
+            except Exception as exception:  # pylint: disable=broad-except
+                for queued in batch:
+                    if not queued.future.done():
+                        queued.future.set_exception(exception)
+
+    async def _async_send_batch(self, batch: list[_QueuedCall]) -> None:
+        await self._ensure_logged_in()
+        if len(batch) == 1 and not self._keep_alive_due():
+            await self._async_send_one(batch[0])
+            return
 
-        if verify_result and resp_json.get("result") is False:
-            error_msg = resp_json.get("error", {})
-            error_code = error_msg.get("code", 0)
+        calls: list[tuple[str, Any]] = [
+            (queued.method, queued.params) for queued in batch
+        ]
+        try:
+            responses = await self.multicall(calls)
+        except ConnectionError as exception:
+            # Older firmware has no system.multicall, send the calls one at a time instead
+            _LOGGER.debug(
+                "system.multicall of %s calls failed (%s), sending them one at a time",
+                len(calls),
+                exception,
+            )
+            self.fallbacks += 1
+            for queued in batch:
+                await self._async_send_one(queued)
+            return
+
+        for queued, response in zip(batch, responses):
+            if queued.future.done():
+                continue
+            if response.get("result") is False:
+                queued.future.set_exception(
+                    ConnectionError(f"RPC2 error: {response.get('error', {})}")
+                )
+            else:
+                queued.future.set_result(response)
 
-            # Check if it's a session error (code 287637505 means "Invalid session")
-            if error_code == 287637505 or "session" in str(error_msg).lower():
+    async def _async_send_one(self, queued: _QueuedCall) -> None:
+        if queued.future.done():
+            return
+        try:
+            response = await self.request(queued.method, params=queued.params)
+        except Exception as exception:  # pylint: disable=broad-except
+            if not queued.future.done():
+                queued.future.set_exception(exception)
+            return
+        if not queued.future.done():
+            queued.future.set_result(response)
+
+    async def multicall(self, calls: list[tuple[str, Any]]) -> list[dict[str, Any]]:
+        """
+        Sends the calls (method, params) in one system.multicall request and returns their responses in the same
+        order. The response of a call the device rejected has result False. Raises ConnectionError if the multicall
+        itself fails. When the session is due to be kept alive global.keepAlive is sent along.
+        """
+        await self._ensure_logged_in()
+        keep_alive = self._keep_alive_due()
+        if keep_alive:
+            calls = [*calls, self._keep_alive_call()]
+        for attempt in range(2):
+            sub_requests = [self._build(method, params) for method, params in calls]
+            response = await self._post(
+                "{0}/RPC2".format(self._base),
+                self._build("system.multicall", sub_requests),
+            )
+            by_id = {
+                result.get("id"): result
+                for result in response.get("params") or []
+                if isinstance(result, dict)
+            }
+            responses = [
+                by_id.get(
+                    sub_request["id"],
+                    {"result": False, "error": {"message": "No response"}},
+                )
+                for sub_request in sub_requests
+            ]
+            session_error = _is_session_error(response) or any(
+                _is_session_error(result) for result in responses
+            )
+            if session_error and attempt == 0:
                 _LOGGER.info("Session expired, attempting to re-login")
-                # Clear the session and try to login again
-                self._session_id = None
-                await self.login()
-
-                # Retry the request with the new session
-                if self._session_id:
-                    data["session"] = self._session_id
-                    resp = await self._session.post(url, data=json.dumps(data))
-                    resp_text = await resp.text()
-                    try:
-                        resp_json = json.loads(resp_text)
-                    except json.JSONDecodeError:
-                        _LOGGER.error(
-                            "Failed to parse JSON response after re-login: %s",
-                            resp_text,
-                        )
-                        raise ConnectionError(f"Invalid JSON response: {resp_text}")
-
-                    # Check the result again
-                    if resp_json.get("result") is False:
-                        error_msg = resp_json.get("error", {})
-                        _LOGGER.error(
-                            "RPC2 request failed after re-login: %s", error_msg
-                        )
-                        raise ConnectionError(f"RPC2 error: {error_msg}")
-                else:
-                    _LOGGER.error("Failed to re-login after session expiry")
-                    raise ConnectionError(f"RPC2 error: {error_msg}")
-            else:
-                _LOGGER.error("RPC2 request failed: %s", error_msg)
-                raise ConnectionError(f"RPC2 error: {error_msg}")
+                await self._relogin()
+                continue
+            if response.get("result") is False and not by_id:
+                raise ConnectionError(f"RPC2 error: {response.get('error', {})}")
+            break
+        self.multicalls += 1
+        if keep_alive and responses.pop().get("result") is not False:
+            self._kept_alive()
+        return responses
+
+    def _keep_alive_call(self) -> tuple[str, Any]:
+        return "global.keepAlive", {"timeout": SESSION_TIMEOUT_SECONDS, "active": True}
+
+    def _keep_alive_due(self) -> bool:
+        return self._session_id is not None and time.monotonic() >= self._keep_alive_at
+
+    def _kept_alive(self) -> None:
+        now = time.monotonic()
+        self.keep_alives += 1
+        self._keep_alive_at = now + self._keep_alive_interval
+        self._session_expires = now + SESSION_TIMEOUT_SECONDS
+
+    async def keep_alive(self) -> bool:
+        """Sends global.keepAlive, returns true if the session is still valid"""
+        method, params = self._keep_alive_call()
+        response = await self.request(method=method, params=params, verify_result=False)
+        if response.get("result") is False:
+            return False
+        self._kept_alive()
+        return True
 
-        return resp_json
+    def start_keep_alive(self) -> None:
+        """
+        Runs async_run_keep_alive until every caller of start_keep_alive called stop_keep_alive, so the session stays
+        alive as long as one of the config entries sharing the client polls over it
+        """
+        self._keep_alive_holders += 1
+        if self._keep_alive_task is None:
+            self._keep_alive_task = asyncio.create_task(self.async_run_keep_alive())
+
+    def stop_keep_alive(self) -> None:
+        """Releases a start_keep_alive, the keep alive loop stops with the last one"""
+        self._keep_alive_holders = max(self._keep_alive_holders - 1, 0)
+        if self._keep_alive_holders == 0 and self._keep_alive_task is not None:
+            self._keep_alive_task.cancel()
+            self._keep_alive_task = None
+
+    async def async_run_keep_alive(self) -> None:
+        """Keeps the session alive until cancelled, sending global.keepAlive when no queued call took it along"""
+        while True:
+            await asyncio.sleep(max(self._keep_alive_at - time.monotonic(), 1.0))
+            if not self._keep_alive_due():
+                continue
+            try:
+                if not await self.keep_alive():
+                    await self._relogin()
+            except asyncio.CancelledError:
+                raise
+            except Exception as exception:  # pylint: disable=broad-except
+                _LOGGER.debug("RPC2 keepAlive to %s failed: %s", self._base, exception)
+                # Try again after the interval instead of spinning
+                self._keep_alive_at = time.monotonic() + self._keep_alive_interval
+
+    async def _relogin(self) -> None:
+        self._session_id = None
+        await self._ensure_logged_in()
 
     async def login(self) -> dict[str, Any]:
         """Dahua RPC login.
@@ -129,9 +414,17 @@ class DahuaRpc2Client:
             method=method, params=params, url=url, verify_result=False
         )
 
+        challenge = r.get("params")
+        if (
+            not r.get("session")
+            or not isinstance(challenge, dict)
+            or not isinstance(challenge.get("realm"), str)
+            or not isinstance(challenge.get("random"), str)
+        ):
+            raise ConnectionError(f"Invalid RPC2 login challenge: {r}")
         self._session_id = r["session"]
-        realm = r["params"]["realm"]
-        random = r["params"]["random"]
+        realm = challenge["realm"]
+        random = challenge["random"]
 
         # Password encryption algorithm. Reversed from rpcCore.getAuthByType
         pwd_phrase: str | bytes = self._username + ":" + realm + ":" + self._password
@@ -151,7 +444,25 @@ class DahuaRpc2Client:
             "authorityType": "Default",
             "passwordType": "Default",
         }
-        return await self.request(method=method, params=params, url=url)
+        # verify_result=False, a failed login must not be retried by logging in again
+        response = await self.request(
+            method=method, params=params, url=url, verify_result=False
+        )
+        if response.get("result") is False:
+            error_msg = response.get("error", {})
+            _LOGGER.error("RPC2 login failed: %s", error_msg)
+            raise ConnectionError(f"RPC2 error: {error_msg}")
+
+        self.logins += 1
+        self._keep_alive_interval = float(
+            (response.get("params") or {}).get(
+                "keepAliveInterval", DEFAULT_KEEP_ALIVE_SECONDS
+            )
+        )
+        now = time.monotonic()
+        self._keep_alive_at = now + self._keep_alive_interval
+        self._session_expires = now + SESSION_TIMEOUT_SECONDS
+        return response
 
     async def logout(self) -> bool:
         """Logs out of the current session. Returns true if the logout was successful"""
@@ -177,10 +488,16 @@ class DahuaRpc2Client:
         return result
 
     async def get_config(self, params: dict[str, Any]) -> Any:
-        """Gets config for the supplied params"""
-        response = await self.request(method="configManager.getConfig", params=params)
+        """Gets config for the supplied params. Concurrent calls are sent in one system.multicall request"""
+        response = await self.call("configManager.getConfig", params)
         return response["params"]
 
+    async def set_config(self, params: dict[str, Any]) -> bool:
+        """Sets config for the supplied params. Concurrent calls are sent in one system.multicall request"""
+        response = await self.call("configManager.setConfig", params)
+        # For configManager.setConfig, success is indicated by result being True or the method completing without error
+        return response.get("result", True) is not False
+
     async def get_device_name(self) -> str:
         """Get the device name"""
         data = await self.get_config({"name": "General"})
@@ -204,7 +521,12 @@ class DahuaRpc2Client:
 
     async def _ensure_logged_in(self):
         """Ensure we have a valid session, login if needed."""
-        if not self._session_id:
+        if self._session_id and time.monotonic() < self._session_expires:
+            return
+        async with self._login_lock:
+            # Another call may have logged in while this one waited for the lock
+            if self._session_id and time.monotonic() < self._session_expires:
+                return
             await self.login()
 
     async def set_privacy_mode(self, enabled: bool) -> bool:
@@ -239,6 +561,38 @@ class DahuaRpc2Client:
             "options": [],
         }
 
-        response = await self.request(method="configManager.setConfig", params=params)
-        # For configManager.setConfig, success is indicated by result being True or the method completing without error
-        return response.get("result", True) is not False
+        return await self.set_config(params)
+
+
+# One client per device and credentials. NVR channels are set up as separate config entries, sharing the client gives
+# them one session and one keep alive loop instead of one per channel.
+_RPC2_CLIENTS: SharedRegistry[tuple[str, int, str, str], DahuaRpc2Client] = (
+    SharedRegistry()
+)
+
+
+def get_rpc2_client(
+    username: str,
+    password: str,
+    address: str,
+    port: int,
+    rtsp_port: int,
+    session: aiohttp.ClientSession,
+) -> DahuaRpc2Client:
+    """
+    Returns the shared DahuaRpc2Client for the device and credentials, creating it if needed. Each call holds the
+    client until release_rpc2_client is called
+    """
+    return _RPC2_CLIENTS.acquire(
+        (address, int(port), username, password),
+        lambda: DahuaRpc2Client(username, password, address, port, rtsp_port, session),
+    )
+
+
+def release_rpc2_client(username: str, password: str, address: str, port: int) -> None:
+    """Releases a hold from get_rpc2_client, the client is closed and dropped when the last holder released it"""
+    key = (address, int(port), username, password)
+    client = _RPC2_CLIENTS.get(key)
+    _RPC2_CLIENTS.release(key)
+    if client is not None and _RPC2_CLIENTS.get(key) is None:
+        client.close()
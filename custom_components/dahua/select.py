@@ -68,7 +68,7 @@ class DahuaDoorbellLightSelect(DahuaBaseEntity, SelectEntity):
         await self._coordinator.client.async_set_lighting_v2_for_amcrest_doorbells(
             option
         )
-        await self._coordinator.async_refresh()
+        await self._coordinator.async_request_refresh()
 
     @property
     def unique_id(self) -> str:
@@ -116,7 +116,7 @@ class DahuaCameraPresetPositionSelect(DahuaBaseEntity, SelectEntity):
             return
         channel = self._coordinator.get_channel()
         await self._coordinator.client.async_goto_preset_position(channel, int(option))
-        await self._coordinator.async_refresh()
+        await self._coordinator.async_request_refresh()
 
     @property
     def unique_id(self) -> str:
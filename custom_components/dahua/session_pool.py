@@ -0,0 +1,109 @@
+"""
+HTTP sessions shared by every config entry of the same device. An NVR is set up with one config entry per channel, they
+all talk to the same host, so they share a single connection pool instead of opening their own connections.
+"""
+
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+
+import aiohttp
+from aiohttp.hdrs import USER_AGENT
+from homeassistant.const import EVENT_HOMEASSISTANT_CLOSE
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant
+from homeassistant.helpers.aiohttp_client import SERVER_SOFTWARE, HassClientResponse
+from homeassistant.helpers.json import json_dumps
+
+from .const import DOMAIN
+from .request_scheduler import MAX_REQUEST_LIMIT
+
+_LOGGER: logging.Logger = logging.getLogger(__package__)
+
+# The request scheduler limits the regular requests (up to MAX_REQUEST_LIMIT with the max_concurrent_requests option),
+# on top of that the event stream and an audio upload can each hold a connection open
+CONNECTION_LIMIT_PER_HOST = MAX_REQUEST_LIMIT + 2
+
+# Polls come every few seconds, keep the connections open in between so they don't need a new TCP handshake
+KEEPALIVE_TIMEOUT_SECONDS = 30
+
+# Devices are usually set up by IP address, when they aren't the name rarely changes
+DNS_CACHE_SECONDS = 300
+
+_DATA_SESSIONS = f"{DOMAIN}_sessions"
+
+
+@dataclass
+class _SharedSession:
+    session: aiohttp.ClientSession
+    entries: set[str]
+    unsub_close: CALLBACK_TYPE
+
+
+def _device_key(address: str, port: int) -> str:
+    return "{0}:{1}".format(address.rstrip("/"), port)
+
+
+def _create_session() -> aiohttp.ClientSession:
+    """
+    Creates a session like async_create_clientsession(hass, verify_ssl=False, auto_cleanup=False) does, but with its
+    own connector: the helper always uses Home Assistant's shared connector and can't be given another one. The
+    session owns the connector, so closing it once the last entry is unloaded closes the device's connections.
+    """
+    connector = aiohttp.TCPConnector(
+        limit_per_host=CONNECTION_LIMIT_PER_HOST,
+        keepalive_timeout=KEEPALIVE_TIMEOUT_SECONDS,
+        ttl_dns_cache=DNS_CACHE_SECONDS,
+        # These devices use self signed certificates
+        ssl=False,
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        headers={USER_AGENT: SERVER_SOFTWARE},
+        json_serialize=json_dumps,
+        response_class=HassClientResponse,
+    )
+
+
+def async_get_device_session(
+    hass: HomeAssistant, entry_id: str, address: str, port: int
+) -> aiohttp.ClientSession:
+    """
+    Returns the session for the device at address:port, creating it if needed. The config entry holds on to the
+    session until it calls async_release_device_session.
+    """
+    sessions: dict[str, _SharedSession] = hass.data.setdefault(_DATA_SESSIONS, {})
+    key = _device_key(address, port)
+    shared = sessions.get(key)
+    if shared is None or shared.session.closed:
+        session = _create_session()
+
+        async def _async_close(event: Event) -> None:
+            sessions.pop(key, None)
+            await session.close()
+
+        shared = _SharedSession(
+            session,
+            set(),
+            hass.bus.async_listen_once(EVENT_HOMEASSISTANT_CLOSE, _async_close),
+        )
+        sessions[key] = shared
+    shared.entries.add(entry_id)
+    return shared.session
+
+
+async def async_release_device_session(
+    hass: HomeAssistant, entry_id: str, address: str, port: int
+) -> None:
+    """Releases the config entry's hold on the device session, the session is closed once no entry uses it"""
+    sessions: dict[str, _SharedSession] = hass.data.get(_DATA_SESSIONS, {})
+    key = _device_key(address, port)
+    shared = sessions.get(key)
+    if shared is None:
+        return
+    shared.entries.discard(entry_id)
+    if not shared.entries:
+        _LOGGER.debug("Closing the HTTP session for %s", key)
+        sessions.pop(key)
+        shared.unsub_close()
+        await shared.session.close()
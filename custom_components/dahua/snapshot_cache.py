@@ -0,0 +1,71 @@
+"""Snapshot cache with request coalescing"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+
+class SnapshotCache:
+    """
+    SnapshotCache keeps the last JPEG fetched from a channel for ttl seconds. Callers asking for a snapshot while a
+    download is already running wait on that download instead of starting another one, so the dashboard, automations
+    and image processing all hitting the same camera in the same second only cost a single snapshot.cgi request.
+
+    A ttl of 0 disables caching, but concurrent callers are still coalesced.
+    """
+
+    def __init__(self, fetch: Callable[[], Awaitable[bytes]], ttl: float) -> None:
+        self._fetch = fetch
+        self.ttl = ttl
+        self._image: bytes | None = None
+        self._fetched_at = 0.0
+        self._task: asyncio.Task[bytes] | None = None
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def async_get(self) -> bytes:
+        """Returns a snapshot, from the cache if it's fresh enough"""
+        if self._image is not None and time.monotonic() - self._fetched_at < self.ttl:
+            self.hits += 1
+            return self._image
+
+        task = self._task
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(self._async_fetch())
+            task.add_done_callback(self._fetch_done)
+            self._task = task
+        else:
+            self.coalesced += 1
+
+        # Shield the download so one caller timing out doesn't cancel it for everyone else waiting on it
+        return await asyncio.shield(task)
+
+    async def _async_fetch(self) -> bytes:
+        image = await self._fetch()
+        self._image = image
+        self._fetched_at = time.monotonic()
+        return image
+
+    def _fetch_done(self, task: asyncio.Task[bytes]) -> None:
+        self._task = None
+        # Retrieve the exception so it isn't reported as never retrieved when every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    def invalidate(self) -> None:
+        """Drops the cached image"""
+        self._image = None
+
+    def as_dict(self) -> dict[str, Any]:
+        """Returns the cache counters, used by diagnostics"""
+        return {
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+        }
@@ -66,14 +66,14 @@ class DahuaMotionDetectionBinarySwitch(DahuaBaseEntity, SwitchEntity):
         """Turn on/enable motion detection."""
         channel = self._coordinator.get_channel()
         await self._coordinator.client.enable_motion_detection(channel, True)
-        await self._coordinator.async_refresh()
+        await self._coordinator.async_request_refresh()
 
     @dahua_command
     async def async_turn_off(self, **kwargs: Any) -> None:  # pylint: disable=unused-argument
         """Turn off/disable motion detection."""
         channel = self._coordinator.get_channel()
         await self._coordinator.client.enable_motion_detection(channel, False)
-        await self._coordinator.async_refresh()
+        await self._coordinator.async_request_refresh()
 
     @property
     def unique_id(self) -> str:
@@ -103,14 +103,14 @@ class DahuaDisarmingLinkageBinarySwitch(DahuaBaseEntity, SwitchEntity):
         """Turn on/enable linkage"""
         channel = self._coordinator.get_channel()
         await self._coordinator.client.async_set_disarming_linkage(channel, True)
-        await self._coordinator.async_refresh()
+        await self._coordinator.async_request_refresh()
 
     @dahua_command
     async def async_turn_off(self, **kwargs: Any) -> None:  # pylint: disable=unused-argument
         """Turn off/disable linkage"""
         channel = self._coordinator.get_channel()
         await self._coordinator.client.async_set_disarming_linkage(channel, False)
-        await self._coordinator.async_refresh()
+        await self._coordinator.async_request_refresh()
 
     @property
     def unique_id(self) -> str:
@@ -143,14 +143,14 @@ class DahuaDisarmingEventNotificationsLinkageBinarySwitch(
         """Turn on/enable event notifications"""
         channel = self._coordinator.get_channel()
         await self._coordinator.client.async_set_event_notifications(channel, True)
-        await self._coordinator.async_refresh()
+        await self._coordinator.async_request_refresh()
 
     @dahua_command
     async def async_turn_off(self, **kwargs: Any) -> None:  # pylint: disable=unused-argument
         """Turn off/disable event notifications"""
         channel = self._coordinator.get_channel()
         await self._coordinator.client.async_set_event_notifications(channel, False)
-        await self._coordinator.async_refresh()
+        await self._coordinator.async_request_refresh()
 
     @property
     def unique_id(self) -> str:
@@ -182,7 +182,7 @@ class DahuaSmartMotionDetectionBinarySwitch(DahuaBaseEntity, SwitchEntity):
             await self._coordinator.client.async_set_ivs_rule(0, 0, True)
         else:
             await self._coordinator.client.async_enabled_smart_motion_detection(True)
-        await self._coordinator.async_refresh()
+        await self._coordinator.async_request_refresh()
 
     @dahua_command
     async def async_turn_off(self, **kwargs: Any) -> None:  # pylint: disable=unused-argument
@@ -191,7 +191,7 @@ class DahuaSmartMotionDetectionBinarySwitch(DahuaBaseEntity, SwitchEntity):
             await self._coordinator.client.async_set_ivs_rule(0, 0, False)
         else:
             await self._coordinator.client.async_enabled_smart_motion_detection(False)
-        await self._coordinator.async_refresh()
+        await self._coordinator.async_request_refresh()
 
     @property
     def unique_id(self) -> str:
@@ -220,7 +220,7 @@ class DahuaSirenBinarySwitch(DahuaBaseEntity, SwitchEntity):
         await self._coordinator.client.async_set_coaxial_control_state(
             channel, SIREN_TYPE, True
         )
-        await self._coordinator.async_refresh()
+        await self._coordinator.async_request_refresh()
 
     @dahua_command
     async def async_turn_off(self, **kwargs: Any) -> None:  # pylint: disable=unused-argument
@@ -229,7 +229,7 @@ class DahuaSirenBinarySwitch(DahuaBaseEntity, SwitchEntity):
         await self._coordinator.client.async_set_coaxial_control_state(
             channel, SIREN_TYPE, False
         )
-        await self._coordinator.async_refresh()
+        await self._coordinator.async_request_refresh()
 
     @property
     def unique_id(self) -> str:
@@ -254,12 +254,12 @@ class DahuaPrivacyModeBinarySwitch(DahuaBaseEntity, SwitchEntity):
     async def async_turn_on(self, **kwargs):
         """Turn on privacy mode."""
         await self._coordinator.rpc2_client.set_privacy_mode(True)
-        await self._coordinator.async_refresh()
+        await self._coordinator.async_request_refresh()
 
     async def async_turn_off(self, **kwargs):
         """Turn off privacy mode."""
         await self._coordinator.rpc2_client.set_privacy_mode(False)
-        await self._coordinator.async_refresh()
+        await self._coordinator.async_request_refresh()
 
     @property
     def name(self):
@@ -11,13 +11,16 @@ import logging
 import json
 import asyncio
 import hashlib
-from collections.abc import Callable, Generator
-from json import JSONDecoder
+from collections.abc import Callable
 from typing import Any
 
+from .log_utils import HotPathLogger
+
 PROTOCOLS = {True: "https", False: "http"}
 
 _LOGGER: logging.Logger = logging.getLogger(__package__)
+# Logs every packet received, see log_utils.HotPathLogger
+_PACKET_LOGGER = HotPathLogger(_LOGGER)
 
 DAHUA_DEVICE_TYPE = "deviceType"
 DAHUA_SERIAL_NUMBER = "serialNumber"
@@ -33,6 +36,102 @@ DAHUA_MAGICBOX_GETDEVICETYPE = "magicBox.getDeviceType"
 
 DAHUA_ALLOWED_DETAILS = [DAHUA_DEVICE_TYPE, DAHUA_SERIAL_NUMBER]
 
+# How long async_request waits for the VTO to answer
+REQUEST_TIMEOUT_SECONDS = 10
+
+# Every DHIP message starts with a 32 byte header: 0x20000000, "DHIP", the session id, the request id, the payload
+# length, 0, the payload length again and 0. The ids and lengths are little endian. The payload is a JSON object
+DHIP_HEADER_LENGTH = 32
+DHIP_MAGIC = b"DHIP"
+_DHIP_MAGIC_OFFSET = 4
+_DHIP_LENGTH = struct.Struct("<L")
+_DHIP_LENGTH_OFFSET = 16
+
+# Consumed bytes are dropped from the buffer once there are this many, so a burst of small messages doesn't move the
+# rest of the buffer for every message
+_COMPACT_THRESHOLD = 64 * 1024
+
+# The largest DHIP payload accepted. VTO messages are small JSON objects, a larger length means the stream is corrupt
+# and buffering up to it would hold on to whatever the VTO sends
+MAX_DHIP_PAYLOAD_LENGTH = 1024 * 1024
+
+
+class DhipDecoder:
+    """
+    DhipDecoder splits the VTO TCP stream into DHIP messages using the payload length in the header and decodes the
+    JSON payloads. A message can arrive in several chunks and a chunk can hold several messages, incomplete messages
+    are kept until the rest arrives. Consumed bytes are skipped with an offset rather than copying the rest of the
+    buffer each time. A header with a payload longer than MAX_DHIP_PAYLOAD_LENGTH raises a ValueError, the stream can't
+    be trusted after it and is best reconnected.
+    """
+
+    def __init__(self) -> None:
+        self._buffer = bytearray()
+        self._offset = 0
+
+    def feed(self, data: bytes) -> list[dict[str, Any]]:
+        """Adds a chunk from the stream and returns the messages it completed"""
+        buffer = self._buffer
+        buffer += data
+        messages: list[dict[str, Any]] = []
+        offset = self._offset
+        end = len(buffer)
+        oversized = 0
+
+        with memoryview(buffer) as view:
+            while end - offset >= DHIP_HEADER_LENGTH:
+                magic = offset + _DHIP_MAGIC_OFFSET
+                if view[magic : magic + len(DHIP_MAGIC)] != DHIP_MAGIC:
+                    # Out of sync (e.g. a trailing newline after the payload), skip to the next header
+                    found = buffer.find(DHIP_MAGIC, magic + 1)
+                    if found == -1:
+                        # Keep the last bytes, they could be the start of a header that's split across chunks
+                        offset = max(offset, end - DHIP_HEADER_LENGTH + 1)
+                        break
+                    offset = found - _DHIP_MAGIC_OFFSET
+                    continue
+
+                (length,) = _DHIP_LENGTH.unpack_from(view, offset + _DHIP_LENGTH_OFFSET)
+                if length > MAX_DHIP_PAYLOAD_LENGTH:
+                    oversized = length
+                    break
+                start = offset + DHIP_HEADER_LENGTH
+                if end - start < length:
+                    break
+                offset = start + length
+                # Released right away, so a reference kept elsewhere (e.g. an exception) can't pin the buffer
+                with view[start:offset] as payload:
+                    message = self._decode(payload)
+                if message is not None:
+                    messages.append(message)
+
+        if oversized:
+            # Nothing after a corrupt header can be trusted, start over on the next connection
+            self._buffer = bytearray()
+            self._offset = 0
+            raise ValueError(
+                "DHIP payload of {0} bytes is over the {1} byte limit".format(
+                    oversized, MAX_DHIP_PAYLOAD_LENGTH
+                )
+            )
+
+        if offset >= _COMPACT_THRESHOLD or offset == end:
+            del buffer[:offset]
+            offset = 0
+        self._offset = offset
+        return messages
+
+    @staticmethod
+    def _decode(payload: memoryview) -> dict[str, Any] | None:
+        try:
+            message = json.loads(str(payload, "utf-8"))
+        except ValueError as ex:
+            _LOGGER.error("Failed to decode DHIP message: %s", ex)
+            return None
+        if not isinstance(message, dict):
+            return None
+        return message
+
 
 class DahuaVTOClient(asyncio.Protocol):
     requestId: int
@@ -48,7 +147,7 @@ class DahuaVTOClient(asyncio.Protocol):
     hold_time: int
     lock_status: dict[str, Any]
     data_handlers: dict[int, Callable[..., None]]
-    buffer: bytearray
+    decoder: DhipDecoder
 
     def __init__(
         self,
@@ -57,8 +156,12 @@ class DahuaVTOClient(asyncio.Protocol):
         password: str,
         is_ssl: bool,
         on_receive_vto_event: Callable[[dict[str, Any]], None],
+        dahua_details: dict[str, Any] | None = None,
+        hold_time: int = 0,
     ) -> None:
-        self.dahua_details: dict[str, Any] = {}
+        # Details learned on an earlier connection are passed in, they're not loaded again after login
+        self.dahua_details: dict[str, Any] = dict(dahua_details or {})
+        self.details_loaded = dahua_details is not None
         self.host = host
         self.username = username
         self.password = password
@@ -70,10 +173,15 @@ class DahuaVTOClient(asyncio.Protocol):
         self.sessionId = 0
         self.keep_alive_interval = 0
         self.transport: asyncio.Transport | None = None
-        self.hold_time = 0
+        self.hold_time = hold_time
         self.lock_status: dict[str, Any] = {}
+        # Handlers of the requests waiting for a response, by request id. A handler is removed when its response
+        # arrives, except for the ids in _kept_handlers which get more messages (the event stream)
         self.data_handlers: dict[int, Callable[..., None]] = {}
-        self.buffer = bytearray()
+        self._kept_handlers: set[int] = set()
+        self._pending: dict[int, asyncio.Future[dict[str, Any]]] = {}
+        self._details_task: asyncio.Task[None] | None = None
+        self.decoder = DhipDecoder()
 
         self._keep_alive_handle: asyncio.TimerHandle | None = None
 
@@ -81,6 +189,8 @@ class DahuaVTOClient(asyncio.Protocol):
         self.on_receive_vto_event = on_receive_vto_event
         self._loop = asyncio.get_event_loop()
         self.disconnected: asyncio.Future[bool] = self._loop.create_future()
+        # Done once logged in and attached to the event manager
+        self.attached: asyncio.Future[None] = self._loop.create_future()
 
     def connection_made(self, transport: asyncio.BaseTransport) -> None:
         _LOGGER.debug("VTO connection established")
@@ -97,27 +207,25 @@ class DahuaVTOClient(asyncio.Protocol):
             )
 
     def data_received(self, data: bytes) -> None:
-        _LOGGER.debug("Event data %s: '%s'", self.host, data)
-
-        self.buffer += data
-
-        while b"\n" in self.buffer:
-            newline_index = self.buffer.find(b"\n") + 1
-            packet = self.buffer[:newline_index]
-            self.buffer = self.buffer[newline_index:]
+        _PACKET_LOGGER.debug("Event data %s: '%s'", self.host, data)
 
+        try:
+            messages = self.decoder.feed(data)
+        except ValueError as ex:
+            # Closing the connection calls connection_lost, the supervisor then reconnects
+            _LOGGER.warning("Invalid data from VTO %s, reconnecting: %s", self.host, ex)
+            self.transport.close()
+            return
+
+        for message in messages:
             try:
-                messages = self.parse_response(packet)
-                for message in messages:
-                    if message is None:
-                        continue
-
-                    message_id: int = message.get("id")  # type: ignore[assignment]
+                message_id: int = message.get("id")  # type: ignore[assignment]
 
-                    handler: Callable[..., None] = self.data_handlers.get(
-                        message_id, self.handle_default
-                    )
-                    handler(message)
+                if message_id in self._kept_handlers:
+                    handler = self.data_handlers[message_id]
+                else:
+                    handler = self.data_handlers.pop(message_id, self.handle_default)
+                handler(message)
             except Exception as ex:
                 exc_type, exc_obj, exc_tb = sys.exc_info()
                 assert exc_tb is not None
@@ -146,7 +254,7 @@ class DahuaVTOClient(asyncio.Protocol):
             )
 
     def handle_default(self, message: dict[str, Any]) -> None:
-        _LOGGER.info(f"Data received without handler: {message}")
+        _PACKET_LOGGER.info("Data received without handler: %s", message)
 
     def eof_received(self) -> None:
         _LOGGER.info("Server sent EOF message")
@@ -154,6 +262,7 @@ class DahuaVTOClient(asyncio.Protocol):
         if self._keep_alive_handle is not None:
             self._keep_alive_handle.cancel()
             self._keep_alive_handle = None
+        self._fail_pending()
         if not self.disconnected.done():
             self.disconnected.set_result(True)
 
@@ -163,15 +272,30 @@ class DahuaVTOClient(asyncio.Protocol):
         if self._keep_alive_handle is not None:
             self._keep_alive_handle.cancel()
             self._keep_alive_handle = None
+        self._fail_pending()
         if not self.disconnected.done():
             self.disconnected.set_result(True)
 
+    def _fail_pending(self) -> None:
+        """Fails the requests still waiting for a response, they won't get one on this connection"""
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("VTO connection closed"))
+        self._pending.clear()
+        self.data_handlers.clear()
+        self._kept_handlers.clear()
+
     def send(
         self,
         action: str,
         handler: Callable[[dict[str, Any] | None], None],
         params: dict[str, Any] | None = None,
-    ) -> None:
+        keep: bool = False,
+    ) -> int:
+        """
+        Sends a request, handler is called with its response. With keep the handler stays registered for the other
+        messages with the request id (e.g. the events after eventManager.attach). Returns the request id.
+        """
         if params is None:
             params = {}
 
@@ -186,12 +310,15 @@ class DahuaVTOClient(asyncio.Protocol):
         }
 
         self.data_handlers[self.request_id] = handler
+        if keep:
+            self._kept_handlers.add(self.request_id)
 
         assert self.transport is not None
         if not self.transport.is_closing():
             message = self.convert_message(message_data)
 
             self.transport.write(message)
+        return self.request_id
 
     @staticmethod
     def convert_message(data: dict[str, Any]) -> bytes:
@@ -250,11 +377,13 @@ class DahuaVTOClient(asyncio.Protocol):
             if keep_alive_interval is not None:
                 self.keep_alive_interval = keep_alive_interval - 5
 
-                self.load_access_control()
-                self.load_version()
-                self.load_serial_number()
-                self.load_device_type()
+                if not self.details_loaded:
+                    self._details_task = self._loop.create_task(
+                        self.async_load_details()
+                    )
                 self.attach_event_manager()
+                if not self.attached.done():
+                    self.attached.set_result(None)
 
                 self._keep_alive_handle = self._loop.call_later(
                     self.keep_alive_interval, self.keep_alive
@@ -291,93 +420,120 @@ class DahuaVTOClient(asyncio.Protocol):
 
         request_data: dict[str, Any] = {"codes": ["All"]}
 
-        self.send(DAHUA_EVENT_MANAGER_ATTACH, handle_attach_event_manager, request_data)
+        self.send(
+            DAHUA_EVENT_MANAGER_ATTACH,
+            handle_attach_event_manager,
+            request_data,
+            keep=True,
+        )
 
-    def load_access_control(self) -> None:
-        _LOGGER.info("Get access control configuration")
+    async def async_request(
+        self,
+        action: str,
+        params: dict[str, Any] | None = None,
+        timeout: float = REQUEST_TIMEOUT_SECONDS,
+    ) -> dict[str, Any]:
+        """
+        Sends a request and waits for its response. Requests are pipelined, any number can be outstanding at once.
+        Raises TimeoutError when the VTO doesn't answer within timeout and ConnectionError when the connection is lost
+        first.
+        """
+        if self.transport is None or self.transport.is_closing():
+            raise ConnectionError("Not connected to the VTO")
 
-        def handle_access_control(message: dict[str, Any] | None) -> None:
-            if message is None:
-                return
+        future: asyncio.Future[dict[str, Any]] = self._loop.create_future()
 
-            params: dict[str, Any] = message.get("params")  # type: ignore[assignment]
-            table = params.get("table")
+        def resolve(message: dict[str, Any] | None) -> None:
+            if not future.done():
+                future.set_result(message or {})
 
-            if table is not None:
-                for item in table:
-                    access_control = item.get("AccessProtocol")
+        request_id = self.send(action, resolve, params)
+        self._pending[request_id] = future
+        try:
+            async with asyncio.timeout(timeout):
+                return await future
+        finally:
+            # A request that timed out or was cancelled doesn't leave its handler behind
+            self._pending.pop(request_id, None)
+            self.data_handlers.pop(request_id, None)
+
+    async def async_load_details(self) -> None:
+        """Loads the access control configuration and the device details, the requests are sent at once"""
+        results = await asyncio.gather(
+            self.async_request(
+                DAHUA_CONFIG_MANAGER_GETCONFIG, {"name": "AccessControl"}
+            ),
+            self.async_request(DAHUA_MAGICBOX_GETSOFTWAREVERSION),
+            self.async_request(DAHUA_CONFIG_MANAGER_GETCONFIG, {"name": "T2UServer"}),
+            self.async_request(DAHUA_MAGICBOX_GETDEVICETYPE),
+            return_exceptions=True,
+        )
+        handlers = (
+            self.handle_access_control,
+            self.handle_version,
+            self.handle_serial_number,
+            self.handle_device_type,
+        )
+        failed = False
+        for handler, result in zip(handlers, results):
+            if isinstance(result, BaseException):
+                failed = True
+                _LOGGER.warning(
+                    "VTO %s didn't answer %s: %r", self.host, handler.__name__, result
+                )
+            else:
+                handler(result)
+        # Only complete details are reused on the next connection
+        self.details_loaded = not failed
 
-                    if access_control == "Local":
-                        self.hold_time = item.get("UnlockReloadInterval")
+    def handle_access_control(self, message: dict[str, Any]) -> None:
+        params: dict[str, Any] = message.get("params") or {}
+        table = params.get("table")
 
-                        _LOGGER.info(f"Hold time: {self.hold_time}")
+        if table is not None:
+            for item in table:
+                access_control = item.get("AccessProtocol")
 
-        request_data: dict[str, Any] = {"name": "AccessControl"}
+                if access_control == "Local":
+                    self.hold_time = item.get("UnlockReloadInterval")
 
-        self.send(DAHUA_CONFIG_MANAGER_GETCONFIG, handle_access_control, request_data)
+                    _LOGGER.info("Hold time: %s", self.hold_time)
 
     async def cancel_call(self) -> bool:
+        """Cancels the call on the VTO, returns true if the VTO accepted it"""
         _LOGGER.info("Cancelling call on VTO")
 
-        def cancel(message: dict[str, Any] | None) -> None:
-            _LOGGER.info(f"Got cancel call response: {message}")
+        message = await self.async_request("console.runCmd", {"command": "hc"})
+        _LOGGER.info("Got cancel call response: %s", message)
+        return message.get("result") is not False
 
-        self.send("console.runCmd", cancel, {"command": "hc"})
-        return True
+    def handle_version(self, message: dict[str, Any]) -> None:
+        params: dict[str, Any] = message.get("params") or {}
+        version_details = params.get("version", {})
+        build_date = version_details.get("BuildDate")
+        version = version_details.get("Version")
 
-    def load_version(self) -> None:
-        _LOGGER.info("Get version")
+        self.dahua_details[DAHUA_VERSION] = version
+        self.dahua_details[DAHUA_BUILD_DATE] = build_date
 
-        def handle_version(message: dict[str, Any] | None) -> None:
-            if message is None:
-                return
+        _LOGGER.info("Version: %s, Build Date: %s", version, build_date)
 
-            params: dict[str, Any] = message.get("params")  # type: ignore[assignment]
-            version_details = params.get("version", {})
-            build_date = version_details.get("BuildDate")
-            version = version_details.get("Version")
+    def handle_device_type(self, message: dict[str, Any]) -> None:
+        params: dict[str, Any] = message.get("params") or {}
+        device_type = params.get("type")
 
-            self.dahua_details[DAHUA_VERSION] = version
-            self.dahua_details[DAHUA_BUILD_DATE] = build_date
+        self.dahua_details[DAHUA_DEVICE_TYPE] = device_type
 
-            _LOGGER.info(f"Version: {version}, Build Date: {build_date}")
+        _LOGGER.info("Device Type: %s", device_type)
 
-        self.send(DAHUA_MAGICBOX_GETSOFTWAREVERSION, handle_version)
+    def handle_serial_number(self, message: dict[str, Any]) -> None:
+        params: dict[str, Any] = message.get("params") or {}
+        table = params.get("table", {})
+        serial_number = table.get("UUID")
 
-    def load_device_type(self) -> None:
-        _LOGGER.info("Get device type")
+        self.dahua_details[DAHUA_SERIAL_NUMBER] = serial_number
 
-        def handle_device_type(message: dict[str, Any] | None) -> None:
-            if message is None:
-                return
-
-            params: dict[str, Any] = message.get("params")  # type: ignore[assignment]
-            device_type = params.get("type")
-
-            self.dahua_details[DAHUA_DEVICE_TYPE] = device_type
-
-            _LOGGER.info(f"Device Type: {device_type}")
-
-        self.send(DAHUA_MAGICBOX_GETDEVICETYPE, handle_device_type)
-
-    def load_serial_number(self) -> None:
-        _LOGGER.info("Get serial number")
-
-        def handle_serial_number(message: dict[str, Any] | None) -> None:
-            if message is None:
-                return
-
-            params: dict[str, Any] = message.get("params")  # type: ignore[assignment]
-            table = params.get("table", {})
-            serial_number = table.get("UUID")
-
-            self.dahua_details[DAHUA_SERIAL_NUMBER] = serial_number
-
-            _LOGGER.info(f"Serial Number: {serial_number}")
-
-        request_data: dict[str, Any] = {"name": "T2UServer"}
-
-        self.send(DAHUA_CONFIG_MANAGER_GETCONFIG, handle_serial_number, request_data)
+        _LOGGER.info("Serial Number: %s", serial_number)
 
     def keep_alive(self) -> None:
         _LOGGER.debug("Keep alive")
@@ -386,16 +542,6 @@ class DahuaVTOClient(asyncio.Protocol):
             self._keep_alive_handle = self._loop.call_later(
                 self.keep_alive_interval, self.keep_alive
             )
-            if message is None:
-                return
-
-            message_id = message.get("id")
-            if message_id is not None and message_id in self.data_handlers:
-                del self.data_handlers[message_id]
-            else:
-                _LOGGER.warning(
-                    f"Could not delete keep alive handler with message ID {message_id}."
-                )
 
         request_data: dict[str, Any] = {
             "timeout": self.keep_alive_interval,
@@ -404,55 +550,6 @@ class DahuaVTOClient(asyncio.Protocol):
 
         self.send(DAHUA_GLOBAL_KEEPALIVE, handle_keep_alive, request_data)
 
-    @staticmethod
-    def parse_response(response: bytes | bytearray) -> list[dict[str, Any]]:
-        result: list[dict[str, Any]] = []
-
-        try:
-            # Messages can look like like the following, note, this was shorted with ...
-            # Note that there can 0 or more events per line. Typically it's 1 event, but sometimes 2 events will arrive.
-            # This example shows 2 events
-            # \x00\x00\x00DHIP*Q\xa8f\x08\x00\x00\x00m\x04\x00\x00\x00\x00\x00\x00m\x04\x00\x00\x00\x00\x00\x00{"id":8,"method":"client.notifyEventStream","params":{"SID":513,"eventList":[{"Action":"Start","Code":"CrossRegionDetection"...},"session":1722306858}\n \x00\x00\x00DHIP*Q\xa8f\x08\x00\x00\x00\xe8\x00\x00\x00\x00\x00\x00\x00\xe8\x00\x00\x00\x00\x00\x00\x00{"id":8,"method":"client.notifyEventStream","params":{"SID":513,"eventList":[{"Action":"Pulse","Code":"IntelliFrame",..."session":1722306858}\n'
-            # Another example
-            # \x00\x00\x00DHIP\x8c-\x96{\x08\x00\x00\x00{\x01\x00\x00\x00\x00\x00\x00{\x01\x00\x00\x00\x00\x00\x00{"id":8,"method":"client.notifyEventStream","params":{"SID":513,"eventList":[{"Action":"State","Code":"VideoMotionInfo","Data":[{"Id":0,"Region":[4194303,4194303,4128767,3997695,3801087,3801087,3932159,3407871,3932159,3932158,3932156,3735548,3678204,2101244,2047,2097663,3146239,524799],"RegionName":"Region1","State":"Active","Threshold":54}],"Index":0}]},"session":1722306858}\n
-
-            data = str(response)
-
-            jsons = DahuaVTOClient.extract_json_objects(data)
-            for j in jsons:
-                result.append(j)
-            return result
-        except Exception as e:
-            exc_type, exc_obj, exc_tb = sys.exc_info()
-            assert exc_tb is not None
-            _LOGGER.error(
-                f"Failed to read data: {response!r}, error: {e}, Line: {exc_tb.tb_lineno}"
-            )
-
-        return result
-
-    @staticmethod
-    def extract_json_objects(
-        text: str, decoder: json.JSONDecoder = JSONDecoder()
-    ) -> Generator[dict[str, Any], None, None]:
-        """Find JSON objects in text, and yield the decoded JSON data
-
-        Does not attempt to look for JSON arrays, text, or other JSON types outside
-        of a parent JSON object.
-        https://stackoverflow.com/questions/54235528/how-to-find-json-object-in-text-with-python/54235803
-        """
-        pos = 0
-        while True:
-            match = text.find("{", pos)
-            if match == -1:
-                break
-            try:
-                result, index = decoder.raw_decode(text[match:])
-                yield result
-                pos = match + index
-            except ValueError:
-                pos = match + 1
-
     @staticmethod
     def _get_hashed_password(
         random: str, realm: str, username: str, password: str
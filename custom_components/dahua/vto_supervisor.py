@@ -0,0 +1,142 @@
+"""Keeps the connection to a doorbell (VTO) open, reconnecting with backoff when it drops"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections.abc import Callable
+from typing import Any
+
+from .backoff import backoff_delay
+from .metrics import LatencyStats
+from .vto import DahuaVTOClient
+
+_LOGGER: logging.Logger = logging.getLogger(__package__)
+
+VTO_PORT = 5000
+
+# Reconnect delays grow from the base to the max, doubling after every failed attempt
+BACKOFF_BASE_SECONDS = 2.0
+BACKOFF_MAX_SECONDS = 300.0
+
+# A connection that stayed up this long was healthy, the next reconnect starts from the base delay again
+STABLE_CONNECTION_SECONDS = 60.0
+
+# How long the connection, login and attach may take before the attempt counts as failed
+CONNECT_TIMEOUT_SECONDS = 30.0
+
+
+class VTOSupervisor:
+    """
+    VTOSupervisor connects to the VTO, waits for the connection to drop and reconnects with backoff_delay. The device
+    details (version, serial number, device type, hold time) learned on the first connection are handed to the next
+    one, so a reconnect only logs in and attaches to the event manager.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        username: str,
+        password: str,
+        on_receive_vto_event: Callable[[dict[str, Any]], None],
+        port: int = VTO_PORT,
+    ) -> None:
+        self._host = host
+        self._username = username
+        self._password = password
+        self._on_receive_vto_event = on_receive_vto_event
+        self._port = port
+        self.client: DahuaVTOClient | None = None
+        self._details: dict[str, Any] | None = None
+        self._hold_time = 0
+        self._attempt = 0
+        self._reconnect_latency = LatencyStats()
+        self._connects = 0
+        self._failures = 0
+        self._last_delay = 0.0
+
+    async def async_run(self) -> None:
+        """Connects and reconnects until cancelled"""
+        down_since = time.monotonic()
+        while True:
+            connected_at: float | None = None
+            try:
+                client = await self._async_connect()
+                connected_at = time.monotonic()
+                if self._connects:
+                    self._reconnect_latency.add(connected_at - down_since)
+                self._connects += 1
+                _LOGGER.debug("Attached to the VTO event stream at %s", self._host)
+                await client.disconnected
+            except asyncio.CancelledError:
+                if self.client is not None and self.client.transport is not None:
+                    self.client.transport.close()
+                raise
+            except Exception as ex:
+                self._failures += 1
+                if self.client is not None and self.client.transport is not None:
+                    self.client.transport.close()
+                _LOGGER.warning("VTO connection to %s failed: %s", self._host, ex)
+            finally:
+                self._remember_details()
+
+            down_since = time.monotonic()
+            if (
+                connected_at is not None
+                and down_since - connected_at >= STABLE_CONNECTION_SECONDS
+            ):
+                self._attempt = 0
+            self._last_delay = backoff_delay(
+                self._attempt, BACKOFF_BASE_SECONDS, BACKOFF_MAX_SECONDS
+            )
+            self._attempt += 1
+            _LOGGER.warning(
+                "Disconnected from VTO at %s, reconnecting in %.1fs",
+                self._host,
+                self._last_delay,
+            )
+            await asyncio.sleep(self._last_delay)
+
+    async def _async_connect(self) -> DahuaVTOClient:
+        """Connects, logs in and attaches. Raises if that doesn't happen within CONNECT_TIMEOUT_SECONDS"""
+        loop = asyncio.get_running_loop()
+        async with asyncio.timeout(CONNECT_TIMEOUT_SECONDS):
+            _, client = await loop.create_connection(
+                lambda: DahuaVTOClient(
+                    self._host,
+                    self._username,
+                    self._password,
+                    False,
+                    self._on_receive_vto_event,
+                    self._details,
+                    self._hold_time,
+                ),
+                host=self._host,
+                port=self._port,
+            )
+            self.client = client
+            await asyncio.wait(
+                (client.attached, client.disconnected),
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+        if not client.attached.done():
+            raise ConnectionError("Disconnected before attaching")
+        return client
+
+    def _remember_details(self) -> None:
+        client = self.client
+        if client is not None and client.details_loaded:
+            self._details = dict(client.dahua_details)
+            self._hold_time = client.hold_time
+
+    def as_dict(self) -> dict[str, Any]:
+        """Returns the connection counts and the reconnect latency, used by diagnostics"""
+        return {
+            "connects": self._connects,
+            "failures": self._failures,
+            "attempt": self._attempt,
+            "last_backoff_seconds": round(self._last_delay, 1),
+            "details_cached": self._details is not None,
+            "reconnect_latency": self._reconnect_latency.as_dict(),
+        }
@@ -0,0 +1,172 @@
+"""Coalesces setConfig writes to the same device into a single request"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+from .registry import SharedRegistry
+
+_LOGGER: logging.Logger = logging.getLogger(__package__)
+
+# How long a write waits for other writes to join it. Scenes and automations flip several settings within a few ms
+COALESCE_WINDOW_SECONDS = 0.05
+
+# Keep the merged URL well below what the web servers on these devices accept
+MAX_QUERY_LENGTH = 1500
+
+# A send that doesn't finish within this time fails every write that was sent in it. Cancelling the send also gives
+# its request scheduler slot back, so the writes queued behind it aren't stuck. The client's sends wait up to a minute
+# for a slot (QUEUE_TIMEOUT_SECONDS) before their own request timeout starts, this only catches a send that never ends
+SEND_TIMEOUT_SECONDS = 90
+
+
+@dataclass
+class _PendingWrite:
+    params: list[str]
+    send: Callable[[list[str]], Awaitable[str]]
+    future: asyncio.Future[str] = field(repr=False)
+
+
+def _merge(writes: list[_PendingWrite]) -> list[str]:
+    """Merges the params of the writes, a later write to the same name wins"""
+    merged: dict[str, str] = {}
+    for write in writes:
+        for param in write.params:
+            merged[param.split("=", 1)[0]] = param
+    return list(merged.values())
+
+
+def _query_length(params: list[str]) -> int:
+    return sum(len(param) + 1 for param in params)
+
+
+class SetConfigQueue:
+    """
+    SetConfigQueue merges the setConfig writes made to a device within COALESCE_WINDOW_SECONDS into one
+    configManager.cgi?action=setConfig request with all of their key=value pairs, and hands the response to every
+    caller. If the device rejects the merged request each write is retried on its own, so a caller only sees an error
+    caused by its own keys.
+    """
+
+    def __init__(
+        self,
+        window: float = COALESCE_WINDOW_SECONDS,
+        send_timeout: float = SEND_TIMEOUT_SECONDS,
+    ) -> None:
+        self._window = window
+        self._send_timeout = send_timeout
+        self._pending: list[_PendingWrite] = []
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._flush_tasks: set[asyncio.Task[None]] = set()
+        self.writes = 0
+        self.requests = 0
+        self.fallbacks = 0
+
+    async def async_set(
+        self, params: list[str], send: Callable[[list[str]], Awaitable[str]]
+    ) -> str:
+        """
+        Queues a write of params (like ["Lighting[0][0].Mode=Manual"]) and returns the response text of the request it
+        was sent in. send does the request for a list of params.
+        """
+        loop = asyncio.get_running_loop()
+        write = _PendingWrite(params, send, loop.create_future())
+        self._pending.append(write)
+        self.writes += 1
+        if self._flush_handle is None:
+            self._flush_handle = loop.call_later(self._window, self._flush)
+        return await write.future
+
+    def _flush(self) -> None:
+        self._flush_handle = None
+        # Writes whose caller gave up (cancelled or timed out) before they were sent are dropped
+        writes = [write for write in self._pending if not write.future.done()]
+        self._pending = []
+        if not writes:
+            return
+        task = asyncio.create_task(self._async_send(writes))
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    async def _async_send(self, writes: list[_PendingWrite]) -> None:
+        # Split into requests that stay under MAX_QUERY_LENGTH, a single write is never split
+        group: list[_PendingWrite] = []
+        for write in writes:
+            if group and _query_length(_merge([*group, write])) > MAX_QUERY_LENGTH:
+                await self._async_send_group(group)
+                group = []
+            group.append(write)
+        await self._async_send_group(group)
+
+    async def _async_send_group(self, writes: list[_PendingWrite]) -> None:
+        if len(writes) == 1:
+            await self._async_send_one(writes[0])
+            return
+
+        self.requests += 1
+        try:
+            async with asyncio.timeout(self._send_timeout):
+                response = await writes[0].send(_merge(writes))
+        except Exception as exception:  # pylint: disable=broad-except
+            for write in writes:
+                if not write.future.done():
+                    write.future.set_exception(exception)
+            return
+
+        if response.lower().strip() == "ok":
+            for write in writes:
+                if not write.future.done():
+                    write.future.set_result(response)
+            return
+
+        # One of the writes has a key the device doesn't accept, find out which by sending them one at a time
+        _LOGGER.debug(
+            "Merged setConfig of %s writes was rejected (%s), sending them one at a time",
+            len(writes),
+            response.strip(),
+        )
+        self.fallbacks += 1
+        for write in writes:
+            await self._async_send_one(write)
+
+    async def _async_send_one(self, write: _PendingWrite) -> None:
+        if write.future.done():
+            return
+        self.requests += 1
+        try:
+            async with asyncio.timeout(self._send_timeout):
+                response = await write.send(write.params)
+        except Exception as exception:  # pylint: disable=broad-except
+            if not write.future.done():
+                write.future.set_exception(exception)
+            return
+        if not write.future.done():
+            write.future.set_result(response)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Returns the write and request counters, used by diagnostics"""
+        return {
+            "writes": self.writes,
+            "requests": self.requests,
+            "fallbacks": self.fallbacks,
+        }
+
+
+_SET_CONFIG_QUEUES: SharedRegistry[tuple[str, str], SetConfigQueue] = SharedRegistry()
+
+
+def get_set_config_queue(host: str, username: str) -> SetConfigQueue:
+    """
+    Returns the shared SetConfigQueue for the given host and username, creating it if needed. Each call holds the
+    queue until release_set_config_queue is called
+    """
+    return _SET_CONFIG_QUEUES.acquire((host, username), SetConfigQueue)
+
+
+def release_set_config_queue(host: str, username: str) -> None:
+    """Releases a hold from get_set_config_queue, the queue is dropped when the last holder released it"""
+    _SET_CONFIG_QUEUES.release((host, username))
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""Benchmark parsing getConfig responses and reading entity state from them.
+
+Builds a large synthetic getConfig dump (Lighting_V2, MotionDetect, Encode and
+VideoAnalyseRule tables for a number of channels), then times:
+  - the previous async split() based parser against parse_dahua_api_response
+  - projecting the parsed dict with dahua_utils.project_config
+  - reading the state accessors the old way (format the key, get, lowercase)
+    against looking them up in the projected tree
+
+Needs aiohttp (the client imports it), but not Home Assistant.
+
+Usage: python3 bench_config_parser.py [channels] [rounds]
+Example: python3 bench_config_parser.py 16 200
+"""
+
+import asyncio
+import importlib
+import sys
+import time
+import types
+from pathlib import Path
+
+# Load the integration's modules without running its __init__, which needs Home Assistant
+PACKAGE_PATH = Path(__file__).resolve().parent.parent / "custom_components" / "dahua"
+package = types.ModuleType("dahua")
+package.__path__ = [str(PACKAGE_PATH)]
+sys.modules["dahua"] = package
+client = importlib.import_module("dahua.client")
+dahua_utils = importlib.import_module("dahua.dahua_utils")
+
+
+async def previous_parse(data: str) -> dict:
+    """The parser before it was made synchronous, kept here as the baseline"""
+    lines = data.splitlines()
+    data_dict = {}
+    for line in lines:
+        parts = line.split("=", 1)
+        if len(parts) == 2:
+            data_dict[parts[0]] = parts[1]
+        else:
+            data_dict[parts[0]] = line
+    return data_dict
+
+
+def make_dump(channels: int) -> str:
+    lines = []
+    for channel in range(channels):
+        for profile in range(3):
+            for light in range(2):
+                prefix = "table.Lighting_V2[{0}][{1}][{2}]".format(
+                    channel, profile, light
+                )
+                lines.append(prefix + ".Mode=Manual")
+                lines.append(prefix + ".PercentOfMaxBrightness=100")
+                lines.append(prefix + ".Sensitive=3")
+                for level in range(3):
+                    lines.append(
+                        "{0}.MiddleLight[{1}].Light={2}".format(prefix, level, 50)
+                    )
+        lines.append("table.MotionDetect[{0}].Enable=true".format(channel))
+        lines.append("table.MotionDetect[{0}].DetectVersion=V3.0".format(channel))
+        for region in range(4):
+            lines.append(
+                "table.MotionDetect[{0}].Region[{1}]=4194303".format(channel, region)
+            )
+        for stream in ("MainFormat", "ExtraFormat"):
+            base = "table.Encode[{0}].{1}[0]".format(channel, stream)
+            lines.append(base + ".AudioEnable=false")
+            lines.append(base + ".Video.BitRate=4096")
+            lines.append(base + ".Video.Compression=H.265")
+        for rule in range(8):
+            lines.append(
+                "table.VideoAnalyseRule[{0}][{1}].Enable=false".format(channel, rule)
+            )
+            lines.append(
+                "table.VideoAnalyseRule[{0}][{1}].Name=Rule{1}".format(channel, rule)
+            )
+    return "\r\n".join(lines) + "\r\n"
+
+
+def read_flat(data: dict, channels: int) -> int:
+    on = 0
+    for channel in range(channels):
+        if (
+            str(data.get("table.MotionDetect[{0}].Enable".format(channel), "")).lower()
+            == "true"
+        ):
+            on += 1
+        if (
+            str(data.get("table.Lighting_V2[{0}][{1}][0].Mode".format(channel, 0), ""))
+            == "Manual"
+        ):
+            on += 1
+    return on
+
+
+def read_tree(tree: dict, channels: int) -> int:
+    on = 0
+    for channel in range(channels):
+        if (
+            dahua_utils.config_value(tree, "table", "MotionDetect", channel, "Enable")
+            is True
+        ):
+            on += 1
+        if (
+            dahua_utils.config_value(
+                tree, "table", "Lighting_V2", channel, 0, 0, "Mode"
+            )
+            == "Manual"
+        ):
+            on += 1
+    return on
+
+
+def timed(name: str, rounds: int, fn) -> None:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        result = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{name:36s} {elapsed / rounds * 1e6:10.1f} us/round  ({result})")
+
+
+def main() -> None:
+    channels = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    dump = make_dump(channels)
+    print(
+        f"{channels} channels, {dump.count(chr(10))} lines, {len(dump)} bytes, {rounds} rounds"
+    )
+
+    loop = asyncio.new_event_loop()
+    parse = client.DahuaClient.parse_dahua_api_response
+    timed(
+        "previous async parser",
+        rounds,
+        lambda: len(loop.run_until_complete(previous_parse(dump))),
+    )
+    timed("parse_dahua_api_response", rounds, lambda: len(parse(dump)))
+    loop.close()
+
+    data = parse(dump)
+    timed(
+        "project_config", rounds, lambda: len(dahua_utils.project_config(data)["table"])
+    )
+
+    tree = dahua_utils.project_config(data)
+    timed("accessors on flat dict", rounds * 10, lambda: read_flat(data, channels))
+    timed("accessors on projected tree", rounds * 10, lambda: read_tree(tree, channels))
+
+
+if __name__ == "__main__":
+    main()
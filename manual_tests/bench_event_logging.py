@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""Benchmark the CPU cost of logging a burst of events on the event hot path.
+
+Builds a burst of parsed VideoMotionInfo/IntelliFrame style events and times
+the previous f-string debug logging against log_utils.HotPathLogger, with debug
+logging disabled and enabled (the handler writes to memory, so only the
+formatting is measured).
+
+Doesn't need Home Assistant or aiohttp.
+
+Usage: python3 bench_event_logging.py [events] [rounds]
+Example: python3 bench_event_logging.py 1000 20
+"""
+
+import importlib
+import io
+import logging
+import sys
+import time
+import types
+from pathlib import Path
+
+# Load the integration's modules without running its __init__, which needs Home Assistant
+PACKAGE_PATH = Path(__file__).resolve().parent.parent / "custom_components" / "dahua"
+package = types.ModuleType("dahua")
+package.__path__ = [str(PACKAGE_PATH)]
+sys.modules["dahua"] = package
+log_utils = importlib.import_module("dahua.log_utils")
+
+
+def make_events(count: int) -> list:
+    events = []
+    for i in range(count):
+        events.append(
+            {
+                "Code": "IntelliFrame" if i % 2 else "VideoMotionInfo",
+                "action": "Pulse",
+                "index": "0",
+                "data": {
+                    "Object": [
+                        {
+                            "BoundingBox": [4816, 4552, 5248, 5272],
+                            "ObjectID": 542 + n,
+                            "ObjectType": "Human",
+                        }
+                        for n in range(8)
+                    ],
+                    "FrameSequence": 549073 + i,
+                    "PTS": 42986015370.0 + i,
+                    "UTC": 1620477656,
+                },
+            }
+        )
+    return events
+
+
+def previous(logger: logging.Logger, events: list) -> None:
+    for event in events:
+        logger.debug(f"Events received from 192.168.1.108 on channel 0: {[event]}")
+
+
+def hot_path(logger, events: list) -> None:
+    for event in events:
+        logger.debug(
+            "Events received from %s on channel %s: %s", "192.168.1.108", 0, [event]
+        )
+
+
+def timed(name: str, rounds: int, fn) -> None:
+    start = time.process_time()
+    for _ in range(rounds):
+        fn()
+    elapsed = time.process_time() - start
+    print(f"{name:40s} {elapsed / rounds * 1000:8.2f} ms CPU/burst")
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    events = make_events(count)
+
+    logger = logging.getLogger("bench_event_logging")
+    logger.propagate = False
+    logger.addHandler(logging.StreamHandler(io.StringIO()))
+    hot = log_utils.HotPathLogger(logger)
+    sampled = log_utils.HotPathLogger(logger, sample_every=100)
+    print(f"{count} events per burst, {rounds} rounds")
+
+    for level in (logging.INFO, logging.DEBUG):
+        logger.setLevel(level)
+        label = "debug on" if level == logging.DEBUG else "debug off"
+        timed(f"f-string ({label})", rounds, lambda: previous(logger, events))
+        timed(f"HotPathLogger ({label})", rounds, lambda: hot_path(hot, events))
+        timed(
+            f"HotPathLogger 1 in 100 ({label})",
+            rounds,
+            lambda: hot_path(sampled, events),
+        )
+
+
+if __name__ == "__main__":
+    main()
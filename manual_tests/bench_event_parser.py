@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Benchmark the eventManager multipart parsers.
+
+Builds a synthetic event stream (events with JSON data and heartbeats), splits
+it into random chunks like the HTTP client does, then compares parsing every
+chunk with parse_event against feeding the chunks to EventStreamParser. Reports
+the time taken and how many events each approach recovered.
+
+Usage: python3 bench_event_parser.py [events] [max_chunk_size]
+Example: python3 bench_event_parser.py 20000 512
+"""
+
+import importlib.util
+import random
+import sys
+import time
+from pathlib import Path
+
+# Load dahua_utils directly so Home Assistant doesn't need to be installed
+UTILS_PATH = (
+    Path(__file__).resolve().parent.parent
+    / "custom_components"
+    / "dahua"
+    / "dahua_utils.py"
+)
+spec = importlib.util.spec_from_file_location("dahua_utils", UTILS_PATH)
+dahua_utils = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(dahua_utils)
+
+
+def make_part(body: str) -> bytes:
+    return (
+        "--myboundary\r\n"
+        "Content-Type: text/plain\r\n"
+        "Content-Length: {0}\r\n"
+        "\r\n"
+        "{1}\r\n"
+        "\r\n".format(len(body.encode("utf-8")), body)
+    ).encode("utf-8")
+
+
+def make_parts(count: int) -> list[bytes]:
+    parts = []
+    for i in range(count):
+        if i % 10 == 0:
+            parts.append(make_part("Heartbeat"))
+        body = "Code=CrossLineDetection;action=Start;index={0};data={{\n".format(i % 16)
+        body += (
+            '   "Object" : {{ "ObjectID" : {0}, "ObjectType" : "Human" }},\n'.format(i)
+        )
+        body += '   "Name" : "Rule{0}",\n   "UTC" : {1}\n}}'.format(i, 1700000000 + i)
+        parts.append(make_part(body))
+    return parts
+
+
+def split_chunks(data: bytes, max_size: int, rng: random.Random) -> list[bytes]:
+    chunks = []
+    pos = 0
+    while pos < len(data):
+        size = rng.randint(1, max_size)
+        chunks.append(data[pos : pos + size])
+        pos += size
+    return chunks
+
+
+def bench_per_chunk(chunks: list[bytes]) -> int:
+    count = 0
+    for chunk in chunks:
+        count += len(dahua_utils.parse_event(chunk.decode("utf-8", errors="ignore")))
+    return count
+
+
+def bench_incremental(chunks: list[bytes]) -> int:
+    parser = dahua_utils.EventStreamParser()
+    count = 0
+    for chunk in chunks:
+        count += len(parser.feed(chunk))
+    return count
+
+
+def main() -> None:
+    events = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    max_chunk_size = int(sys.argv[2]) if len(sys.argv) > 2 else 512
+
+    parts = make_parts(events)
+    data = b"".join(parts)
+    chunks = split_chunks(data, max_chunk_size, random.Random(0))
+    print(
+        f"{events} events, {len(data)} bytes, {len(chunks)} chunks of up to {max_chunk_size} bytes"
+    )
+
+    # The first run is the best case for parse_event: every chunk is exactly one part
+    for name, fn, stream in (
+        ("parse_event one part/chunk", bench_per_chunk, parts),
+        ("parse_event per chunk", bench_per_chunk, chunks),
+        ("EventStreamParser", bench_incremental, chunks),
+    ):
+        start = time.perf_counter()
+        try:
+            parsed = fn(stream)
+            result = f"{parsed} events"
+        except Exception as ex:  # pylint: disable=broad-except
+            result = f"failed: {ex}"
+        elapsed = time.perf_counter() - start
+        print(f"{name:28s} {elapsed * 1000:8.1f} ms  {result}")
+
+
+if __name__ == "__main__":
+    main()
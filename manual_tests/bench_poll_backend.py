@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""Benchmark a poll cycle over CGI against RPC2.
+
+A poll reads VideoInMode and then the configs the coordinator reads on every
+poll (MotionDetect, Lighting, DisableLinkage, ...). It is run with:
+  - cgi, one request per config (firmware without batched getConfig)
+  - cgi, batched getConfig (CgiPollBackend)
+  - rpc2, system.multicall over one session (Rpc2PollBackend)
+and reports the HTTP requests, bytes sent (URL and body) and received (body)
+and latency per poll. Header bytes aren't counted.
+
+Without a device the polls go to a local web server that answers like a
+camera, with the given delay per request for the device's response time
+(20 ms by default, cheap cameras often take longer). The server doesn't ask
+for digest auth, so CGI doesn't pay for the 401 round trip it makes on a
+camera once per session. Against a camera, pass its address and credentials.
+
+Needs aiohttp, but not Home Assistant.
+
+Usage: python3 bench_poll_backend.py [polls] [delay_ms] [host username password [port]]
+Example: python3 bench_poll_backend.py 50 20
+Example: python3 bench_poll_backend.py 20 0 192.168.1.108 admin secret
+"""
+
+import asyncio
+import importlib
+import json
+import sys
+import time
+import types
+from pathlib import Path
+
+import aiohttp
+from aiohttp import web
+
+# Load the integration's modules without running its __init__, which needs Home Assistant
+PACKAGE_PATH = Path(__file__).resolve().parent.parent / "custom_components" / "dahua"
+package = types.ModuleType("dahua")
+package.__path__ = [str(PACKAGE_PATH)]
+sys.modules["dahua"] = package
+client_module = importlib.import_module("dahua.client")
+metrics = importlib.import_module("dahua.metrics")
+poll_backend = importlib.import_module("dahua.poll_backend")
+rpc2 = importlib.import_module("dahua.rpc2")
+
+POLLED_CONFIGS = [
+    "MotionDetect",
+    "Lighting[0][0]",
+    "DisableLinkage",
+    "DisableEventNotify",
+    "SmartMotionDetect",
+    "Lighting_V2",
+]
+
+EVENT_HANDLER = {
+    "AlarmOut": 1,
+    "AlarmOutChannels": [0, 0],
+    "AlarmOutEnable": False,
+    "AlarmOutLatch": 10,
+    "Dejitter": 0,
+    "ExAlarmOutChannels": [0] * 8,
+    "FlashEnable": False,
+    "FlashLatch": 10,
+    "LogEnable": True,
+    "MailEnable": False,
+    "MatrixEnable": False,
+    "MessageEnable": False,
+    "PtzLinkEnable": False,
+    "RecordChannels": [0],
+    "RecordEnable": True,
+    "RecordLatch": 10,
+    "SnapshotChannels": [0],
+    "SnapshotEnable": False,
+    "SnapshotPeriod": 0,
+    "TimeSection": [["1 00:00:00-24:00:00"] + ["0 00:00:00-24:00:00"] * 5] * 7,
+    "TipEnable": False,
+    "VoiceEnable": False,
+}
+
+# What the device answers for getConfig, by name. The CGI API returns the same tables flattened
+DEVICE_CONFIGS = {
+    "VideoInMode": [
+        {"Config": [0], "Mode": 0, "TimeSection": [["0 00:00:00-24:00:00"] * 6] * 7}
+    ],
+    "MotionDetect": [
+        {
+            "Enable": True,
+            "EventHandler": EVENT_HANDLER,
+            "Level": 3,
+            "MotionDetectWindow": [
+                {
+                    "Id": index,
+                    "Name": "Region{0}".format(index + 1),
+                    "Region": [4194303] * 18,
+                    "Sensitive": 60,
+                    "Threshold": 5,
+                }
+                for index in range(4)
+            ],
+            "PirMotionLevel": 3,
+        }
+    ],
+    "Lighting": [
+        [
+            {
+                "Correction": 50,
+                "MiddleLight": [{"Angle": 50, "Light": 50}],
+                "Mode": "Auto",
+                "Sensitive": 3,
+            }
+        ]
+        * 3
+    ],
+    "DisableLinkage": {"Enable": False},
+    "DisableEventNotify": {"Enable": False},
+    "SmartMotionDetect": [
+        {
+            "Enable": True,
+            "Sensitivity": "Middle",
+            "ObjectTypes": {"Human": True, "Vehicle": False},
+        }
+    ],
+    "Lighting_V2": [
+        [
+            [
+                {
+                    "Mode": "Auto",
+                    "State": "Off",
+                    "LightType": light_type,
+                    "PercentOfMaxBrightness": 100,
+                }
+                for light_type in ("InfraredLight", "WhiteLight")
+            ]
+        ]
+        * 3
+    ],
+}
+
+
+class FakeDevice:
+    """Answers configManager.cgi getConfig and RPC2 like a camera would, after delay seconds"""
+
+    def __init__(self, delay: float) -> None:
+        self.delay = delay
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/cgi-bin/configManager.cgi", self.cgi)
+        app.router.add_post("/RPC2_Login", self.rpc2)
+        app.router.add_post("/RPC2", self.rpc2)
+        return app
+
+    async def cgi(self, request: web.Request) -> web.Response:
+        await asyncio.sleep(self.delay)
+        lines = []
+        for name in request.query.getall("name"):
+            base = name.split("[", 1)[0].split(".", 1)[0]
+            if base not in DEVICE_CONFIGS:
+                return web.Response(status=400, text="Error\r\nBad Request!\r\n")
+            flat = poll_backend.flatten_config(base, DEVICE_CONFIGS[base])
+            lines.extend(
+                "{0}={1}".format(key, value)
+                for key, value in poll_backend.select_config(flat, name).items()
+            )
+        return web.Response(text="\r\n".join(lines) + "\r\n")
+
+    async def rpc2(self, request: web.Request) -> web.Response:
+        await asyncio.sleep(self.delay)
+        body = json.loads(await request.text())
+        return web.Response(text=json.dumps(self.answer(body)))
+
+    def answer(self, body: dict) -> dict:
+        method = body["method"]
+        response = {"id": body["id"], "result": True, "session": "bench"}
+        if method == "global.login":
+            if not body["params"]["password"]:
+                response["result"] = False
+                response["params"] = {"realm": "Login to bench", "random": "12345"}
+            else:
+                response["params"] = {"keepAliveInterval": 60}
+        elif method == "system.multicall":
+            response["params"] = [self.answer(call) for call in body["params"]]
+        elif method == "configManager.getConfig":
+            name = body["params"]["name"]
+            if name in DEVICE_CONFIGS:
+                response["params"] = {"table": DEVICE_CONFIGS[name]}
+            else:
+                response["result"] = False
+                response["error"] = {"code": 268959743, "message": "Unknown error!"}
+        else:
+            response["params"] = {}
+        return response
+
+
+class Traffic:
+    """Counts the requests, URL and body bytes of a session with an aiohttp TraceConfig"""
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.sent = 0
+        self.received = 0
+        self.trace = aiohttp.TraceConfig()
+        self.trace.on_request_start.append(self._on_request_start)
+        self.trace.on_request_chunk_sent.append(self._on_chunk_sent)
+        self.trace.on_response_chunk_received.append(self._on_chunk_received)
+
+    async def _on_request_start(self, session, context, params) -> None:
+        self.requests += 1
+        self.sent += len(str(params.url))
+
+    async def _on_chunk_sent(self, session, context, params) -> None:
+        self.sent += len(params.chunk)
+
+    async def _on_chunk_received(self, session, context, params) -> None:
+        self.received += len(params.chunk)
+
+    def reset(self) -> None:
+        self.requests = self.sent = self.received = 0
+
+
+async def poll_cgi_unbatched(client, backend) -> dict:
+    data = dict(await client.async_get_video_in_mode())
+    for result in await asyncio.gather(
+        *(client.async_get_config(name) for name in POLLED_CONFIGS)
+    ):
+        data.update(result)
+    return data
+
+
+async def poll_backend_cycle(client, backend) -> dict:
+    """What the coordinator does: VideoInMode first (it picks the Lighting profile), then the configs at once"""
+    data = await backend.async_get_configs(["VideoInMode"])
+    if data is None:
+        data = dict(await client.async_get_video_in_mode())
+    batch = await backend.async_get_configs(POLLED_CONFIGS)
+    if batch is None:
+        for result in await asyncio.gather(
+            *(client.async_get_config(name) for name in POLLED_CONFIGS)
+        ):
+            batch = {**(batch or {}), **result}
+    data.update(batch or {})
+    return data
+
+
+async def run(label, poll, polls, host, port, username, password) -> dict:
+    traffic = Traffic()
+    async with aiohttp.ClientSession(trace_configs=[traffic.trace]) as session:
+        client = client_module.DahuaClient(username, password, host, port, 554, session)
+        rpc2_client = rpc2.DahuaRpc2Client(username, password, host, port, 554, session)
+        backend = poll_backend.CgiPollBackend(client)
+        if label.startswith("rpc2"):
+            backend = poll_backend.Rpc2PollBackend(rpc2_client, backend)
+
+        # Warm up: digest challenge, RPC2 login and whether the firmware batches getConfig
+        data = await poll(client, backend)
+        traffic.reset()
+        latency = metrics.LatencyStats(polls)
+        for _ in range(polls):
+            start = time.perf_counter()
+            await poll(client, backend)
+            latency.add(time.perf_counter() - start)
+
+    stats = latency.as_dict()
+    return {
+        "label": label,
+        "data": data,
+        "keys": len(data),
+        "requests": traffic.requests / polls,
+        "sent": traffic.sent / polls,
+        "received": traffic.received / polls,
+        "p50": stats["p50_ms"],
+        "p95": stats["p95_ms"],
+    }
+
+
+async def main() -> None:
+    polls = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    delay = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.02
+    runner = None
+    if len(sys.argv) > 5:
+        host, username, password = sys.argv[3:6]
+        port = int(sys.argv[6]) if len(sys.argv) > 6 else 80
+        print("Polling {0}:{1}, {2} polls per backend".format(host, port, polls))
+    else:
+        host, username, password, port = "127.0.0.1", "admin", "admin", 0
+        runner = web.AppRunner(FakeDevice(delay).app())
+        await runner.setup()
+        site = web.TCPSite(runner, host, 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        print(
+            "Polling a local fake device ({0:.0f} ms per request), {1} polls per backend".format(
+                delay * 1000, polls
+            )
+        )
+
+    cycles = (
+        ("cgi, one request per config", poll_cgi_unbatched),
+        ("cgi, batched getConfig", poll_backend_cycle),
+        ("rpc2, system.multicall", poll_backend_cycle),
+    )
+    try:
+        results = [
+            await run(label, poll, polls, host, port, username, password)
+            for label, poll in cycles
+        ]
+    finally:
+        if runner is not None:
+            await runner.cleanup()
+
+    print()
+    print(
+        "{0:<30} {1:>6} {2:>10} {3:>10} {4:>10} {5:>9} {6:>9}".format(
+            "backend", "keys", "requests", "sent B", "recv B", "p50 ms", "p95 ms"
+        )
+    )
+    for result in results:
+        print(
+            "{label:<30} {keys:>6} {requests:>10.1f} {sent:>10.0f} {received:>10.0f} {p50:>9} {p95:>9}".format(
+                **result
+            )
+        )
+
+    # The RPC2 tables are flattened into the keys the CGI API returns, both should give the same data
+    baseline = results[0]["data"]
+    for result in results[1:]:
+        differ = [
+            key
+            for key in baseline.keys() | result["data"].keys()
+            if baseline.get(key) != result["data"].get(key)
+        ]
+        print(
+            "{0}: {1}".format(
+                result["label"],
+                "same data as CGI"
+                if not differ
+                else "{0} keys differ from CGI, e.g. {1}".format(
+                    len(differ), sorted(differ)[:5]
+                ),
+            )
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""Benchmark decoding the VTO (DHIP) event stream.
+
+Times the previous decoder (split on newlines, str() the bytes and scan for
+JSON objects with raw_decode) against DhipDecoder, which reads the payload
+length from the DHIP header. The stream is fed in random chunk sizes like a
+TCP socket delivers it.
+
+Without a capture file the stream is built from the notifyEventStream messages
+a VTO sends (BackKeyLight, VideoMotionInfo, IntelliFrame with many objects).
+To replay recorded traffic, save the raw bytes received from port 5000 (for
+example with tcpdump/Wireshark "follow TCP stream", raw, server to client only)
+and pass the file.
+
+Doesn't need Home Assistant or aiohttp.
+
+Usage: python3 bench_vto_decoder.py [messages] [max_chunk] [capture file]
+Example: python3 bench_vto_decoder.py 5000 4096
+"""
+
+import importlib
+import json
+import random
+import sys
+import time
+import types
+from json import JSONDecoder
+from pathlib import Path
+
+# Load the integration's modules without running its __init__, which needs Home Assistant
+PACKAGE_PATH = Path(__file__).resolve().parent.parent / "custom_components" / "dahua"
+package = types.ModuleType("dahua")
+package.__path__ = [str(PACKAGE_PATH)]
+sys.modules["dahua"] = package
+vto = importlib.import_module("dahua.vto")
+
+
+def extract_json_objects(text, decoder=JSONDecoder()):
+    pos = 0
+    while True:
+        match = text.find("{", pos)
+        if match == -1:
+            break
+        try:
+            result, index = decoder.raw_decode(text[match:])
+            yield result
+            pos = match + index
+        except ValueError:
+            pos = match + 1
+
+
+class PreviousDecoder:
+    """The decoder before the DHIP header was used, kept here as the baseline"""
+
+    def __init__(self) -> None:
+        self.buffer = bytearray()
+
+    def feed(self, data: bytes) -> list:
+        messages = []
+        self.buffer += data
+        while b"\n" in self.buffer:
+            newline_index = self.buffer.find(b"\n") + 1
+            packet = self.buffer[:newline_index]
+            self.buffer = self.buffer[newline_index:]
+            messages.extend(extract_json_objects(str(packet)))
+        return messages
+
+
+def make_stream(count: int) -> bytes:
+    messages = []
+    for i in range(count):
+        kind = i % 3
+        if kind == 0:
+            event = {"Action": "Pulse", "Code": "BackKeyLight", "Data": {"State": 1}}
+        elif kind == 1:
+            event = {
+                "Action": "State",
+                "Code": "VideoMotionInfo",
+                "Data": [
+                    {
+                        "Id": 0,
+                        "Region": [4194303] * 18,
+                        "RegionName": "Region1",
+                        "State": "Active",
+                        "Threshold": 54,
+                    }
+                ],
+                "Index": 0,
+            }
+        else:
+            event = {
+                "Action": "Pulse",
+                "Code": "IntelliFrame",
+                "Data": {
+                    "Objects": [
+                        {
+                            "BoundingBox": [4816, 4552, 5248, 5272],
+                            "ObjectID": n,
+                            "ObjectType": "Human",
+                        }
+                        for n in range(20)
+                    ],
+                    "PTS": 42986015370.0 + i,
+                },
+                "Index": 0,
+            }
+        message = {
+            "id": 8,
+            "method": "client.notifyEventStream",
+            "params": {"SID": 513, "eventList": [event]},
+            "session": 1722306858,
+        }
+        # The VTO sends compact JSON followed by a newline, which the previous decoder relied on
+        payload = (json.dumps(message, separators=(",", ":")) + "\n").encode()
+        header = b"\x20\x00\x00\x00DHIP" + bytes(8)
+        header += len(payload).to_bytes(4, "little") + bytes(4)
+        header += len(payload).to_bytes(4, "little") + bytes(4)
+        messages.append(header + payload)
+    return b"".join(messages)
+
+
+def chunk(stream: bytes, max_chunk: int) -> list:
+    rng = random.Random(1)
+    chunks = []
+    pos = 0
+    while pos < len(stream):
+        size = rng.randint(1, max_chunk)
+        chunks.append(stream[pos : pos + size])
+        pos += size
+    return chunks
+
+
+def timed(name: str, chunks: list, decoder) -> None:
+    start = time.perf_counter()
+    count = 0
+    for data in chunks:
+        count += len(decoder.feed(data))
+    elapsed = time.perf_counter() - start
+    size = sum(len(c) for c in chunks) / 1e6
+    print(
+        f"{name:20s} {elapsed * 1000:8.1f} ms  {size / elapsed:7.1f} MB/s  {count} messages"
+    )
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    max_chunk = int(sys.argv[2]) if len(sys.argv) > 2 else 4096
+    if len(sys.argv) > 3:
+        stream = Path(sys.argv[3]).read_bytes()
+    else:
+        stream = make_stream(count)
+    chunks = chunk(stream, max_chunk)
+    print(f"{len(stream)} bytes in {len(chunks)} chunks of up to {max_chunk} bytes")
+
+    timed("previous decoder", chunks, PreviousDecoder())
+    timed("DhipDecoder", chunks, vto.DhipDecoder())
+
+
+if __name__ == "__main__":
+    main()
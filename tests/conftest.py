@@ -16,8 +16,15 @@ from custom_components.dahua.const import (
     CONF_PORT,
     CONF_RTSP_PORT,
     CONF_USERNAME,
+    DEFAULT_EVENT_RATE_LIMIT,
     DOMAIN,
 )
+from custom_components.dahua.event_router import EventRouter
+from custom_components.dahua.event_throttle import EventThrottle
+from custom_components.dahua.models import DahuaState
+from custom_components.dahua.poll_backend import CgiPollBackend
+from custom_components.dahua.refresh_scheduler import RefreshScheduler
+from custom_components.dahua.snapshot_cache import SnapshotCache
 
 # Re-export fixtures from pytest-homeassistant-custom-component
 pytest_plugins = ["pytest_homeassistant_custom_component"]
@@ -86,7 +93,8 @@ def mock_client() -> AsyncMock:
     client.async_get_zoomfocus_v1.side_effect = ClientError()
     client.async_get_config.side_effect = ClientError()
 
-    # Periodic polling defaults
+    # Periodic polling defaults. Batched getConfig is off so the individual getters are used
+    client.async_get_config_batch.return_value = None
     client.async_get_config_motion_detection.return_value = {
         "table.MotionDetect[0].Enable": "true"
     }
@@ -129,9 +137,19 @@ def mock_coordinator(hass, mock_config_entry, mock_client):
     coordinator._supports_lighting_v2 = False
     coordinator._supports_audio_cgi = False
     coordinator._audio_encoding_enabled = None
+    coordinator._supports_rpc2 = False
+    coordinator._rpc2_client = MagicMock()
+    coordinator._rpc2_client.multicall = AsyncMock(
+        side_effect=ConnectionError("RPC2 error: Method not found")
+    )
+    coordinator._poll_backend = CgiPollBackend(mock_client)
+    coordinator._rpc2_keep_alive = False
+    coordinator._closed = False
     coordinator._supports_zoom_focus = False
     coordinator._supports_floodlightmode = False
     coordinator._supports_profile_mode = False
+    coordinator._probe_results = {}
+    coordinator._capabilities_from_store = False
     coordinator._serial_number = "SERIAL123"
     coordinator._update_serial = ""
     coordinator._profile_mode = "0"
@@ -139,16 +157,25 @@ def mock_coordinator(hass, mock_config_entry, mock_client):
     coordinator._channel = 0
     coordinator._channel_number = 1
     coordinator._address = "192.168.1.108"
+    coordinator._port = 80
     coordinator._max_streams = 3
     coordinator._name = "TestCam"
     coordinator._username = "admin"
     coordinator._password = "password"
-    coordinator._event_task = None
+    coordinator._event_unsubscribe = None
+    coordinator._event_hub = None
     coordinator._vto_task = None
-    coordinator._vto_client = None
-    coordinator._dahua_event_listeners = {}
+    coordinator._vto_supervisor = None
+    coordinator._event_router = EventRouter()
+    coordinator._event_throttle = EventThrottle(DEFAULT_EVENT_RATE_LIMIT)
     coordinator._dahua_event_timestamp = {}
     coordinator._floodlight_mode = 2
+    coordinator._config = {}
+    coordinator._config_data = None
+    coordinator._state = DahuaState()
+    coordinator._state_data = None
+    coordinator._refresh_scheduler = RefreshScheduler()
+    coordinator._snapshot_cache = SnapshotCache(coordinator._async_fetch_snapshot, 1.0)
     coordinator.data = {}
     coordinator.logger = MagicMock()
     coordinator.name = DOMAIN
@@ -0,0 +1,19 @@
+"""Tests for backoff.py."""
+
+import random
+
+from custom_components.dahua.backoff import backoff_delay
+
+
+class TestBackoffDelay:
+    def test_grows_and_is_capped(self):
+        rng = random.Random(1)
+        for attempt in range(12):
+            delay = min(300.0, 2.0 * 2**attempt)
+            assert delay / 2 <= backoff_delay(attempt, 2.0, 300.0, rng) <= delay
+
+    def test_jittered(self):
+        """Devices that disconnect together don't all retry at the same moment."""
+        rng = random.Random(1)
+        delays = {backoff_delay(3, 2.0, 300.0, rng) for _ in range(20)}
+        assert len(delays) == 20
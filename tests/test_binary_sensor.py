@@ -1,10 +1,13 @@
 """Tests for binary_sensor platform."""
 
+from unittest.mock import AsyncMock, MagicMock, patch
+
 import pytest
 from homeassistant.components.binary_sensor import BinarySensorDeviceClass
 
 from custom_components.dahua.binary_sensor import (
     DahuaEventSensor,
+    DahuaEventStreamSensor,
     async_setup_entry,
 )
 
@@ -21,9 +24,12 @@ class TestAsyncSetupEntry:
         await async_setup_entry(None, mock_config_entry, added.append)
 
         all_sensors = [s for sensors in added for s in sensors]
-        event_names = [s._event_name for s in all_sensors]
+        event_names = [
+            s._event_name for s in all_sensors if isinstance(s, DahuaEventSensor)
+        ]
         assert "VideoMotion" in event_names
         assert "CrossLineDetection" in event_names
+        assert any(isinstance(s, DahuaEventStreamSensor) for s in all_sensors)
 
     @pytest.mark.asyncio
     async def test_doorbell_extras(self, mock_coordinator, mock_config_entry):
@@ -101,8 +107,59 @@ class TestDahuaEventSensor:
     ):
         sensor = DahuaEventSensor(mock_coordinator, mock_config_entry, "VideoMotion")
         await sensor.async_added_to_hass()
-        assert "VideoMotion-0" in mock_coordinator._dahua_event_listeners
+        assert mock_coordinator._event_router.has_listener("VideoMotion", 0)
 
     def test_should_poll_false(self, mock_coordinator, mock_config_entry):
         sensor = DahuaEventSensor(mock_coordinator, mock_config_entry, "VideoMotion")
         assert sensor.should_poll is False
+
+
+class TestDahuaEventStreamSensor:
+    def test_off_without_event_stream(self, mock_coordinator, mock_config_entry):
+        sensor = DahuaEventStreamSensor(mock_coordinator, mock_config_entry)
+        assert sensor.is_on is False
+        assert sensor.extra_state_attributes == {}
+        assert sensor.device_class == BinarySensorDeviceClass.CONNECTIVITY
+        assert (
+            sensor.unique_id == mock_coordinator.get_serial_number() + "_event_stream"
+        )
+
+    def test_reports_event_hub_state(self, mock_coordinator, mock_config_entry):
+        mock_coordinator._event_hub = MagicMock()
+        mock_coordinator._event_hub.as_dict.return_value = {
+            "connected": True,
+            "event_lag_seconds": 2.5,
+            "reconnects": 1,
+            "stale_reconnects": 1,
+            "last_backoff_seconds": 1.2,
+        }
+        sensor = DahuaEventStreamSensor(mock_coordinator, mock_config_entry)
+        assert sensor.is_on is True
+        assert sensor.extra_state_attributes == {
+            "event_lag": 2.5,
+            "reconnects": 1,
+            "stale_reconnects": 1,
+        }
+
+    @pytest.mark.asyncio
+    async def test_listens_for_event_stream_signal(
+        self, hass, mock_coordinator, mock_config_entry
+    ):
+        mock_coordinator._event_hub = MagicMock(signal="dahua_event_stream_updated_x")
+        sensor = DahuaEventStreamSensor(mock_coordinator, mock_config_entry)
+        sensor.hass = hass
+
+        with (
+            patch(
+                "custom_components.dahua.binary_sensor.DahuaBaseEntity.async_added_to_hass",
+                new_callable=AsyncMock,
+            ),
+            patch(
+                "custom_components.dahua.binary_sensor.async_dispatcher_connect"
+            ) as mock_connect,
+        ):
+            await sensor.async_added_to_hass()
+
+        mock_connect.assert_called_once_with(
+            hass, "dahua_event_stream_updated_x", sensor.async_write_ha_state
+        )
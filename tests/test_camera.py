@@ -1,8 +1,9 @@
 """Tests for camera platform."""
 
-from unittest.mock import AsyncMock
+from unittest.mock import AsyncMock, MagicMock
 
 import pytest
+from homeassistant.exceptions import HomeAssistantError
 
 from custom_components.dahua.camera import DahuaCamera
 
@@ -62,12 +63,26 @@ class TestDahuaCamera:
         result = await cam.async_camera_image()
         assert result == b"\xff\xd8"
 
+    @pytest.mark.asyncio
+    async def test_async_camera_image_shared_between_streams(
+        self, mock_coordinator, mock_config_entry
+    ):
+        """Main and sub stream entities of a channel share the cached snapshot."""
+        mock_coordinator.client.async_get_snapshot.side_effect = None
+        mock_coordinator.client.async_get_snapshot.return_value = b"\xff\xd8"
+        main = DahuaCamera(mock_coordinator, 0, mock_config_entry)
+        sub = DahuaCamera(mock_coordinator, 1, mock_config_entry)
+
+        assert await main.async_camera_image() == b"\xff\xd8"
+        assert await sub.async_camera_image() == b"\xff\xd8"
+        mock_coordinator.client.async_get_snapshot.assert_called_once_with(1)
+
     @pytest.mark.asyncio
     async def test_async_enable_motion_detection(
         self, mock_coordinator, mock_config_entry
     ):
         mock_coordinator.client.enable_motion_detection = AsyncMock()
-        mock_coordinator.async_refresh = AsyncMock()
+        mock_coordinator.async_request_refresh = AsyncMock()
         cam = DahuaCamera(mock_coordinator, 0, mock_config_entry)
 
         await cam.async_enable_motion_detection()
@@ -79,7 +94,7 @@ class TestDahuaCamera:
         self, mock_coordinator, mock_config_entry
     ):
         mock_coordinator.client.enable_motion_detection = AsyncMock()
-        mock_coordinator.async_refresh = AsyncMock()
+        mock_coordinator.async_request_refresh = AsyncMock()
         cam = DahuaCamera(mock_coordinator, 0, mock_config_entry)
 
         await cam.async_disable_motion_detection()
@@ -117,7 +132,7 @@ class TestDahuaCamera:
     @pytest.mark.asyncio
     async def test_async_set_infrared_mode(self, mock_coordinator, mock_config_entry):
         mock_coordinator.client.async_set_lighting_v1_mode = AsyncMock()
-        mock_coordinator.async_refresh = AsyncMock()
+        mock_coordinator.async_request_refresh = AsyncMock()
         cam = DahuaCamera(mock_coordinator, 0, mock_config_entry)
 
         await cam.async_set_infrared_mode("Auto", 80)
@@ -178,7 +193,7 @@ class TestDahuaCamera:
     @pytest.mark.asyncio
     async def test_async_set_record_mode(self, mock_coordinator, mock_config_entry):
         mock_coordinator.client.async_set_record_mode = AsyncMock()
-        mock_coordinator.async_refresh = AsyncMock()
+        mock_coordinator.async_request_refresh = AsyncMock()
         cam = DahuaCamera(mock_coordinator, 0, mock_config_entry)
 
         await cam.async_set_record_mode("auto")
@@ -187,7 +202,7 @@ class TestDahuaCamera:
     @pytest.mark.asyncio
     async def test_async_adjustfocus(self, mock_coordinator, mock_config_entry):
         mock_coordinator.client.async_adjustfocus_v1 = AsyncMock()
-        mock_coordinator.async_refresh = AsyncMock()
+        mock_coordinator.async_request_refresh = AsyncMock()
         cam = DahuaCamera(mock_coordinator, 0, mock_config_entry)
 
         await cam.async_adjustfocus("10", "5")
@@ -282,7 +297,7 @@ class TestDahuaCamera:
         self, mock_coordinator, mock_config_entry
     ):
         mock_coordinator.client.async_goto_preset_position = AsyncMock()
-        mock_coordinator.async_refresh = AsyncMock()
+        mock_coordinator.async_request_refresh = AsyncMock()
         cam = DahuaCamera(mock_coordinator, 0, mock_config_entry)
 
         await cam.async_goto_preset_position(3)
@@ -293,7 +308,7 @@ class TestDahuaCamera:
         self, mock_coordinator, mock_config_entry
     ):
         mock_coordinator.client.async_set_video_in_day_night_mode = AsyncMock()
-        mock_coordinator.async_refresh = AsyncMock()
+        mock_coordinator.async_request_refresh = AsyncMock()
         cam = DahuaCamera(mock_coordinator, 0, mock_config_entry)
 
         await cam.async_set_video_in_day_night_mode("day", "color")
@@ -340,8 +355,20 @@ class TestDahuaCamera:
     @pytest.mark.asyncio
     async def test_async_vto_cancel_call(self, mock_coordinator, mock_config_entry):
         mock_vto = AsyncMock()
-        mock_coordinator._vto_client = mock_vto
+        mock_coordinator._vto_supervisor = MagicMock(client=mock_vto)
         cam = DahuaCamera(mock_coordinator, 0, mock_config_entry)
 
         await cam.async_vto_cancel_call()
         mock_vto.cancel_call.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_async_vto_cancel_call_rejected(
+        self, mock_coordinator, mock_config_entry
+    ):
+        mock_vto = AsyncMock()
+        mock_vto.cancel_call.return_value = False
+        mock_coordinator._vto_supervisor = MagicMock(client=mock_vto)
+        cam = DahuaCamera(mock_coordinator, 0, mock_config_entry)
+
+        with pytest.raises(HomeAssistantError):
+            await cam.async_vto_cancel_call()
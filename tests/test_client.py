@@ -1,11 +1,17 @@
 """Tests for client.py (DahuaClient)."""
 
+import asyncio
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import aiohttp
 import pytest
 
-from custom_components.dahua.client import DahuaClient
+from custom_components.dahua.client import (
+    DahuaClient,
+    _written_keys,
+    _written_values,
+)
+from custom_components.dahua.digest import _DIGEST_AUTH_CACHES
 
 # --- Constructor tests ---
 
@@ -26,6 +32,30 @@ class TestConstructor:
         client = DahuaClient("admin", "pass", "192.168.1.1/", 80, 554, session)
         assert client._address == "192.168.1.1"
 
+    def test_close_releases_the_shared_digest_challenge(self):
+        session = MagicMock()
+        first = DahuaClient("admin", "pass", "192.168.1.77", 80, 554, session)
+        second = DahuaClient("admin", "pass", "192.168.1.77", 80, 554, session)
+        key = ("http://192.168.1.77:80", "admin")
+
+        first.close()
+        first.close()
+        assert _DIGEST_AUTH_CACHES.get(key) is second._auth_cache
+        second.close()
+        assert _DIGEST_AUTH_CACHES.get(key) is None
+
+    def test_request_limit_applies_to_the_device_until_closed(self):
+        session = MagicMock()
+        camera = DahuaClient("admin", "pass", "192.168.1.78", 80, 554, session)
+        nvr = DahuaClient(
+            "admin", "pass", "192.168.1.78", 80, 554, session, request_limit=6
+        )
+        assert camera._request_scheduler.as_dict()["limit"] == 6
+
+        nvr.close()
+        assert camera._request_scheduler.as_dict()["limit"] == 2
+        camera.close()
+
 
 # --- Static helpers ---
 
@@ -65,27 +95,23 @@ class TestGetRtspStreamUrl:
 
 
 class TestParseDahuaApiResponse:
-    @pytest.mark.asyncio
-    async def test_key_value_parsing(self):
+    def test_key_value_parsing(self):
         data = "key1=value1\nkey2=value2"
-        result = await DahuaClient.parse_dahua_api_response(data)
+        result = DahuaClient.parse_dahua_api_response(data)
         assert result == {"key1": "value1", "key2": "value2"}
 
-    @pytest.mark.asyncio
-    async def test_single_value(self):
+    def test_single_value(self):
         data = "OK"
-        result = await DahuaClient.parse_dahua_api_response(data)
+        result = DahuaClient.parse_dahua_api_response(data)
         assert result == {"OK": "OK"}
 
-    @pytest.mark.asyncio
-    async def test_equals_in_value(self):
+    def test_equals_in_value(self):
         data = "key=value=with=equals"
-        result = await DahuaClient.parse_dahua_api_response(data)
+        result = DahuaClient.parse_dahua_api_response(data)
         assert result == {"key": "value=with=equals"}
 
-    @pytest.mark.asyncio
-    async def test_empty_string(self):
-        result = await DahuaClient.parse_dahua_api_response("")
+    def test_empty_string(self):
+        result = DahuaClient.parse_dahua_api_response("")
         assert result == {}
 
 
@@ -673,6 +699,20 @@ class TestAsyncGetSnapshot:
             assert result == b"\xff\xd8"
             assert "snapshot.cgi?channel=1" in mock_get.call_args[0][0]
 
+    @pytest.mark.asyncio
+    async def test_records_latency(self):
+        client = _make_client()
+        with patch.object(
+            client, "get_bytes", new_callable=AsyncMock, return_value=b"\xff\xd8"
+        ):
+            await client.async_get_snapshot(1)
+            await client.async_get_snapshot(1)
+
+        stats = client.get_snapshot_stats()
+        assert stats["count"] == 2
+        assert stats["p50_ms"] is not None
+        assert stats["p95_ms"] is not None
+
 
 class TestGetSoftwareVersion:
     @pytest.mark.asyncio
@@ -854,6 +894,218 @@ class TestAsyncGetConfig:
             assert result == {}
 
 
+class TestAsyncGetConfigBatch:
+    @pytest.mark.asyncio
+    async def test_single_request_for_all_names(self):
+        client = _make_client()
+        response = {
+            "table.MotionDetect[0].Enable": "true",
+            "table.Lighting[0][0].Mode": "Auto",
+            "table.DisableLinkage.Enable": "false",
+        }
+        with patch.object(
+            client, "get", new_callable=AsyncMock, return_value=response
+        ) as mock_get:
+            result = await client.async_get_config_batch(
+                ["MotionDetect", "Lighting[0][0]", "DisableLinkage"]
+            )
+
+        assert result == response
+        mock_get.assert_called_once()
+        assert mock_get.call_args[0][0] == (
+            "/cgi-bin/configManager.cgi?action=getConfig"
+            "&name=MotionDetect&name=Lighting[0][0]&name=DisableLinkage"
+        )
+        assert client.get_config_batch_stats()["supported"] is True
+
+    @pytest.mark.asyncio
+    async def test_config_the_device_lacks_is_left_out(self):
+        """A device without one of the configs still batches the others."""
+        client = _make_client()
+        response = {
+            "table.MotionDetect[0].Enable": "true",
+            "table.DisableLinkage.Enable": "false",
+            # Lighting_V2 must not be mistaken for Lighting[0][0]
+            "table.Lighting_V2[0][0][0].Mode": "Manual",
+        }
+        with patch.object(
+            client, "get", new_callable=AsyncMock, return_value=response
+        ) as mock_get:
+            names = ["MotionDetect", "Lighting[0][0]", "DisableLinkage"]
+            assert await client.async_get_config_batch(names) == response
+            await client.async_get_config_batch(names)
+
+        # The caller gets Lighting[0][0] on its own, later batches don't ask for it
+        assert mock_get.call_args[0][0] == (
+            "/cgi-bin/configManager.cgi?action=getConfig"
+            "&name=MotionDetect&name=DisableLinkage"
+        )
+        stats = client.get_config_batch_stats()
+        assert stats["supported"] is True
+        assert stats["excluded"] == ["Lighting[0][0]"]
+
+    @pytest.mark.asyncio
+    async def test_first_batch_without_any_config_disables_batching(self):
+        client = _make_client()
+        with patch.object(
+            client, "get", new_callable=AsyncMock, return_value={}
+        ) as mock_get:
+            names = ["MotionDetect", "Lighting[0][0]"]
+            assert await client.async_get_config_batch(names) is None
+            assert await client.async_get_config_batch(names) is None
+
+        mock_get.assert_called_once()
+        stats = client.get_config_batch_stats()
+        assert stats["supported"] is False
+        assert stats["fallbacks"] == 2
+
+    @pytest.mark.asyncio
+    async def test_error_after_batching_worked_keeps_batching(self):
+        client = _make_client()
+        req_info = MagicMock()
+        req_info.real_url = "http://test"
+        names = ["MotionDetect", "DisableLinkage"]
+        with patch.object(
+            client,
+            "get",
+            new_callable=AsyncMock,
+            return_value={
+                "table.MotionDetect[0].Enable": "true",
+                "table.DisableLinkage.Enable": "false",
+            },
+        ):
+            await client.async_get_config_batch(names)
+        with patch.object(
+            client,
+            "get",
+            new_callable=AsyncMock,
+            side_effect=aiohttp.ClientResponseError(req_info, (), status=400),
+        ):
+            assert await client.async_get_config_batch(names) is None
+
+        assert client.get_config_batch_stats()["supported"] is True
+
+    @pytest.mark.asyncio
+    async def test_error_falls_back(self):
+        client = _make_client()
+        req_info = MagicMock()
+        req_info.real_url = "http://test"
+        with patch.object(
+            client,
+            "get",
+            new_callable=AsyncMock,
+            side_effect=aiohttp.ClientResponseError(req_info, (), status=400),
+        ):
+            result = await client.async_get_config_batch(
+                ["MotionDetect", "VideoInMode"]
+            )
+
+        assert result is None
+        assert client.get_config_batch_stats()["supported"] is False
+
+
+class TestWriteListener:
+    def test_written_keys(self):
+        assert _written_keys(
+            "http://cam/cgi-bin/configManager.cgi?action=setConfig"
+            "&Lighting[0][0].Mode=Manual&Lighting[0][0].MiddleLight[0].Light=50"
+        ) == {"Lighting"}
+        assert _written_keys(
+            "http://cam/cgi-bin/configManager.cgi?action=setConfig&DisableLinkage[0].Enable=true"
+        ) == {"DisableLinkage"}
+        assert _written_keys(
+            "http://cam/cgi-bin/ptz.cgi?action=start&channel=1&code=GotoPreset"
+        ) == {"ptz"}
+        assert (
+            _written_keys(
+                "http://cam/cgi-bin/configManager.cgi?action=getConfig&name=X"
+            )
+            == set()
+        )
+        assert _written_keys("http://cam/cgi-bin/ptz.cgi?action=getStatus") == set()
+
+    def test_written_values(self):
+        assert _written_values(
+            "http://cam/cgi-bin/configManager.cgi?action=setConfig"
+            "&Lighting[0][0].Mode=Manual&ChannelTitle[0].Name=Front%20Door"
+        ) == {
+            "table.Lighting[0][0].Mode": "Manual",
+            "table.ChannelTitle[0].Name": "Front Door",
+        }
+        assert (
+            _written_values(
+                "http://cam/cgi-bin/configManager.cgi?action=getConfig&name=Lighting"
+            )
+            == {}
+        )
+        assert (
+            _written_values(
+                "http://cam/cgi-bin/ptz.cgi?action=start&channel=1&code=GotoPreset"
+            )
+            == {}
+        )
+
+    @pytest.mark.asyncio
+    async def test_listener_called_after_write(self):
+        client = _make_client()
+        written = []
+        remove = client.add_write_listener(
+            lambda keys, values: written.append((keys, values))
+        )
+
+        mock_response = AsyncMock()
+        mock_response.raise_for_status = MagicMock()
+        mock_response.text = AsyncMock(return_value="OK")
+        mock_response.close = MagicMock()
+        with patch("custom_components.dahua.client.DigestAuth") as mock_auth_cls:
+            mock_auth_cls.return_value.request = AsyncMock(return_value=mock_response)
+            await client.async_set_disarming_linkage(0, True)
+            remove()
+            await client.async_set_disarming_linkage(0, False)
+
+        assert written == [
+            ({"DisableLinkage"}, {"table.DisableLinkage[0].Enable": "true"})
+        ]
+
+    @pytest.mark.asyncio
+    async def test_values_not_reported_when_write_rejected(self):
+        client = _make_client()
+        written = []
+        client.add_write_listener(lambda keys, values: written.append((keys, values)))
+
+        mock_response = AsyncMock()
+        mock_response.raise_for_status = MagicMock()
+        mock_response.text = AsyncMock(return_value="Error")
+        mock_response.close = MagicMock()
+        with patch("custom_components.dahua.client.DigestAuth") as mock_auth_cls:
+            mock_auth_cls.return_value.request = AsyncMock(return_value=mock_response)
+            await client.async_set_disarming_linkage(0, True)
+
+        assert written == [({"DisableLinkage"}, {})]
+
+
+class TestSetConfigCoalescing:
+    @pytest.mark.asyncio
+    async def test_concurrent_setters_share_one_request(self):
+        client = _make_client()
+
+        mock_response = AsyncMock()
+        mock_response.raise_for_status = MagicMock()
+        mock_response.text = AsyncMock(return_value="OK")
+        mock_response.close = MagicMock()
+        with patch("custom_components.dahua.client.DigestAuth") as mock_auth_cls:
+            mock_auth_cls.return_value.request = AsyncMock(return_value=mock_response)
+            await asyncio.gather(
+                client.async_set_disarming_linkage(0, True),
+                client.async_set_event_notifications(0, False),
+            )
+
+        mock_auth_cls.return_value.request.assert_called_once()
+        url = mock_auth_cls.return_value.request.call_args[0][1]
+        assert "action=setConfig&DisableLinkage[0].Enable=true" in url
+        assert "DisableEventNotify[0].Enable=true" in url
+
+
 class TestAsyncGetConfigLighting:
     @pytest.mark.asyncio
     async def test_success(self):
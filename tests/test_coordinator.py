@@ -4,6 +4,8 @@ from unittest.mock import MagicMock, patch
 
 import pytest
 
+from custom_components.dahua.event_throttle import EventThrottle
+
 # --- Model detection ---
 
 
@@ -284,6 +286,20 @@ class TestSupportsSmartMotionDetectionAmcrest:
 # --- State getters ---
 
 
+class TestGetConfig:
+    def test_projected_once_per_data(self, mock_coordinator):
+        mock_coordinator.data = {"table.MotionDetect[0].Enable": "true"}
+        config = mock_coordinator.get_config()
+
+        assert config["table"]["MotionDetect"][0]["Enable"] is True
+        assert mock_coordinator.get_config() is config
+
+        mock_coordinator.data = {"table.MotionDetect[0].Enable": "false"}
+        assert (
+            mock_coordinator.get_config()["table"]["MotionDetect"][0]["Enable"] is False
+        )
+
+
 class TestIsMotionDetectionEnabled:
     def test_enabled(self, mock_coordinator):
         mock_coordinator.data = {"table.MotionDetect[0].Enable": "true"}
@@ -492,71 +508,6 @@ class TestGetAddress:
 # --- Event handling ---
 
 
-class TestOnReceive:
-    def test_video_motion_start(self, mock_coordinator):
-        """VideoMotion Start should set timestamp and call listener."""
-        called = []
-        mock_coordinator.add_dahua_event_listener(
-            "VideoMotion", lambda: called.append(True)
-        )
-
-        data = (
-            b"--myboundary\n"
-            b"Content-Type: text/plain\n"
-            b"Content-Length: 50\n"
-            b"\n"
-            b"Code=VideoMotion;action=Start;index=0"
-        )
-
-        with patch("custom_components.dahua.time") as mock_time:
-            mock_time.time.return_value = 1000
-            mock_coordinator.on_receive(data, 0)
-
-        assert len(called) == 1
-        assert mock_coordinator.get_event_timestamp("VideoMotion") == 1000
-
-    def test_video_motion_stop(self, mock_coordinator):
-        """VideoMotion Stop should clear timestamp and call listener."""
-        called = []
-        mock_coordinator.add_dahua_event_listener(
-            "VideoMotion", lambda: called.append(True)
-        )
-
-        # Set initial timestamp
-        mock_coordinator._dahua_event_timestamp["VideoMotion-0"] = 1000
-
-        data = (
-            b"--myboundary\n"
-            b"Content-Type: text/plain\n"
-            b"Content-Length: 50\n"
-            b"\n"
-            b"Code=VideoMotion;action=Stop;index=0"
-        )
-        mock_coordinator.on_receive(data, 0)
-
-        assert len(called) == 1
-        assert mock_coordinator.get_event_timestamp("VideoMotion") == 0
-
-    def test_wrong_channel_ignored(self, mock_coordinator):
-        """Events for wrong channel should be ignored."""
-        called = []
-        mock_coordinator.add_dahua_event_listener(
-            "VideoMotion", lambda: called.append(True)
-        )
-        mock_coordinator._channel = 0
-
-        data = (
-            b"--myboundary\n"
-            b"Content-Type: text/plain\n"
-            b"Content-Length: 50\n"
-            b"\n"
-            b"Code=VideoMotion;action=Start;index=1"
-        )
-        mock_coordinator.on_receive(data, 0)
-
-        assert len(called) == 0
-
-
 class TestTranslateEventCode:
     def test_crossline_human_to_smart_motion(self, mock_coordinator):
         """CrossLineDetection with Human ObjectType -> SmartMotionHuman when no CrossLine listener."""
@@ -712,7 +663,52 @@ class TestAddDahuaEventListener:
             return None
 
         mock_coordinator.add_dahua_event_listener("VideoMotion", listener)
-        assert mock_coordinator._dahua_event_listeners.get("VideoMotion-0") is listener
+        route = mock_coordinator._event_router.route("VideoMotion", 0)
+        assert route.listeners == [listener]
+
+    def test_multiple_listeners_are_called(self, mock_coordinator):
+        """A second listener for the same event doesn't replace the first."""
+        first = MagicMock()
+        second = MagicMock()
+        mock_coordinator.add_dahua_event_listener("VideoMotion", first)
+        remove = mock_coordinator.add_dahua_event_listener("VideoMotion", second)
+
+        mock_coordinator.on_event({"Code": "VideoMotion", "action": "Start"})
+        first.assert_called_once()
+        second.assert_called_once()
+
+        remove()
+        mock_coordinator.on_event({"Code": "VideoMotion", "action": "Stop"})
+        assert first.call_count == 2
+        second.assert_called_once()
+
+
+class TestEventThrottle:
+    def test_every_event_is_fired_by_default(self, mock_coordinator):
+        with patch.object(mock_coordinator.hass.bus, "fire") as mock_fire:
+            for _ in range(50):
+                mock_coordinator.on_event(
+                    {"Code": "VideoMotionInfo", "action": "Start", "data": {"UTC": 1}}
+                )
+
+        assert mock_fire.call_count == 50
+
+    def test_flood_is_not_fired_on_the_bus(self, mock_coordinator):
+        """Identical events are collapsed on the bus, but listeners still see every one."""
+        mock_coordinator._event_throttle = EventThrottle(2.0)
+        listener = MagicMock()
+        mock_coordinator.add_dahua_event_listener("VideoMotionInfo", listener)
+
+        with patch.object(mock_coordinator.hass.bus, "fire") as mock_fire:
+            for _ in range(50):
+                mock_coordinator.on_event(
+                    {"Code": "VideoMotionInfo", "action": "Start", "data": {"UTC": 1}}
+                )
+
+        assert mock_fire.call_count == 1
+        assert listener.call_count == 50
+        stats = mock_coordinator.get_event_stats()["throttle"]["events"]
+        assert stats["VideoMotionInfo"]["collapsed"] == 49
 
 
 # --- Cleanup ---
@@ -720,12 +716,14 @@ class TestAddDahuaEventListener:
 
 class TestAsyncStop:
     @pytest.mark.asyncio
-    async def test_cancels_event_task(self, mock_coordinator):
-        mock_task = MagicMock()
-        mock_coordinator._event_task = mock_task
-        await mock_coordinator.async_stop()
-        mock_task.cancel.assert_called_once()
-        assert mock_coordinator._event_task is None
+    async def test_unsubscribes_from_event_hub(self, mock_coordinator):
+        unsubscribe = MagicMock()
+        mock_coordinator._event_unsubscribe = unsubscribe
+        with patch("custom_components.dahua.release_event_hub") as release:
+            await mock_coordinator.async_stop()
+        unsubscribe.assert_called_once()
+        release.assert_called_once_with("192.168.1.108", 80, "admin")
+        assert mock_coordinator._event_unsubscribe is None
 
     @pytest.mark.asyncio
     async def test_cancels_vto_task(self, mock_coordinator):
@@ -741,83 +739,34 @@ class TestAsyncStop:
         await mock_coordinator.async_stop()
 
 
-class TestOnReceiveExtended:
-    def _make_event_data(self, event_str):
-        """Format event string with boundary markers for parse_event."""
-        return (
-            "--myboundary\r\n"
-            "Content-Type: text/plain\r\n"
-            "Content-Length: 100\r\n"
-            "\r\n"
-            f"{event_str}"
-        ).encode("utf-8")
+class TestAsyncStartEventListener:
+    @pytest.mark.asyncio
+    async def test_subscribes_to_event_hub(self, mock_coordinator):
+        """async_start_event_listener subscribes the channel to the device's shared event hub."""
+        mock_coordinator.events = ["VideoMotion"]
+        with patch("custom_components.dahua.get_event_hub") as mock_get_hub:
+            hub = mock_get_hub.return_value
+            await mock_coordinator.async_start_event_listener()
 
-    def test_event_with_index_parsing(self, mock_coordinator):
-        """on_receive parses index from event data (lines 650-655)."""
-        called = []
-        mock_coordinator.add_dahua_event_listener(
-            "CrossLineDetection", lambda: called.append(True)
+        mock_get_hub.assert_called_once_with(
+            mock_coordinator.hass, mock_coordinator.client, "192.168.1.108", 80, "admin"
         )
-
-        data = self._make_event_data("Code=CrossLineDetection;action=Start;index=0")
-        with patch("custom_components.dahua.time") as mock_time:
-            mock_time.time.return_value = 5000
-            mock_coordinator.on_receive(data, 0)
-
-        assert len(called) == 1
-
-    def test_event_with_invalid_index(self, mock_coordinator):
-        """Non-integer index defaults to 0 (lines 654-655)."""
-        called = []
-        mock_coordinator.add_dahua_event_listener(
-            "VideoMotion", lambda: called.append(True)
+        hub.subscribe.assert_called_once_with(
+            mock_coordinator.client, 0, ["VideoMotion"], mock_coordinator.on_event
         )
+        assert mock_coordinator._event_unsubscribe is hub.subscribe.return_value
 
-        data = self._make_event_data("Code=VideoMotion;action=Start;index=abc")
-        with patch("custom_components.dahua.time") as mock_time:
-            mock_time.time.return_value = 5000
-            mock_coordinator.on_receive(data, 0)
-
-        assert len(called) == 1
-
-    def test_empty_events_returns_early(self, mock_coordinator):
-        """Empty data returns early without errors (line 643)."""
-        mock_coordinator.on_receive(b"", 0)
-
-    def test_event_wrong_channel_index(self, mock_coordinator):
-        """Events with index != channel are discarded (lines 659)."""
-        called = []
-        mock_coordinator._channel = 0
-        mock_coordinator.add_dahua_event_listener(
-            "VideoMotion", lambda: called.append(True)
-        )
-
-        data = self._make_event_data("Code=VideoMotion;action=Start;index=1")
-        mock_coordinator.on_receive(data, 0)
-
-        assert len(called) == 0
-
-
-class TestAsyncStartEventListener:
-    @pytest.mark.asyncio
-    async def test_creates_task(self, mock_coordinator):
-        """async_start_event_listener creates a task when events exist (lines 187-188)."""
-        import asyncio
-
-        mock_coordinator.events = ["VideoMotion"]
-        with patch.object(
-            mock_coordinator, "_async_stream_events", return_value=asyncio.sleep(0)
-        ):
+        # Not subscribed again when a failed initialization is retried
+        with patch("custom_components.dahua.get_event_hub") as mock_get_hub:
             await mock_coordinator.async_start_event_listener()
-            assert mock_coordinator._event_task is not None
-            mock_coordinator._event_task.cancel()
+        mock_get_hub.assert_not_called()
 
     @pytest.mark.asyncio
-    async def test_no_events_no_task(self, mock_coordinator):
-        """No task created when events is None."""
+    async def test_no_events_no_subscription(self, mock_coordinator):
+        """No subscription when events is None."""
         mock_coordinator.events = None
         await mock_coordinator.async_start_event_listener()
-        assert mock_coordinator._event_task is None
+        assert mock_coordinator._event_unsubscribe is None
 
 
 class TestAsyncStartVtoEventListener:
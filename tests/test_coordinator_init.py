@@ -4,12 +4,19 @@ from unittest.mock import AsyncMock, MagicMock, patch
 
 import aiohttp
 import pytest
+from homeassistant.config_entries import ConfigEntryState
 from homeassistant.helpers.update_coordinator import UpdateFailed
 
 from custom_components.dahua import (
     async_setup_entry,
     async_unload_entry,
 )
+from custom_components.dahua.digest import _DIGEST_AUTH_CACHES
+from custom_components.dahua.poll_backend import Rpc2PollBackend
+from custom_components.dahua.refresh_scheduler import KEY_LIGHTING, RefreshScheduler
+from custom_components.dahua.request_scheduler import _REQUEST_SCHEDULERS
+from custom_components.dahua.rpc2 import _RPC2_CLIENTS
+from custom_components.dahua.write_queue import _SET_CONFIG_QUEUES
 
 
 def _clear_polling_side_effects(mock_client):
@@ -370,6 +377,54 @@ class TestAsyncUpdateDataInit:
         assert mock_coordinator.model == "IPC-XXXX"
 
 
+class TestStoredCapabilities:
+    async def _init(self, coordinator):
+        coordinator.initialized = False
+        with patch.object(
+            coordinator,
+            "async_start_event_listener",
+            new_callable=AsyncMock,
+        ):
+            await coordinator._async_update_data()
+
+    @pytest.mark.asyncio
+    async def test_second_start_skips_probes(self, mock_coordinator, mock_client):
+        """Capabilities found on the first start are reused while the firmware is unchanged."""
+        _clear_polling_side_effects(mock_client)
+        await self._init(mock_coordinator)
+        assert mock_coordinator.is_capabilities_from_store() is False
+        assert mock_coordinator._supports_ptz_position is True
+
+        mock_client.get_max_extra_streams.reset_mock()
+        mock_client.async_get_ptz_position.reset_mock()
+        mock_coordinator._supports_ptz_position = False
+        mock_coordinator.model = ""
+        # Make everything due again so the poll reads PTZ like on a fresh start
+        mock_coordinator._refresh_scheduler = RefreshScheduler()
+        await self._init(mock_coordinator)
+
+        assert mock_coordinator.is_capabilities_from_store() is True
+        assert mock_coordinator._supports_ptz_position is True
+        assert mock_coordinator.model == "IPC-HDW5831R-ZE"
+        mock_client.get_max_extra_streams.assert_not_called()
+        # Called once by the poll, not by the probes
+        assert mock_client.async_get_ptz_position.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_firmware_change_probes_again(self, mock_coordinator, mock_client):
+        _clear_polling_side_effects(mock_client)
+        await self._init(mock_coordinator)
+
+        mock_client.get_software_version.return_value = {
+            "version": "2.820.0000000.0.R,build:2023-01-01"
+        }
+        mock_client.get_max_extra_streams.reset_mock()
+        await self._init(mock_coordinator)
+
+        assert mock_coordinator.is_capabilities_from_store() is False
+        mock_client.get_max_extra_streams.assert_called_once()
+
+
 class TestAsyncUpdateDataPolling:
     @pytest.mark.asyncio
     async def test_basic_polling(self, mock_coordinator, mock_client):
@@ -512,6 +567,227 @@ class TestAsyncUpdateDataPolling:
         assert mock_coordinator._profile_mode == "0"
 
 
+class TestAsyncUpdateDataBatchedConfig:
+    @pytest.mark.asyncio
+    async def test_batched_configs(self, mock_coordinator, mock_client):
+        """configManager configs come from one batched request when the device supports it."""
+        _clear_polling_side_effects(mock_client)
+        mock_coordinator._supports_disarming_linkage = True
+        mock_client.async_get_config_batch.return_value = {
+            "table.MotionDetect[0].Enable": "true",
+            "table.Lighting[0][0].Mode": "Auto",
+            "table.DisableLinkage.Enable": "false",
+        }
+
+        data = await mock_coordinator._async_update_data()
+
+        names = mock_client.async_get_config_batch.call_args[0][0]
+        assert names == ["MotionDetect", "Lighting[0][0]", "DisableLinkage"]
+        assert data["table.DisableLinkage.Enable"] == "false"
+        mock_client.async_get_config_motion_detection.assert_not_called()
+        mock_client.async_get_config_lighting.assert_not_called()
+        mock_client.async_get_disarming_linkage.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_config_missing_from_the_batch_is_fetched_on_its_own(
+        self, mock_coordinator, mock_client
+    ):
+        """A device without one of the configs still gets the others from the batch."""
+        _clear_polling_side_effects(mock_client)
+        mock_coordinator._supports_disarming_linkage = True
+        mock_client.async_get_config_batch.return_value = {
+            "table.MotionDetect[0].Enable": "true",
+            "table.DisableLinkage.Enable": "false",
+        }
+
+        data = await mock_coordinator._async_update_data()
+
+        assert data["table.Lighting[0][0].Mode"] == "Auto"
+        mock_client.async_get_config_lighting.assert_called_once()
+        mock_client.async_get_config_motion_detection.assert_not_called()
+        mock_client.async_get_disarming_linkage.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_falls_back_to_individual_configs(
+        self, mock_coordinator, mock_client
+    ):
+        _clear_polling_side_effects(mock_client)
+        mock_client.async_get_config_batch.return_value = None
+
+        data = await mock_coordinator._async_update_data()
+
+        assert data["table.MotionDetect[0].Enable"] == "true"
+        assert data["table.Lighting[0][0].Mode"] == "Auto"
+        mock_client.async_get_config_motion_detection.assert_called_once()
+
+
+class TestAsyncUpdateDataPollBackend:
+    @pytest.mark.asyncio
+    async def test_rpc2_selected_when_probe_succeeds(
+        self, mock_coordinator, mock_client
+    ):
+        mock_coordinator.initialized = False
+        _clear_polling_side_effects(mock_client)
+        mock_coordinator._rpc2_client.multicall = AsyncMock(
+            side_effect=lambda calls: [
+                {"result": True, "params": {"table": [{"Enable": True}]}} for _ in calls
+            ]
+        )
+
+        with patch.object(
+            mock_coordinator,
+            "async_start_event_listener",
+            new_callable=AsyncMock,
+        ):
+            data = await mock_coordinator._async_update_data()
+
+        assert isinstance(mock_coordinator._poll_backend, Rpc2PollBackend)
+        mock_coordinator._rpc2_client.start_keep_alive.assert_called_once()
+        assert data["table.MotionDetect[0].Enable"] == "true"
+        assert mock_coordinator.get_poll_backend_stats()["backend"] == "rpc2"
+        await mock_coordinator.async_stop()
+        mock_coordinator._rpc2_client.stop_keep_alive.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_cgi_kept_when_probe_fails(self, mock_coordinator, mock_client):
+        mock_coordinator.initialized = False
+        _clear_polling_side_effects(mock_client)
+
+        with patch.object(
+            mock_coordinator,
+            "async_start_event_listener",
+            new_callable=AsyncMock,
+        ):
+            await mock_coordinator._async_update_data()
+
+        assert mock_coordinator._supports_rpc2 is False
+        assert mock_coordinator.get_poll_backend_stats() == {"backend": "cgi"}
+
+    @pytest.mark.asyncio
+    async def test_profile_mode_from_poll_backend(self, mock_coordinator, mock_client):
+        _clear_polling_side_effects(mock_client)
+        mock_coordinator._supports_profile_mode = True
+        mock_coordinator._poll_backend = MagicMock()
+        mock_coordinator._poll_backend.async_get_configs = AsyncMock(
+            side_effect=[{"table.VideoInMode[0].Config[0]": "1"}, None]
+        )
+
+        await mock_coordinator._async_update_data()
+
+        assert mock_coordinator._profile_mode == "1"
+        mock_client.async_get_video_in_mode.assert_not_called()
+
+
+class TestAsyncUpdateDataRefreshScheduler:
+    @pytest.mark.asyncio
+    async def test_only_due_keys_are_fetched(self, mock_coordinator, mock_client):
+        """State that was just refreshed keeps its value from the last poll."""
+        _clear_polling_side_effects(mock_client)
+        mock_coordinator.data = await mock_coordinator._async_update_data()
+        mock_client.async_get_config_motion_detection.reset_mock()
+        mock_client.async_get_config_lighting.reset_mock()
+
+        data = await mock_coordinator._async_update_data()
+
+        mock_client.async_get_config_motion_detection.assert_not_called()
+        mock_client.async_get_config_lighting.assert_not_called()
+        assert data["table.MotionDetect[0].Enable"] == "true"
+
+    @pytest.mark.asyncio
+    async def test_tick_with_nothing_due_keeps_data(
+        self, mock_coordinator, mock_client
+    ):
+        """A tick that refreshed nothing returns the same dict, so no state is written."""
+        _clear_polling_side_effects(mock_client)
+        mock_coordinator.data = await mock_coordinator._async_update_data()
+
+        data = await mock_coordinator._async_update_data()
+
+        assert data is mock_coordinator.data
+
+    @pytest.mark.asyncio
+    async def test_unchanged_data_does_not_notify_listeners(
+        self, hass, mock_config_entry
+    ):
+        from custom_components.dahua import DahuaDataUpdateCoordinator
+
+        coordinator = DahuaDataUpdateCoordinator(
+            hass,
+            mock_config_entry,
+            [],
+            "192.168.1.108",
+            80,
+            554,
+            "admin",
+            "password",
+            "TestCam",
+            0,
+            MagicMock(),
+        )
+        data = {"table.MotionDetect[0].Enable": "true"}
+        listener = MagicMock()
+        coordinator.async_add_listener(listener)
+
+        with patch.object(
+            coordinator, "_async_update_data", AsyncMock(return_value=data)
+        ):
+            await coordinator.async_refresh()
+            await coordinator.async_refresh()
+
+        assert listener.call_count == 1
+        await coordinator.async_shutdown()
+
+    @pytest.mark.asyncio
+    async def test_invalidated_key_is_fetched(self, mock_coordinator, mock_client):
+        _clear_polling_side_effects(mock_client)
+        mock_coordinator.data = await mock_coordinator._async_update_data()
+        mock_client.async_get_config_motion_detection.reset_mock()
+        mock_client.async_get_config_lighting.reset_mock()
+
+        mock_coordinator._refresh_scheduler.invalidate([KEY_LIGHTING])
+        await mock_coordinator._async_update_data()
+
+        mock_client.async_get_config_lighting.assert_called_once()
+        mock_client.async_get_config_motion_detection.assert_not_called()
+
+
+class TestOnWrite:
+    def test_patches_known_values_and_invalidates(self, mock_coordinator):
+        mock_coordinator.data = {
+            "table.Lighting[0][0].Mode": "Auto",
+            "table.MotionDetect[0].Enable": "true",
+        }
+        mock_coordinator._refresh_scheduler.record(KEY_LIGHTING, "Auto")
+        mock_coordinator.async_set_updated_data = MagicMock()
+
+        mock_coordinator._on_write(
+            {KEY_LIGHTING},
+            {
+                "table.Lighting[0][0].Mode": "Manual",
+                "table.Lighting[0][0].Unknown": "1",
+            },
+        )
+
+        mock_coordinator.async_set_updated_data.assert_called_once_with(
+            {
+                "table.Lighting[0][0].Mode": "Manual",
+                "table.MotionDetect[0].Enable": "true",
+            }
+        )
+        assert mock_coordinator._refresh_scheduler.is_due(KEY_LIGHTING)
+
+    def test_unchanged_values_do_not_update(self, mock_coordinator):
+        mock_coordinator.data = {"table.Lighting[0][0].Mode": "Manual"}
+        mock_coordinator.async_set_updated_data = MagicMock()
+
+        mock_coordinator._on_write(
+            {KEY_LIGHTING}, {"table.Lighting[0][0].Mode": "Manual"}
+        )
+        mock_coordinator._on_write({KEY_LIGHTING}, {})
+
+        mock_coordinator.async_set_updated_data.assert_not_called()
+
+
 # --- Setup / Unload ---
 
 
@@ -540,6 +816,32 @@ class TestAsyncSetupEntry:
 
         assert result is True
 
+    @pytest.mark.asyncio
+    async def test_failed_first_refresh_releases_shared_state(
+        self, hass, mock_config_entry
+    ):
+        """A failed first refresh is retried, each retry must give back what the coordinator took"""
+        registries = (
+            _DIGEST_AUTH_CACHES,
+            _SET_CONFIG_QUEUES,
+            _REQUEST_SCHEDULERS,
+            _RPC2_CLIENTS,
+        )
+        before = [dict(registry._holders) for registry in registries]
+        mock_config_entry.add_to_hass(hass)
+
+        with patch(
+            "custom_components.dahua.DahuaDataUpdateCoordinator._async_update_data",
+            AsyncMock(side_effect=UpdateFailed("Device unreachable")),
+        ):
+            assert not await hass.config_entries.async_setup(mock_config_entry.entry_id)
+            await hass.async_block_till_done()
+
+        assert mock_config_entry.state is ConfigEntryState.SETUP_RETRY
+        assert [dict(registry._holders) for registry in registries] == before
+        # Cancels the retry
+        await hass.config_entries.async_unload(mock_config_entry.entry_id)
+
 
 class TestAsyncUnloadEntry:
     @pytest.mark.asyncio
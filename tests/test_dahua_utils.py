@@ -1,9 +1,16 @@
 """Tests for dahua_utils module."""
 
+import random
+
 from custom_components.dahua.dahua_utils import (
+    EventStreamParser,
+    config_value,
     dahua_brightness_to_hass_brightness,
     hass_brightness_to_dahua_brightness,
+    parse_config_path,
     parse_event,
+    project_config,
+    typed_config_value,
 )
 
 
@@ -95,3 +102,180 @@ class TestParseEvent:
         assert events[0]["Code"] == "VideoMotion"
         # data remains as the invalid string, not parsed as JSON
         assert isinstance(events[0]["data"], str)
+
+    def test_event_with_json_data_containing_separators(self):
+        data = (
+            "--myboundary\n"
+            "Content-Type: text/plain\n"
+            "Content-Length: 80\n"
+            "\n"
+            'Code=VideoMotion;action=Start;index=0;data={"Name" : "a=b;c"}'
+        )
+        events = parse_event(data)
+        assert len(events) == 1
+        assert events[0]["index"] == "0"
+        assert events[0]["data"]["Name"] == "a=b;c"
+
+
+def _make_part(body, newline="\r\n", content_length=True):
+    headers = ["--myboundary", "Content-Type: text/plain"]
+    if content_length:
+        headers.append("Content-Length: {0}".format(len(body.encode("utf-8"))))
+    return (
+        newline.join(headers) + newline + newline + body + newline + newline
+    ).encode("utf-8")
+
+
+def _make_stream(count, newline="\r\n", content_length=True):
+    """Returns a stream of count events with heartbeats and multi-line JSON data mixed in"""
+    parts = []
+    for i in range(count):
+        if i % 5 == 0:
+            parts.append(_make_part("Heartbeat", newline, content_length))
+        body = "Code=VideoMotion;action=Start;index={0}".format(i)
+        if i % 3 == 0:
+            body += ';data={{{0}   "Id" : [ {1} ],{0}   "Name" : "x;y=z"{0}}}'.format(
+                newline, i
+            )
+        parts.append(_make_part(body, newline, content_length))
+    return b"".join(parts)
+
+
+class TestParseConfigPath:
+    def test_names_and_indexes(self):
+        assert parse_config_path("table.Lighting_V2[0][1][0].Mode") == (
+            "table",
+            "Lighting_V2",
+            0,
+            1,
+            0,
+            "Mode",
+        )
+
+    def test_plain_key(self):
+        assert parse_config_path("version") == ("version",)
+        assert parse_config_path("") == ()
+
+
+class TestTypedConfigValue:
+    def test_values(self):
+        assert typed_config_value("true") is True
+        assert typed_config_value("False") is False
+        assert typed_config_value("50") == 50
+        assert typed_config_value("-1") == -1
+        assert typed_config_value("0") == 0
+        assert typed_config_value("0123") == "0123"
+        assert typed_config_value("Manual") == "Manual"
+        assert typed_config_value("") == ""
+
+
+class TestProjectConfig:
+    def test_nested_and_typed(self):
+        tree = project_config(
+            {
+                "table.Lighting_V2[0][1][0].Mode": "Manual",
+                "table.Lighting_V2[0][1][0].MiddleLight[0].Light": "50",
+                "table.MotionDetect[0].Enable": "true",
+                "version": "2.800.0000016.0.R",
+            }
+        )
+
+        assert config_value(tree, "table", "Lighting_V2", 0, 1, 0, "Mode") == "Manual"
+        assert (
+            config_value(
+                tree, "table", "Lighting_V2", 0, 1, 0, "MiddleLight", 0, "Light"
+            )
+            == 50
+        )
+        assert config_value(tree, "table", "MotionDetect", 0, "Enable") is True
+        assert config_value(tree, "version") == "2.800.0000016.0.R"
+
+    def test_missing_path_returns_default(self):
+        tree = project_config({"table.MotionDetect[0].Enable": "true"})
+
+        assert config_value(tree, "table", "MotionDetect", 1, "Enable") is None
+        assert config_value(tree, "table", "MotionDetect", 0, "Enable", "X") is None
+        assert config_value(tree, "table", "Lighting", default="") == ""
+
+
+def _random_chunks(data, rng):
+    chunks = []
+    pos = 0
+    while pos < len(data):
+        size = rng.randint(1, 64)
+        chunks.append(data[pos : pos + size])
+        pos += size
+    return chunks
+
+
+class TestEventStreamParser:
+    def test_single_chunk(self):
+        parser = EventStreamParser()
+        events = parser.feed(_make_stream(3))
+        assert [event["index"] for event in events] == ["0", "1", "2"]
+        assert events[0]["data"] == {"Id": [0], "Name": "x;y=z"}
+
+    def test_event_split_across_chunks(self):
+        parser = EventStreamParser()
+        data = _make_part("Code=VideoMotion;action=Stop;index=1")
+        assert parser.feed(data[:20]) == []
+        assert parser.feed(data[20:50]) == []
+        events = parser.feed(data[50:])
+        assert len(events) == 1
+        assert events[0]["action"] == "Stop"
+
+    def test_heartbeat_is_skipped(self):
+        parser = EventStreamParser()
+        assert parser.feed(_make_part("Heartbeat")) == []
+
+    def test_content_length_too_large(self):
+        """A wrong Content-Length doesn't swallow the next event."""
+        data = _make_part("Code=VideoMotion;action=Start;index=0").replace(
+            b"Content-Length: 37", b"Content-Length: 500"
+        )
+        data += _make_part("Code=VideoMotion;action=Stop;index=0")
+        parser = EventStreamParser()
+        events = parser.feed(data)
+        assert [event["action"] for event in events] == ["Start", "Stop"]
+
+    def test_without_content_length_ends_at_next_boundary(self):
+        parser = EventStreamParser()
+        assert (
+            parser.feed(
+                _make_part(
+                    "Code=VideoMotion;action=Start;index=0", content_length=False
+                )
+            )
+            == []
+        )
+        events = parser.feed(_make_part("Heartbeat", content_length=False))
+        assert len(events) == 1
+        assert events[0]["action"] == "Start"
+
+    def test_randomized_chunk_splits(self):
+        """Every event is returned exactly once no matter how the stream is split."""
+        rng = random.Random(1234)
+        for newline in ("\r\n", "\n"):
+            for content_length in (True, False):
+                data = _make_stream(50, newline, content_length)
+                for _ in range(20):
+                    parser = EventStreamParser()
+                    events = []
+                    for chunk in _random_chunks(data, rng):
+                        events.extend(parser.feed(chunk))
+                    if not content_length:
+                        # The last part only completes when the next boundary arrives
+                        events.extend(parser.feed(b"--myboundary\r\n"))
+                    assert [event["index"] for event in events] == [
+                        str(i) for i in range(50)
+                    ]
+                    assert events[3]["data"]["Id"] == [3]
+
+    def test_drops_oversized_part(self):
+        parser = EventStreamParser()
+        parser.MAX_PART_SIZE = 100
+        parser.feed(
+            b"--myboundary\r\nContent-Type: text/plain\r\n\r\nCode=" + b"x" * 200
+        )
+        events = parser.feed(_make_part("Code=VideoMotion;action=Start;index=0"))
+        assert len(events) == 1
@@ -32,3 +32,36 @@ class TestDiagnostics:
         assert "smart_motion_detection" in result["supports"]
         assert "flood_light" in result["supports"]
         assert "doorbell" in result["supports"]
+
+    @pytest.mark.asyncio
+    async def test_diagnostics_includes_digest_auth_stats(
+        self, hass, mock_coordinator, mock_config_entry
+    ):
+        """Digest auth cache counters from the client are included."""
+        mock_config_entry.runtime_data = mock_coordinator
+        mock_coordinator.data = {}
+        mock_coordinator.client.get_auth_stats.return_value = {
+            "hits": 10,
+            "misses": 1,
+            "stale": 0,
+        }
+
+        result = await async_get_config_entry_diagnostics(hass, mock_config_entry)
+
+        assert result["digest_auth"]["hits"] == 10
+        assert result["digest_auth"]["misses"] == 1
+
+    @pytest.mark.asyncio
+    async def test_diagnostics_includes_probe_results(
+        self, hass, mock_coordinator, mock_config_entry
+    ):
+        """Capability probe outcomes and timings are included."""
+        mock_config_entry.runtime_data = mock_coordinator
+        mock_coordinator.data = {}
+        mock_coordinator._probe_results = {
+            "ptz_position": {"result": "timeout", "duration_ms": 10000.0}
+        }
+
+        result = await async_get_config_entry_diagnostics(hass, mock_config_entry)
+
+        assert result["capability_probes"]["ptz_position"]["result"] == "timeout"
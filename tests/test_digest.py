@@ -0,0 +1,115 @@
+"""Tests for digest.py (DigestAuth and the shared challenge cache)."""
+
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from custom_components.dahua.digest import (
+    DigestAuth,
+    DigestAuthCache,
+    get_digest_auth_cache,
+    release_digest_auth_cache,
+)
+
+CHALLENGE = 'Digest realm="Login to ABC", qop="auth", nonce="12345", opaque="xyz"'
+
+
+def _response(status, www_authenticate=None):
+    response = MagicMock()
+    response.status = status
+    response.headers = {}
+    if www_authenticate is not None:
+        response.headers["www-authenticate"] = www_authenticate
+    return response
+
+
+class TestGetDigestAuthCache:
+    def test_same_device_shares_cache(self):
+        a = get_digest_auth_cache("http://10.0.0.1:80", "admin")
+        b = get_digest_auth_cache("http://10.0.0.1:80", "admin")
+        assert a is b
+
+    def test_different_user_gets_own_cache(self):
+        a = get_digest_auth_cache("http://10.0.0.2:80", "admin")
+        b = get_digest_auth_cache("http://10.0.0.2:80", "viewer")
+        assert a is not b
+
+    def test_dropped_when_released_by_every_holder(self):
+        a = get_digest_auth_cache("http://10.0.0.9:80", "admin")
+        get_digest_auth_cache("http://10.0.0.9:80", "admin")
+
+        release_digest_auth_cache("http://10.0.0.9:80", "admin")
+        assert get_digest_auth_cache("http://10.0.0.9:80", "admin") is a
+        release_digest_auth_cache("http://10.0.0.9:80", "admin")
+        release_digest_auth_cache("http://10.0.0.9:80", "admin")
+
+        assert get_digest_auth_cache("http://10.0.0.9:80", "admin") is not a
+
+
+class TestDigestAuthCache:
+    @pytest.mark.asyncio
+    async def test_first_request_is_a_miss_then_hits(self):
+        """The first request pays the 401 round-trip, later ones reuse the challenge."""
+        cache = DigestAuthCache()
+        session = MagicMock()
+        session.request = AsyncMock(
+            side_effect=[_response(401, CHALLENGE), _response(200), _response(200)]
+        )
+
+        first = DigestAuth("admin", "pass", session, cache=cache)
+        await first.request("GET", "http://10.0.0.1/cgi-bin/a")
+        second = DigestAuth("admin", "pass", session, cache=cache)
+        response = await second.request("GET", "http://10.0.0.1/cgi-bin/b")
+
+        assert response.status == 200
+        assert session.request.call_count == 3
+        assert cache.misses == 1
+        assert cache.hits == 1
+        assert cache.nonce_count == 2
+        # The second request was sent with the authorization header straight away
+        headers = session.request.call_args_list[2].kwargs["headers"]
+        assert 'nonce="12345"' in headers["AUTHORIZATION"]
+        assert "nc=00000002" in headers["AUTHORIZATION"]
+
+    @pytest.mark.asyncio
+    async def test_stale_nonce_rechallenges(self):
+        cache = DigestAuthCache()
+        cache.challenge = {"realm": "r", "nonce": "old", "qop": "auth"}
+        session = MagicMock()
+        session.request = AsyncMock(
+            side_effect=[_response(401, CHALLENGE), _response(200)]
+        )
+
+        auth = DigestAuth("admin", "pass", session, cache=cache)
+        response = await auth.request("GET", "http://10.0.0.1/cgi-bin/a")
+
+        assert response.status == 200
+        assert cache.stale == 1
+        assert cache.challenge["nonce"] == "12345"
+        assert cache.nonce_count == 1
+
+    @pytest.mark.asyncio
+    async def test_bad_credentials_only_retry_once(self):
+        """A 401 after a fresh challenge is returned instead of retrying forever."""
+        cache = DigestAuthCache()
+        session = MagicMock()
+        session.request = AsyncMock(
+            side_effect=[_response(401, CHALLENGE), _response(401, CHALLENGE)]
+        )
+
+        auth = DigestAuth("admin", "wrong", session, cache=cache)
+        response = await auth.request("GET", "http://10.0.0.1/cgi-bin/a")
+
+        assert response.status == 401
+        assert session.request.call_count == 2
+
+    def test_previous_state_without_cache(self):
+        auth = DigestAuth(
+            "admin",
+            "pass",
+            MagicMock(),
+            {"last_nonce": "abc", "nonce_count": 3, "challenge": {"nonce": "abc"}},
+        )
+        assert auth.last_nonce == "abc"
+        assert auth.nonce_count == 3
+        assert auth.challenge == {"nonce": "abc"}
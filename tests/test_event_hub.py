@@ -0,0 +1,285 @@
+"""Tests for event_hub.py."""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+
+from custom_components.dahua import event_hub
+from custom_components.dahua.event_hub import get_event_hub, release_event_hub
+from custom_components.dahua.registry import SharedRegistry
+
+
+def _make_event_data(event):
+    return (
+        "--myboundary\r\nContent-Type: text/plain\r\nContent-Length: {0}\r\n\r\n{1}\r\n\r\n".format(
+            len(event), event
+        )
+    ).encode("utf-8")
+
+
+@pytest.fixture
+def client():
+    client = MagicMock()
+    # Never returns, like a healthy event stream
+    client.stream_events = AsyncMock(side_effect=asyncio.Event().wait)
+    return client
+
+
+@pytest.fixture(autouse=True)
+def hubs():
+    hubs = SharedRegistry()
+    with (
+        patch.object(event_hub, "_EVENT_HUBS", hubs),
+        patch.object(event_hub, "STREAM_RESTART_DELAY_SECONDS", 0),
+    ):
+        yield hubs
+    for hub in hubs._values.values():
+        hub.stop()
+
+
+async def _run_loop():
+    """Lets the scheduled stream (re)start run and the stream task call stream_events"""
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+
+class TestDahuaEventHub:
+    @pytest.mark.asyncio
+    async def test_shared_per_device(self, hass, client):
+        hub = get_event_hub(hass, client, "192.168.1.108", 80, "admin")
+        assert get_event_hub(hass, client, "192.168.1.108", 80, "admin") is hub
+        assert get_event_hub(hass, client, "192.168.1.109", 80, "admin") is not hub
+
+    @pytest.mark.asyncio
+    async def test_single_stream_for_all_channels(self, hass, client):
+        hub = get_event_hub(hass, client, "192.168.1.108", 80, "admin")
+        hub.subscribe(client, 0, ["VideoMotion"], MagicMock())
+        hub.subscribe(client, 1, ["VideoMotion", "CrossLineDetection"], MagicMock())
+        await _run_loop()
+
+        assert client.stream_events.call_count == 1
+        assert hub.get_codes() == ["VideoMotion", "CrossLineDetection"]
+
+    @pytest.mark.asyncio
+    async def test_subscriptions_within_the_delay_connect_once(self, hass, client):
+        with patch(
+            "custom_components.dahua.event_hub.STREAM_RESTART_DELAY_SECONDS", 0.05
+        ):
+            hub = get_event_hub(hass, client, "192.168.1.108", 80, "admin")
+            hub.subscribe(client, 0, ["VideoMotion"], MagicMock())
+            await asyncio.sleep(0.02)
+            hub.subscribe(client, 1, ["CrossLineDetection"], MagicMock())
+            await asyncio.sleep(0.02)
+            hub.subscribe(client, 2, ["VideoMotion"], MagicMock())
+            await asyncio.sleep(0.1)
+
+        assert client.stream_events.call_count == 1
+        assert client.stream_events.call_args[0][1] == [
+            "VideoMotion",
+            "CrossLineDetection",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_restarts_only_for_new_codes(self, hass, client):
+        hub = get_event_hub(hass, client, "192.168.1.108", 80, "admin")
+        hub.subscribe(client, 0, ["VideoMotion", "CrossLineDetection"], MagicMock())
+        await _run_loop()
+        unsubscribe = hub.subscribe(client, 1, ["VideoMotion"], MagicMock())
+        await _run_loop()
+        unsubscribe()
+        await _run_loop()
+        assert client.stream_events.call_count == 1
+
+        hub.subscribe(client, 1, ["AlarmLocal"], MagicMock())
+        await _run_loop()
+        assert client.stream_events.call_count == 2
+        assert hub.get_codes() == ["VideoMotion", "CrossLineDetection", "AlarmLocal"]
+
+    @pytest.mark.asyncio
+    async def test_all_code_wins(self, hass, client):
+        hub = get_event_hub(hass, client, "192.168.1.108", 80, "admin")
+        hub.subscribe(client, 0, ["VideoMotion"], MagicMock())
+        hub.subscribe(client, 1, ["All"], MagicMock())
+        await _run_loop()
+        assert hub.get_codes() == ["All"]
+
+    @pytest.mark.asyncio
+    async def test_dispatches_by_index(self, hass, client):
+        hub = get_event_hub(hass, client, "192.168.1.108", 80, "admin")
+        channel0 = MagicMock()
+        channel1 = MagicMock()
+        hub.subscribe(client, 0, ["VideoMotion"], channel0)
+        hub.subscribe(client, 1, ["VideoMotion"], channel1)
+
+        hub.on_receive(_make_event_data("Code=VideoMotion;action=Start;index=1"), 0)
+        hub.on_receive(_make_event_data("Code=VideoMotion;action=Stop;index=abc"), 0)
+
+        channel1.assert_called_once()
+        assert channel1.call_args[0][0]["action"] == "Start"
+        # A non-integer index is treated as channel 0
+        channel0.assert_called_once()
+        assert channel0.call_args[0][0]["action"] == "Stop"
+
+    @pytest.mark.asyncio
+    async def test_parses_event_data(self, hass, client):
+        hub = get_event_hub(hass, client, "192.168.1.108", 80, "admin")
+        on_event = MagicMock()
+        hub.subscribe(client, 0, ["CrossLineDetection"], on_event)
+
+        hub.on_receive(
+            _make_event_data(
+                'Code=CrossLineDetection;action=Start;index=0;data={\n   "Object" : { "ObjectType" : "Human" }\n}'
+            ),
+            0,
+        )
+
+        event = on_event.call_args[0][0]
+        assert event["Code"] == "CrossLineDetection"
+        assert event["action"] == "Start"
+        assert event["data"] == {"Object": {"ObjectType": "Human"}}
+
+    @pytest.mark.asyncio
+    async def test_event_split_across_chunks(self, hass, client):
+        hub = get_event_hub(hass, client, "192.168.1.108", 80, "admin")
+        on_event = MagicMock()
+        hub.subscribe(client, 0, ["VideoMotion"], on_event)
+        data = _make_event_data("Code=VideoMotion;action=Start;index=0")
+
+        hub.on_receive(data[:40], 0)
+        on_event.assert_not_called()
+        hub.on_receive(data[40:], 0)
+
+        on_event.assert_called_once()
+        assert on_event.call_args[0][0]["action"] == "Start"
+
+    @pytest.mark.asyncio
+    async def test_events_for_other_channels_are_not_dispatched(self, hass, client):
+        hub = get_event_hub(hass, client, "192.168.1.108", 80, "admin")
+        on_event = MagicMock()
+        hub.subscribe(client, 0, ["VideoMotion"], on_event)
+
+        hub.on_receive(_make_event_data("Code=VideoMotion;action=Start;index=1"), 0)
+        hub.on_receive(b"", 0)
+
+        on_event.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_last_unsubscribe_stops_stream(self, hass, client):
+        hub = get_event_hub(hass, client, "192.168.1.108", 80, "admin")
+        unsubscribe0 = hub.subscribe(client, 0, ["VideoMotion"], MagicMock())
+        unsubscribe1 = hub.subscribe(client, 1, ["CrossLineDetection"], MagicMock())
+
+        await _run_loop()
+
+        unsubscribe1()
+        # Codes are only added to a running stream, the extra code doesn't cost a reconnect
+        assert hub.get_codes() == ["VideoMotion", "CrossLineDetection"]
+        assert hub._task is not None
+
+        unsubscribe0()
+        assert hub._task is None
+
+    @pytest.mark.asyncio
+    async def test_dropped_when_released_by_every_holder(self, hass, client, hubs):
+        hub = get_event_hub(hass, client, "192.168.1.108", 80, "admin")
+        get_event_hub(hass, client, "192.168.1.108", 80, "admin")
+        hub.subscribe(client, 0, ["VideoMotion"], MagicMock())
+        await _run_loop()
+
+        release_event_hub("192.168.1.108", 80, "admin")
+        assert hub._task is not None
+        release_event_hub("192.168.1.108", 80, "admin")
+        assert hub._task is None
+        assert not hubs
+
+    @pytest.mark.asyncio
+    async def test_unsubscribing_client_is_replaced(self, hass, client):
+        other = MagicMock()
+        other.stream_events = AsyncMock(side_effect=asyncio.Event().wait)
+        hub = get_event_hub(hass, client, "192.168.1.108", 80, "admin")
+        hub.subscribe(client, 0, ["VideoMotion"], MagicMock())
+        unsubscribe = hub.subscribe(other, 1, ["VideoMotion"], MagicMock())
+        await _run_loop()
+        assert hub._client is other
+
+        # The entry whose client the stream uses unloads, its client is closed
+        unsubscribe()
+        assert hub._client is client
+
+
+class TestStreamSignal:
+    @pytest.mark.asyncio
+    async def test_connect_and_disconnect_are_signalled(self, hass, client):
+        async def stream_events(on_receive, codes, channel):
+            on_receive(_make_event_data("Heartbeat"), channel)
+            on_receive(_make_event_data("Heartbeat"), channel)
+
+        client.stream_events = AsyncMock(side_effect=stream_events)
+        updates = MagicMock()
+        with patch("custom_components.dahua.event_hub.backoff_delay", return_value=10):
+            hub = get_event_hub(hass, client, "192.168.1.108", 80, "admin")
+            async_dispatcher_connect(hass, hub.signal, updates)
+            hub.subscribe(client, 0, ["VideoMotion"], MagicMock())
+            await asyncio.sleep(0.05)
+            await hass.async_block_till_done()
+
+        # Once when the first heartbeat arrived, once when the stream ended
+        assert updates.call_count == 2
+        assert hub.connected is False
+
+
+class TestWatchdog:
+    @pytest.mark.asyncio
+    async def test_silent_stream_is_reconnected(self, hass, client):
+        async def stream_events(on_receive, codes, channel):
+            await asyncio.Event().wait()
+
+        client.stream_events = AsyncMock(side_effect=stream_events)
+        with (
+            patch("custom_components.dahua.event_hub.STALE_STREAM_SECONDS", 0.05),
+            patch("custom_components.dahua.event_hub.backoff_delay", return_value=0),
+        ):
+            hub = get_event_hub(hass, client, "192.168.1.108", 80, "admin")
+            hub.subscribe(client, 0, ["VideoMotion"], MagicMock())
+            await asyncio.sleep(0.2)
+
+            assert client.stream_events.call_count >= 2
+            assert hub.stale_reconnects >= 1
+            assert hub.as_dict()["connected"] is False
+
+    @pytest.mark.asyncio
+    async def test_heartbeats_keep_stream_open(self, hass, client):
+        hub = get_event_hub(hass, client, "192.168.1.108", 80, "admin")
+
+        async def stream_events(on_receive, codes, channel):
+            while True:
+                on_receive(_make_event_data("Heartbeat"), channel)
+                await asyncio.sleep(0.01)
+
+        client.stream_events = AsyncMock(side_effect=stream_events)
+        with patch("custom_components.dahua.event_hub.STALE_STREAM_SECONDS", 0.05):
+            hub.subscribe(client, 0, ["VideoMotion"], MagicMock())
+            await asyncio.sleep(0.2)
+
+        assert client.stream_events.call_count == 1
+        assert hub.stale_reconnects == 0
+        stats = hub.as_dict()
+        assert stats["connected"] is True
+        assert stats["event_lag_seconds"] < 0.05
+
+    @pytest.mark.asyncio
+    async def test_backoff_grows_on_failures(self, hass, client):
+        client.stream_events = AsyncMock(return_value=None)
+        with patch(
+            "custom_components.dahua.event_hub.backoff_delay", return_value=0
+        ) as mock_backoff:
+            hub = get_event_hub(hass, client, "192.168.1.108", 80, "admin")
+            hub.subscribe(client, 0, ["VideoMotion"], MagicMock())
+            for _ in range(10):
+                await asyncio.sleep(0)
+
+        attempts = [call.args[0] for call in mock_backoff.call_args_list]
+        assert attempts[:3] == [0, 1, 2]
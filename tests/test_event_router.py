@@ -0,0 +1,51 @@
+"""Tests for event_router.py."""
+
+from unittest.mock import MagicMock, patch
+
+from custom_components.dahua.event_router import RATE_WINDOW_SECONDS, EventRouter
+
+
+class TestEventRouter:
+    def test_routes_by_code_and_channel(self):
+        router = EventRouter()
+        listener = MagicMock()
+        router.add_listener("VideoMotion", 1, listener)
+
+        route = router.route("VideoMotion", 1)
+        assert route.key == "VideoMotion-1"
+        assert route.listeners == [listener]
+        assert router.route("VideoMotion", 0) is None
+        assert router.route("CrossLineDetection", 1) is None
+
+    def test_remove_listener(self):
+        router = EventRouter()
+        first = MagicMock()
+        second = MagicMock()
+        remove_first = router.add_listener("VideoMotion", 0, first)
+        remove_second = router.add_listener("VideoMotion", 0, second)
+
+        remove_first()
+        assert router.route("VideoMotion", 0).listeners == [second]
+        remove_second()
+        assert not router.has_listener("VideoMotion", 0)
+        # Removing twice is harmless
+        remove_second()
+
+    def test_event_rates(self):
+        router = EventRouter()
+        router.add_listener("VideoMotion", 0, MagicMock())
+        with patch("custom_components.dahua.event_router.time") as mock_time:
+            mock_time.monotonic.return_value = 1000.0
+            for _ in range(10):
+                router.route("VideoMotion", 0)
+            router.route("NewFile", 0)
+
+            stats = router.as_dict()
+            assert stats["listeners"] == {"VideoMotion-0": 1}
+            assert stats["events"]["VideoMotion"] == {"count": 10, "per_minute": 2.0}
+            assert stats["events"]["NewFile"]["count"] == 1
+
+            # Events older than the window no longer count towards the rate
+            mock_time.monotonic.return_value = 1000.0 + RATE_WINDOW_SECONDS + 1
+            stats = router.as_dict()
+            assert stats["events"]["VideoMotion"] == {"count": 10, "per_minute": 0.0}
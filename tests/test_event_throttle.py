@@ -0,0 +1,56 @@
+"""Tests for event_throttle.py."""
+
+from unittest.mock import patch
+
+from custom_components.dahua.event_throttle import EventThrottle
+
+
+def _event(action="Start", **data):
+    return {"Code": "IntelliFrame", "action": action, "index": "0", "data": data}
+
+
+class TestEventThrottle:
+    def test_token_bucket(self):
+        throttle = EventThrottle(rate=1.0, burst=3, dedup_window=0)
+        with patch("custom_components.dahua.event_throttle.time") as mock_time:
+            mock_time.monotonic.return_value = 100.0
+            results = [throttle.allow("IntelliFrame", _event(Id=i)) for i in range(5)]
+            assert results == [True, True, True, False, False]
+
+            # One token comes back per second
+            mock_time.monotonic.return_value = 101.0
+            assert throttle.allow("IntelliFrame", _event(Id=5)) is True
+            assert throttle.allow("IntelliFrame", _event(Id=6)) is False
+
+        stats = throttle.as_dict()["events"]["IntelliFrame"]
+        assert stats == {"passed": 4, "dropped": 3, "collapsed": 0}
+
+    def test_codes_have_their_own_bucket(self):
+        throttle = EventThrottle(rate=1.0, burst=1, dedup_window=0)
+        with patch("custom_components.dahua.event_throttle.time") as mock_time:
+            mock_time.monotonic.return_value = 100.0
+            assert throttle.allow("IntelliFrame", _event()) is True
+            assert throttle.allow("IntelliFrame", _event()) is False
+            assert throttle.allow("VideoMotion", _event()) is True
+
+    def test_identical_events_are_collapsed(self):
+        throttle = EventThrottle(rate=100.0, dedup_window=1.0)
+        with patch("custom_components.dahua.event_throttle.time") as mock_time:
+            mock_time.monotonic.return_value = 100.0
+            assert throttle.allow("IntelliFrame", _event(UTC=1, Id=1)) is True
+            # Only the time stamps differ
+            assert throttle.allow("IntelliFrame", _event(UTC=2, Id=1)) is False
+            # The action or the data differ
+            assert throttle.allow("IntelliFrame", _event("Stop", UTC=2, Id=1)) is True
+            assert throttle.allow("IntelliFrame", _event("Stop", UTC=2, Id=2)) is True
+
+            # Outside the window
+            mock_time.monotonic.return_value = 101.5
+            assert throttle.allow("IntelliFrame", _event("Stop", UTC=3, Id=2)) is True
+
+        assert throttle.as_dict()["events"]["IntelliFrame"]["collapsed"] == 1
+
+    def test_zero_rate_disables(self):
+        throttle = EventThrottle(rate=0)
+        assert all(throttle.allow("IntelliFrame", _event()) for _ in range(100))
+        assert throttle.as_dict()["events"]["IntelliFrame"]["passed"] == 100
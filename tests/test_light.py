@@ -132,7 +132,7 @@ class TestDahuaInfraredLight:
     @pytest.mark.asyncio
     async def test_turn_on(self, mock_coordinator, mock_config_entry):
         mock_coordinator.client.async_set_lighting_v1 = AsyncMock()
-        mock_coordinator.async_refresh = AsyncMock()
+        mock_coordinator.async_request_refresh = AsyncMock()
         light = DahuaInfraredLight(mock_coordinator, mock_config_entry)
 
         await light.async_turn_on(**{ATTR_BRIGHTNESS: 255})
@@ -143,7 +143,7 @@ class TestDahuaInfraredLight:
     @pytest.mark.asyncio
     async def test_turn_off(self, mock_coordinator, mock_config_entry):
         mock_coordinator.client.async_set_lighting_v1 = AsyncMock()
-        mock_coordinator.async_refresh = AsyncMock()
+        mock_coordinator.async_request_refresh = AsyncMock()
         light = DahuaInfraredLight(mock_coordinator, mock_config_entry)
 
         await light.async_turn_off()
@@ -190,7 +190,7 @@ class TestDahuaIlluminator:
     @pytest.mark.asyncio
     async def test_turn_on(self, mock_coordinator, mock_config_entry):
         mock_coordinator.client.async_set_lighting_v2 = AsyncMock()
-        mock_coordinator.async_refresh = AsyncMock()
+        mock_coordinator.async_request_refresh = AsyncMock()
         light = DahuaIlluminator(mock_coordinator, mock_config_entry)
 
         await light.async_turn_on(**{ATTR_BRIGHTNESS: 128})
@@ -201,7 +201,7 @@ class TestDahuaIlluminator:
     @pytest.mark.asyncio
     async def test_turn_off(self, mock_coordinator, mock_config_entry):
         mock_coordinator.client.async_set_lighting_v2 = AsyncMock()
-        mock_coordinator.async_refresh = AsyncMock()
+        mock_coordinator.async_request_refresh = AsyncMock()
         light = DahuaIlluminator(mock_coordinator, mock_config_entry)
 
         await light.async_turn_off()
@@ -230,7 +230,7 @@ class TestAmcrestRingLight:
     @pytest.mark.asyncio
     async def test_turn_on(self, mock_coordinator, mock_config_entry):
         mock_coordinator.client.async_set_light_global_enabled = AsyncMock()
-        mock_coordinator.async_refresh = AsyncMock()
+        mock_coordinator.async_request_refresh = AsyncMock()
         light = AmcrestRingLight(mock_coordinator, mock_config_entry)
 
         await light.async_turn_on()
@@ -241,7 +241,7 @@ class TestAmcrestRingLight:
     @pytest.mark.asyncio
     async def test_turn_off(self, mock_coordinator, mock_config_entry):
         mock_coordinator.client.async_set_light_global_enabled = AsyncMock()
-        mock_coordinator.async_refresh = AsyncMock()
+        mock_coordinator.async_request_refresh = AsyncMock()
         light = AmcrestRingLight(mock_coordinator, mock_config_entry)
 
         await light.async_turn_off()
@@ -291,7 +291,7 @@ class TestFloodLight:
         mock_coordinator.client.async_get_floodlightmode = AsyncMock(return_value=2)
         mock_coordinator.client.async_set_floodlightmode = AsyncMock()
         mock_coordinator.client.async_set_coaxial_control_state = AsyncMock()
-        mock_coordinator.async_refresh = AsyncMock()
+        mock_coordinator.async_request_refresh = AsyncMock()
         light = FloodLight(mock_coordinator, mock_config_entry)
 
         await light.async_turn_on()
@@ -306,7 +306,7 @@ class TestFloodLight:
         mock_coordinator._floodlight_mode = 2
         mock_coordinator.client.async_set_floodlightmode = AsyncMock()
         mock_coordinator.client.async_set_coaxial_control_state = AsyncMock()
-        mock_coordinator.async_refresh = AsyncMock()
+        mock_coordinator.async_request_refresh = AsyncMock()
         light = FloodLight(mock_coordinator, mock_config_entry)
 
         await light.async_turn_off()
@@ -319,7 +319,7 @@ class TestFloodLight:
     ):
         mock_coordinator._supports_floodlightmode = False
         mock_coordinator.client.async_set_lighting_v2_for_flood_lights = AsyncMock()
-        mock_coordinator.async_refresh = AsyncMock()
+        mock_coordinator.async_request_refresh = AsyncMock()
         light = FloodLight(mock_coordinator, mock_config_entry)
 
         await light.async_turn_on()
@@ -335,7 +335,7 @@ class TestFloodLight:
     ):
         mock_coordinator._supports_floodlightmode = False
         mock_coordinator.client.async_set_lighting_v2_for_flood_lights = AsyncMock()
-        mock_coordinator.async_refresh = AsyncMock()
+        mock_coordinator.async_request_refresh = AsyncMock()
         light = FloodLight(mock_coordinator, mock_config_entry)
 
         await light.async_turn_off()
@@ -380,7 +380,7 @@ class TestDahuaSecurityLight:
     @pytest.mark.asyncio
     async def test_turn_on(self, mock_coordinator, mock_config_entry):
         mock_coordinator.client.async_set_coaxial_control_state = AsyncMock()
-        mock_coordinator.async_refresh = AsyncMock()
+        mock_coordinator.async_request_refresh = AsyncMock()
         light = DahuaSecurityLight(mock_coordinator, mock_config_entry)
 
         await light.async_turn_on()
@@ -391,7 +391,7 @@ class TestDahuaSecurityLight:
     @pytest.mark.asyncio
     async def test_turn_off(self, mock_coordinator, mock_config_entry):
         mock_coordinator.client.async_set_coaxial_control_state = AsyncMock()
-        mock_coordinator.async_refresh = AsyncMock()
+        mock_coordinator.async_request_refresh = AsyncMock()
         light = DahuaSecurityLight(mock_coordinator, mock_config_entry)
 
         await light.async_turn_off()
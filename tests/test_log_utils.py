@@ -0,0 +1,48 @@
+"""Tests for log_utils.py."""
+
+import logging
+from unittest.mock import MagicMock
+
+from custom_components.dahua.log_utils import HotPathLogger, Truncated
+
+
+class TestTruncated:
+    def test_short_payload_unchanged(self):
+        assert str(Truncated({"Code": "VideoMotion"})) == "{'Code': 'VideoMotion'}"
+        assert str(Truncated(b"abc")) == "b'abc'"
+
+    def test_long_payload_truncated(self):
+        assert str(Truncated("x" * 20, max_chars=5)) == "xxxxx... (20 chars)"
+        assert str(Truncated(b"y" * 20, max_chars=5)) == "b'yyyyy'... (20 bytes)"
+
+
+class TestHotPathLogger:
+    def _logger(self, level):
+        logger = MagicMock()
+        logger.isEnabledFor.side_effect = lambda lvl: lvl >= level
+        return logger
+
+    def test_nothing_done_when_disabled(self):
+        logger = self._logger(logging.INFO)
+        HotPathLogger(logger).debug("Events: %s", [1, 2, 3])
+        logger.log.assert_not_called()
+
+    def test_args_are_truncated(self):
+        logger = self._logger(logging.DEBUG)
+        HotPathLogger(logger).debug("Events: %s", "x" * 1000)
+        level, msg, arg = logger.log.call_args.args
+        assert level == logging.DEBUG
+        assert isinstance(arg, Truncated)
+        assert str(arg).endswith("(1000 chars)")
+
+    def test_sampling(self):
+        logger = self._logger(logging.DEBUG)
+        hot = HotPathLogger(logger, sample_every=10)
+        for i in range(25):
+            hot.debug("Event %s", i)
+        assert logger.log.call_count == 3
+        assert [str(call.args[2]) for call in logger.log.call_args_list] == [
+            "0",
+            "10",
+            "20",
+        ]
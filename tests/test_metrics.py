@@ -0,0 +1,24 @@
+"""Tests for metrics.py."""
+
+from custom_components.dahua.metrics import LatencyStats
+
+
+class TestLatencyStats:
+    def test_empty(self):
+        stats = LatencyStats()
+        assert stats.as_dict() == {"count": 0, "p50_ms": None, "p95_ms": None}
+
+    def test_percentiles(self):
+        stats = LatencyStats()
+        for ms in range(1, 101):
+            stats.add(ms / 1000)
+        assert stats.percentile(50) == 50.0
+        assert stats.percentile(95) == 95.0
+
+    def test_keeps_only_recent_samples(self):
+        stats = LatencyStats(max_samples=2)
+        stats.add(10.0)
+        stats.add(0.001)
+        stats.add(0.001)
+        assert stats.count == 3
+        assert stats.percentile(95) == 1.0
@@ -0,0 +1,79 @@
+"""Tests for model_capabilities.py."""
+
+from custom_components.dahua.model_capabilities import (
+    CONTAINS,
+    EXACT,
+    PREFIX,
+    ModelCapabilityDatabase,
+    ModelRule,
+    classify_model,
+)
+from custom_components.dahua.models import ModelInfo
+
+
+class TestModelCapabilityDatabase:
+    def test_match_kinds(self):
+        prefix = ModelRule("IPC", PREFIX, frozenset({"a"}))
+        contains = ModelRule("-AS", CONTAINS, frozenset({"b"}))
+        exact = ModelRule("AD410", EXACT, frozenset({"c"}))
+        database = ModelCapabilityDatabase((prefix, contains, exact))
+
+        assert database.match("IPC-HDW5442TP-AS") == [prefix, contains]
+        assert database.match("XIPC-AS-PV") == [contains]
+        assert database.match("AD410") == [exact]
+        assert database.match("AD4100") == []
+
+    def test_unless_excludes(self):
+        rule = ModelRule("DHI", PREFIX, frozenset({"a"}), unless="NVR")
+        database = ModelCapabilityDatabase((rule,))
+
+        assert database.match("DHI-VTO3311Q") == [rule]
+        assert database.match("DHI-NVR4108HS") == []
+
+
+class TestClassifyModel:
+    def test_siren_camera(self):
+        info = classify_model("IPC-HDW3849HP-AS-PV")
+        assert info.siren is True
+        assert info.security_light is True
+        assert info.speaker is True
+        assert info.infrared_light is False
+        assert info.doorbell is False
+
+    def test_doorbells(self):
+        assert classify_model("VTO2202F-P-S2").doorbell is True
+        assert classify_model("DHI-VTO3311Q-WP").doorbell is True
+        assert classify_model("DHI-NVR4108HS-8P-4KS2").doorbell is False
+        amcrest = classify_model("AD410")
+        assert amcrest.doorbell is True
+        assert amcrest.amcrest_doorbell is True
+        assert amcrest.speaker is True
+        assert amcrest.smart_motion_detection_amcrest is True
+        assert classify_model("DB61i").smart_motion_detection_amcrest is True
+        assert classify_model("DB2X").empiretech_doorbell is True
+        assert classify_model("AV-VB").avaloidgoliath_doorbell is True
+
+    def test_flood_lights(self):
+        info = classify_model("IPC-L46N")
+        assert info.flood_light is True
+        assert info.floodlightmode is True
+        assert info.siren is True
+        assert classify_model("ASH26-W").floodlightmode is False
+        assert classify_model("W452ASD").siren is True
+        assert classify_model("IPC-W452ASD").siren is False
+        assert classify_model("IPC-W452ASD").floodlightmode is True
+
+    def test_speaker_from_update_serial(self):
+        assert classify_model("E891AB").speaker is False
+        assert classify_model("E891AB", "IPC-HDW5442TP-AS").speaker is True
+        # Only the speaker is taken from updateSerial
+        assert classify_model("E891AB", "IPC-HDW3849HP-AS-PV").siren is False
+        assert classify_model("E891AB", "VTO2000").speaker is False
+
+    def test_known_probes(self):
+        assert "snapshot_channel_0" in classify_model("VTO2202F").known_probes
+        assert "smart_motion_detection" in classify_model("AD410").known_probes
+        assert classify_model("IPC-HDW5831R-ZE").known_probes == frozenset()
+
+    def test_regular_camera(self):
+        assert classify_model("IPC-HDW5831R-ZE") == ModelInfo()
@@ -0,0 +1,177 @@
+"""Tests for poll_backend.py."""
+
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from aiohttp import ClientError
+
+from custom_components.dahua import poll_backend
+from custom_components.dahua.poll_backend import (
+    CgiPollBackend,
+    Rpc2PollBackend,
+    flatten_config,
+)
+
+TABLES = {
+    "MotionDetect": [{"Enable": True, "Level": 3}],
+    "Lighting": [[{"Mode": "Auto", "MiddleLight": [{"Light": 50}]}, {"Mode": "Off"}]],
+    "DisableLinkage": {"Enable": False},
+    "VideoAnalyseRule": [[{"Enable": True, "Name": "Rule1"}]],
+}
+
+
+def _rpc2_client(tables=TABLES):
+    async def multicall(calls):
+        responses = []
+        for _, params in calls:
+            name = params["name"]
+            if name in tables:
+                responses.append({"result": True, "params": {"table": tables[name]}})
+            else:
+                responses.append({"result": False, "error": {"code": 268959743}})
+        return responses
+
+    client = MagicMock()
+    client.multicall = AsyncMock(side_effect=multicall)
+    client.calls = client.requests = client.multicalls = 0
+    client.keep_alives = client.logins = 0
+    return client
+
+
+def _cgi_backend(batch=None):
+    client = MagicMock()
+    client.async_get_config_batch = AsyncMock(return_value=batch)
+    return CgiPollBackend(client)
+
+
+class TestFlattenConfig:
+    def test_flattens_like_the_cgi_api(self):
+        flat = flatten_config("Lighting", TABLES["Lighting"])
+
+        assert flat == {
+            "table.Lighting[0][0].Mode": "Auto",
+            "table.Lighting[0][0].MiddleLight[0].Light": "50",
+            "table.Lighting[0][1].Mode": "Off",
+        }
+
+    def test_booleans_and_none(self):
+        flat = flatten_config("General", {"Enable": True, "Off": False, "Name": None})
+
+        assert flat == {
+            "table.General.Enable": "true",
+            "table.General.Off": "false",
+            "table.General.Name": "",
+        }
+
+
+class TestCgiPollBackend:
+    @pytest.mark.asyncio
+    async def test_single_config_is_not_batched(self):
+        backend = _cgi_backend({"table.VideoInMode[0].Config[0]": "1"})
+
+        assert await backend.async_get_configs(["VideoInMode"]) is None
+
+    @pytest.mark.asyncio
+    async def test_batch(self):
+        batch = {"table.MotionDetect[0].Enable": "true"}
+        backend = _cgi_backend(batch)
+
+        assert await backend.async_get_configs(["MotionDetect", "Lighting"]) == batch
+
+
+class TestRpc2PollBackend:
+    @pytest.mark.asyncio
+    async def test_selects_the_requested_configs(self):
+        client = _rpc2_client()
+        backend = Rpc2PollBackend(client, _cgi_backend())
+
+        data = await backend.async_get_configs(
+            [
+                "MotionDetect",
+                "Lighting[0][1]",
+                "DisableLinkage",
+                "VideoAnalyseRule[0][0].Enable",
+            ]
+        )
+
+        assert data == {
+            "table.MotionDetect[0].Enable": "true",
+            "table.MotionDetect[0].Level": "3",
+            "table.Lighting[0][1].Mode": "Off",
+            "table.DisableLinkage.Enable": "false",
+            "table.VideoAnalyseRule[0][0].Enable": "true",
+        }
+        client.multicall.assert_called_once_with(
+            [
+                ("configManager.getConfig", {"name": "MotionDetect"}),
+                ("configManager.getConfig", {"name": "Lighting"}),
+                ("configManager.getConfig", {"name": "DisableLinkage"}),
+                ("configManager.getConfig", {"name": "VideoAnalyseRule"}),
+            ]
+        )
+        assert backend.as_dict()["polls"] == 1
+
+    @pytest.mark.asyncio
+    async def test_config_name_is_read_once(self):
+        client = _rpc2_client()
+        backend = Rpc2PollBackend(client, _cgi_backend())
+
+        await backend.async_get_configs(["Lighting[0][0]", "Lighting[0][1]"])
+
+        client.multicall.assert_called_once_with(
+            [("configManager.getConfig", {"name": "Lighting"})]
+        )
+
+    @pytest.mark.asyncio
+    async def test_missing_config_is_left_out(self):
+        backend = Rpc2PollBackend(_rpc2_client(), _cgi_backend())
+
+        data = await backend.async_get_configs(
+            ["MotionDetect", "LightGlobal[0].Enable"]
+        )
+
+        assert data == {
+            "table.MotionDetect[0].Enable": "true",
+            "table.MotionDetect[0].Level": "3",
+        }
+
+    @pytest.mark.asyncio
+    async def test_failed_poll_falls_back_to_cgi(self):
+        client = _rpc2_client()
+        client.multicall.side_effect = ClientError()
+        batch = {"table.MotionDetect[0].Enable": "true"}
+        backend = Rpc2PollBackend(client, _cgi_backend(batch))
+
+        assert await backend.async_get_configs(["MotionDetect", "Lighting"]) == batch
+        assert backend.enabled is True
+        assert backend.as_dict()["fallbacks"] == 1
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(
+        "response",
+        [{"result": True, "params": None}, {"result": True}],
+        ids=["null params", "missing params"],
+    )
+    async def test_malformed_response_falls_back_to_cgi(self, response):
+        client = _rpc2_client()
+        client.multicall.side_effect = None
+        client.multicall.return_value = [response, response]
+        batch = {"table.MotionDetect[0].Enable": "true"}
+        backend = Rpc2PollBackend(client, _cgi_backend(batch))
+
+        assert await backend.async_get_configs(["MotionDetect", "Lighting"]) == batch
+        assert backend.as_dict()["fallbacks"] == 1
+
+    @pytest.mark.asyncio
+    async def test_disabled_after_repeated_failures(self):
+        client = _rpc2_client(tables={})
+        backend = Rpc2PollBackend(client, _cgi_backend())
+
+        for _ in range(poll_backend.MAX_RPC2_FAILURES):
+            await backend.async_get_configs(["MotionDetect", "Lighting"])
+        client.multicall.reset_mock()
+        await backend.async_get_configs(["MotionDetect", "Lighting"])
+
+        assert backend.enabled is False
+        assert backend.as_dict()["backend"] == "cgi"
+        client.multicall.assert_not_called()
@@ -0,0 +1,197 @@
+"""Tests for probes.py."""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from aiohttp import ClientError
+
+from custom_components.dahua import probes
+from custom_components.dahua.models import ModelInfo
+from custom_components.dahua.probes import CapabilityProbe, async_run_probes
+from custom_components.dahua.request_scheduler import PRIORITY_POLL, RequestScheduler
+
+
+def _make_coordinator():
+    coordinator = MagicMock()
+    coordinator._channel = 2
+    coordinator._channel_number = 3
+    coordinator._profile_mode = "0"
+    coordinator.is_doorbell.return_value = False
+    coordinator.supports_speaker.return_value = True
+    coordinator.get_address.return_value = "192.168.1.108"
+    coordinator.model_info = ModelInfo()
+    return coordinator
+
+
+class TestAsyncRunProbes:
+    @pytest.mark.asyncio
+    async def test_sets_supported_and_unsupported(self):
+        coordinator = _make_coordinator()
+        coordinator.client.async_get_ptz_position = AsyncMock(return_value={})
+        coordinator.client.async_get_lighting_v2 = AsyncMock(side_effect=ClientError())
+        probe_table = tuple(
+            p
+            for p in probes.CAPABILITY_PROBES
+            if p.name in ("ptz_position", "lighting_v2")
+        )
+
+        results = await async_run_probes(coordinator, probe_table)
+
+        assert coordinator._supports_ptz_position is True
+        assert coordinator._supports_lighting_v2 is False
+        assert results["ptz_position"]["result"] == "supported"
+        assert results["lighting_v2"]["result"] == "unsupported"
+        assert results["ptz_position"]["duration_ms"] >= 0
+
+    @pytest.mark.asyncio
+    async def test_malformed_rpc2_response_is_unsupported(self):
+        coordinator = _make_coordinator()
+        # A multicall answered with "params": null
+        coordinator._rpc2_client.multicall = AsyncMock(side_effect=TypeError())
+        probe_table = tuple(p for p in probes.CAPABILITY_PROBES if p.name == "rpc2")
+
+        results = await async_run_probes(coordinator, probe_table)
+
+        assert coordinator._supports_rpc2 is False
+        assert results["rpc2"]["result"] == "unsupported"
+
+    @pytest.mark.asyncio
+    async def test_timeout_keeps_the_default(self):
+        coordinator = _make_coordinator()
+        coordinator._supports_slow = None
+        scheduler = RequestScheduler()
+
+        async def hang():
+            async with scheduler.slot(PRIORITY_POLL):
+                await asyncio.Event().wait()
+
+        probe = CapabilityProbe("slow", "_supports_slow", lambda c: hang())
+        with patch.object(probes, "PROBE_TIMEOUT_SECONDS", 0.01):
+            results = await async_run_probes(coordinator, (probe,))
+
+        assert coordinator._supports_slow is None
+        assert results["slow"]["result"] == "timeout"
+
+    @pytest.mark.asyncio
+    async def test_timeout_starts_when_the_request_gets_its_slot(self):
+        coordinator = _make_coordinator()
+        scheduler = RequestScheduler(limit=1)
+        release = asyncio.Event()
+
+        async def busy():
+            async with scheduler.slot(PRIORITY_POLL):
+                await release.wait()
+
+        async def probe_call(c):
+            async with scheduler.slot(PRIORITY_POLL):
+                await asyncio.sleep(0.02)
+            return {}
+
+        blocker = asyncio.create_task(busy())
+        await asyncio.sleep(0)
+        probe = CapabilityProbe("queued", "_supports_queued", probe_call)
+        with patch.object(probes, "PROBE_TIMEOUT_SECONDS", 0.05):
+            running = asyncio.create_task(async_run_probes(coordinator, (probe,)))
+            # Longer than the probe timeout, but spent waiting for the slot
+            await asyncio.sleep(0.1)
+            release.set()
+            results = await running
+        await blocker
+
+        assert coordinator._supports_queued is True
+        assert results["queued"]["result"] == "supported"
+
+    @pytest.mark.asyncio
+    async def test_queue_timeout(self):
+        coordinator = _make_coordinator()
+        coordinator._supports_slow = False
+
+        async def never_scheduled():
+            await asyncio.Event().wait()
+
+        probe = CapabilityProbe("slow", "_supports_slow", lambda c: never_scheduled())
+        with patch.object(probes, "PROBE_QUEUE_TIMEOUT_SECONDS", 0.01):
+            results = await async_run_probes(coordinator, (probe,))
+
+        assert coordinator._supports_slow is False
+        assert results["slow"]["result"] == "timeout"
+
+    @pytest.mark.asyncio
+    async def test_unexpected_error_propagates(self):
+        coordinator = _make_coordinator()
+        probe = CapabilityProbe(
+            "broken", "_supports_broken", AsyncMock(side_effect=RuntimeError("boom"))
+        )
+        with pytest.raises(RuntimeError):
+            await async_run_probes(coordinator, (probe,))
+
+    @pytest.mark.asyncio
+    async def test_bounded_concurrency(self):
+        coordinator = _make_coordinator()
+        running = 0
+        peak = 0
+
+        async def probe_call(c):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        probe_table = tuple(
+            CapabilityProbe("probe{0}".format(i), "_supports_{0}".format(i), probe_call)
+            for i in range(10)
+        )
+        results = await async_run_probes(coordinator, probe_table)
+
+        assert len(results) == 10
+        assert peak == probes.PROBE_CONCURRENCY
+
+    @pytest.mark.asyncio
+    async def test_later_stage_sees_channel_number(self):
+        """audio.cgi is probed with the channel number found by the snapshot probe."""
+        coordinator = _make_coordinator()
+        coordinator.client.async_get_snapshot = AsyncMock(return_value=b"\xff")
+        coordinator.client.async_get_audio_input = AsyncMock(return_value=None)
+        probe_table = tuple(
+            p
+            for p in probes.CAPABILITY_PROBES
+            if p.name in ("snapshot_channel_0", "audio_cgi")
+        )
+
+        await async_run_probes(coordinator, probe_table)
+
+        assert coordinator._channel_number == 2
+        coordinator.client.async_get_audio_input.assert_called_once_with(2)
+        assert coordinator._supports_audio_cgi is True
+
+    @pytest.mark.asyncio
+    async def test_condition_skips_probe(self):
+        coordinator = _make_coordinator()
+        coordinator.is_doorbell.return_value = True
+        coordinator.client.async_get_config = AsyncMock(return_value={"a": 1, "b": 2})
+        probe_table = tuple(
+            p for p in probes.CAPABILITY_PROBES if p.name == "profile_mode"
+        )
+
+        results = await async_run_probes(coordinator, probe_table)
+
+        assert results == {}
+        coordinator.client.async_get_config.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_known_probe_is_skipped(self):
+        coordinator = _make_coordinator()
+        coordinator.model_info = ModelInfo(known_probes=frozenset({"ptz_position"}))
+        coordinator._supports_ptz_position = False
+        coordinator.client.async_get_ptz_position = AsyncMock(return_value={})
+        probe_table = tuple(
+            p for p in probes.CAPABILITY_PROBES if p.name == "ptz_position"
+        )
+
+        results = await async_run_probes(coordinator, probe_table)
+
+        coordinator.client.async_get_ptz_position.assert_not_called()
+        assert coordinator._supports_ptz_position is False
+        assert results["ptz_position"]["result"] == "known"
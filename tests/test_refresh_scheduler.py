@@ -0,0 +1,67 @@
+"""Tests for refresh_scheduler.py."""
+
+from unittest.mock import patch
+
+from custom_components.dahua.refresh_scheduler import (
+    KEY_DISARMING_LINKAGE,
+    KEY_PTZ,
+    SLOW,
+    VOLATILE,
+    RefreshScheduler,
+)
+
+
+def _at(seconds):
+    return patch(
+        "custom_components.dahua.refresh_scheduler.time.monotonic",
+        return_value=seconds,
+    )
+
+
+class TestRefreshScheduler:
+    def test_new_key_is_due(self):
+        assert RefreshScheduler().is_due(KEY_PTZ) is True
+
+    def test_not_due_until_interval_passed(self):
+        scheduler = RefreshScheduler()
+        with _at(100):
+            scheduler.record(KEY_PTZ, {"status.PresetID": "1"})
+        with _at(100 + VOLATILE[0] - 1):
+            assert scheduler.is_due(KEY_PTZ) is False
+        with _at(100 + VOLATILE[0]):
+            assert scheduler.is_due(KEY_PTZ) is True
+
+    def test_unchanged_value_backs_off_to_max(self):
+        scheduler = RefreshScheduler()
+        value = {"table.DisableLinkage.Enable": "false"}
+        with _at(0):
+            for _ in range(10):
+                scheduler.record(KEY_DISARMING_LINKAGE, value)
+        assert scheduler.as_dict()[KEY_DISARMING_LINKAGE] == SLOW[1]
+
+    def test_changed_value_resets_interval(self):
+        scheduler = RefreshScheduler()
+        with _at(0):
+            scheduler.record(KEY_DISARMING_LINKAGE, {"Enable": "false"})
+            scheduler.record(KEY_DISARMING_LINKAGE, {"Enable": "false"})
+            assert scheduler.as_dict()[KEY_DISARMING_LINKAGE] == SLOW[0] * 2
+            scheduler.record(KEY_DISARMING_LINKAGE, {"Enable": "true"})
+        assert scheduler.as_dict()[KEY_DISARMING_LINKAGE] == SLOW[0]
+
+    def test_invalidate_makes_key_due(self):
+        scheduler = RefreshScheduler()
+        with _at(0):
+            scheduler.record(KEY_DISARMING_LINKAGE, {})
+            scheduler.invalidate([KEY_DISARMING_LINKAGE])
+            assert scheduler.is_due(KEY_DISARMING_LINKAGE) is True
+
+    def test_activity_shortens_interval(self):
+        scheduler = RefreshScheduler()
+        with _at(0):
+            for _ in range(3):
+                scheduler.record(KEY_PTZ, {})
+            assert scheduler.as_dict()[KEY_PTZ] == VOLATILE[1]
+            scheduler.activity([KEY_PTZ])
+        assert scheduler.as_dict()[KEY_PTZ] == VOLATILE[0]
+        with _at(VOLATILE[0]):
+            assert scheduler.is_due(KEY_PTZ) is True
@@ -0,0 +1,244 @@
+"""Tests for request_scheduler.py."""
+
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from custom_components.dahua import request_scheduler
+from custom_components.dahua.request_scheduler import (
+    PRIORITY_COMMAND,
+    PRIORITY_POLL,
+    PRIORITY_SNAPSHOT,
+    RequestScheduler,
+    get_request_scheduler,
+    release_request_scheduler,
+)
+
+
+async def _request(scheduler, priority, started, release):
+    async with scheduler.slot(priority):
+        started.append(priority)
+        await release.wait()
+
+
+class TestRequestScheduler:
+    @pytest.mark.asyncio
+    async def test_limits_concurrency(self):
+        scheduler = RequestScheduler(2)
+        started = []
+        release = asyncio.Event()
+
+        tasks = [
+            asyncio.ensure_future(_request(scheduler, PRIORITY_POLL, started, release))
+            for _ in range(5)
+        ]
+        await asyncio.sleep(0)
+
+        assert len(started) == 2
+        assert scheduler.as_dict()["queue_depth"] == 3
+        assert scheduler.as_dict()["peak_queue_depth"] == 3
+
+        release.set()
+        await asyncio.gather(*tasks)
+        assert len(started) == 5
+        assert scheduler.as_dict()["in_flight"] == 0
+        assert scheduler.as_dict()["wait"]["poll"]["count"] == 5
+
+    @pytest.mark.asyncio
+    async def test_higher_priority_goes_first(self):
+        scheduler = RequestScheduler(1)
+        started = []
+        release = asyncio.Event()
+
+        blocker = asyncio.ensure_future(
+            _request(scheduler, PRIORITY_POLL, started, release)
+        )
+        await asyncio.sleep(0)
+        tasks = [
+            asyncio.ensure_future(_request(scheduler, priority, started, release))
+            for priority in (PRIORITY_POLL, PRIORITY_SNAPSHOT, PRIORITY_COMMAND)
+        ]
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(blocker, *tasks)
+
+        assert started == [
+            PRIORITY_POLL,
+            PRIORITY_COMMAND,
+            PRIORITY_SNAPSHOT,
+            PRIORITY_POLL,
+        ]
+
+    @pytest.mark.asyncio
+    async def test_waiting_request_ages_up(self):
+        scheduler = RequestScheduler(1)
+        started = []
+        release = asyncio.Event()
+
+        with patch.object(request_scheduler.time, "monotonic", return_value=100.0):
+            blocker = asyncio.ensure_future(
+                _request(scheduler, PRIORITY_POLL, started, release)
+            )
+            poll = asyncio.ensure_future(
+                _request(scheduler, PRIORITY_POLL, started, release)
+            )
+            await asyncio.sleep(0)
+        with patch.object(request_scheduler.time, "monotonic", return_value=111.0):
+            snapshot = asyncio.ensure_future(
+                _request(scheduler, PRIORITY_SNAPSHOT, started, release)
+            )
+            await asyncio.sleep(0)
+            release.set()
+            await asyncio.gather(blocker, poll, snapshot)
+
+        # The poll waited more than two AGING_SECONDS and went ahead of the snapshot
+        assert started == [PRIORITY_POLL, PRIORITY_POLL, PRIORITY_SNAPSHOT]
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_gives_up_its_place(self):
+        scheduler = RequestScheduler(1)
+        started = []
+        release = asyncio.Event()
+
+        blocker = asyncio.ensure_future(
+            _request(scheduler, PRIORITY_POLL, started, release)
+        )
+        await asyncio.sleep(0)
+        cancelled = asyncio.ensure_future(
+            _request(scheduler, PRIORITY_COMMAND, started, release)
+        )
+        waiting = asyncio.ensure_future(
+            _request(scheduler, PRIORITY_POLL, started, release)
+        )
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(blocker, waiting)
+
+        assert started == [PRIORITY_POLL, PRIORITY_POLL]
+        assert scheduler.as_dict()["in_flight"] == 0
+        assert scheduler.as_dict()["queue_depth"] == 0
+
+
+class TestTimeout:
+    @pytest.mark.asyncio
+    async def test_timeout_starts_when_the_slot_is_acquired(self):
+        scheduler = RequestScheduler(1)
+        started = []
+        release = asyncio.Event()
+
+        blocker = asyncio.ensure_future(
+            _request(scheduler, PRIORITY_POLL, started, release)
+        )
+        await asyncio.sleep(0)
+        asyncio.get_running_loop().call_later(0.05, release.set)
+
+        # Waits 0.05s for the slot, longer than its timeout
+        async with scheduler.slot(PRIORITY_POLL, timeout=0.03):
+            await asyncio.sleep(0.01)
+        await blocker
+
+    @pytest.mark.asyncio
+    async def test_request_times_out_once_it_has_the_slot(self):
+        scheduler = RequestScheduler(1)
+
+        with pytest.raises(TimeoutError):
+            async with scheduler.slot(PRIORITY_POLL, timeout=0.01):
+                await asyncio.Event().wait()
+        assert scheduler.as_dict()["in_flight"] == 0
+
+    @pytest.mark.asyncio
+    async def test_wait_for_the_slot_is_bounded(self, monkeypatch):
+        monkeypatch.setattr(request_scheduler, "QUEUE_TIMEOUT_SECONDS", 0.01)
+        scheduler = RequestScheduler(1)
+        started = []
+        release = asyncio.Event()
+
+        blocker = asyncio.ensure_future(
+            _request(scheduler, PRIORITY_POLL, started, release)
+        )
+        await asyncio.sleep(0)
+        with pytest.raises(TimeoutError):
+            async with scheduler.slot(PRIORITY_POLL, timeout=10):
+                pass
+        assert scheduler.as_dict()["queue_depth"] == 0
+
+        release.set()
+        await blocker
+        assert scheduler.as_dict()["in_flight"] == 0
+
+
+class TestLimit:
+    @pytest.mark.asyncio
+    async def test_largest_limit_asked_for_applies(self):
+        scheduler = RequestScheduler(2)
+        started = []
+        release = asyncio.Event()
+
+        tasks = [
+            asyncio.ensure_future(_request(scheduler, PRIORITY_POLL, started, release))
+            for _ in range(5)
+        ]
+        await asyncio.sleep(0)
+        assert len(started) == 2
+
+        # A raised limit starts the waiting requests
+        scheduler.add_limit(1)
+        scheduler.add_limit(4)
+        await asyncio.sleep(0)
+        assert len(started) == 4
+        assert scheduler.as_dict()["limit"] == 4
+
+        scheduler.remove_limit(4)
+        assert scheduler.as_dict()["limit"] == 1
+        scheduler.remove_limit(1)
+        assert scheduler.as_dict()["limit"] == 2
+
+        release.set()
+        await asyncio.gather(*tasks)
+        assert scheduler.as_dict()["in_flight"] == 0
+
+    @pytest.mark.asyncio
+    async def test_lowered_limit_applies_as_requests_finish(self):
+        scheduler = RequestScheduler(1)
+        scheduler.add_limit(3)
+        started = []
+        release = asyncio.Event()
+        tasks = [
+            asyncio.ensure_future(_request(scheduler, PRIORITY_POLL, started, release))
+            for _ in range(3)
+        ]
+        await asyncio.sleep(0)
+        assert len(started) == 3
+
+        scheduler.remove_limit(3)
+        waiting = asyncio.Event()
+        late = asyncio.ensure_future(
+            _request(scheduler, PRIORITY_POLL, started, waiting)
+        )
+        release.set()
+        await asyncio.gather(*tasks)
+        await asyncio.sleep(0)
+        assert len(started) == 4
+        assert scheduler.as_dict()["in_flight"] == 1
+
+        waiting.set()
+        await late
+        assert scheduler.as_dict()["in_flight"] == 0
+
+
+class TestGetRequestScheduler:
+    def test_shared_per_host(self):
+        a = get_request_scheduler("http://10.0.0.5:80")
+        b = get_request_scheduler("http://10.0.0.5:80")
+        c = get_request_scheduler("http://10.0.0.6:80")
+        assert a is b
+        assert a is not c
+
+    def test_dropped_when_released_by_every_holder(self):
+        a = get_request_scheduler("http://10.0.0.7:80")
+        release_request_scheduler("http://10.0.0.7:80")
+
+        assert get_request_scheduler("http://10.0.0.7:80") is not a
@@ -0,0 +1,387 @@
+"""Tests for rpc2.py."""
+
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from custom_components.dahua import rpc2
+from custom_components.dahua.request_scheduler import (
+    get_request_scheduler,
+    release_request_scheduler,
+)
+from custom_components.dahua.rpc2 import (
+    DahuaRpc2Client,
+    get_rpc2_client,
+    release_rpc2_client,
+)
+
+
+class FakeDevice:
+    """Answers the RPC2 requests posted by the client, records every posted body"""
+
+    def __init__(self, multicall: bool = True, keep_alive_interval: int = 60):
+        self.multicall = multicall
+        self.keep_alive_interval = keep_alive_interval
+        self.posts: list[dict] = []
+        self.expired = False
+
+    async def post(self, url, data):
+        body = json.loads(data)
+        self.posts.append(body)
+        response = MagicMock()
+        response.json = AsyncMock(return_value=self._answer(body))
+        return response
+
+    def _answer(self, body):
+        method = body["method"]
+        if method == "global.login":
+            if not body["params"]["password"]:
+                return {
+                    "id": body["id"],
+                    "result": False,
+                    "session": "session-1",
+                    "params": {"realm": "realm", "random": "random"},
+                }
+            self.expired = False
+            return {
+                "id": body["id"],
+                "result": True,
+                "session": "session-1",
+                "params": {"keepAliveInterval": self.keep_alive_interval},
+            }
+        if self.expired:
+            return {
+                "id": body["id"],
+                "result": False,
+                "error": {
+                    "code": rpc2.INVALID_SESSION_CODE,
+                    "message": "Invalid session",
+                },
+            }
+        if method == "system.multicall":
+            if not self.multicall:
+                return {
+                    "id": body["id"],
+                    "result": False,
+                    "error": {"code": 268894210, "message": "Method not found"},
+                }
+            return {
+                "id": body["id"],
+                "result": True,
+                "params": [self._answer(call) for call in body["params"]],
+            }
+        if method == "configManager.getConfig":
+            if body["params"]["name"] == "Missing":
+                return {"id": body["id"], "result": False, "error": {"code": 1}}
+            return {
+                "id": body["id"],
+                "result": True,
+                "params": {"table": {"Name": body["params"]["name"]}},
+            }
+        return {"id": body["id"], "result": True, "params": {}}
+
+    def methods(self):
+        return [post["method"] for post in self.posts]
+
+
+def _client(device: FakeDevice) -> DahuaRpc2Client:
+    session = MagicMock()
+    session.post = device.post
+    return DahuaRpc2Client("admin", "password", "192.168.1.108", 80, 554, session, 0.01)
+
+
+class TestMulticall:
+    @pytest.mark.asyncio
+    async def test_concurrent_get_config_is_one_request(self):
+        device = FakeDevice()
+        client = _client(device)
+        await client.login()
+        device.posts.clear()
+
+        results = await asyncio.gather(
+            client.get_config({"name": "General"}),
+            client.get_config({"name": "LeLensMask"}),
+            client.get_config({"name": "Lighting"}),
+        )
+
+        assert [result["table"]["Name"] for result in results] == [
+            "General",
+            "LeLensMask",
+            "Lighting",
+        ]
+        assert device.methods() == ["system.multicall"]
+        calls = device.posts[0]["params"]
+        assert [call["method"] for call in calls] == ["configManager.getConfig"] * 3
+        assert all(call["session"] == "session-1" for call in calls)
+        assert client.multicalls == 1
+
+    @pytest.mark.asyncio
+    async def test_single_call_is_not_wrapped(self):
+        device = FakeDevice()
+        client = _client(device)
+        await client.login()
+        device.posts.clear()
+
+        assert await client.set_config({"name": "LeLensMask", "table": []}) is True
+        assert device.methods() == ["configManager.setConfig"]
+
+    @pytest.mark.asyncio
+    async def test_logs_in_before_the_first_call(self):
+        device = FakeDevice()
+        client = _client(device)
+
+        await client.get_config({"name": "General"})
+
+        assert device.methods() == [
+            "global.login",
+            "global.login",
+            "configManager.getConfig",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_failed_call_only_fails_its_caller(self):
+        device = FakeDevice()
+        client = _client(device)
+        await client.login()
+
+        results = await asyncio.gather(
+            client.get_config({"name": "General"}),
+            client.get_config({"name": "Missing"}),
+            return_exceptions=True,
+        )
+
+        assert results[0] == {"table": {"Name": "General"}}
+        assert isinstance(results[1], ConnectionError)
+
+    @pytest.mark.asyncio
+    async def test_falls_back_without_multicall(self):
+        device = FakeDevice(multicall=False)
+        client = _client(device)
+        await client.login()
+        device.posts.clear()
+
+        results = await asyncio.gather(
+            client.get_config({"name": "General"}),
+            client.get_config({"name": "Lighting"}),
+        )
+
+        assert [result["table"]["Name"] for result in results] == [
+            "General",
+            "Lighting",
+        ]
+        assert device.methods() == [
+            "system.multicall",
+            "configManager.getConfig",
+            "configManager.getConfig",
+        ]
+        assert client.fallbacks == 1
+
+    @pytest.mark.asyncio
+    async def test_batches_are_limited(self, monkeypatch):
+        monkeypatch.setattr(rpc2, "MAX_MULTICALL_CALLS", 2)
+        device = FakeDevice()
+        client = _client(device)
+        await client.login()
+        device.posts.clear()
+
+        await asyncio.gather(
+            *(client.get_config({"name": str(index)}) for index in range(5))
+        )
+
+        assert device.methods() == [
+            "system.multicall",
+            "system.multicall",
+            "configManager.getConfig",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_relogs_in_when_the_session_expired(self):
+        device = FakeDevice()
+        client = _client(device)
+        await client.login()
+        device.expired = True
+        device.posts.clear()
+
+        results = await asyncio.gather(
+            client.get_config({"name": "General"}),
+            client.get_config({"name": "Lighting"}),
+        )
+
+        assert [result["table"]["Name"] for result in results] == [
+            "General",
+            "Lighting",
+        ]
+        assert device.methods() == [
+            "system.multicall",
+            "global.login",
+            "global.login",
+            "system.multicall",
+        ]
+
+
+class TestMalformedResponses:
+    @pytest.mark.asyncio
+    async def test_null_response(self):
+        client = _client(FakeDevice())
+        response = MagicMock()
+        response.json = AsyncMock(return_value=None)
+        client._session.post = AsyncMock(return_value=response)
+
+        with pytest.raises(ConnectionError):
+            await client.request("magicBox.getSerialNo")
+
+    @pytest.mark.asyncio
+    async def test_login_challenge_without_params(self):
+        device = FakeDevice()
+        answer = device._answer
+        device._answer = lambda body: {
+            key: value for key, value in answer(body).items() if key != "params"
+        }
+        client = _client(device)
+
+        with pytest.raises(ConnectionError):
+            await client.login()
+        assert device.methods() == ["global.login"]
+
+
+class TestKeepAlive:
+    @pytest.mark.asyncio
+    async def test_keep_alive_is_sent_along_when_due(self):
+        device = FakeDevice(keep_alive_interval=0)
+        client = _client(device)
+        await client.login()
+        device.posts.clear()
+
+        await client.get_config({"name": "General"})
+
+        assert device.methods() == ["system.multicall"]
+        assert [call["method"] for call in device.posts[0]["params"]] == [
+            "configManager.getConfig",
+            "global.keepAlive",
+        ]
+        assert client.keep_alives == 1
+
+    @pytest.mark.asyncio
+    async def test_keep_alive(self):
+        device = FakeDevice()
+        client = _client(device)
+        await client.login()
+
+        assert await client.keep_alive() is True
+        assert device.posts[-1]["params"] == {
+            "timeout": rpc2.SESSION_TIMEOUT_SECONDS,
+            "active": True,
+        }
+
+    @pytest.mark.asyncio
+    async def test_expired_session_is_logged_in_before_the_call(self, monkeypatch):
+        device = FakeDevice()
+        client = _client(device)
+        await client.login()
+        monkeypatch.setattr(client, "_session_expires", 0.0)
+        device.posts.clear()
+
+        await client.get_config({"name": "General"})
+
+        assert device.methods() == [
+            "global.login",
+            "global.login",
+            "configManager.getConfig",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_concurrent_logins_are_shared(self):
+        device = FakeDevice()
+        client = _client(device)
+
+        await asyncio.gather(client._ensure_logged_in(), client._ensure_logged_in())
+
+        assert device.methods() == ["global.login", "global.login"]
+
+    @pytest.mark.asyncio
+    async def test_keep_alive_runs_until_the_last_holder_stops(self):
+        client = _client(FakeDevice())
+        client.async_run_keep_alive = AsyncMock(side_effect=asyncio.Event().wait)
+
+        client.start_keep_alive()
+        client.start_keep_alive()
+        await asyncio.sleep(0)
+        task = client._keep_alive_task
+        client.async_run_keep_alive.assert_called_once()
+
+        client.stop_keep_alive()
+        await asyncio.sleep(0)
+        assert not task.done()
+        client.stop_keep_alive()
+        await asyncio.sleep(0)
+        assert task.cancelled()
+
+
+class TestRequestScheduler:
+    @pytest.mark.asyncio
+    async def test_shares_the_request_scheduler_of_the_device(self):
+        session = MagicMock()
+        session.post = FakeDevice().post
+        client = DahuaRpc2Client("admin", "password", "192.168.1.109", 80, 554, session)
+        scheduler = get_request_scheduler("http://192.168.1.109:80")
+        try:
+            assert client._request_scheduler is scheduler
+
+            await client.get_config({"name": "General"})
+            await client.set_config({"name": "General", "table": {}})
+
+            wait = scheduler.as_dict()["wait"]
+            # The login takes two requests, the getConfig one more and the setConfig goes ahead of the polling
+            assert wait["poll"]["count"] == 3
+            assert wait["command"]["count"] == 1
+        finally:
+            release_request_scheduler("http://192.168.1.109:80")
+            client.close()
+
+    @pytest.mark.asyncio
+    async def test_hanging_request_times_out(self, monkeypatch):
+        monkeypatch.setattr(rpc2, "REQUEST_TIMEOUT_SECONDS", 0.01)
+        client = _client(FakeDevice())
+
+        async def hang(url, data):
+            await asyncio.Event().wait()
+
+        client._session.post = hang
+
+        with pytest.raises(TimeoutError):
+            await client.request("magicBox.getSerialNo")
+        # The slot is given back
+        assert client._request_scheduler.as_dict()["in_flight"] == 0
+        client.close()
+
+
+class TestGetRpc2Client:
+    def test_shared_per_device_and_credentials(self):
+        session = MagicMock()
+        a = get_rpc2_client("admin", "password", "10.0.0.10", 80, 554, session)
+        b = get_rpc2_client("admin", "password", "10.0.0.10", 80, 554, session)
+        c = get_rpc2_client("admin", "other", "10.0.0.10", 80, 554, session)
+        assert a is b
+        assert a is not c
+
+        for _ in range(2):
+            release_rpc2_client("admin", "password", "10.0.0.10", 80)
+        release_rpc2_client("admin", "other", "10.0.0.10", 80)
+        assert (
+            get_rpc2_client("admin", "password", "10.0.0.10", 80, 554, session) is not a
+        )
+        release_rpc2_client("admin", "password", "10.0.0.10", 80)
+
+    def test_last_release_closes_the_client(self):
+        client = get_rpc2_client("admin", "password", "10.0.0.11", 80, 554, MagicMock())
+        scheduler = client._request_scheduler
+        assert get_request_scheduler("http://10.0.0.11:80") is scheduler
+
+        release_rpc2_client("admin", "password", "10.0.0.11", 80)
+        assert client._closed
+        # Only the hold taken above is left
+        release_request_scheduler("http://10.0.0.11:80")
+        assert get_request_scheduler("http://10.0.0.11:80") is not scheduler
+        release_request_scheduler("http://10.0.0.11:80")
@@ -76,7 +76,7 @@ class TestDoorbellLightSelect:
         mock_coordinator.client.async_set_lighting_v2_for_amcrest_doorbells = (
             AsyncMock()
         )
-        mock_coordinator.async_refresh = AsyncMock()
+        mock_coordinator.async_request_refresh = AsyncMock()
         sel = DahuaDoorbellLightSelect(mock_coordinator, mock_config_entry)
 
         await sel.async_select_option("On")
@@ -122,7 +122,7 @@ class TestPresetPositionSelect:
     @pytest.mark.asyncio
     async def test_select_option_numbered(self, mock_coordinator, mock_config_entry):
         mock_coordinator.client.async_goto_preset_position = AsyncMock()
-        mock_coordinator.async_refresh = AsyncMock()
+        mock_coordinator.async_request_refresh = AsyncMock()
         sel = DahuaCameraPresetPositionSelect(mock_coordinator, mock_config_entry)
 
         await sel.async_select_option("5")
@@ -0,0 +1,57 @@
+"""Tests for session_pool.py."""
+
+import pytest
+from aiohttp.hdrs import USER_AGENT
+from homeassistant.helpers.aiohttp_client import SERVER_SOFTWARE
+
+from custom_components.dahua.session_pool import (
+    CONNECTION_LIMIT_PER_HOST,
+    async_get_device_session,
+    async_release_device_session,
+)
+
+
+class TestDeviceSession:
+    @pytest.mark.asyncio
+    async def test_shared_by_entries_of_the_same_device(self, hass):
+        a = async_get_device_session(hass, "entry1", "192.168.1.108", 80)
+        b = async_get_device_session(hass, "entry2", "192.168.1.108", 80)
+        c = async_get_device_session(hass, "entry3", "192.168.1.109", 80)
+
+        assert a is b
+        assert a is not c
+        assert a.connector.limit_per_host == CONNECTION_LIMIT_PER_HOST
+        assert a.headers[USER_AGENT] == SERVER_SOFTWARE
+
+        for entry_id, address in (
+            ("entry1", "192.168.1.108"),
+            ("entry2", "192.168.1.108"),
+            ("entry3", "192.168.1.109"),
+        ):
+            await async_release_device_session(hass, entry_id, address, 80)
+
+    @pytest.mark.asyncio
+    async def test_closed_when_last_entry_releases(self, hass):
+        session = async_get_device_session(hass, "entry1", "192.168.1.108", 80)
+        async_get_device_session(hass, "entry2", "192.168.1.108", 80)
+
+        await async_release_device_session(hass, "entry1", "192.168.1.108", 80)
+        assert not session.closed
+
+        await async_release_device_session(hass, "entry2", "192.168.1.108", 80)
+        assert session.closed
+        assert session.connector is None or session.connector.closed
+
+        # A new entry gets a new session
+        new_session = async_get_device_session(hass, "entry1", "192.168.1.108", 80)
+        assert new_session is not session
+        await async_release_device_session(hass, "entry1", "192.168.1.108", 80)
+
+    @pytest.mark.asyncio
+    async def test_reload_does_not_take_a_second_hold(self, hass):
+        session = async_get_device_session(hass, "entry1", "192.168.1.108", 80)
+        async_get_device_session(hass, "entry1", "192.168.1.108", 80)
+
+        await async_release_device_session(hass, "entry1", "192.168.1.108", 80)
+
+        assert session.closed
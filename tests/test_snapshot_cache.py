@@ -0,0 +1,61 @@
+"""Tests for snapshot_cache.py."""
+
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from custom_components.dahua.snapshot_cache import SnapshotCache
+
+
+class TestSnapshotCache:
+    @pytest.mark.asyncio
+    async def test_cached_within_ttl(self):
+        fetch = AsyncMock(return_value=b"jpeg")
+        cache = SnapshotCache(fetch, 2.0)
+
+        assert await cache.async_get() == b"jpeg"
+        assert await cache.async_get() == b"jpeg"
+
+        assert fetch.call_count == 1
+        assert cache.as_dict()["hits"] == 1
+        assert cache.as_dict()["misses"] == 1
+
+    @pytest.mark.asyncio
+    async def test_refetched_after_ttl(self):
+        fetch = AsyncMock(side_effect=[b"one", b"two"])
+        cache = SnapshotCache(fetch, 1.0)
+
+        with patch("custom_components.dahua.snapshot_cache.time") as mock_time:
+            mock_time.monotonic.return_value = 100.0
+            assert await cache.async_get() == b"one"
+            mock_time.monotonic.return_value = 101.5
+            assert await cache.async_get() == b"two"
+
+    @pytest.mark.asyncio
+    async def test_concurrent_callers_coalesce(self):
+        release = asyncio.Event()
+        calls = []
+
+        async def fetch():
+            calls.append(True)
+            await release.wait()
+            return b"jpeg"
+
+        cache = SnapshotCache(fetch, 0)
+        waiters = [asyncio.ensure_future(cache.async_get()) for _ in range(5)]
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await asyncio.gather(*waiters) == [b"jpeg"] * 5
+        assert len(calls) == 1
+        assert cache.as_dict()["coalesced"] == 4
+
+    @pytest.mark.asyncio
+    async def test_error_is_not_cached(self):
+        fetch = AsyncMock(side_effect=[ValueError("boom"), b"jpeg"])
+        cache = SnapshotCache(fetch, 5.0)
+
+        with pytest.raises(ValueError):
+            await cache.async_get()
+        assert await cache.async_get() == b"jpeg"
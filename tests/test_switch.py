@@ -101,7 +101,7 @@ class TestMotionDetectionSwitch:
     @pytest.mark.asyncio
     async def test_turn_on(self, mock_coordinator, mock_config_entry):
         mock_coordinator.client.enable_motion_detection = AsyncMock()
-        mock_coordinator.async_refresh = AsyncMock()
+        mock_coordinator.async_request_refresh = AsyncMock()
         sw = DahuaMotionDetectionBinarySwitch(mock_coordinator, mock_config_entry)
 
         await sw.async_turn_on()
@@ -110,7 +110,7 @@ class TestMotionDetectionSwitch:
     @pytest.mark.asyncio
     async def test_turn_off(self, mock_coordinator, mock_config_entry):
         mock_coordinator.client.enable_motion_detection = AsyncMock()
-        mock_coordinator.async_refresh = AsyncMock()
+        mock_coordinator.async_request_refresh = AsyncMock()
         sw = DahuaMotionDetectionBinarySwitch(mock_coordinator, mock_config_entry)
 
         await sw.async_turn_off()
@@ -136,7 +136,7 @@ class TestSirenSwitch:
     @pytest.mark.asyncio
     async def test_turn_on(self, mock_coordinator, mock_config_entry):
         mock_coordinator.client.async_set_coaxial_control_state = AsyncMock()
-        mock_coordinator.async_refresh = AsyncMock()
+        mock_coordinator.async_request_refresh = AsyncMock()
         sw = DahuaSirenBinarySwitch(mock_coordinator, mock_config_entry)
 
         await sw.async_turn_on()
@@ -147,7 +147,7 @@ class TestSirenSwitch:
     @pytest.mark.asyncio
     async def test_turn_off(self, mock_coordinator, mock_config_entry):
         mock_coordinator.client.async_set_coaxial_control_state = AsyncMock()
-        mock_coordinator.async_refresh = AsyncMock()
+        mock_coordinator.async_request_refresh = AsyncMock()
         sw = DahuaSirenBinarySwitch(mock_coordinator, mock_config_entry)
 
         await sw.async_turn_off()
@@ -179,7 +179,7 @@ class TestSmartMotionDetectionSwitch:
         """Standard Dahua uses async_enabled_smart_motion_detection."""
         mock_coordinator.model = "IPC-HDW5831R-ZE"
         mock_coordinator.client.async_enabled_smart_motion_detection = AsyncMock()
-        mock_coordinator.async_refresh = AsyncMock()
+        mock_coordinator.async_request_refresh = AsyncMock()
         sw = DahuaSmartMotionDetectionBinarySwitch(mock_coordinator, mock_config_entry)
 
         await sw.async_turn_on()
@@ -192,7 +192,7 @@ class TestSmartMotionDetectionSwitch:
         """Amcrest uses async_set_ivs_rule."""
         mock_coordinator.model = "AD410"
         mock_coordinator.client.async_set_ivs_rule = AsyncMock()
-        mock_coordinator.async_refresh = AsyncMock()
+        mock_coordinator.async_request_refresh = AsyncMock()
         sw = DahuaSmartMotionDetectionBinarySwitch(mock_coordinator, mock_config_entry)
 
         await sw.async_turn_on()
@@ -202,7 +202,7 @@ class TestSmartMotionDetectionSwitch:
     async def test_turn_off_standard(self, mock_coordinator, mock_config_entry):
         mock_coordinator.model = "IPC-HDW5831R-ZE"
         mock_coordinator.client.async_enabled_smart_motion_detection = AsyncMock()
-        mock_coordinator.async_refresh = AsyncMock()
+        mock_coordinator.async_request_refresh = AsyncMock()
         sw = DahuaSmartMotionDetectionBinarySwitch(mock_coordinator, mock_config_entry)
 
         await sw.async_turn_off()
@@ -214,7 +214,7 @@ class TestSmartMotionDetectionSwitch:
     async def test_turn_off_amcrest(self, mock_coordinator, mock_config_entry):
         mock_coordinator.model = "AD410"
         mock_coordinator.client.async_set_ivs_rule = AsyncMock()
-        mock_coordinator.async_refresh = AsyncMock()
+        mock_coordinator.async_request_refresh = AsyncMock()
         sw = DahuaSmartMotionDetectionBinarySwitch(mock_coordinator, mock_config_entry)
 
         await sw.async_turn_off()
@@ -242,7 +242,7 @@ class TestDisarmingLinkageSwitch:
     @pytest.mark.asyncio
     async def test_turn_on(self, mock_coordinator, mock_config_entry):
         mock_coordinator.client.async_set_disarming_linkage = AsyncMock()
-        mock_coordinator.async_refresh = AsyncMock()
+        mock_coordinator.async_request_refresh = AsyncMock()
         sw = DahuaDisarmingLinkageBinarySwitch(mock_coordinator, mock_config_entry)
 
         await sw.async_turn_on()
@@ -253,7 +253,7 @@ class TestDisarmingLinkageSwitch:
     @pytest.mark.asyncio
     async def test_turn_off(self, mock_coordinator, mock_config_entry):
         mock_coordinator.client.async_set_disarming_linkage = AsyncMock()
-        mock_coordinator.async_refresh = AsyncMock()
+        mock_coordinator.async_request_refresh = AsyncMock()
         sw = DahuaDisarmingLinkageBinarySwitch(mock_coordinator, mock_config_entry)
 
         await sw.async_turn_off()
@@ -284,7 +284,7 @@ class TestEventNotificationsSwitch:
     @pytest.mark.asyncio
     async def test_turn_off(self, mock_coordinator, mock_config_entry):
         mock_coordinator.client.async_set_event_notifications = AsyncMock()
-        mock_coordinator.async_refresh = AsyncMock()
+        mock_coordinator.async_request_refresh = AsyncMock()
         sw = DahuaDisarmingEventNotificationsLinkageBinarySwitch(
             mock_coordinator, mock_config_entry
         )
@@ -304,7 +304,7 @@ class TestEventNotificationsSwitch:
     @pytest.mark.asyncio
     async def test_turn_on(self, mock_coordinator, mock_config_entry):
         mock_coordinator.client.async_set_event_notifications = AsyncMock()
-        mock_coordinator.async_refresh = AsyncMock()
+        mock_coordinator.async_request_refresh = AsyncMock()
         sw = DahuaDisarmingEventNotificationsLinkageBinarySwitch(
             mock_coordinator, mock_config_entry
         )
@@ -0,0 +1,189 @@
+"""Tests for the DHIP decoder in vto.py."""
+
+import asyncio
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+from custom_components.dahua.vto import (
+    MAX_DHIP_PAYLOAD_LENGTH,
+    DahuaVTOClient,
+    DhipDecoder,
+)
+
+
+def _frame(message):
+    return DahuaVTOClient.convert_message(message)
+
+
+EVENT = {
+    "id": 8,
+    "method": "client.notifyEventStream",
+    "params": {"SID": 513, "eventList": [{"Action": "Pulse", "Code": "BackKeyLight"}]},
+    "session": 1722306858,
+}
+
+
+class TestDhipDecoder:
+    def test_single_frame(self):
+        assert DhipDecoder().feed(_frame(EVENT)) == [EVENT]
+
+    def test_several_frames_in_a_chunk(self):
+        data = _frame(EVENT) + _frame({"id": 9, "params": {}})
+        assert DhipDecoder().feed(data) == [EVENT, {"id": 9, "params": {}}]
+
+    def test_frame_split_across_chunks(self):
+        decoder = DhipDecoder()
+        data = _frame(EVENT) * 2
+        messages = []
+        # Split inside the header and inside the payload
+        for chunk in (data[:10], data[10:40], data[40:100], data[100:]):
+            messages.extend(decoder.feed(chunk))
+        assert messages == [EVENT, EVENT]
+
+    def test_one_byte_at_a_time(self):
+        decoder = DhipDecoder()
+        data = _frame(EVENT) * 3
+        messages = []
+        for i in range(len(data)):
+            messages.extend(decoder.feed(data[i : i + 1]))
+        assert messages == [EVENT, EVENT, EVENT]
+
+    def test_resyncs_after_garbage(self):
+        """Bytes between frames (e.g. a trailing newline) are skipped."""
+        data = _frame(EVENT) + b"\n" + _frame(EVENT) + b"junk"
+        decoder = DhipDecoder()
+        assert decoder.feed(data) == [EVENT, EVENT]
+        assert decoder.feed(_frame(EVENT)) == [EVENT]
+
+    def test_invalid_json_is_skipped(self):
+        payload = b"{not json"
+        header = _frame({})[:32]
+        bad = bytearray(header)
+        bad[16:20] = len(payload).to_bytes(4, "little")
+        data = bytes(bad) + payload + _frame(EVENT)
+        assert DhipDecoder().feed(data) == [EVENT]
+
+    def test_unicode_payload(self):
+        message = {"id": 1, "params": {"name": "Haustür"}}
+        frame = b"\x20\x00\x00\x00DHIP" + bytes(8)
+        payload = json.dumps(message, ensure_ascii=False).encode("utf-8")
+        frame += len(payload).to_bytes(4, "little") + bytes(4)
+        frame += len(payload).to_bytes(4, "little") + bytes(4) + payload
+        assert DhipDecoder().feed(frame) == [message]
+
+    def test_oversized_frame_resets_the_buffer(self):
+        header = bytearray(_frame({})[:32])
+        header[16:20] = (MAX_DHIP_PAYLOAD_LENGTH + 1).to_bytes(4, "little")
+        decoder = DhipDecoder()
+
+        with pytest.raises(ValueError):
+            decoder.feed(bytes(header) + b"{")
+
+        assert len(decoder._buffer) == 0
+        assert decoder.feed(_frame(EVENT)) == [EVENT]
+
+
+def _client():
+    client = DahuaVTOClient("192.168.1.110", "admin", "password", False, MagicMock())
+    client.transport = MagicMock()
+    client.transport.is_closing.return_value = False
+    return client
+
+
+def _response(request_id, **fields):
+    return _frame({"id": request_id, "session": 0, **fields})
+
+
+class TestAsyncRequest:
+    @pytest.mark.asyncio
+    async def test_pipelined_requests(self):
+        """Several requests are outstanding at once and each gets its own response."""
+        client = _client()
+        first = asyncio.ensure_future(client.async_request("magicBox.getDeviceType"))
+        second = asyncio.ensure_future(client.async_request("magicBox.getSerialNo"))
+        await asyncio.sleep(0)
+        assert client.transport.write.call_count == 2
+
+        # Answered out of order
+        client.data_received(_response(3, params={"sn": "ABC"}))
+        client.data_received(_response(2, params={"type": "VTO2202F"}))
+
+        assert (await first)["params"] == {"type": "VTO2202F"}
+        assert (await second)["params"] == {"sn": "ABC"}
+        assert client.data_handlers == {}
+
+    @pytest.mark.asyncio
+    async def test_timeout_removes_handler(self):
+        client = _client()
+        with pytest.raises(TimeoutError):
+            await client.async_request("magicBox.getDeviceType", timeout=0.01)
+        assert client.data_handlers == {}
+
+        # A late response goes to the default handler
+        client.data_received(_response(2, params={}))
+
+    @pytest.mark.asyncio
+    async def test_connection_lost_fails_pending(self):
+        client = _client()
+        request = asyncio.ensure_future(client.async_request("magicBox.getDeviceType"))
+        await asyncio.sleep(0)
+        client.connection_lost(None)
+        with pytest.raises(ConnectionError):
+            await request
+        assert client.data_handlers == {}
+
+    @pytest.mark.asyncio
+    async def test_oversized_frame_closes_the_connection(self):
+        client = _client()
+        header = bytearray(_frame({})[:32])
+        header[16:20] = (MAX_DHIP_PAYLOAD_LENGTH + 1).to_bytes(4, "little")
+
+        client.data_received(bytes(header))
+
+        client.transport.close.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_kept_handler_gets_every_message(self):
+        client = _client()
+        handler = MagicMock()
+        request_id = client.send("eventManager.attach", handler, keep=True)
+        client.data_received(_response(request_id, params={}))
+        client.data_received(_response(request_id, method="client.notifyEventStream"))
+        assert handler.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_load_details(self):
+        client = _client()
+        task = asyncio.ensure_future(client.async_load_details())
+        for _ in range(3):
+            await asyncio.sleep(0)
+        # All four requests are sent before any response
+        assert client.transport.write.call_count == 4
+
+        client.data_received(_response(5, params={"type": "VTO2202F"}))
+        client.data_received(_response(3, params={"version": {"Version": "4.3"}}))
+        client.data_received(_response(4, params={"table": {"UUID": "SN123"}}))
+        client.data_received(
+            _response(
+                2,
+                params={
+                    "table": [{"AccessProtocol": "Local", "UnlockReloadInterval": 3}]
+                },
+            )
+        )
+        await task
+
+        assert client.dahua_details["deviceType"] == "VTO2202F"
+        assert client.dahua_details["serialNumber"] == "SN123"
+        assert client.dahua_details["version"] == "4.3"
+        assert client.hold_time == 3
+
+    @pytest.mark.asyncio
+    async def test_cancel_call(self):
+        client = _client()
+        task = asyncio.ensure_future(client.cancel_call())
+        await asyncio.sleep(0)
+        client.data_received(_response(2, result=False))
+        assert await task is False
@@ -0,0 +1,88 @@
+"""Tests for vto_supervisor.py."""
+
+import asyncio
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from custom_components.dahua.vto_supervisor import VTOSupervisor
+
+
+def _client(details_loaded=True):
+    loop = asyncio.get_running_loop()
+    client = MagicMock()
+    client.attached = loop.create_future()
+    client.attached.set_result(None)
+    client.disconnected = loop.create_future()
+    client.details_loaded = details_loaded
+    client.dahua_details = {"deviceType": "VTO2202F", "serialNumber": "SN123"}
+    client.hold_time = 3
+    return client
+
+
+class TestVTOSupervisor:
+    @pytest.mark.asyncio
+    async def test_reconnects_with_cached_details(self):
+        supervisor = VTOSupervisor("192.168.1.110", "admin", "password", MagicMock())
+        clients = [_client(), _client()]
+        factories = []
+
+        async def create_connection(factory, host, port):
+            factories.append(factory)
+            client = clients[len(factories) - 1]
+            # The first connection drops right after attaching
+            if len(factories) == 1:
+                client.disconnected.set_result(True)
+            return MagicMock(), client
+
+        loop = asyncio.get_running_loop()
+        with (
+            patch.object(loop, "create_connection", side_effect=create_connection),
+            patch(
+                "custom_components.dahua.vto_supervisor.backoff_delay", return_value=0
+            ),
+            patch("custom_components.dahua.vto_supervisor.DahuaVTOClient") as mock_cls,
+        ):
+            task = asyncio.ensure_future(supervisor.async_run())
+            for _ in range(10):
+                await asyncio.sleep(0)
+
+            assert supervisor.client is clients[1]
+            # The second connection gets the details learned on the first
+            factories[1]()
+            args = mock_cls.call_args.args
+            assert args[5] == {"deviceType": "VTO2202F", "serialNumber": "SN123"}
+            assert args[6] == 3
+
+            stats = supervisor.as_dict()
+            assert stats["connects"] == 2
+            assert stats["details_cached"] is True
+            assert stats["reconnect_latency"]["count"] == 1
+
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+    @pytest.mark.asyncio
+    async def test_failure_counts_and_backs_off(self):
+        supervisor = VTOSupervisor("192.168.1.110", "admin", "password", MagicMock())
+        loop = asyncio.get_running_loop()
+        with (
+            patch.object(loop, "create_connection", side_effect=OSError("refused")),
+            patch(
+                "custom_components.dahua.vto_supervisor.backoff_delay", return_value=0
+            ) as mock_backoff,
+        ):
+            task = asyncio.ensure_future(supervisor.async_run())
+            for _ in range(10):
+                await asyncio.sleep(0)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        stats = supervisor.as_dict()
+        assert stats["failures"] >= 2
+        assert stats["connects"] == 0
+        # Each failed attempt backs off further
+        attempts = [call.args[0] for call in mock_backoff.call_args_list]
+        assert attempts[:3] == [0, 1, 2]
@@ -0,0 +1,136 @@
+"""Tests for write_queue.py."""
+
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from aiohttp import ClientError
+
+from custom_components.dahua import write_queue
+from custom_components.dahua.write_queue import (
+    SetConfigQueue,
+    get_set_config_queue,
+    release_set_config_queue,
+)
+
+
+class TestSetConfigQueue:
+    @pytest.mark.asyncio
+    async def test_concurrent_writes_are_merged(self):
+        send = AsyncMock(return_value="OK\r\n")
+        queue = SetConfigQueue(0.01)
+
+        results = await asyncio.gather(
+            queue.async_set(["Lighting[0][0].Mode=Manual"], send),
+            queue.async_set(["DisableLinkage[0].Enable=true"], send),
+        )
+
+        assert results == ["OK\r\n", "OK\r\n"]
+        send.assert_called_once_with(
+            ["Lighting[0][0].Mode=Manual", "DisableLinkage[0].Enable=true"]
+        )
+        assert queue.as_dict() == {"writes": 2, "requests": 1, "fallbacks": 0}
+
+    @pytest.mark.asyncio
+    async def test_later_write_to_same_key_wins(self):
+        send = AsyncMock(return_value="OK")
+        queue = SetConfigQueue(0.01)
+
+        await asyncio.gather(
+            queue.async_set(["LightGlobal[0].Enable=true"], send),
+            queue.async_set(["LightGlobal[0].Enable=false"], send),
+        )
+
+        send.assert_called_once_with(["LightGlobal[0].Enable=false"])
+
+    @pytest.mark.asyncio
+    async def test_rejected_merge_is_sent_one_at_a_time(self):
+        async def send(params):
+            return "Error" if "Bad[0].Enable=true" in params else "OK"
+
+        queue = SetConfigQueue(0.01)
+
+        results = await asyncio.gather(
+            queue.async_set(["Good[0].Enable=true"], send),
+            queue.async_set(["Bad[0].Enable=true"], send),
+        )
+
+        assert results == ["OK", "Error"]
+        assert queue.as_dict() == {"writes": 2, "requests": 3, "fallbacks": 1}
+
+    @pytest.mark.asyncio
+    async def test_error_goes_to_every_caller(self):
+        send = AsyncMock(side_effect=ClientError("down"))
+        queue = SetConfigQueue(0.01)
+
+        results = await asyncio.gather(
+            queue.async_set(["A[0].Enable=true"], send),
+            queue.async_set(["B[0].Enable=true"], send),
+            return_exceptions=True,
+        )
+
+        assert all(isinstance(result, ClientError) for result in results)
+        send.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_unanswered_request_times_out_every_caller(self):
+        released = asyncio.Event()
+
+        async def send(params):
+            try:
+                await asyncio.sleep(10)
+            finally:
+                # Stands in for the request scheduler slot the send holds
+                released.set()
+
+        queue = SetConfigQueue(0.01, send_timeout=0.05)
+
+        results = await asyncio.gather(
+            queue.async_set(["A[0].Enable=true"], send),
+            queue.async_set(["B[0].Enable=true"], send),
+            return_exceptions=True,
+        )
+
+        assert all(isinstance(result, TimeoutError) for result in results)
+        assert released.is_set()
+        assert queue.as_dict() == {"writes": 2, "requests": 1, "fallbacks": 0}
+
+    @pytest.mark.asyncio
+    async def test_long_writes_are_split(self):
+        send = AsyncMock(return_value="OK")
+        queue = SetConfigQueue(0.01)
+
+        with patch.object(write_queue, "MAX_QUERY_LENGTH", 30):
+            await asyncio.gather(
+                queue.async_set(["A[0].Enable=true"], send),
+                queue.async_set(["B[0].Enable=true"], send),
+            )
+
+        assert send.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_cancelled_write_is_not_sent(self):
+        send = AsyncMock(return_value="OK")
+        queue = SetConfigQueue(0.01)
+
+        task = asyncio.ensure_future(queue.async_set(["A[0].Enable=true"], send))
+        await asyncio.sleep(0)
+        task.cancel()
+        await asyncio.sleep(0.05)
+
+        send.assert_not_called()
+
+
+class TestGetSetConfigQueue:
+    def test_shared_per_device(self):
+        a = get_set_config_queue("http://10.0.0.3:80", "admin")
+        b = get_set_config_queue("http://10.0.0.3:80", "admin")
+        c = get_set_config_queue("http://10.0.0.4:80", "admin")
+        assert a is b
+        assert a is not c
+
+    def test_dropped_when_released_by_every_holder(self):
+        a = get_set_config_queue("http://10.0.0.8:80", "admin")
+        release_set_config_queue("http://10.0.0.8:80", "admin")
+
+        assert get_set_config_queue("http://10.0.0.8:80", "admin") is not a